@@ -0,0 +1,247 @@
+import heapq
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from spatial_index import DynamicGeoGridIndex
+from mock_data import DELIVERY_AGENTS
+from catalog_loader import read_agents
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+AGENT_STATUSES = ('available', 'busy', 'offline')
+
+# Allowed status changes; anything else is rejected
+_STATUS_TRANSITIONS = {
+    'available': {'busy', 'offline'},
+    'busy': {'available', 'offline'},
+    'offline': {'available'},
+}
+
+class AgentRegistry:
+    """
+    Live registry of delivery agents
+
+    Agents are dicts shaped like mock_data.DELIVERY_AGENTS entries. Only available agents
+    are kept in a spatial grid, so nearest-available queries never look at busy or offline
+    agents and cost O(agents near the query). Every operation holds one re-entrant lock,
+    which makes claim_nearest atomic: two concurrent orders can never get the same agent.
+
+    A claim can carry a lease: if the agent is not released within claim_ttl_seconds it
+    becomes available again, so an order that never reports completion does not take the
+    agent out of rotation forever. Each claim gets a claim_id; releasing with it only frees
+    the agent while that claim is still the current one.
+
+    Args:
+        agents (Iterable[Dict]): Initial agents
+        cell_km (float): Spatial grid cell size in kilometers
+        claim_ttl_seconds (float): Lease on claims; 0 keeps agents busy until released
+        clock (Callable[[], float]): Monotonic time source, injectable for tests
+    """
+
+    def __init__(self, agents: Iterable[Dict] = (), cell_km: float = Config.AGENT_INDEX_CELL_KM,
+                 claim_ttl_seconds: float = Config.AGENT_CLAIM_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self._lock = threading.RLock()
+        self._agents: Dict[str, Dict] = {}
+        self._available = DynamicGeoGridIndex(cell_km)
+        self._claim_ttl_seconds = claim_ttl_seconds
+        self._clock = clock
+        self._claim_expiry: Dict[str, float] = {}
+        self._claim_ids: Dict[str, str] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        for agent in agents:
+            self.register(agent)
+
+    @staticmethod
+    def _snapshot(agent: Dict) -> Dict:
+        return {**agent, "current_location": dict(agent["current_location"])}
+
+    def _index(self, agent: Dict):
+        if agent["status"] == 'available':
+            location = agent["current_location"]
+            self._available.upsert(agent["id"], location["lat"], location["lng"])
+        else:
+            self._available.remove(agent["id"])
+
+    def _reap_expired_claims(self):
+        """Make agents whose claim lease ran out available again"""
+        now = self._clock()
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, agent_id = heapq.heappop(heap)
+            # Stale heap entries belong to claims that were released or renewed
+            if self._claim_expiry.get(agent_id) == expires_at:
+                logger.warning(f"Claim on agent {agent_id} expired, making it available again")
+                self._set_status(agent_id, 'available')
+
+    def register(self, agent: Dict) -> Dict:
+        """
+        Add an agent, or replace one with the same id
+
+        Args:
+            agent (Dict): {"id", "name", "status", "current_location": {"lat", "lng"}};
+                status defaults to available
+
+        Returns:
+            Dict: Snapshot of the registered agent
+        """
+        status = agent.get("status", 'available')
+        if status not in AGENT_STATUSES:
+            raise ValueError(f"Unknown agent status: {status}")
+        record = {**agent, "status": status, "current_location": dict(agent["current_location"])}
+        with self._lock:
+            self._agents[record["id"]] = record
+            self._claim_expiry.pop(record["id"], None)
+            self._claim_ids.pop(record["id"], None)
+            self._index(record)
+            return self._snapshot(record)
+
+    def get(self, agent_id: str) -> Optional[Dict]:
+        """Return a snapshot of an agent, or None"""
+        with self._lock:
+            self._reap_expired_claims()
+            agent = self._agents.get(agent_id)
+            return self._snapshot(agent) if agent else None
+
+    def agents(self) -> List[Dict]:
+        """Snapshots of every agent in registration order"""
+        with self._lock:
+            self._reap_expired_claims()
+            return [self._snapshot(agent) for agent in self._agents.values()]
+
+    def available_count(self) -> int:
+        with self._lock:
+            self._reap_expired_claims()
+            return len(self._available)
+
+    def update_location(self, agent_id: str, lat: float, lng: float) -> bool:
+        """Move an agent; returns False for unknown agents"""
+        with self._lock:
+            agent = self._agents.get(agent_id)
+            if agent is None:
+                return False
+            agent["current_location"] = {"lat": lat, "lng": lng}
+            self._index(agent)
+            return True
+
+    def set_status(self, agent_id: str, status: str) -> bool:
+        """
+        Change an agent's status
+
+        Args:
+            agent_id (str): Agent id
+            status (str): One of AGENT_STATUSES
+
+        Returns:
+            bool: False when the agent is unknown or the transition is not allowed
+        """
+        if status not in AGENT_STATUSES:
+            raise ValueError(f"Unknown agent status: {status}")
+        with self._lock:
+            self._reap_expired_claims()
+            return self._set_status(agent_id, status)
+
+    def _set_status(self, agent_id: str, status: str) -> bool:
+        agent = self._agents.get(agent_id)
+        if agent is None:
+            return False
+        if agent["status"] == status:
+            return True
+        if status not in _STATUS_TRANSITIONS[agent["status"]]:
+            return False
+        agent["status"] = status
+        self._claim_ids.pop(agent_id, None)
+        if status == 'busy' and self._claim_ttl_seconds > 0:
+            expires_at = self._clock() + self._claim_ttl_seconds
+            self._claim_expiry[agent_id] = expires_at
+            heapq.heappush(self._expiry_heap, (expires_at, agent_id))
+        else:
+            self._claim_expiry.pop(agent_id, None)
+        self._index(agent)
+        return True
+
+    def nearest_available(self, location: Dict, k: int = 1,
+                          max_distance_km: Optional[float] = None) -> List[Tuple[Dict, float]]:
+        """
+        Find the k available agents nearest to a location, without claiming them
+
+        Args:
+            location (Dict): {"lat": float, "lng": float}
+            k (int): Number of agents
+            max_distance_km (Optional[float]): Ignore agents farther than this
+
+        Returns:
+            List[Tuple[Dict, float]]: (agent snapshot, distance_km), nearest first
+        """
+        with self._lock:
+            self._reap_expired_claims()
+            return [
+                (self._snapshot(self._agents[agent_id]), distance_km)
+                for agent_id, distance_km in self._available.nearest(location["lat"], location["lng"], k, max_distance_km)
+            ]
+
+    def claim(self, agent_id: str) -> Optional[Dict]:
+        """
+        Mark an available agent busy
+
+        Returns:
+            Optional[Dict]: Agent snapshot plus the claim's "claim_id", or None if it was not available
+        """
+        with self._lock:
+            self._reap_expired_claims()
+            agent = self._agents.get(agent_id)
+            if agent is None or agent["status"] != 'available':
+                return None
+            self._set_status(agent_id, 'busy')
+            claim_id = uuid.uuid4().hex
+            self._claim_ids[agent_id] = claim_id
+            return {**self._snapshot(agent), "claim_id": claim_id}
+
+    def claim_nearest(self, location: Dict, max_distance_km: Optional[float] = None) -> Optional[Tuple[Dict, float]]:
+        """
+        Atomically find the nearest available agent and mark it busy
+
+        Returns:
+            Optional[Tuple[Dict, float]]: (agent snapshot, distance_km), or None when no agent is available
+        """
+        with self._lock:
+            nearest = self.nearest_available(location, 1, max_distance_km)
+            if not nearest:
+                return None
+            agent, distance_km = nearest[0]
+            return self.claim(agent["id"]), distance_km
+
+    def release(self, agent_id: str, location: Optional[Dict] = None, claim_id: Optional[str] = None) -> bool:
+        """
+        Make a busy agent available again, optionally at a new location
+
+        Args:
+            claim_id (Optional[str]): Only release if this is still the agent's current claim
+
+        Returns:
+            bool: False when the agent is unknown, was not busy or is held by another claim
+        """
+        with self._lock:
+            self._reap_expired_claims()
+            agent = self._agents.get(agent_id)
+            if agent is None or agent["status"] != 'busy':
+                return False
+            if claim_id is not None and self._claim_ids.get(agent_id) != claim_id:
+                return False
+            if location is not None:
+                agent["current_location"] = {"lat": location["lat"], "lng": location["lng"]}
+            return self._set_status(agent_id, 'available')
+
+
+def _stored_agents() -> List[Dict]:
+    try:
+        return read_agents()
+    except Exception as e:
+        logger.error(f"Error reading delivery agents: {e}")
+        return []
+
+# Shared registry seeded from the agents table, or the built-in agents when it is empty
+agent_registry = AgentRegistry(_stored_agents() or DELIVERY_AGENTS)
@@ -0,0 +1,84 @@
+from collections import deque
+from typing import Iterable, Iterator, Set, Tuple
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton for finding every occurrence of a fixed set of patterns in a text
+
+    Build once, then each search is a single pass over the text regardless of how many
+    patterns there are.
+
+    Args:
+        patterns (Iterable[str]): Non-empty patterns, matched case-sensitively
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = tuple(patterns)
+        self._goto = [{}]  # state -> {char: state}
+        self._fail = [0]
+        self._out = [()]  # state -> pattern indexes ending here
+
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                raise ValueError("AhoCorasick patterns must be non-empty")
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] = self._out[state] + (index,)
+
+        # Breadth-first pass to link each state to its longest proper suffix state
+        queue = deque(self._goto[0].values())  # Depth-1 states fail back to the root
+        bfs_order = [0]
+        while queue:
+            state = queue.popleft()
+            bfs_order.append(state)
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+        # Fold the failure links into a full transition table so searching never backtracks.
+        # Failure states are shallower, so breadth-first order has them ready first.
+        self._delta = [None] * len(self._goto)
+        for state in bfs_order:
+            transitions = dict(self._delta[self._fail[state]]) if state else {}
+            transitions.update(self._goto[state])
+            self._delta[state] = transitions
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (end_index, pattern_index) for every occurrence in text"""
+        delta = self._delta
+        out = self._out
+        state = 0
+        for position, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            for index in out[state]:
+                yield position, index
+
+    def find_all(self, text: str) -> Set[int]:
+        """Return the indexes of every pattern occurring in text"""
+        delta = self._delta
+        out = self._out
+        found = set()
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def contains_any(self, text: str) -> bool:
+        """Return True if any pattern occurs in text"""
+        for _ in self.iter_matches(text):
+            return True
+        return False
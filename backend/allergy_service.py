@@ -1,7 +1,12 @@
 import logging
-from typing import List, Dict, Set
+import time
+from functools import lru_cache
+from typing import List, Dict, Set, Tuple
 from sqlalchemy.orm import Session
-from models import UserAllergy
+from models import SessionLocal, UserAllergy, AllergyProfileVersion
+from aho_corasick import AhoCorasick
+from cache_service import LRUCache
+from config import Config
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -155,8 +160,10 @@ def add_user_allergy(db: Session, user_id: int, allergy_name: str, allergy_type:
         )
         
         db.add(new_allergy)
+        bump_allergy_profile_version(db, user_id)
         db.commit()
         db.refresh(new_allergy)
+        invalidate_user_allergy_profile(user_id)
         
         return {
             "success": True,
@@ -201,7 +208,9 @@ def remove_user_allergy(db: Session, user_id: int, allergy_id: int) -> Dict:
             }
         
         db.delete(allergy)
+        bump_allergy_profile_version(db, user_id)
         db.commit()
+        invalidate_user_allergy_profile(user_id)
         
         return {
             "success": True,
@@ -216,6 +225,147 @@ def remove_user_allergy(db: Session, user_id: int, allergy_id: int) -> Dict:
             "error": f"Failed to remove allergy: {str(e)}"
         }
 
+class AllergenMatcher:
+    """
+    Compiled matcher for one user allergy list
+
+    Every keyword and related term of the user's common allergens, plus their custom
+    allergies, go into one Aho-Corasick automaton, so checking an ingredient is a single
+    pass over its name however many allergens the user has. Matching keeps the original
+    substring rules: a common allergen matches when a keyword or related term occurs in
+    the ingredient name, a custom allergy when either string contains the other.
+
+    Args:
+        user_allergies (Tuple[str, ...]): Lowercased user allergies, in profile order
+    """
+
+    def __init__(self, user_allergies: Tuple[str, ...]):
+        self.user_allergies = user_allergies
+        self.common_allergens = tuple(name for name in COMMON_ALLERGENS if name in user_allergies)
+        # Duplicates are kept: each listed custom allergy reports its own match
+        self.custom_allergies = tuple(allergy for allergy in user_allergies if allergy not in COMMON_ALLERGENS)
+
+        # pattern -> [(rule index, match type)] where rules are common allergens then custom allergies
+        pattern_rules = {}
+        for index, allergen_name in enumerate(self.common_allergens):
+            for match_type, terms in (("keyword_match", COMMON_ALLERGENS[allergen_name]['keywords']),
+                                      ("related_match", COMMON_ALLERGENS[allergen_name]['related'])):
+                for term in terms:
+                    pattern_rules.setdefault(term, set()).add((index, match_type))
+
+        custom_offset = len(self.common_allergens)
+        self._always_matching = set()
+        containing = {}  # substring of a custom allergy -> rules of the custom allergies containing it
+        for index, custom_allergy in enumerate(self.custom_allergies, start=custom_offset):
+            rule = (index, "custom_match")
+            if custom_allergy:
+                pattern_rules.setdefault(custom_allergy, set()).add(rule)
+            else:
+                self._always_matching.add(rule)  # '' is contained in every ingredient name
+            for start in range(len(custom_allergy)):
+                for end in range(start + 1, len(custom_allergy) + 1):
+                    containing.setdefault(custom_allergy[start:end], set()).add(rule)
+            containing.setdefault('', set()).add(rule)
+
+        self._patterns = tuple(pattern_rules)
+        self._pattern_rules = tuple(frozenset(pattern_rules[pattern]) for pattern in self._patterns)
+        self._automaton = AhoCorasick(self._patterns) if self._patterns else None
+        self._containing = {substring: frozenset(rules) for substring, rules in containing.items()}
+
+        # Output order of the original loops: per common allergen keyword then related, then customs
+        self._rule_order = [(index, match_type) for index in range(custom_offset)
+                            for match_type in ("keyword_match", "related_match")]
+        self._rule_order += [(index, "custom_match") for index in range(custom_offset, custom_offset + len(self.custom_allergies))]
+        self._rule_names = self.common_allergens + self.custom_allergies
+
+    def match(self, ingredient_name: str) -> List[Tuple[str, str]]:
+        """
+        Find the user's allergens in one ingredient name
+
+        Args:
+            ingredient_name (str): Lowercased ingredient name
+
+        Returns:
+            List[Tuple[str, str]]: (allergen, match type) pairs in reporting order
+        """
+        hits = set(self._always_matching)
+        if self._automaton is not None:
+            for pattern_index in self._automaton.find_all(ingredient_name):
+                hits.update(self._pattern_rules[pattern_index])
+        hits.update(self._containing.get(ingredient_name, ()))
+
+        if not hits:
+            return []
+        return [(self._rule_names[index], match_type) for index, match_type in self._rule_order
+                if (index, match_type) in hits]
+
+
+@lru_cache(maxsize=1024)
+def get_allergen_matcher(user_allergies: Tuple[str, ...]) -> AllergenMatcher:
+    """Return the compiled matcher for a lowercased allergy list, built once per distinct list"""
+    return AllergenMatcher(user_allergies)
+
+# Per-user compiled allergy profiles: user_id -> (profile version, AllergenMatcher, monotonic time it was last checked)
+_user_allergy_profiles = LRUCache(Config.ALLERGY_PROFILE_CACHE_MAX_ENTRIES, Config.ALLERGY_PROFILE_CACHE_TTL_SECONDS)
+
+def bump_allergy_profile_version(db: Session, user_id: int):
+    """
+    Mark a user's allergy profile as changed, in the caller's transaction
+    
+    The process making the change drops its cached matcher; other processes notice the
+    new version within Config.ALLERGY_PROFILE_VERSION_CHECK_SECONDS.
+    """
+    bumped = db.query(AllergyProfileVersion).filter(AllergyProfileVersion.user_id == user_id).update(
+        {AllergyProfileVersion.version: AllergyProfileVersion.version + 1}, synchronize_session=False)
+    if not bumped:
+        db.add(AllergyProfileVersion(user_id=user_id, version=1))
+
+def get_user_allergy_matcher(user_id: int, session_factory=SessionLocal) -> AllergenMatcher:
+    """
+    Get the compiled allergy matcher for a user
+    
+    Cached matchers are served from memory. Changes made in this process drop the entry
+    at once; changes made by other processes are caught by comparing the stored profile
+    version at most every Config.ALLERGY_PROFILE_VERSION_CHECK_SECONDS, reloading the
+    allergies when it moved.
+    
+    Args:
+        user_id (int): User ID
+        session_factory: Callable returning a SQLAlchemy session
+        
+    Returns:
+        AllergenMatcher: Matcher for the user's allergies (user_allergies is empty if they have none)
+    """
+    cached = _user_allergy_profiles.get(user_id)
+    now = time.monotonic()
+    if cached is not None and now - cached[2] < Config.ALLERGY_PROFILE_VERSION_CHECK_SECONDS:
+        return cached[1]
+    
+    db = session_factory()
+    try:
+        version = db.query(AllergyProfileVersion.version).filter(
+            AllergyProfileVersion.user_id == user_id
+        ).scalar() or 0
+        
+        if cached is not None and cached[0] == version:
+            _user_allergy_profiles.set(user_id, (version, cached[1], now))
+            return cached[1]
+        
+        # Read after the version, so a change landing in between only costs another reload
+        rows = db.query(UserAllergy.allergy_name).filter(
+            UserAllergy.user_id == user_id
+        ).order_by(UserAllergy.id).all()
+    finally:
+        db.close()
+    
+    matcher = get_allergen_matcher(tuple(row.allergy_name.lower() for row in rows))
+    _user_allergy_profiles.set(user_id, (version, matcher, now))
+    return matcher
+
+def invalidate_user_allergy_profile(user_id: int):
+    """Drop this process's cached allergy profile for a user"""
+    _user_allergy_profiles.delete(user_id)
+
 def check_ingredients_for_allergies(ingredients: List[Dict], user_allergies: List[str]) -> Dict:
     """
     Check if any ingredients match user allergies
@@ -224,41 +374,18 @@ def check_ingredients_for_allergies(ingredients: List[Dict], user_allergies: Lis
         found_allergens = []
         allergen_details = []
         user_allergies_lower = [allergy.lower() for allergy in user_allergies]
+        matcher = get_allergen_matcher(tuple(user_allergies_lower))
         
         logger.info(f"Checking {len(ingredients)} ingredients for allergies: {user_allergies_lower}")
         
         for ingredient in ingredients:
             ingredient_name = ingredient.get('ingredient', '').lower()
-            logger.info(f"Checking ingredient: '{ingredient_name}'")
-            
-            for allergen_name, allergen_data in COMMON_ALLERGENS.items():
-                if allergen_name in user_allergies_lower:
-                    # Check keywords
-                    for keyword in allergen_data['keywords']:
-                        if keyword in ingredient_name:
-                            logger.info(f"Found allergen '{allergen_name}' in ingredient '{ingredient_name}' via keyword '{keyword}'")
-                            if allergen_name not in found_allergens:
-                                found_allergens.append(allergen_name)
-                            allergen_details.append({"allergen": allergen_name, "ingredient": ingredient.get('ingredient', ''), "type": "keyword_match"})
-                            break
-                    
-                    # Check related ingredients
-                    for related in allergen_data['related']:
-                        if related in ingredient_name:
-                            logger.info(f"Found allergen '{allergen_name}' in ingredient '{ingredient_name}' via related '{related}'")
-                            if allergen_name not in found_allergens:
-                                found_allergens.append(allergen_name)
-                            allergen_details.append({"allergen": allergen_name, "ingredient": ingredient.get('ingredient', ''), "type": "related_match"})
-                            break
             
-            # Check custom allergies
-            for custom_allergy in user_allergies_lower:
-                if custom_allergy not in [a for a in COMMON_ALLERGENS.keys()]:
-                    if custom_allergy in ingredient_name or ingredient_name in custom_allergy:
-                        logger.info(f"Found custom allergen '{custom_allergy}' in ingredient '{ingredient_name}'")
-                        if custom_allergy not in found_allergens:
-                            found_allergens.append(custom_allergy)
-                        allergen_details.append({"allergen": custom_allergy, "ingredient": ingredient.get('ingredient', ''), "type": "custom_match"})
+            for allergen_name, match_type in matcher.match(ingredient_name):
+                logger.debug(f"Found allergen '{allergen_name}' in ingredient '{ingredient_name}' ({match_type})")
+                if allergen_name not in found_allergens:
+                    found_allergens.append(allergen_name)
+                allergen_details.append({"allergen": allergen_name, "ingredient": ingredient.get('ingredient', ''), "type": match_type})
         
         logger.info(f"Found allergens: {found_allergens}")
         logger.info(f"Allergen details: {allergen_details}")
@@ -1,21 +1,35 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import logging
 import random
 import jwt
 import json
+import base64
+from concurrent.futures import TimeoutError as WriteTimeout
 from datetime import datetime
+from sqlalchemy import func, or_, and_
+from sqlalchemy.exc import IntegrityError
 
 # Import  modular services
 from config import Config
-from models import get_db, User, RecentSearch, Order, SavedAddress, UserPreference
-from auth_service import create_access_token, verify_token, require_auth, create_user, authenticate_user
+from models import SessionLocal, session_scope, pool_metrics, User, RecentSearch, Order, OrderItem, SavedAddress, UserPreference
+from auth_service import create_access_token, verify_token, require_auth, require_operator, create_user, authenticate_user
 from ingredient_service import get_ingredients_by_dish_name, clean_dish_name, extract_dish_type, validate_recipe_relevance, scale_api_ingredients, get_recipe_ingredients_from_spoonacular_improved
 from delivery_service import (
-    find_and_rank_shops, assign_delivery_agent, estimate_delivery_time,
-    get_google_distance_matrix
+    find_and_rank_shops, rank_shops, assign_delivery_agent, release_delivery_agent, estimate_delivery_time,
+    get_google_distance_matrix, list_shops, encode_shop_cursor, decode_shop_cursor,
+    SHOP_FIELDS, DEFAULT_SHOP_FIELDS
 )
-from mock_data import MOCK_SHOPS, DELIVERY_AGENTS
+from agent_registry import agent_registry, AGENT_STATUSES
+from dispatch_service import dispatch_delivery_agent
+from basket_planner import plan_basket, basket_as_top_shop
+from shop_catalog import shop_catalog
+from provider_client import get_client_metrics
+from cache_service import recipe_cache
+from distance_matrix_service import distance_matrix_service
+from write_queue import write_queue
+from eta_service import record_completed_order, schedule_eta_refresh
+from order_items import add_order_items, ingredient_shops, order_status_filter, top_ingredients
 
 
 # Configure logging
@@ -29,6 +43,21 @@ app.config.from_object(Config)
 # Enable CORS
 CORS(app)
 
+def get_request_db():
+    """Database session for the current request, opened on first use and released by close_request_db"""
+    if 'db' not in g:
+        g.db = SessionLocal()
+    return g.db
+
+@app.teardown_appcontext
+def close_request_db(exception=None):
+    """Return the request's connection to the pool however the request ended"""
+    db = g.pop('db', None)
+    if db is not None:
+        if exception is not None:
+            db.rollback()
+        db.close()
+
 # ============================================================================
 # ROUTES
 # ============================================================================
@@ -42,6 +71,18 @@ def health_check():
         'service': 'WeKno Food Delivery API'
     })
 
+@app.route('/health/metrics', methods=['GET'])
+def health_metrics():
+    """Outbound provider, cache and database pool metrics"""
+    return jsonify({
+        'timestamp': datetime.utcnow().isoformat(),
+        'provider_client': get_client_metrics(),
+        'recipe_cache': recipe_cache.stats(),
+        'distance_matrix': distance_matrix_service.stats(),
+        'db_pool': pool_metrics.stats(),
+        'write_queue': write_queue.stats()
+    })
+
 # ============================================================================
 # AUTHENTICATION ROUTES
 # ============================================================================
@@ -64,7 +105,7 @@ def register():
             return jsonify({'error': 'Password must be at least 6 characters'}), 400
         
         # Get database session
-        db = next(get_db())
+        db = get_request_db()
         
         # Create user
         user, error = create_user(db, name, email, password)
@@ -76,16 +117,17 @@ def register():
         if allergies:
             from allergy_service import add_user_allergy
             # Get a fresh database session for allergies
-            db_allergies = next(get_db())
-            try:
+            with session_scope() as db_allergies:
                 for allergy_name in allergies:
                     if allergy_name.strip():  # Only add non-empty allergies
                         try:
                             add_user_allergy(db_allergies, user.id, allergy_name.strip(), "common")
                         except Exception as e:
                             logger.error(f"Error adding allergy {allergy_name}: {e}")
-            finally:
-                db_allergies.close()
+        
+        # Start the new account from a clean allergy profile
+        from allergy_service import invalidate_user_allergy_profile
+        invalidate_user_allergy_profile(user.id)
         
         # Create access token
         access_token = create_access_token(data={"sub": user.email, "user_id": user.id})
@@ -118,7 +160,7 @@ def login():
             return jsonify({'error': 'Email and password are required'}), 400
         
         # Get database session
-        db = next(get_db())
+        db = get_request_db()
         
         # Authenticate user
         user, error = authenticate_user(db, email, password)
@@ -150,7 +192,7 @@ def get_user_profile():
     """Get current user profile"""
     try:
         user_id = request.user.get('user_id')
-        db = next(get_db())
+        db = get_request_db()
         user = db.query(User).filter(User.id == user_id).first()
         
         if not user:
@@ -181,7 +223,7 @@ def get_user_recent_searches():
     """Get user's recent searches"""
     try:
         user_id = request.user.get('user_id')
-        db = next(get_db())
+        db = get_request_db()
         
         # Get recent searches for user, limit to 4 most recent
         recent_searches = db.query(RecentSearch).filter(
@@ -217,26 +259,28 @@ def add_recent_search():
         if not dish_name:
             return jsonify({'error': 'Dish name is required'}), 400
         
-        db = next(get_db())
-        
-        # Check if search already exists for this user
-        existing_search = db.query(RecentSearch).filter(
-            RecentSearch.user_id == user_id,
-            RecentSearch.dish_name == dish_name
-        ).first()
-        
-        if existing_search:
-            # Update timestamp
-            existing_search.search_timestamp = datetime.utcnow()
-        else:
-            # Create new search
-            new_search = RecentSearch(
-                user_id=user_id,
-                dish_name=dish_name
-            )
-            db.add(new_search)
+        def save_search(db):
+            # Check if search already exists for this user
+            existing_search = db.query(RecentSearch).filter(
+                RecentSearch.user_id == user_id,
+                RecentSearch.dish_name == dish_name
+            ).first()
+            
+            if existing_search:
+                # Update timestamp
+                existing_search.search_timestamp = datetime.utcnow()
+            else:
+                # Create new search
+                new_search = RecentSearch(
+                    user_id=user_id,
+                    dish_name=dish_name
+                )
+                db.add(new_search)
+                # Flush so a second search for the same dish in this write batch finds this one
+                db.flush()
         
-        db.commit()
+        # Small write, batched with other requests' writes by the single writer
+        write_queue.execute(save_search, timeout=Config.DB_POOL_TIMEOUT)
         
         return jsonify({
             'success': True,
@@ -247,32 +291,115 @@ def add_recent_search():
         logger.error(f"Add recent search error: {e}")
         return jsonify({'error': 'Failed to add recent search'}), 500
 
+ORDER_FIELDS = ('id', 'dish_name', 'ingredients', 'servings', 'status', 'timestamp')
+ORDER_STATUSES = ('pending', 'preparing', 'in_transit', 'on_the_way', 'nearby', 'delivered', 'completed', 'cancelled')
+ORDER_CLOSED_STATUSES = ('delivered', 'completed', 'cancelled')  # Statuses that free the order's delivery agent; final
+ORDER_DELIVERED_STATUSES = ('delivered', 'completed')  # Closed statuses that feed the ETA history
+ORDER_PICKED_UP_STATUSES = ('on_the_way', 'nearby')  # First of these marks the end of prep
+ORDER_COLUMNS = {
+    'id': Order.id,
+    'dish_name': Order.dish_name,
+    'ingredients': Order.ingredients,
+    'servings': Order.servings,
+    'status': Order.status,
+    'timestamp': Order.order_timestamp
+}
+
+def encode_order_cursor(order_timestamp, order_id):
+    """Opaque cursor pointing just past an order in (order_timestamp, id) descending order"""
+    payload = json.dumps([order_timestamp.isoformat(), order_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_order_cursor(cursor):
+    """(order_timestamp, id) from encode_order_cursor; raises ValueError when malformed"""
+    try:
+        timestamp, order_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(timestamp), int(order_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
 @app.route('/user/orders', methods=['GET'])
 @require_auth
 def get_user_orders():
-    """Get user's orders"""
+    """
+    Get user's orders, newest first, one page at a time
+    
+    Query parameters:
+        limit: Page size (default ORDERS_PAGE_DEFAULT_LIMIT, capped at ORDERS_PAGE_MAX_LIMIT)
+        cursor: next_cursor of the previous page
+        fields: Comma-separated subset of id, dish_name, ingredients, servings, status, timestamp
+        status: Comma-separated statuses to include (pending includes orders without a status)
+        summary: true returns order counts by status and the most ordered ingredients
+            instead of orders
+    """
     try:
         user_id = request.user.get('user_id')
-        db = next(get_db())
+        db = get_request_db()
         
-        orders = db.query(Order).filter(
-            Order.user_id == user_id
-        ).order_by(Order.order_timestamp.desc()).all()
+        statuses = [status.strip() for status in request.args.get('status', '').split(',') if status.strip()]
         
-        order_list = []
-        for order in orders:
-            order_list.append({
-                'id': order.id,
-                'dish_name': order.dish_name,
-                'ingredients': order.ingredients,
-                'servings': order.servings,
-                'status': order.status,
-                'timestamp': order.order_timestamp.isoformat()
+        if request.args.get('summary', '').lower() == 'true':
+            counts = db.query(Order.status, func.count(Order.id)).filter(Order.user_id == user_id)
+            if statuses:
+                counts = counts.filter(order_status_filter(statuses))
+            by_status = {}
+            for status, count in counts.group_by(Order.status).all():
+                by_status[status or 'pending'] = by_status.get(status or 'pending', 0) + count
+            return jsonify({
+                'success': True,
+                'summary': {
+                    'total': sum(by_status.values()),
+                    'by_status': by_status,
+                    'top_ingredients': top_ingredients(db, user_id=user_id, statuses=statuses)
+                }
             })
         
+        fields = ORDER_FIELDS
+        if request.args.get('fields'):
+            fields = tuple(dict.fromkeys(field.strip() for field in request.args['fields'].split(',') if field.strip()))
+            if not fields or any(field not in ORDER_FIELDS for field in fields):
+                return jsonify({'error': f"fields must be a comma-separated subset of: {', '.join(ORDER_FIELDS)}"}), 400
+        
+        try:
+            limit = int(request.args.get('limit', Config.ORDERS_PAGE_DEFAULT_LIMIT))
+            after = decode_order_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer and cursor must come from a previous page'}), 400
+        if limit < 1:
+            return jsonify({'error': 'limit must be positive'}), 400
+        limit = min(limit, Config.ORDERS_PAGE_MAX_LIMIT)
+        
+        # Only the requested columns are read, plus the (order_timestamp, id) keyset
+        columns = [ORDER_COLUMNS[field] for field in fields if field not in ('id', 'timestamp')]
+        query = db.query(Order.id, Order.order_timestamp, *columns).filter(Order.user_id == user_id)
+        if statuses:
+            query = query.filter(order_status_filter(statuses))
+        if after is not None:
+            after_timestamp, after_id = after
+            query = query.filter(or_(
+                Order.order_timestamp < after_timestamp,
+                and_(Order.order_timestamp == after_timestamp, Order.id < after_id)
+            ))
+        rows = query.order_by(Order.order_timestamp.desc(), Order.id.desc()).limit(limit + 1).all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        order_list = []
+        for row in rows:
+            order = {}
+            for field in fields:
+                if field == 'timestamp':
+                    order['timestamp'] = row.order_timestamp.isoformat()
+                else:
+                    order[field] = getattr(row, ORDER_COLUMNS[field].key)
+            order_list.append(order)
+        
         return jsonify({
             'success': True,
-            'orders': order_list
+            'orders': order_list,
+            'limit': limit,
+            'next_cursor': encode_order_cursor(rows[-1].order_timestamp, rows[-1].id) if has_more else None
         })
         
     except Exception as e:
@@ -306,25 +433,31 @@ def add_user_order():
             logger.error("Ingredients are missing")
             return jsonify({'error': 'Ingredients are required'}), 400
         
-        db = next(get_db())
-        
-        new_order = Order(
-            user_id=user_id,
-            dish_name=dish_name,
-            ingredients=ingredients,
-            servings=servings,
-            status='pending'  # Explicitly set status
-        )
+        def save_order(db):
+            new_order = Order(
+                user_id=user_id,
+                dish_name=dish_name,
+                ingredients=ingredients,
+                servings=servings,
+                status='pending'  # Explicitly set status
+            )
+            db.add(new_order)
+            db.flush()
+            add_order_items(db, new_order.id, user_id, ingredients)
+            return new_order.id
         
-        db.add(new_order)
-        db.commit()
+        order_id = write_queue.execute(save_order, timeout=Config.DB_POOL_TIMEOUT)
         
         return jsonify({
             'success': True,
             'message': 'Order added successfully',
-            'order_id': new_order.id
+            'order_id': order_id
         })
         
+    except WriteTimeout:
+        # execute() cancelled the queued write, so a retry cannot duplicate the order
+        logger.error("Add order error: timed out waiting for the write queue")
+        return jsonify({'error': 'Order was not saved, please try again'}), 503
     except Exception as e:
         logger.error(f"Add order error: {e}")
         return jsonify({'error': 'Failed to add order'}), 500
@@ -340,8 +473,10 @@ def update_order_status(order_id):
         
         if not new_status:
             return jsonify({'error': 'Status is required'}), 400
+        if new_status not in ORDER_STATUSES:
+            return jsonify({'error': f"Status must be one of: {', '.join(ORDER_STATUSES)}"}), 400
         
-        db = next(get_db())
+        db = get_request_db()
         
         order = db.query(Order).filter(
             Order.id == order_id,
@@ -351,9 +486,31 @@ def update_order_status(order_id):
         if not order:
             return jsonify({'error': 'Order not found'}), 404
         
+        if order.status in ORDER_CLOSED_STATUSES and new_status != order.status:
+            return jsonify({'error': f"Order is already {order.status}"}), 409
+        
+        closing = new_status in ORDER_CLOSED_STATUSES and order.status not in ORDER_CLOSED_STATUSES
         order.status = new_status
+        if new_status in ORDER_PICKED_UP_STATUSES and order.picked_up_at is None:
+            order.picked_up_at = datetime.utcnow()
         db.commit()
         
+        if closing and order.agent_id:
+            release_delivery_agent(order.agent_id, claim_id=order.agent_claim_id)
+        
+        if closing and new_status in ORDER_DELIVERED_STATUSES:
+            # Feed the delivery history and refresh the ETA tables off the request thread
+            completed_at = datetime.utcnow()
+            
+            def save_delivery(db):
+                return record_completed_order(db, db.get(Order, order_id), completed_at) is not None
+            
+            def refresh_after_save(future):
+                if future.exception() is None and future.result():
+                    schedule_eta_refresh()
+            
+            write_queue.submit(save_delivery).add_done_callback(refresh_after_save)
+        
         return jsonify({
             'success': True,
             'message': 'Order status updated successfully'
@@ -369,11 +526,21 @@ def clear_user_orders():
     """Clear all orders for the current user"""
     try:
         user_id = request.user.get('user_id')
-        db = next(get_db())
+        db = get_request_db()
+        
+        # Free the agents of orders still open
+        open_agents = db.query(Order.agent_id, Order.agent_claim_id).filter(
+            Order.user_id == user_id,
+            Order.agent_id.isnot(None),
+            Order.status.notin_(ORDER_CLOSED_STATUSES)
+        ).all()
         
-        # Delete all orders for this user
+        # Delete all orders for this user (bulk deletes skip the ORM cascade, so items go first)
+        db.query(OrderItem).filter(OrderItem.user_id == user_id).delete(synchronize_session=False)
         deleted_count = db.query(Order).filter(Order.user_id == user_id).delete()
         db.commit()
+        for agent_id, claim_id in open_agents:
+            release_delivery_agent(agent_id, claim_id=claim_id)
         
         logger.info(f"Cleared {deleted_count} orders for user {user_id}")
         
@@ -394,7 +561,7 @@ def get_user_addresses():
         user_id = request.user.get('user_id')
         print(f"DEBUG: Getting addresses for user_id: {user_id}")
         
-        db = next(get_db())
+        db = get_request_db()
         
         addresses = db.query(SavedAddress).filter(
             SavedAddress.user_id == user_id
@@ -449,7 +616,7 @@ def add_user_address():
             print(f"DEBUG: Missing required fields")
             return jsonify({'error': 'All address fields are required'}), 400
         
-        db = next(get_db())
+        db = get_request_db()
         
         # If this is set as default, unset other defaults
         is_default = data.get('is_default', False)
@@ -492,7 +659,7 @@ def delete_user_address(address_id):
     """Delete a user's address"""
     try:
         user_id = request.user.get('user_id')
-        db = next(get_db())
+        db = get_request_db()
         
         # Find the address and ensure it belongs to the user
         address = db.query(SavedAddress).filter(
@@ -522,7 +689,7 @@ def set_default_address(address_id):
     """Set an address as default for the user"""
     try:
         user_id = request.user.get('user_id')
-        db = next(get_db())
+        db = get_request_db()
         
         # Find the address and ensure it belongs to the user
         address = db.query(SavedAddress).filter(
@@ -558,7 +725,7 @@ def get_user_preferences():
     """Get user's preferences"""
     try:
         user_id = request.user.get('user_id')
-        db = next(get_db())
+        db = get_request_db()
         
         preferences = db.query(UserPreference).filter(
             UserPreference.user_id == user_id
@@ -574,7 +741,14 @@ def get_user_preferences():
                 notifications_enabled=True
             )
             db.add(preferences)
-            db.commit()
+            try:
+                db.commit()
+            except IntegrityError:
+                # A concurrent request created them first
+                db.rollback()
+                preferences = db.query(UserPreference).filter(
+                    UserPreference.user_id == user_id
+                ).first()
         
         return jsonify({
             'success': True,
@@ -597,7 +771,7 @@ def update_user_preferences():
     try:
         user_id = request.user.get('user_id')
         data = request.get_json()
-        db = next(get_db())
+        db = get_request_db()
         
         preferences = db.query(UserPreference).filter(
             UserPreference.user_id == user_id
@@ -659,7 +833,7 @@ def get_user_allergies():
     """Get user's allergies"""
     try:
         user_id = request.user.get('user_id')
-        db = next(get_db())
+        db = get_request_db()
         
         from allergy_service import get_user_allergies
         allergies = get_user_allergies(db, user_id)
@@ -702,7 +876,7 @@ def add_user_allergy():
                 'error': validation['error']
             }), 400
         
-        db = next(get_db())
+        db = get_request_db()
         
         from allergy_service import add_user_allergy
         result = add_user_allergy(db, user_id, allergy_name, allergy_type)
@@ -725,7 +899,7 @@ def remove_user_allergy(allergy_id):
     """Remove an allergy for user"""
     try:
         user_id = request.user.get('user_id')
-        db = next(get_db())
+        db = get_request_db()
         
         from allergy_service import remove_user_allergy
         result = remove_user_allergy(db, user_id, allergy_id)
@@ -797,6 +971,78 @@ def get_nutrition():
             'error': 'Failed to get nutrition information'
         }), 500
 
+@app.route('/nutrition/batch', methods=['POST'])
+def get_nutrition_batch():
+    """Get local nutrition for many dishes at once (meal plans, order history)"""
+    try:
+        # Validate request
+        if not request.is_json:
+            return jsonify({
+                'success': False,
+                'error': 'Content-Type must be application/json'
+            }), 400
+        
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({
+                'success': False,
+                'error': 'Request body must be a JSON object'
+            }), 400
+        dishes = data.get('dishes')
+        
+        # Validate input
+        if not isinstance(dishes, list) or not dishes:
+            return jsonify({
+                'success': False,
+                'error': 'dishes must be a non-empty list'
+            }), 400
+        
+        if len(dishes) > Config.NUTRITION_BATCH_MAX_DISHES:
+            return jsonify({
+                'success': False,
+                'error': f'At most {Config.NUTRITION_BATCH_MAX_DISHES} dishes per request'
+            }), 400
+        
+        for dish in dishes:
+            if not isinstance(dish, dict) or not isinstance(dish.get('ingredients'), list):
+                return jsonify({
+                    'success': False,
+                    'error': 'Each dish needs an ingredients list'
+                }), 400
+        
+        logger.info(f"Getting batch nutrition for {len(dishes)} dishes")
+        
+        # Import nutrition service
+        from nutrition_service import calculate_nutrition_batch, NUTRIENT_FIELDS
+        
+        nutrition_results = calculate_nutrition_batch([dish['ingredients'] for dish in dishes])
+        
+        results = []
+        totals = {field: 0.0 for field in NUTRIENT_FIELDS}
+        for dish, nutrition in zip(dishes, nutrition_results):
+            results.append({
+                'dish_name': dish.get('dish_name', ''),
+                'success': nutrition['success'],
+                'nutrition': {field: nutrition[field] for field in NUTRIENT_FIELDS + ('dietary_tags',)},
+                'error': nutrition['error']
+            })
+            for field in NUTRIENT_FIELDS:
+                totals[field] += nutrition[field]
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'totals': {field: round(value, 1) for field, value in totals.items()},
+            'count': len(results)
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch nutrition error: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to get batch nutrition information'
+        }), 500
+
 @app.route('/ingredients', methods=['POST'])
 def get_ingredients():
     """Main endpoint to get ingredients for a dish"""
@@ -948,12 +1194,10 @@ def get_ingredients():
                     user_data = verify_token(token)
                     if user_data:
                         user_id = user_data.get('user_id')
-                        db = next(get_db())
                         
-                        # Get user's allergies
-                        from allergy_service import get_user_allergies, check_ingredients_for_allergies
-                        user_allergies = get_user_allergies(db, user_id)
-                        allergy_names = [allergy['allergy_name'] for allergy in user_allergies]
+                        # Get user's allergies (cached compiled profile, no DB round trip on a hit)
+                        from allergy_service import get_user_allergy_matcher, check_ingredients_for_allergies
+                        allergy_names = list(get_user_allergy_matcher(user_id).user_allergies)
                         
                         if allergy_names:
                             # Check ingredients for allergies
@@ -1943,22 +2187,33 @@ def create_delivery_order():
         ranked_shops = find_and_rank_shops(
             user_location, 
             scaled_ingredients, 
-            MOCK_SHOPS, 
+            shop_catalog, 
             Config.MAX_DELIVERY_DISTANCE_KM, 
             Config.MIN_INGREDIENT_MATCH_PERCENT
         )
         
-        if not ranked_shops:
+        basket_plan = None
+        if not ranked_shops and Config.BASKET_SPLIT_ENABLED:
+            # No single shop stocks enough; try splitting the order across nearby shops
+            basket_plan = plan_basket(
+                user_location,
+                scaled_ingredients,
+                shop_catalog,
+                Config.MAX_DELIVERY_DISTANCE_KM,
+                Config.MIN_INGREDIENT_MATCH_PERCENT
+            )
+        
+        if not ranked_shops and not basket_plan:
             return jsonify({
                 'success': False,
                 'error': f'No shops found within {Config.MAX_DELIVERY_DISTANCE_KM}km with at least {Config.MIN_INGREDIENT_MATCH_PERCENT}% ingredient match.'
             }), 404
         
-        # Step 4: Get top shop
-        top_shop = ranked_shops[0]
+        # Step 4: Get top shop (for a split order, the whole pickup route)
+        top_shop = ranked_shops[0] if ranked_shops else basket_as_top_shop(basket_plan)
         
-        # Step 5: Assign delivery agent
-        delivery_agent = assign_delivery_agent(top_shop["location"])
+        # Step 5: Preview the delivery agent; no order is placed here, so nobody is claimed
+        delivery_agent = dispatch_delivery_agent(top_shop["location"])
         
         if not delivery_agent:
             return jsonify({
@@ -1972,7 +2227,8 @@ def create_delivery_order():
         # Step 7: Calculate total delivery time
         total_delivery_time = estimate_delivery_time(
             top_shop["distance_km"], 
-            len(scaled_ingredients)
+            len(scaled_ingredients),
+            top_shop["location"]
         )
         
         # Step 8: Format response
@@ -1990,7 +2246,8 @@ def create_delivery_order():
             },
             'delivery_agent': delivery_agent,
             'estimated_delivery_time_minutes': total_delivery_time,
-            'all_qualified_shops': ranked_shops
+            'all_qualified_shops': ranked_shops,
+            'basket_plan': basket_plan
         }
         
         logger.info(f"Created delivery order for '{dish_name}': {order_id}")
@@ -2035,7 +2292,7 @@ def create_delivery_order_test():
             logger.info(f"Token extracted: {token[:20]}...")
             try:
                 # Decode token to get user_id
-                payload = jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
+                payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=[Config.JWT_ALGORITHM])
                 user_id = payload.get('user_id')
                 logger.info(f"Authenticated user ID: {user_id}")
             except jwt.ExpiredSignatureError:
@@ -2089,28 +2346,42 @@ def create_delivery_order_test():
         ranked_shops = find_and_rank_shops(
             user_location, 
             scaled_ingredients, 
-            MOCK_SHOPS, 
+            shop_catalog, 
             Config.MAX_DELIVERY_DISTANCE_KM, 
             Config.MIN_INGREDIENT_MATCH_PERCENT
         )
         
-        if not ranked_shops:
+        basket_plan = None
+        if not ranked_shops and Config.BASKET_SPLIT_ENABLED:
+            # No single shop stocks enough; try splitting the order across nearby shops
+            basket_plan = plan_basket(
+                user_location,
+                scaled_ingredients,
+                shop_catalog,
+                Config.MAX_DELIVERY_DISTANCE_KM,
+                Config.MIN_INGREDIENT_MATCH_PERCENT
+            )
+        
+        if not ranked_shops and not basket_plan:
             return jsonify({
                 'success': False,
                 'error': f'No shops found within {Config.MAX_DELIVERY_DISTANCE_KM}km with at least {Config.MIN_INGREDIENT_MATCH_PERCENT}% ingredient match.'
             }), 404
         
-        # Step 4: Get top shop
-        top_shop = ranked_shops[0]
+        # Step 4: Get top shop (for a split order, the whole pickup route)
+        top_shop = ranked_shops[0] if ranked_shops else basket_as_top_shop(basket_plan)
         
-        # Step 5: Assign delivery agent
-        delivery_agent = assign_delivery_agent(top_shop["location"])
+        # Step 5: Assign delivery agent (greedy or batched, see Config.DISPATCH_MODE). Only a
+        # saved order claims its agent; update_order_status releases it when the order closes
+        delivery_agent = dispatch_delivery_agent(top_shop["location"], claim=bool(user_id))
         
         if not delivery_agent:
             return jsonify({
                 'success': False,
                 'error': 'No delivery agents available at the moment.'
             }), 503
+        # The claim stays with the saved order, it is not part of the response
+        claim_id = delivery_agent.pop("claim_id", None)
         
         # Step 6: Generate order ID
         order_id = f"WK{random.randint(10000, 99999)}"
@@ -2118,29 +2389,41 @@ def create_delivery_order_test():
         # Step 7: Calculate total delivery time
         total_delivery_time = estimate_delivery_time(
             top_shop["distance_km"], 
-            len(scaled_ingredients)
+            len(scaled_ingredients),
+            top_shop["location"]
         )
         
         # Step 8: Save order to user's database if authenticated
         if user_id:
-            try:
-                db = SessionLocal()
+            item_shops = ingredient_shops(top_shop if ranked_shops else None, basket_plan)
+            
+            def save_order(db):
                 new_order = Order(
                     user_id=user_id,
                     dish_name=dish_name,
-                    ingredients=json.dumps(scaled_ingredients),
+                    ingredients=scaled_ingredients,
                     servings=servings,
                     status='pending',
-                    timestamp=datetime.utcnow()
+                    order_timestamp=datetime.utcnow(),
+                    agent_id=delivery_agent["id"],
+                    agent_claim_id=claim_id,
+                    shop_lat=top_shop["location"]["lat"],
+                    shop_lng=top_shop["location"]["lng"],
+                    delivery_distance_km=top_shop["distance_km"]
                 )
                 db.add(new_order)
-                db.commit()
-                db.refresh(new_order)
-                logger.info(f"Order saved to database for user {user_id}: Order ID {new_order.id}")
-                db.close()
+                db.flush()
+                add_order_items(db, new_order.id, user_id, scaled_ingredients, item_shops)
+                return new_order.id
+            
+            try:
+                saved_order_id = write_queue.execute(save_order, timeout=Config.DB_POOL_TIMEOUT)
+                logger.info(f"Order saved to database for user {user_id}: Order ID {saved_order_id}")
             except Exception as e:
-                logger.error(f"Error saving order to database: {str(e)}")
-                db.close()
+                logger.error(f"Error saving order to database: {str(e) or type(e).__name__}")
+                # The save failed or was cancelled on timeout, so nothing will close this order
+                # and its agent is free again
+                release_delivery_agent(delivery_agent["id"], claim_id=claim_id)
                 # Continue with delivery order even if database save fails
         
         # Step 9: Format response
@@ -2158,7 +2441,8 @@ def create_delivery_order_test():
             },
             'delivery_agent': delivery_agent,
             'estimated_delivery_time_minutes': total_delivery_time,
-            'all_qualified_shops': ranked_shops
+            'all_qualified_shops': ranked_shops,
+            'basket_plan': basket_plan
         }
         
         logger.info(f"Created TEST delivery order for '{dish_name}': {order_id}")
@@ -2175,21 +2459,79 @@ def create_delivery_order_test():
 
 @app.route('/delivery/shops', methods=['GET'])
 def get_available_shops():
-    """Get available shops"""
+    """
+    Get available shops, one page at a time
+    
+    Query parameters:
+        limit: Page size, capped at SHOPS_PAGE_MAX_LIMIT (default: every matching shop)
+        cursor: next_cursor of the previous page
+        fields: Comma-separated subset of name, location, inventory_count, inventory, inventory_sample
+        lat, lng, radius_km: Only shops within radius_km of the point
+        bbox: min_lat,min_lng,max_lat,max_lng - only shops inside the box
+    
+    Responses carry an ETag; a matching If-None-Match gets 304 Not Modified.
+    """
     try:
-        shops_data = []
-        for shop_name, shop_data in MOCK_SHOPS.items():
-            shops_data.append({
-                'name': shop_name,
-                'location': shop_data['location'],
-                'inventory_count': len(shop_data['inventory']),
-                'inventory': shop_data['inventory']
-            })
+        fields = DEFAULT_SHOP_FIELDS
+        if request.args.get('fields'):
+            fields = tuple(dict.fromkeys(field.strip() for field in request.args['fields'].split(',') if field.strip()))
+            unknown = [field for field in fields if field not in SHOP_FIELDS]
+            if unknown or not fields:
+                return jsonify({
+                    'success': False,
+                    'error': f"fields must be a comma-separated subset of: {', '.join(SHOP_FIELDS)}"
+                }), 400
         
-        return jsonify({
+        try:
+            limit = int(request.args['limit']) if request.args.get('limit') is not None else None
+            center = radius_km = bbox = None
+            if any(request.args.get(name) is not None for name in ('lat', 'lng', 'radius_km')):
+                center = {"lat": float(request.args['lat']), "lng": float(request.args['lng'])}
+                radius_km = float(request.args['radius_km'])
+            if request.args.get('bbox'):
+                bbox = tuple(float(value) for value in request.args['bbox'].split(','))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'limit must be an integer, lat/lng/radius_km must be given together as numbers, '
+                         'and bbox must be min_lat,min_lng,max_lat,max_lng'
+            }), 400
+        
+        if (limit is not None and limit < 1) or (radius_km is not None and radius_km < 0):
+            return jsonify({
+                'success': False,
+                'error': 'limit must be positive and radius_km non-negative'
+            }), 400
+        if bbox is not None and (len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]):
+            return jsonify({
+                'success': False,
+                'error': 'bbox must be min_lat,min_lng,max_lat,max_lng with min <= max'
+            }), 400
+        if limit is not None:
+            limit = min(limit, Config.SHOPS_PAGE_MAX_LIMIT)
+        
+        try:
+            after = after_position = None
+            if request.args.get('cursor'):
+                after, after_position = decode_shop_cursor(request.args['cursor'])
+            listing = list_shops(shop_catalog, fields, limit, after, center, radius_km, bbox, after_position)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid or expired cursor, start again from the first page'
+            }), 400
+        
+        response = jsonify({
             'success': True,
-            'shops': shops_data
+            'shops': listing["shops"],
+            'total': listing["total"],
+            'limit': limit,
+            'next_cursor': (encode_shop_cursor(listing["next_after"], listing["next_position"])
+                            if listing["next_after"] is not None else None)
         })
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
         
     except Exception as e:
         logger.error(f"Error getting shops: {e}")
@@ -2204,7 +2546,7 @@ def get_delivery_agents():
     try:
         return jsonify({
             'success': True,
-            'agents': DELIVERY_AGENTS
+            'agents': agent_registry.agents()
         })
         
     except Exception as e:
@@ -2214,9 +2556,71 @@ def get_delivery_agents():
             'error': 'Failed to get delivery agents'
         }), 500
 
+@app.route('/delivery/agents/<agent_id>/location', methods=['PUT'])
+@require_operator
+def update_delivery_agent_location(agent_id):
+    """Update a delivery agent's current location"""
+    try:
+        data = request.get_json() or {}
+        try:
+            lat = float(data['lat'])
+            lng = float(data['lng'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'lat and lng are required'}), 400
+        
+        if not agent_registry.update_location(agent_id, lat, lng):
+            return jsonify({'success': False, 'error': 'Agent not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'agent': agent_registry.get(agent_id)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error updating agent location: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to update agent location'
+        }), 500
+
+@app.route('/delivery/agents/<agent_id>/status', methods=['PUT'])
+@require_operator
+def update_delivery_agent_status(agent_id):
+    """Update a delivery agent's status (available, busy, offline)"""
+    try:
+        data = request.get_json() or {}
+        new_status = str(data.get('status', '')).strip()
+        
+        if new_status not in AGENT_STATUSES:
+            return jsonify({'success': False, 'error': f'Status must be one of: {", ".join(AGENT_STATUSES)}'}), 400
+        
+        if agent_registry.get(agent_id) is None:
+            return jsonify({'success': False, 'error': 'Agent not found'}), 404
+        
+        if not agent_registry.set_status(agent_id, new_status):
+            return jsonify({'success': False, 'error': f'Agent cannot change to {new_status}'}), 409
+        
+        return jsonify({
+            'success': True,
+            'agent': agent_registry.get(agent_id)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error updating agent status: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to update agent status'
+        }), 500
+
 @app.route('/delivery/ranked-shops', methods=['POST'])
 def get_ranked_shops():
-    """Get ranked shops based on ingredient match and distance"""
+    """
+    Get ranked shops based on ingredient match and distance
+    
+    Body or query parameters:
+        limit, offset: Page of all_qualified_shops (every qualified shop when limit is absent)
+        include_inventory: true adds each ranked shop's full inventory list
+    """
     try:
         # Validate request
         if not request.is_json:
@@ -2230,6 +2634,9 @@ def get_ranked_shops():
         user_location = data.get('user_location', {})
         max_distance_km = data.get('max_distance_km', Config.MAX_DELIVERY_DISTANCE_KM)
         min_match_percent = data.get('min_match_percent', Config.MIN_INGREDIENT_MATCH_PERCENT)
+        limit = data.get('limit', request.args.get('limit'))
+        offset = data.get('offset', request.args.get('offset', 0))
+        include_inventory = str(data.get('include_inventory', request.args.get('include_inventory', ''))).lower() == 'true'
         
         # Validate input
         if not dish_name:
@@ -2238,6 +2645,23 @@ def get_ranked_shops():
                 'error': 'Dish name is required'
             }), 400
         
+        try:
+            limit = int(limit) if limit is not None else None
+            offset = int(offset)
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'limit and offset must be integers'
+            }), 400
+        
+        if (limit is not None and limit < 1) or offset < 0:
+            return jsonify({
+                'success': False,
+                'error': 'limit must be positive and offset non-negative'
+            }), 400
+        if limit is not None:
+            limit = min(limit, Config.RANKED_SHOPS_MAX_LIMIT)
+        
         # Validate user location (use default if not provided)
         if not user_location or not user_location.get('lat') or not user_location.get('lng'):
             user_location = Config.DEFAULT_USER_LOCATION
@@ -2260,20 +2684,23 @@ def get_ranked_shops():
                 'error': f'No ingredients found for "{dish_name}". Please try a different dish.'
             }), 404
         
-        # Step 2: Find and rank shops
-        ranked_shops = find_and_rank_shops(user_location, ingredients, MOCK_SHOPS, max_distance_km, min_match_percent)
+        # Step 2: Rank shops, materializing only the requested page
+        ranking = rank_shops(user_location, ingredients, shop_catalog, max_distance_km, min_match_percent, limit, offset)
+        ranked_shops = ranking["shops"]
+        if not include_inventory:
+            ranked_shops = [{field: value for field, value in shop.items() if field != 'inventory'} for shop in ranked_shops]
         
-        if not ranked_shops:
+        if not ranking["total"]:
             return jsonify({
                 'success': False,
                 'error': f'No shops found within {max_distance_km}km with at least {min_match_percent}% ingredient match.'
             }), 404
         
         # Step 3: Get top shop
-        top_shop = ranked_shops[0]
+        top_shop = ranking["top"]
         
-        # Step 4: Assign delivery agent
-        delivery_agent = assign_delivery_agent(top_shop["location"])
+        # Step 4: Preview the delivery agent (ranking only, so the agent is not claimed)
+        delivery_agent = assign_delivery_agent(top_shop["location"], claim=False)
         
         # Step 5: Format response
         response_data = {
@@ -2288,7 +2715,10 @@ def get_ranked_shops():
                 'missing_ingredients': top_shop["missing_ingredients"]
             },
             'delivery_agent': delivery_agent,
-            'all_qualified_shops': ranked_shops
+            'all_qualified_shops': ranked_shops,
+            'total_qualified_shops': ranking["total"],
+            'limit': limit,
+            'offset': offset
         }
         
         return jsonify(response_data)
@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify
 from models import get_db, User
+from write_queue import write_queue
 from config import Config
 
 logger = logging.getLogger(__name__)
@@ -56,6 +57,16 @@ def require_auth(f):
     
     return decorated_function
 
+def require_operator(f):
+    """Decorator to require an authenticated delivery operator (Config.DELIVERY_OPERATOR_EMAILS)"""
+    @wraps(f)
+    def operator_function(*args, **kwargs):
+        if str(request.user.get('sub', '')).lower() not in Config.DELIVERY_OPERATOR_EMAILS:
+            return jsonify({'error': 'Delivery operator access required'}), 403
+        return f(*args, **kwargs)
+    
+    return require_auth(operator_function)
+
 def hash_password(password: str) -> str:
     """Hash password using bcrypt"""
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -101,8 +112,9 @@ def authenticate_user(db, email: str, password: str):
     if not verify_password(password, user.password_hash):
         return None, "Invalid email or password"
     
-    # Update last login
-    user.last_login = datetime.utcnow()
-    db.commit()
+    # Update last login through the batched writer; the login does not wait on it
+    user_id, last_login = user.id, datetime.utcnow()
+    user.last_login = last_login
+    write_queue.submit(lambda writer_db: writer_db.query(User).filter(User.id == user_id).update({User.last_login: last_login}))
     
     return user, None 
\ No newline at end of file
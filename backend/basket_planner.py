@@ -0,0 +1,231 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+from shop_catalog import ShopCatalog, InMemoryShopCatalog
+from delivery_service import calculate_distance, match_ingredients_with_shop
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def _coverage_masks(ingredients: List[Dict], candidates: List[Tuple[str, Dict, float]],
+                    shops: ShopCatalog) -> List[int]:
+    """Per candidate shop, a bitmask of the ingredient positions it stocks"""
+    inventory_index = shops.inventory_index
+    if inventory_index is None:
+        masks = []
+        for _, shop_data, _ in candidates:
+            available, _ = match_ingredients_with_shop(ingredients, shop_data["inventory"])
+            available_ids = {id(ingredient) for ingredient in available}
+            masks.append(sum(1 << position for position, ingredient in enumerate(ingredients)
+                             if id(ingredient) in available_ids))
+        return masks
+
+    masks = [0] * len(candidates)
+    shop_bits = [inventory_index.shop_bits[shop_name] for shop_name, _, _ in candidates]
+    for position, ingredient in enumerate(ingredients):
+        shops_with_ingredient = inventory_index.availability(ingredient.get('ingredient', '').lower().strip())
+        if not shops_with_ingredient:
+            continue
+        for candidate, bit in enumerate(shop_bits):
+            if shops_with_ingredient & bit:
+                masks[candidate] |= 1 << position
+    return masks
+
+def _prune(masks: List[int], costs: List[float]) -> List[int]:
+    """Candidates worth considering: drop shops whose items a no-costlier shop also covers"""
+    kept = []
+    for candidate in sorted(range(len(masks)), key=lambda c: (costs[c], c)):
+        mask = masks[candidate]
+        if not mask:
+            continue
+        # Anything already kept costs no more, so it dominates when it covers a superset
+        if any(mask & ~masks[other] == 0 for other in kept):
+            continue
+        kept.append(candidate)
+    return kept
+
+def min_cost_cover(masks: List[int], costs: List[float], target: int,
+                   max_sets: int) -> Optional[List[int]]:
+    """
+    Exact minimum-cost weighted set cover by branch and bound
+
+    Branches on the lowest uncovered element (every cover must contain a set covering it),
+    trying covering sets cheapest first, and prunes any branch that cannot beat the best
+    cover found so far. A greedy cover seeds the bound.
+
+    Args:
+        masks (List[int]): Bitmask of elements per set
+        costs (List[float]): Positive cost per set
+        target (int): Bitmask of elements to cover
+        max_sets (int): Maximum number of sets in the cover
+
+    Returns:
+        Optional[List[int]]: Indexes of the chosen sets, or None when target cannot be
+        covered with at most max_sets sets
+    """
+    candidates = _prune(masks, costs)
+    covering: Dict[int, List[int]] = {}
+    remaining = target
+    while remaining:
+        low = remaining & -remaining
+        covering[low] = [c for c in candidates if masks[c] & low]
+        if not covering[low]:
+            return None
+        remaining ^= low
+
+    best_cost = float('inf')
+    best: Optional[List[int]] = None
+
+    # Greedy seed: repeatedly take the set with the lowest cost per newly covered element
+    covered, chosen, cost = 0, [], 0.0
+    while covered != target and len(chosen) < max_sets:
+        useful = [c for c in candidates if masks[c] & target & ~covered]
+        if not useful:
+            break
+        pick = min(useful, key=lambda c: (costs[c] / bin(masks[c] & target & ~covered).count('1'), c))
+        chosen.append(pick)
+        covered |= masks[pick]
+        cost += costs[pick]
+    if covered & target == target:
+        best_cost, best = cost, chosen
+
+    def search(covered: int, cost: float, chosen: List[int]):
+        nonlocal best_cost, best
+        uncovered = target & ~covered
+        if not uncovered:
+            if cost < best_cost:
+                best_cost, best = cost, list(chosen)
+            return
+        if len(chosen) == max_sets:
+            return
+        for candidate in covering[uncovered & -uncovered]:
+            next_cost = cost + costs[candidate]
+            if next_cost >= best_cost:
+                break  # covering lists are sorted by cost
+            chosen.append(candidate)
+            search(covered | masks[candidate], next_cost, chosen)
+            chosen.pop()
+
+    search(0, 0.0, [])
+    return sorted(best, key=lambda c: (costs[c], c)) if best is not None else None
+
+def _max_coverage(masks: List[int], costs: List[float], target: int, max_sets: int) -> List[int]:
+    """Greedy partial cover when no full cover fits in max_sets: most new elements first, then cheapest"""
+    chosen, covered = [], 0
+    while len(chosen) < max_sets:
+        gains = [(bin(mask & target & ~covered).count('1'), -costs[c], -c) for c, mask in enumerate(masks)]
+        gain, _, negative_index = max(gains)
+        if not gain:
+            break
+        chosen.append(-negative_index)
+        covered |= masks[-negative_index]
+    return chosen
+
+def plan_basket(user_location, ingredients, shops, max_distance_km=5, min_match_percent=60,
+                stop_cost_km=Config.BASKET_STOP_COST_KM, max_shops=Config.BASKET_MAX_SHOPS):
+    """
+    Split an order across the cheapest set of nearby shops that together stock it
+
+    Each shop within max_distance_km costs its distance to the user plus stop_cost_km, so
+    the plan trades extra distance against extra stops. Ingredients no nearby shop stocks
+    are left out, as are any that would need more than max_shops stops; the plan is only
+    returned when what it covers reaches min_match_percent.
+
+    Args:
+        user_location (Dict): {"lat": float, "lng": float}
+        ingredients (List[Dict]): Scaled ingredients with an 'ingredient' name
+        shops (ShopCatalog | Dict): Shop catalog, or a plain name -> shop dict
+        max_distance_km (float): Shop search radius
+        min_match_percent (float): Minimum share of ingredients the plan must cover
+        stop_cost_km (float): Cost of each stop, in kilometers of distance
+        max_shops (int): Maximum number of shops in a plan
+
+    Returns:
+        Optional[Dict]: Plan with pickup stops (farthest from the user first) and the items
+        to collect at each, or None when no plan qualifies
+    """
+    if not isinstance(shops, ShopCatalog):
+        shops = InMemoryShopCatalog(shops)
+    shops = shops.snapshot()
+
+    total_ingredients = len(ingredients)
+    candidates = shops.shops_within(user_location, max_distance_km)
+    if not total_ingredients or not candidates:
+        return None
+
+    masks = _coverage_masks(ingredients, candidates, shops)
+    target = 0
+    for mask in masks:
+        target |= mask
+    if not target or (bin(target).count('1') / total_ingredients) * 100 < min_match_percent:
+        return None
+
+    costs = [distance_km + stop_cost_km for _, _, distance_km in candidates]
+    chosen = min_cost_cover(masks, costs, target, max_shops)
+    if chosen is None:
+        chosen = _max_coverage(masks, costs, target, max_shops)
+
+    covered = 0
+    for candidate in chosen:
+        covered |= masks[candidate]
+    covered_count = bin(covered).count('1')
+    match_percent = (covered_count / total_ingredients) * 100
+    if match_percent < min_match_percent:
+        return None
+
+    # Each ingredient is collected at the nearest chosen shop that stocks it
+    by_distance = sorted(chosen, key=lambda c: (candidates[c][2], c))
+    items: Dict[int, List[Dict]] = {c: [] for c in chosen}
+    unavailable_ingredients = []
+    for position, ingredient in enumerate(ingredients):
+        bit = 1 << position
+        shop = next((c for c in by_distance if masks[c] & bit), None)
+        if shop is None:
+            unavailable_ingredients.append(ingredient)
+        else:
+            items[shop].append(ingredient)
+
+    # Pick up farthest shop first so the route ends near the user
+    stops = [c for c in reversed(by_distance) if items[c]]
+    route_km = 0.0
+    for current, following in zip(stops, stops[1:]):
+        route_km += calculate_distance(
+            candidates[current][1]["location"]["lat"], candidates[current][1]["location"]["lng"],
+            candidates[following][1]["location"]["lat"], candidates[following][1]["location"]["lng"]
+        )
+    route_km += candidates[stops[-1]][2]
+
+    return {
+        "stops": [
+            {
+                "name": candidates[c][0],
+                "distance_km": round(candidates[c][2], 1),
+                "location": candidates[c][1]["location"],
+                "items": items[c],
+                "item_count": len(items[c])
+            }
+            for c in stops
+        ],
+        "shop_count": len(stops),
+        "total_distance_km": round(sum(candidates[c][2] for c in stops), 1),
+        "route_km": round(route_km, 1),
+        "match_percent": round(match_percent, 1),
+        "total_ingredients": total_ingredients,
+        "available_count": covered_count,
+        "unavailable_ingredients": unavailable_ingredients
+    }
+
+def basket_as_top_shop(plan: Dict) -> Dict:
+    """
+    Summarize a basket plan in the top_shop shape the delivery responses use
+
+    The name lists the stops, location is the first pickup and distance_km is the whole
+    pickup route ending at the user.
+    """
+    return {
+        "name": " + ".join(stop["name"] for stop in plan["stops"]),
+        "location": plan["stops"][0]["location"],
+        "distance_km": plan["route_km"],
+        "match_percent": plan["match_percent"],
+        "available_ingredients": [item for stop in plan["stops"] for item in stop["items"]],
+        "missing_ingredients": plan["unavailable_ingredients"]
+    }
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Benchmark: basket planning over 50 candidate shops (target < 20 ms per plan)
+
+Usage: python benchmark_basket_planner.py [candidate shops]
+"""
+
+import random
+import sys
+import time
+
+from basket_planner import plan_basket
+from mock_data import MOCK_SHOPS
+from shop_catalog import InMemoryShopCatalog
+
+USER = {"lat": 37.7749, "lng": -122.4194}
+
+if __name__ == '__main__':
+    shop_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rng = random.Random(7)
+    items = sorted({item for shop in MOCK_SHOPS.values() for item in shop["inventory"]})
+    items += [f"specialty item {i}" for i in range(200)]
+
+    shops = {
+        f"Shop {i}": {
+            "location": {"lat": USER["lat"] + rng.uniform(-0.03, 0.03), "lng": USER["lng"] + rng.uniform(-0.03, 0.03)},
+            "inventory": rng.sample(items, rng.randint(15, 60))
+        }
+        for i in range(shop_count)
+    }
+    catalog = InMemoryShopCatalog(shops)
+
+    recipes = [[{"ingredient": name, "quantity": 1, "unit": "piece"} for name in rng.sample(items, rng.randint(8, 16))]
+               for _ in range(200)]
+
+    timings = []
+    planned = 0
+    for ingredients in recipes:
+        started = time.perf_counter()
+        plan = plan_basket(USER, ingredients, catalog, max_distance_km=5, min_match_percent=0)
+        timings.append(time.perf_counter() - started)
+        planned += plan is not None
+
+    timings.sort()
+    print(f"{shop_count} candidate shops, {len(recipes)} recipes ({planned} planned)")
+    print(f"median {timings[len(timings) // 2] * 1000:.2f} ms | p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms | "
+          f"max {timings[-1] * 1000:.2f} ms")
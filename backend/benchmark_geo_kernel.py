@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized haversine kernel vs the scalar calculate_distance loop
+
+Usage: python benchmark_geo_kernel.py [point counts...]   (default: 10000 1000000)
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+
+from delivery_service import calculate_distance
+from geo_kernel import GeoPoints, distance_matrix, distances_from
+
+ORIGIN = (37.7749, -122.4194)
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 1000000]
+    rng = random.Random(42)
+
+    for count in counts:
+        lats = [ORIGIN[0] + rng.uniform(-0.5, 0.5) for _ in range(count)]
+        lngs = [ORIGIN[1] + rng.uniform(-0.5, 0.5) for _ in range(count)]
+
+        scalar_seconds, expected = timed(
+            lambda: [calculate_distance(ORIGIN[0], ORIGIN[1], lat, lng) for lat, lng in zip(lats, lngs)], repeat=1)
+        pack_seconds, points = timed(lambda: GeoPoints(lats, lngs), repeat=1)
+        vector_seconds, distances = timed(lambda: distances_from(ORIGIN[0], ORIGIN[1], points))
+        np.testing.assert_allclose(distances, expected, rtol=1e-12, atol=1e-9)
+
+        print(f"{count:>9} points, one origin: scalar {scalar_seconds * 1000:9.1f} ms | "
+              f"vectorized {vector_seconds * 1000:7.2f} ms ({scalar_seconds / vector_seconds:5.0f}x) | "
+              f"pack once {pack_seconds * 1000:.1f} ms")
+
+    origins = GeoPoints([ORIGIN[0] + rng.uniform(-0.5, 0.5) for _ in range(100)],
+                        [ORIGIN[1] + rng.uniform(-0.5, 0.5) for _ in range(100)])
+    destinations = GeoPoints([ORIGIN[0] + rng.uniform(-0.5, 0.5) for _ in range(10000)],
+                             [ORIGIN[1] + rng.uniform(-0.5, 0.5) for _ in range(10000)])
+    matrix_seconds, _ = timed(lambda: distance_matrix(origins, destinations))
+    print(f"100 x 10000 distance matrix: {matrix_seconds * 1000:.1f} ms")
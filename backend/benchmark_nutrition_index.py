@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: precompiled nutrition index vs the original per-call table scan
+
+Usage: python benchmark_nutrition_index.py
+"""
+
+import timeit
+
+from nutrition_index import NUTRITION_DB, nutrition_index
+
+RECIPE = [
+    'basmati rice', 'extra virgin olive oil', 'red onion', 'garlic cloves', 'fresh ginger',
+    'boneless chicken thighs', 'garam masala', 'ground cumin', 'plain greek yogurt',
+    'fresh cilantro leaves', 'sea salt', 'green chilies', 'unknown spice blend', 'butter'
+]
+
+def legacy_lookup(names):
+    # Original behaviour: rebuild the table on every call, then scan it for every ingredient
+    nutrition_db = {name: dict(nutrition) for name, nutrition in NUTRITION_DB.items()}
+    matches = []
+    for name in names:
+        matched = None
+        for db_ingredient, nutrition in nutrition_db.items():
+            if db_ingredient in name or name in db_ingredient:
+                matched = nutrition
+                break
+        matches.append(matched)
+    return matches
+
+def indexed_lookup(names):
+    return [nutrition_index.match(name) for name in names]
+
+def indexed_lookup_uncached(names):
+    return [nutrition_index.profiles[p] if (p := nutrition_index._match_position(name)) is not None else None
+            for name in names]
+
+if __name__ == '__main__':
+    assert [dict(m) if m else None for m in legacy_lookup(RECIPE)] == \
+           [dict(m) if m else None for m in indexed_lookup(RECIPE)]
+
+    runs = 20000
+    for label, fn in [('legacy scan', legacy_lookup),
+                      ('index (cold, no memo)', indexed_lookup_uncached),
+                      ('index (memoized)', indexed_lookup)]:
+        seconds = min(timeit.repeat(lambda: fn(RECIPE), number=runs, repeat=3))
+        print(f"{label:24s} {seconds / runs * 1e6:8.1f} µs per {len(RECIPE)}-ingredient recipe")
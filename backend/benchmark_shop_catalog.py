@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: spatially indexed shop catalog vs the linear distance scan
+
+Usage: python benchmark_shop_catalog.py [shop counts...]   (default: 10000 100000)
+"""
+
+import random
+import sys
+import time
+
+from delivery_service import calculate_distance
+from shop_catalog import InMemoryShopCatalog
+
+CITY_CENTER = (37.7749, -122.4194)
+CITY_SPREAD_DEG = 0.5  # ~55 km across
+RADIUS_KM = 5
+QUERIES = 200
+
+def synthetic_shops(count, rng):
+    return {
+        f"shop_{i}": {
+            "location": {"lat": CITY_CENTER[0] + rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG),
+                         "lng": CITY_CENTER[1] + rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG)},
+            "inventory": []
+        }
+        for i in range(count)
+    }
+
+def linear_scan(shops, location, radius_km):
+    matches = []
+    for shop_name, shop_data in shops.items():
+        distance_km = calculate_distance(location["lat"], location["lng"],
+                                         shop_data["location"]["lat"], shop_data["location"]["lng"])
+        if distance_km <= radius_km:
+            matches.append((shop_name, shop_data, distance_km))
+    return matches
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    rng = random.Random(42)
+
+    for count in counts:
+        shops = synthetic_shops(count, rng)
+        queries = [{"lat": CITY_CENTER[0] + rng.uniform(-0.3, 0.3), "lng": CITY_CENTER[1] + rng.uniform(-0.3, 0.3)}
+                   for _ in range(QUERIES)]
+
+        started = time.perf_counter()
+        catalog = InMemoryShopCatalog(shops)
+        build_seconds = time.perf_counter() - started
+
+        linear_queries = queries[:max(5, QUERIES * 10000 // count)]
+        started = time.perf_counter()
+        expected = [linear_scan(shops, query, RADIUS_KM) for query in linear_queries]
+        linear_ms = (time.perf_counter() - started) / len(linear_queries) * 1000
+
+        started = time.perf_counter()
+        results = [catalog.shops_within(query, RADIUS_KM) for query in queries]
+        indexed_ms = (time.perf_counter() - started) / len(queries) * 1000
+
+        for got, want in zip(results, expected):
+            assert [name for name, _, _ in got] == [name for name, _, _ in want]
+        print(f"{count:>9} shops: linear {linear_ms:9.2f} ms/query | grid {indexed_ms:7.2f} ms/query "
+              f"({linear_ms / indexed_ms:5.1f}x) | build {build_seconds:.2f} s | "
+              f"avg {sum(map(len, results)) / len(results):.0f} hits")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Benchmark: top-k shop ranking vs materializing and sorting every qualified shop
+
+Usage: python benchmark_shop_ranking.py [shop count] [k]
+"""
+
+import random
+import sys
+import time
+
+from delivery_service import rank_shops
+from mock_data import MOCK_SHOPS
+from shop_catalog import InMemoryShopCatalog
+
+USER = {"lat": 37.7749, "lng": -122.4194}
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+if __name__ == '__main__':
+    shop_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(11)
+    items = sorted({item for shop in MOCK_SHOPS.values() for item in shop["inventory"]})
+    catalog = InMemoryShopCatalog({
+        f"Shop {i}": {
+            "location": {"lat": USER["lat"] + rng.uniform(-0.03, 0.03), "lng": USER["lng"] + rng.uniform(-0.03, 0.03)},
+            "inventory": rng.sample(items, rng.randint(20, min(80, len(items))))
+        }
+        for i in range(shop_count)
+    })
+    ingredients = [{"ingredient": name, "quantity": 1, "unit": "piece"} for name in rng.sample(items, 12)]
+
+    full_seconds, full = timed(lambda: rank_shops(USER, ingredients, catalog, 5, 0))
+    top_seconds, top = timed(lambda: rank_shops(USER, ingredients, catalog, 5, 0, limit=k))
+    assert top["shops"] == full["shops"][:k]
+
+    print(f"{full['total']} qualified shops")
+    print(f"materialize all: {full_seconds * 1000:.1f} ms | top {k}: {top_seconds * 1000:.1f} ms "
+          f"({full_seconds / top_seconds:.1f}x)")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: mixed read/write throughput on SQLite, default settings with direct commits
+vs the WAL/pragma profile with writes through the single-writer queue
+
+Usage: python benchmark_sqlite_writes.py [threads] [operations per thread] [write share]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, RecentSearch, User, create_database_engine
+from write_queue import WriteQueue
+
+USERS = 50
+
+def setup(sqlite_profile):
+    path = os.path.join(tempfile.mkdtemp(prefix='weknow-bench-'), 'bench.db')
+    engine = create_database_engine(f'sqlite:///{path}', sqlite_profile=sqlite_profile)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = session_factory()
+    db.add_all(User(name=f'User {i}', email=f'user{i}@example.com', password_hash='x') for i in range(USERS))
+    db.commit()
+    db.close()
+    return engine, session_factory
+
+def run(session_factory, write, threads, operations, write_share):
+    errors = []
+    write_latencies = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for i in range(operations):
+            user_id = rng.randint(1, USERS)
+            started = time.perf_counter()
+            try:
+                if rng.random() < write_share:
+                    write(lambda db: db.add(RecentSearch(user_id=user_id, dish_name=f'dish {seed}-{i}')))
+                    with lock:
+                        write_latencies.append(time.perf_counter() - started)
+                else:
+                    db = session_factory()
+                    try:
+                        db.query(RecentSearch).filter(RecentSearch.user_id == user_id) \
+                            .order_by(RecentSearch.search_timestamp.desc()).limit(4).all()
+                    finally:
+                        db.close()
+            except Exception as e:
+                with lock:
+                    errors.append(str(e).splitlines()[0])
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return elapsed, write_latencies, errors
+
+def direct_write(session_factory):
+    def write(job):
+        db = session_factory()
+        try:
+            job(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    return write
+
+if __name__ == '__main__':
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    write_share = float(sys.argv[3]) if len(sys.argv) > 3 else 0.3
+    total = threads * operations
+
+    results = {}
+    _, before_sessions = setup(sqlite_profile=False)
+    results['default, direct commits'] = run(before_sessions, direct_write(before_sessions), threads, operations, write_share)
+
+    _, after_sessions = setup(sqlite_profile=True)
+    writer = WriteQueue(after_sessions)
+    results['WAL profile, write queue'] = run(after_sessions, writer.execute, threads, operations, write_share)
+    batches = writer.stats()['batches']
+    writer.close()
+
+    print(f"{threads} threads x {operations} operations, {write_share:.0%} writes")
+    for label, (elapsed, write_latencies, errors) in results.items():
+        p95 = np.percentile(write_latencies, 95) * 1000 if write_latencies else 0.0
+        print(f"{label:26s}: {total / elapsed:8.0f} ops/s | write p95 {p95:7.1f} ms | {len(errors)} errors"
+              + (f" (first: {errors[0]})" if errors else ""))
+    print(f"write queue committed {len(results['WAL profile, write queue'][1])} writes in {batches} transactions")
@@ -0,0 +1,285 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from models import SessionLocal, RecipeCacheEntry
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with an optional per-entry TTL
+
+    Args:
+        max_entries (int): Maximum number of entries kept before the least recently used is evicted
+        ttl_seconds (float): Default time-to-live for entries, None means entries never expire
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl_seconds: Optional[float] = None):
+        """Store value under key, evicting least recently used entries past max_entries"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove key from the cache if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Return hit/miss/eviction counters and current size"""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class RecipeCache:
+    """
+    Two-tier cache for resolved recipe ingredients
+
+    Tier 1 is an in-process LRU, tier 2 is the recipe_cache table so entries survive
+    restarts. An empty ingredient list is a negative entry ("no ingredients found") and
+    uses the shorter negative TTL.
+
+    Args:
+        session_factory: Callable returning a SQLAlchemy session for the persistent tier
+        max_entries (int): In-process LRU size
+        max_persisted_entries (int): Maximum rows kept in the recipe_cache table
+        ttl_seconds (int): Lifetime of positive entries
+        negative_ttl_seconds (int): Lifetime of negative entries
+        prune_every_writes (int): Persistent writes between prunes of the recipe_cache table,
+            which may hold that many rows over max_persisted_entries in between
+    """
+
+    def __init__(self, session_factory=SessionLocal,
+                 max_entries: int = Config.RECIPE_CACHE_MAX_ENTRIES,
+                 max_persisted_entries: int = Config.RECIPE_CACHE_MAX_PERSISTED_ENTRIES,
+                 ttl_seconds: int = Config.RECIPE_CACHE_TTL_SECONDS,
+                 negative_ttl_seconds: int = Config.RECIPE_CACHE_NEGATIVE_TTL_SECONDS,
+                 prune_every_writes: int = Config.RECIPE_CACHE_PRUNE_EVERY_WRITES):
+        self.session_factory = session_factory
+        self.max_persisted_entries = max_persisted_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.prune_every_writes = max(1, prune_every_writes)
+        self._writes_since_prune = 0
+        self._memory = LRUCache(max_entries, ttl_seconds)
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(dish_key: str, scope: str) -> str:
+        return f"{scope}:{dish_key}"
+
+    @staticmethod
+    def _copy(ingredients: List[Dict]) -> List[Dict]:
+        # Callers are free to mutate what they get back, so never hand out cached dicts
+        return [dict(ingredient) for ingredient in ingredients]
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, dish_key: str, scope: str = "resolved") -> Optional[List[Dict]]:
+        """
+        Look up cached ingredients for a normalized dish name
+
+        Args:
+            dish_key (str): Normalized dish name (clean_dish_name output)
+            scope (str): Cache namespace, e.g. "resolved" or a provider name
+
+        Returns:
+            Optional[List[Dict]]: None on a miss, [] on a negative hit, otherwise the ingredients
+        """
+        key = self._key(dish_key, scope)
+
+        ingredients = self._memory.get(key, _MISSING)
+        if ingredients is not _MISSING:
+            self._count("negative_hits" if not ingredients else "memory_hits")
+            return self._copy(ingredients)
+
+        ingredients = self._load_persistent(key)
+        if ingredients is not None:
+            self._count("negative_hits" if not ingredients else "persistent_hits")
+            return self._copy(ingredients)
+
+        self._count("misses")
+        return None
+
+    def set(self, dish_key: str, ingredients: List[Dict], source: Optional[str] = None, scope: str = "resolved"):
+        """
+        Store ingredients for a normalized dish name in both tiers
+
+        Args:
+            dish_key (str): Normalized dish name (clean_dish_name output)
+            ingredients (List[Dict]): Ingredients to cache, [] caches a "no ingredients found" result
+            source (str): Provider that produced the ingredients
+            scope (str): Cache namespace, e.g. "resolved" or a provider name
+        """
+        key = self._key(dish_key, scope)
+        ttl = self.ttl_seconds if ingredients else self.negative_ttl_seconds
+        ingredients = self._copy(ingredients)
+
+        self._memory.set(key, ingredients, ttl_seconds=ttl)
+        self._store_persistent(key, ingredients, source, ttl)
+
+    def invalidate(self, dish_key: str, scope: str = "resolved"):
+        """Drop a single dish from both tiers"""
+        key = self._key(dish_key, scope)
+        self._memory.delete(key)
+
+        db = self.session_factory()
+        try:
+            db.query(RecipeCacheEntry).filter(RecipeCacheEntry.cache_key == key).delete()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error invalidating recipe cache entry {key}: {e}")
+        finally:
+            db.close()
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        self._memory.clear()
+
+        db = self.session_factory()
+        try:
+            db.query(RecipeCacheEntry).delete()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error clearing recipe cache: {e}")
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for both tiers"""
+        memory_stats = self._memory.stats()
+        return {
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "memory_size": memory_stats["size"],
+            "memory_evictions": memory_stats["evictions"]
+        }
+
+    def _load_persistent(self, key: str) -> Optional[List[Dict]]:
+        db = self.session_factory()
+        try:
+            entry = db.get(RecipeCacheEntry, key)
+            if not entry:
+                return None
+
+            remaining = (entry.expires_at - datetime.utcnow()).total_seconds()
+            if remaining <= 0:
+                return None
+
+            # Promote into the memory tier for the rest of the entry's lifetime
+            ingredients = entry.ingredients or []
+            self._memory.set(key, ingredients, ttl_seconds=remaining)
+            return ingredients
+
+        except Exception as e:
+            logger.error(f"Error reading recipe cache entry {key}: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _store_persistent(self, key: str, ingredients: List[Dict], source: Optional[str], ttl: int):
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            db.merge(RecipeCacheEntry(
+                cache_key=key,
+                ingredients=ingredients,
+                source=source,
+                created_at=now,
+                expires_at=now + timedelta(seconds=ttl)
+            ))
+            db.commit()
+            if self._due_for_prune():
+                self._prune_persistent(db, now)
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error writing recipe cache entry {key}: {e}")
+        finally:
+            db.close()
+
+    def _due_for_prune(self) -> bool:
+        with self._lock:
+            self._writes_since_prune += 1
+            if self._writes_since_prune < self.prune_every_writes:
+                return False
+            self._writes_since_prune = 0
+            return True
+
+    def _prune_persistent(self, db, now: datetime):
+        """Drop expired rows, then the oldest rows beyond max_persisted_entries"""
+        db.query(RecipeCacheEntry).filter(RecipeCacheEntry.expires_at <= now).delete()
+
+        overflow = db.query(func.count(RecipeCacheEntry.cache_key)).scalar() - self.max_persisted_entries
+        if overflow > 0:
+            oldest = db.query(RecipeCacheEntry.cache_key).order_by(
+                RecipeCacheEntry.created_at.asc()
+            ).limit(overflow).subquery()
+            db.query(RecipeCacheEntry).filter(
+                RecipeCacheEntry.cache_key.in_(oldest.select())
+            ).delete(synchronize_session=False)
+
+        db.commit()
+
+
+# Shared cache used by ingredient_service
+recipe_cache = RecipeCache()
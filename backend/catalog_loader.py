@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Bulk loader for the shops, shop_inventory_items and agents tables
+
+Reads shop dumps as JSON (a list of shops, or a name -> shop object shaped like
+mock_data.MOCK_SHOPS) or CSV (name, lat, lng, inventory columns with inventory items
+separated by '|'), and agent dumps as JSON lists shaped like mock_data.DELIVERY_AGENTS.
+Rows are written in batches with executemany-style inserts and updates, one commit
+per batch.
+
+Usage: python catalog_loader.py shops.csv [--agents agents.json] [--batch-size 500]
+"""
+
+import argparse
+import csv
+import json
+import logging
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+from sqlalchemy import delete, insert, select, update
+from models import SessionLocal, Shop, ShopInventoryItem, Agent
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_SEPARATOR = '|'
+
+def _batches(rows: Iterable, size: int) -> Iterator[List]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def read_shop_file(path: str) -> Iterator[Dict]:
+    """
+    Read shops from a JSON or CSV dump
+
+    Returns:
+        Iterator[Dict]: {"name", "location": {"lat", "lng"}, "inventory": List[str]} per shop
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                inventory = row.get('inventory') or ''
+                yield {
+                    "name": row['name'].strip(),
+                    "location": {"lat": float(row['lat']), "lng": float(row['lng'])},
+                    "inventory": [item.strip() for item in inventory.split(INVENTORY_SEPARATOR) if item.strip()]
+                }
+        return
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [{"name": name, **shop} for name, shop in data.items()]
+    for shop in data:
+        yield {"name": shop["name"], "location": shop["location"], "inventory": list(shop.get("inventory", []))}
+
+def load_shops(shops: Iterable[Dict], session_factory=SessionLocal,
+               batch_size: int = Config.CATALOG_LOAD_BATCH_SIZE) -> Dict:
+    """
+    Insert or replace shops and their inventories, keyed by shop name
+
+    A shop that already exists gets its location updated, is reactivated and has its whole
+    inventory replaced. Every written shop has updated_at bumped so catalogs pick it up.
+
+    Args:
+        shops (Iterable[Dict]): Shops with "name", "location" and "inventory"
+        session_factory: Callable returning a SQLAlchemy session
+        batch_size (int): Shops per batch
+
+    Returns:
+        Dict: {"inserted", "updated", "items"} counts
+    """
+    counts = {"inserted": 0, "updated": 0, "items": 0}
+    db = session_factory()
+    try:
+        for batch in _batches(shops, batch_size):
+            # Last occurrence of a name within a batch wins
+            by_name = {shop["name"]: shop for shop in batch}
+            now = datetime.utcnow()
+            existing = dict(db.execute(select(Shop.name, Shop.id).where(Shop.name.in_(list(by_name)))).all())
+
+            new_rows = [
+                {"name": name, "lat": shop["location"]["lat"], "lng": shop["location"]["lng"],
+                 "is_active": True, "updated_at": now}
+                for name, shop in by_name.items() if name not in existing
+            ]
+            if new_rows:
+                db.execute(insert(Shop), new_rows)
+            if existing:
+                db.execute(update(Shop), [
+                    {"id": existing[name], "lat": shop["location"]["lat"], "lng": shop["location"]["lng"],
+                     "is_active": True, "updated_at": now}
+                    for name, shop in by_name.items() if name in existing
+                ])
+                db.execute(delete(ShopInventoryItem).where(ShopInventoryItem.shop_id.in_(list(existing.values()))))
+
+            shop_ids = dict(existing)
+            if new_rows:
+                shop_ids.update(db.execute(select(Shop.name, Shop.id).where(
+                    Shop.name.in_([row["name"] for row in new_rows]))).all())
+            item_rows = [
+                {"shop_id": shop_ids[name], "item_name": item}
+                for name, shop in by_name.items() for item in shop["inventory"]
+            ]
+            if item_rows:
+                db.execute(insert(ShopInventoryItem), item_rows)
+            db.commit()
+
+            counts["inserted"] += len(new_rows)
+            counts["updated"] += len(existing)
+            counts["items"] += len(item_rows)
+
+        logger.info(f"Loaded shops: {counts['inserted']} inserted, {counts['updated']} updated, {counts['items']} inventory items")
+        return counts
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error loading shops: {e}")
+        raise
+    finally:
+        db.close()
+
+def deactivate_shops(shop_names: Iterable[str], session_factory=SessionLocal) -> int:
+    """
+    Take shops out of the catalog, keeping their rows
+
+    Returns:
+        int: Shops deactivated
+    """
+    db = session_factory()
+    try:
+        result = db.execute(
+            update(Shop)
+            .where(Shop.name.in_(list(shop_names)), Shop.is_active.is_(True))
+            .values(is_active=False, updated_at=datetime.utcnow())
+        )
+        db.commit()
+        return result.rowcount
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error deactivating shops: {e}")
+        raise
+    finally:
+        db.close()
+
+def load_agents(agents: Iterable[Dict], session_factory=SessionLocal,
+                batch_size: int = Config.CATALOG_LOAD_BATCH_SIZE) -> int:
+    """
+    Insert or update delivery agents, keyed by agent id
+
+    Args:
+        agents (Iterable[Dict]): Agents shaped like mock_data.DELIVERY_AGENTS entries
+
+    Returns:
+        int: Agents written
+    """
+    written = 0
+    db = session_factory()
+    try:
+        for batch in _batches(agents, batch_size):
+            rows = {
+                agent["id"]: {"id": agent["id"], "name": agent["name"], "status": agent.get("status", "available"),
+                              "lat": agent["current_location"]["lat"], "lng": agent["current_location"]["lng"],
+                              "updated_at": datetime.utcnow()}
+                for agent in batch
+            }
+            existing = set(db.execute(select(Agent.id).where(Agent.id.in_(list(rows)))).scalars())
+            if len(existing) < len(rows):
+                db.execute(insert(Agent), [row for agent_id, row in rows.items() if agent_id not in existing])
+            if existing:
+                db.execute(update(Agent), [row for agent_id, row in rows.items() if agent_id in existing])
+            db.commit()
+            written += len(rows)
+
+        logger.info(f"Loaded {written} delivery agents")
+        return written
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error loading agents: {e}")
+        raise
+    finally:
+        db.close()
+
+def read_agents(session_factory=SessionLocal) -> List[Dict]:
+    """Agents from the agents table, shaped like mock_data.DELIVERY_AGENTS entries"""
+    db = session_factory()
+    try:
+        return [
+            {"id": agent.id, "name": agent.name, "status": agent.status or "available",
+             "current_location": {"lat": agent.lat, "lng": agent.lng}}
+            for agent in db.query(Agent).order_by(Agent.id).all()
+        ]
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk load shops and delivery agents into the database')
+    parser.add_argument('shops', nargs='?', help='Shop dump (.json or .csv)')
+    parser.add_argument('--agents', help='Agent dump (.json)')
+    parser.add_argument('--batch-size', type=int, default=Config.CATALOG_LOAD_BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.shops:
+        print(load_shops(read_shop_file(args.shops), batch_size=args.batch_size))
+    if args.agents:
+        with open(args.agents, encoding='utf-8') as f:
+            print({"agents": load_agents(json.load(f), batch_size=args.batch_size)})
@@ -9,16 +9,106 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
     SPOONACULAR_API_KEY = os.getenv('SPOONACULAR_API_KEY', '9fa1698f628d41f0af451651e77bbb71')
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./weknow.db')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))  # Connections kept open
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))  # Extra connections allowed under load
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # Seconds to wait for a free connection
+    SQLITE_PROFILE_ENABLED = os.getenv('SQLITE_PROFILE_ENABLED', 'true').lower() == 'true'  # Apply the pragmas below to SQLite connections
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')  # Readers no longer block on the writer
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # Durable across app crashes in WAL mode; fsync on checkpoints only
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 65536))  # Page cache per connection
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes of the database file read through mmap
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))  # Wait this long for the write lock before "database is locked"
+    WRITE_QUEUE_ENABLED = os.getenv('WRITE_QUEUE_ENABLED', 'true').lower() == 'true'  # Funnel small writes through one writer thread
+    WRITE_QUEUE_MAX_BATCH = int(os.getenv('WRITE_QUEUE_MAX_BATCH', 100))  # Writes committed together in one transaction
+    WRITE_QUEUE_MAX_DELAY_SECONDS = float(os.getenv('WRITE_QUEUE_MAX_DELAY_SECONDS', 0.005))  # How long a batch waits for more writes
     
     # API Configuration
     SPOONACULAR_BASE_URL = 'https://api.spoonacular.com/recipes'
-    
+
+    # Recipe Cache Configuration
+    RECIPE_CACHE_MAX_ENTRIES = int(os.getenv('RECIPE_CACHE_MAX_ENTRIES', 1000))  # In-process LRU size
+    RECIPE_CACHE_MAX_PERSISTED_ENTRIES = int(os.getenv('RECIPE_CACHE_MAX_PERSISTED_ENTRIES', 20000))  # SQLite table size
+    RECIPE_CACHE_TTL_SECONDS = int(os.getenv('RECIPE_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+    RECIPE_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv('RECIPE_CACHE_NEGATIVE_TTL_SECONDS', 600))  # "No ingredients found"
+    RECIPE_CACHE_PRUNE_EVERY_WRITES = int(os.getenv('RECIPE_CACHE_PRUNE_EVERY_WRITES', 100))  # Cache writes between table prunes
+
+    # Recipe Resolver Configuration
+    RECIPE_RESOLVER_MODE = os.getenv('RECIPE_RESOLVER_MODE', 'sequential')  # sequential, concurrent
+    RECIPE_RESOLVER_POLICY = os.getenv('RECIPE_RESOLVER_POLICY', 'priority')  # priority, first
+    RECIPE_PROVIDER_PRIORITY = ['themealdb', 'spoonacular']
+    RECIPE_RESOLVER_DEADLINE_SECONDS = float(os.getenv('RECIPE_RESOLVER_DEADLINE_SECONDS', 15))
+    RECIPE_RESOLVER_MAX_WORKERS = int(os.getenv('RECIPE_RESOLVER_MAX_WORKERS', 8))
+    RECIPE_MIN_INGREDIENT_COUNT = int(os.getenv('RECIPE_MIN_INGREDIENT_COUNT', 1))
+
+    # Outbound Provider Client Configuration
+    PROVIDER_POOL_MAXSIZE = int(os.getenv('PROVIDER_POOL_MAXSIZE', 16))  # Keep-alive connections per host
+    PROVIDER_MAX_RETRIES = int(os.getenv('PROVIDER_MAX_RETRIES', 2))
+    PROVIDER_RETRY_BACKOFF_SECONDS = float(os.getenv('PROVIDER_RETRY_BACKOFF_SECONDS', 0.3))
+    PROVIDER_DEFAULT_TIMEOUT = 10
+    PROVIDER_TIMEOUTS = {  # Seconds per provider
+        'themealdb': 15,
+        'spoonacular': 15,
+        'spoonacular_nutrition': 3,
+        'spoonacular_ingredients': 2,
+        'distance_matrix': 2,
+    }
+
+    # Ingredient Nutrition Lookup Configuration
+    NUTRITION_LOOKUP_MAX_WORKERS = int(os.getenv('NUTRITION_LOOKUP_MAX_WORKERS', 8))
+    NUTRITION_LOOKUP_DEADLINE_SECONDS = float(os.getenv('NUTRITION_LOOKUP_DEADLINE_SECONDS', 6))
+    NUTRITION_PROFILE_CACHE_MAX_ENTRIES = int(os.getenv('NUTRITION_PROFILE_CACHE_MAX_ENTRIES', 2000))
+    NUTRITION_NO_MATCH_TTL_SECONDS = int(os.getenv('NUTRITION_NO_MATCH_TTL_SECONDS', 24 * 3600))  # Re-search unmatched names
+    NUTRITION_BATCH_MAX_DISHES = int(os.getenv('NUTRITION_BATCH_MAX_DISHES', 500))  # POST /nutrition/batch limit
+
+    # Allergy Profile Cache Configuration
+    ALLERGY_PROFILE_CACHE_MAX_ENTRIES = int(os.getenv('ALLERGY_PROFILE_CACHE_MAX_ENTRIES', 10000))  # Users kept in memory
+    ALLERGY_PROFILE_CACHE_TTL_SECONDS = int(os.getenv('ALLERGY_PROFILE_CACHE_TTL_SECONDS', 3600))  # Idle profiles are dropped after this
+    ALLERGY_PROFILE_VERSION_CHECK_SECONDS = float(os.getenv('ALLERGY_PROFILE_VERSION_CHECK_SECONDS', 30))  # Cached profiles are checked against other workers' changes this often
+
     # Delivery System Configuration
     MAX_DELIVERY_DISTANCE_KM = 5
     MIN_INGREDIENT_MATCH_PERCENT = 60
+    RANKED_SHOPS_MAX_LIMIT = int(os.getenv('RANKED_SHOPS_MAX_LIMIT', 100))  # Largest page a client may request when paging
+    SHOPS_PAGE_MAX_LIMIT = int(os.getenv('SHOPS_PAGE_MAX_LIMIT', 500))  # Largest /delivery/shops page a client may request
+    ORDERS_PAGE_DEFAULT_LIMIT = int(os.getenv('ORDERS_PAGE_DEFAULT_LIMIT', 50))  # Page size of GET /user/orders
+    ORDERS_PAGE_MAX_LIMIT = int(os.getenv('ORDERS_PAGE_MAX_LIMIT', 200))  # Largest /user/orders page a client may request
+    ORDER_ITEMS_BACKFILL_BATCH_SIZE = int(os.getenv('ORDER_ITEMS_BACKFILL_BATCH_SIZE', 500))  # Orders per commit when backfilling order_items
+    BASKET_SPLIT_ENABLED = os.getenv('BASKET_SPLIT_ENABLED', 'true').lower() == 'true'  # Split orders across shops when none covers enough alone
+    BASKET_STOP_COST_KM = float(os.getenv('BASKET_STOP_COST_KM', 1.0))  # Cost of each extra pickup stop, in km
+    BASKET_MAX_SHOPS = int(os.getenv('BASKET_MAX_SHOPS', 3))  # Most shops a split order may use
+    SHOP_INDEX_CELL_KM = float(os.getenv('SHOP_INDEX_CELL_KM', 2.0))  # Spatial grid cell size for shop lookups
+    SHOP_CATALOG_REFRESH_SECONDS = float(os.getenv('SHOP_CATALOG_REFRESH_SECONDS', 30))  # How often the in-memory catalog picks up changed shops
+    SHOP_CATALOG_SEED_MOCK_SHOPS = os.getenv('SHOP_CATALOG_SEED_MOCK_SHOPS', 'true').lower() == 'true'  # Load the built-in shops into an empty shops table
+    CATALOG_LOAD_BATCH_SIZE = int(os.getenv('CATALOG_LOAD_BATCH_SIZE', 500))  # Rows per executemany batch when bulk loading shops/agents
+    AGENT_INDEX_CELL_KM = float(os.getenv('AGENT_INDEX_CELL_KM', 2.0))  # Spatial grid cell size for agent lookups
+    AGENT_CLAIM_TTL_SECONDS = float(os.getenv('AGENT_CLAIM_TTL_SECONDS', 1800))  # Claimed agents free up after this; 0 disables
+    DISPATCH_MODE = os.getenv('DISPATCH_MODE', 'greedy')  # 'greedy' (assign per order) or 'batch' (windowed optimal assignment)
+    DISPATCH_WINDOW_SECONDS = float(os.getenv('DISPATCH_WINDOW_SECONDS', 3.0))  # How long a batch collects orders
+    DISPATCH_CANDIDATE_AGENTS = int(os.getenv('DISPATCH_CANDIDATE_AGENTS', 10))  # Nearest agents considered per order
+    DISPATCH_HUNGARIAN_MAX_ORDERS = int(os.getenv('DISPATCH_HUNGARIAN_MAX_ORDERS', 150))  # Larger batches assign greedily
+    DISPATCH_RESULT_TIMEOUT_SECONDS = float(os.getenv('DISPATCH_RESULT_TIMEOUT_SECONDS', 10.0))  # Extra wait past the window
     DEFAULT_USER_LOCATION = {"lat": 37.7749, "lng": -122.4194}  # San Francisco
+
+    # Delivery ETA Configuration
+    ETA_GEOHASH_PRECISION = int(os.getenv('ETA_GEOHASH_PRECISION', 5))  # ~4.9 km zones
+    ETA_MIN_SAMPLES = int(os.getenv('ETA_MIN_SAMPLES', 20))  # Orders a zone/hour needs before its own figures are used
+    ETA_MIN_TRAVEL_KM = float(os.getenv('ETA_MIN_TRAVEL_KM', 0.2))  # Shorter trips don't inform travel pace
+    ETA_TABLE_RELOAD_SECONDS = float(os.getenv('ETA_TABLE_RELOAD_SECONDS', 3600))
+    ETA_REBUILD_BATCH_SIZE = int(os.getenv('ETA_REBUILD_BATCH_SIZE', 5000))
+    ETA_REFRESH_MIN_INTERVAL_SECONDS = float(os.getenv('ETA_REFRESH_MIN_INTERVAL_SECONDS', 60))  # Delivered orders refresh the tables at most this often
+
+    # Distance Matrix Configuration
+    DISTANCE_MATRIX_PROVIDER_URL = os.getenv('DISTANCE_MATRIX_PROVIDER_URL', '')  # Empty uses local haversine distances only
+    DISTANCE_MATRIX_API_KEY = os.getenv('DISTANCE_MATRIX_API_KEY', '')
+    DISTANCE_MATRIX_GRID_DEGREES = float(os.getenv('DISTANCE_MATRIX_GRID_DEGREES', 0.001))  # ~110 m cache grid
+    DISTANCE_MATRIX_CACHE_MAX_ENTRIES = int(os.getenv('DISTANCE_MATRIX_CACHE_MAX_ENTRIES', 100000))
+    DISTANCE_MATRIX_CACHE_TTL_SECONDS = float(os.getenv('DISTANCE_MATRIX_CACHE_TTL_SECONDS', 900))  # Traffic changes; refresh every 15 min
+    DISTANCE_MATRIX_MAX_ELEMENTS_PER_REQUEST = int(os.getenv('DISTANCE_MATRIX_MAX_ELEMENTS_PER_REQUEST', 100))
+    DISTANCE_MATRIX_MAX_WORKERS = int(os.getenv('DISTANCE_MATRIX_MAX_WORKERS', 4))
+    DISTANCE_MATRIX_DEADLINE_SECONDS = float(os.getenv('DISTANCE_MATRIX_DEADLINE_SECONDS', 1.5))  # Then fall back to local distances
     
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'weknow-super-secret-jwt-key-2024-secure-and-unique')
     JWT_ALGORITHM = 'HS256'
-    JWT_EXPIRATION_HOURS = 24 
\ No newline at end of file
+    JWT_EXPIRATION_HOURS = 24 
+    DELIVERY_OPERATOR_EMAILS = {email.strip().lower() for email in os.getenv('DELIVERY_OPERATOR_EMAILS', '').split(',') if email.strip()}  # May change delivery agents; empty allows nobody
\ No newline at end of file
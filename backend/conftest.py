@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Run tests against a throwaway database instead of the tracked weknow.db
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='weknow-tests-'), 'weknow.db'))
@@ -1,7 +1,14 @@
-import math
+import heapq
+import base64
 import random
 import logging
-from mock_data import MOCK_SHOPS, DELIVERY_AGENTS
+from functools import lru_cache
+from mock_data import MOCK_SHOPS
+from spatial_index import haversine_km
+from shop_catalog import ShopCatalog, InMemoryShopCatalog
+from inventory_index import InventoryIndex
+from agent_registry import agent_registry
+from eta_service import eta_engine, BASE_PREP_MINUTES, TRAVEL_MINUTES_PER_KM, ingredient_minutes
 from config import Config
 
 logger = logging.getLogger(__name__)
@@ -11,175 +18,248 @@ def calculate_distance(lat1, lng1, lat2, lng2):
     Calculate distance between two points using Haversine formula
     Returns distance in kilometers
     """
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lng1_rad = math.radians(lng1)
-    lat2_rad = math.radians(lat2)
-    lng2_rad = math.radians(lng2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlng = lng2_rad - lng1_rad
-    
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    distance = R * c
-    
-    return distance
+    return haversine_km(lat1, lng1, lat2, lng2)
 
 def find_and_rank_shops(user_location, ingredients, shops, max_distance_km=5, min_match_percent=60):
     """
     Find and rank shops based on ingredient match percentage and distance
     Returns shops within max_distance_km that have at least min_match_percent of ingredients
+    
+    shops is a ShopCatalog (spatially indexed) or a plain name -> shop dict, which is
+    indexed on the fly
+    """
+    return rank_shops(user_location, ingredients, shops, max_distance_km, min_match_percent)["shops"]
+
+def rank_shops(user_location, ingredients, shops, max_distance_km=5, min_match_percent=60, limit=None, offset=0):
     """
-    qualified_shops = []
+    Rank qualified shops and materialize only one page of them
     
-    for shop_name, shop_data in shops.items():
-        # Calculate distance to user
-        distance_km = calculate_distance(
-            user_location["lat"], user_location["lng"],
-            shop_data["location"]["lat"], shop_data["location"]["lng"]
-        )
-        
-        # Skip shops outside the maximum distance
-        if distance_km > max_distance_km:
-            continue
-        
-        # Match ingredients with shop inventory
-        available_ingredients, missing_ingredients = match_ingredients_with_shop(ingredients, shop_data["inventory"])
-        
-        # Calculate match percentage
-        total_ingredients = len(ingredients)
-        available_count = len(available_ingredients)
+    Every shop within range is scored from per-shop availability counts computed for the
+    whole catalog at once by the inventory index, then heapq picks the offset + limit best, so
+    only those get their available/missing ingredient lists and result dicts built.
+    Ordering matches find_and_rank_shops: match percentage descending, then distance,
+    then catalog order.
+    
+    Returns {"total": number of qualified shops, "shops": the requested page,
+    "top": the best shop overall, even when offset skips it}
+    """
+    if not isinstance(shops, ShopCatalog):
+        shops = InMemoryShopCatalog(shops)
+    shops = shops.snapshot()
+    
+    inventory_index = shops.inventory_index
+    total_ingredients = len(ingredients)
+    if inventory_index is not None:
+        available_counts = inventory_index.availability_counts(
+            ingredient.get('ingredient', '').lower().strip() for ingredient in ingredients
+        ).tolist()
+        shop_positions = inventory_index.shop_positions
+    
+    # Score every shop within range without building any per-shop lists
+    scored = []
+    for position, (shop_name, shop_data, distance_km) in enumerate(shops.shops_within(user_location, max_distance_km)):
+        if inventory_index is not None:
+            available_count = available_counts[shop_positions[shop_name]]
+        else:
+            available_count = len(match_ingredients_with_shop(ingredients, shop_data["inventory"])[0])
         match_percent = (available_count / total_ingredients) * 100 if total_ingredients > 0 else 0
         
         # Skip shops that don't meet minimum match requirement
         if match_percent < min_match_percent:
             continue
         
-        # Add shop to qualified list
-        qualified_shops.append({
+        scored.append((-round(match_percent, 1), round(distance_km, 1), position, shop_name, shop_data, available_count))
+    
+    # Sort shops by match percentage (descending) and then by distance (ascending)
+    if limit is None:
+        selected = sorted(scored)
+    else:
+        selected = heapq.nsmallest(offset + limit, scored)
+    
+    def materialize(entry):
+        negative_match_percent, distance_km, _, shop_name, shop_data, available_count = entry
+        # Match ingredients with shop inventory
+        if inventory_index is not None:
+            available_ingredients, missing_ingredients = inventory_index.match(ingredients, shop_name)
+        else:
+            available_ingredients, missing_ingredients = match_ingredients_with_shop(ingredients, shop_data["inventory"])
+        
+        return {
             "name": shop_name,
-            "distance_km": round(distance_km, 1),
-            "match_percent": round(match_percent, 1),
+            "distance_km": distance_km,
+            "match_percent": -negative_match_percent,
             "location": shop_data["location"],
             "inventory": shop_data["inventory"],
             "available_ingredients": available_ingredients,
             "missing_ingredients": missing_ingredients,
             "total_ingredients": total_ingredients,
             "available_count": available_count
-        })
+        }
     
-    # Sort shops by match percentage (descending) and then by distance (ascending)
-    qualified_shops.sort(key=lambda x: (-x["match_percent"], x["distance_km"]))
+    ranked = [materialize(entry) for entry in selected[offset:]]
+    if offset == 0 or not selected:
+        top = ranked[0] if ranked else None
+    else:
+        top = materialize(selected[0])
+    
+    return {"total": len(scored), "shops": ranked, "top": top}
+
+SHOP_FIELDS = ('name', 'location', 'inventory_count', 'inventory', 'inventory_sample')
+DEFAULT_SHOP_FIELDS = ('name', 'location', 'inventory_count', 'inventory')
+INVENTORY_SAMPLE_SIZE = 6
+
+def encode_shop_cursor(shop_name, position):
+    """Opaque pagination cursor pointing just past a shop, found at position in its listing"""
+    payload = f"{position}:{shop_name}"
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_shop_cursor(cursor):
+    """(shop name, position) from a cursor made by encode_shop_cursor; raises ValueError when malformed"""
+    try:
+        position, shop_name = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8').split(':', 1)
+        return shop_name, int(position)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _project_shop(shop_name, shop_data, fields):
+    projected = {}
+    for field in fields:
+        if field == 'name':
+            projected['name'] = shop_name
+        elif field == 'location':
+            projected['location'] = shop_data['location']
+        elif field == 'inventory_count':
+            projected['inventory_count'] = len(shop_data['inventory'])
+        elif field == 'inventory':
+            projected['inventory'] = shop_data['inventory']
+        elif field == 'inventory_sample':
+            projected['inventory_sample'] = shop_data['inventory'][:INVENTORY_SAMPLE_SIZE]
+    return projected
+
+def list_shops(shops, fields=DEFAULT_SHOP_FIELDS, limit=None, after=None, center=None, radius_km=None, bbox=None,
+               after_position=None):
+    """
+    Page through the shop catalog, optionally only shops within a radius and/or a
+    bounding box, with each shop reduced to the requested fields
+    
+    Area filters go through the catalog's spatial index (a radius and a bounding box
+    together search the radius, then trim to the box). Shops stay in catalog order, and a
+    page resumes after the shop named by after (see encode_shop_cursor). after_position,
+    where that shop was in the previous page's listing, is checked first; if the shop has
+    since left the catalog the page resumes at that position instead.
+    
+    Returns {"total": number of matching shops, "shops": the page,
+    "next_after": last shop of the page when more follow, else None,
+    "next_position": its position in the listing}.
+    Raises ValueError when after is not among the matching shops and no position is given.
+    """
+    if not isinstance(shops, ShopCatalog):
+        shops = InMemoryShopCatalog(shops)
+    shops = shops.snapshot()
     
-    return qualified_shops
+    if center is not None and radius_km is not None:
+        matches = [(shop_name, shop_data) for shop_name, shop_data, _ in shops.shops_within(center, radius_km)]
+    elif bbox is not None:
+        matches = shops.shops_in_box(*bbox)
+    else:
+        matches = list(shops.items())
+    
+    if bbox is not None and radius_km is not None:
+        min_lat, min_lng, max_lat, max_lng = bbox
+        matches = [(shop_name, shop_data) for shop_name, shop_data in matches
+                   if min_lat <= shop_data["location"]["lat"] <= max_lat
+                   and min_lng <= shop_data["location"]["lng"] <= max_lng]
+    
+    start = 0
+    if after is not None:
+        if after_position is not None and 0 <= after_position < len(matches) and matches[after_position][0] == after:
+            start = after_position + 1
+        else:
+            # The catalog changed since the cursor was issued
+            start = next((position + 1 for position, (shop_name, _) in enumerate(matches) if shop_name == after), None)
+            if start is None and after_position is None:
+                raise ValueError(f"Shop '{after}' is no longer in the listing")
+            if start is None:
+                start = min(max(after_position, 0), len(matches))
+    
+    end = len(matches) if limit is None else start + limit
+    page = matches[start:end]
+    more = bool(page) and end < len(matches)
+    return {
+        "total": len(matches),
+        "shops": [_project_shop(shop_name, shop_data, fields) for shop_name, shop_data in page],
+        "next_after": page[-1][0] if more else None,
+        "next_position": start + len(page) - 1 if more else None
+    }
 
 def match_ingredients_with_shop(ingredients, shop_inventory):
     """
     Match recipe ingredients with shop inventory
     Returns available and missing ingredients
     """
-    available_ingredients = []
-    missing_ingredients = []
-    
-    # Define ingredient substitutions for better matching
-    ingredient_substitutions = {
-        'heavy cream': ['heavy cream', 'whipping cream', 'double cream'],
-        'whole milk': ['whole milk', 'milk', 'full fat milk'],
-        'dark chocolate': ['dark chocolate', 'chocolate', 'bittersweet chocolate', 'semisweet chocolate'],
-        'vanilla extract': ['vanilla extract', 'vanilla', 'vanilla essence'],
-        'vanilla bean': ['vanilla bean', 'vanilla pod', 'vanilla extract'],
-        'all-purpose flour': ['all-purpose flour', 'flour', 'plain flour'],
-        'cocoa powder': ['cocoa powder', 'unsweetened cocoa', 'cocoa'],
-        'baking soda': ['baking soda', 'sodium bicarbonate', 'bicarbonate of soda'],
-        'baking powder': ['baking powder'],
-        'extra virgin olive oil': ['extra virgin olive oil', 'olive oil', 'evoo'],
-        'fresh mozzarella': ['fresh mozzarella', 'mozzarella', 'mozzarella cheese'],
-        'tomato sauce': ['tomato sauce', 'pizza sauce', 'marinara sauce'],
-        'fresh basil leaves': ['fresh basil leaves', 'basil', 'basil leaves'],
-        'pepperoni slices': ['pepperoni slices', 'pepperoni', 'pepperoni sausage'],
-        'parmesan cheese': ['parmesan cheese', 'parmesan', 'parmigiano reggiano'],
-        'red pepper flakes': ['red pepper flakes', 'crushed red pepper', 'chili flakes']
-    }
-    
-    for ingredient in ingredients:
-        ingredient_name = ingredient.get('ingredient', '').lower().strip()
-        
-        # Check if ingredient is available in shop
-        found = False
-        
-        # First, try exact match
-        for shop_item in shop_inventory:
-            if ingredient_name in shop_item.lower() or shop_item.lower() in ingredient_name:
-                available_ingredients.append(ingredient)
-                found = True
-                break
-        
-        # If not found, try substitutions
-        if not found:
-            for key, substitutions in ingredient_substitutions.items():
-                if ingredient_name in key or key in ingredient_name:
-                    for substitution in substitutions:
-                        for shop_item in shop_inventory:
-                            if substitution in shop_item.lower() or shop_item.lower() in substitution:
-                                available_ingredients.append(ingredient)
-                                found = True
-                                break
-                        if found:
-                            break
-                if found:
-                    break
-        
-        if not found:
-            missing_ingredients.append(ingredient)
-    
-    return available_ingredients, missing_ingredients
+    return _single_shop_inventory_index(tuple(shop_inventory)).match(ingredients, _SINGLE_SHOP)
+
+_SINGLE_SHOP = "shop"
 
-def assign_delivery_agent(shop_location):
+@lru_cache(maxsize=256)
+def _single_shop_inventory_index(shop_inventory):
+    """Inventory index for one inventory, reused while the same inventory keeps coming in"""
+    return InventoryIndex([(_SINGLE_SHOP, shop_inventory)])
+
+def assign_delivery_agent(shop_location, registry=agent_registry, claim=False):
     """
     Assign the nearest available delivery agent to a shop
-    """
-    available_agents = [agent for agent in DELIVERY_AGENTS if agent["status"] == "available"]
     
-    if not available_agents:
-        return None
-    
-    # Find the nearest agent
-    nearest_agent = None
-    min_distance = float('inf')
-    
-    for agent in available_agents:
-        distance = calculate_distance(
-            shop_location["lat"], shop_location["lng"],
-            agent["current_location"]["lat"], agent["current_location"]["lng"]
-        )
-        
-        if distance < min_distance:
-            min_distance = distance
-            nearest_agent = agent
+    By default this only previews who would be assigned. With claim=True the agent is
+    atomically marked busy until release_delivery_agent is called (or its claim expires),
+    so only claim for orders that are actually placed; the result then carries the
+    claim's claim_id for releasing it.
+    """
+    if claim:
+        nearest_agent = registry.claim_nearest(shop_location)
+    else:
+        nearest = registry.nearest_available(shop_location)
+        nearest_agent = nearest[0] if nearest else None
     
     if nearest_agent:
+        agent, min_distance = nearest_agent
         return {
-            "name": nearest_agent["name"],
+            "id": agent["id"],
+            "name": agent["name"],
             "distance_to_shop_km": round(min_distance, 1),
-            "eta_minutes": estimate_delivery_time(min_distance, 0)
+            "eta_minutes": estimate_delivery_time(min_distance, 0, shop_location),
+            **({"claim_id": agent["claim_id"]} if "claim_id" in agent else {})
         }
     
     return None
 
-def estimate_delivery_time(distance_km, ingredient_count):
+def release_delivery_agent(agent_id, location=None, registry=agent_registry, claim_id=None):
+    """
+    Make an agent claimed by assign_delivery_agent available again
+
+    With the claim_id from the assignment, an agent that has since been claimed again
+    (e.g. after its lease expired) is left alone.
+    """
+    return registry.release(agent_id, location, claim_id)
+
+def estimate_delivery_time(distance_km, ingredient_count, location=None, when=None):
     """
     Estimate delivery time based on distance and ingredient count
+    
+    With the pickup location, prep time and travel pace come from the per-zone,
+    hour-of-week ETA tables (see eta_service); without it the fleet defaults are used
     """
+    if location is not None:
+        return eta_engine.estimate(location, distance_km, ingredient_count, when)
+    
     # Base time: 15 minutes for preparation
-    base_time = 15
+    base_time = BASE_PREP_MINUTES
     
     # Travel time: 4 minutes per km (average city speed)
-    travel_time = distance_km * 4
+    travel_time = distance_km * TRAVEL_MINUTES_PER_KM
     
     # Additional time for ingredient count (more ingredients = more time to collect)
-    ingredient_time = (ingredient_count / 5) * 2  # 2 minutes per 5 ingredients
+    ingredient_time = ingredient_minutes(ingredient_count)  # 2 minutes per 5 ingredients
     
     total_time = base_time + travel_time + ingredient_time
     
@@ -187,14 +267,15 @@ def estimate_delivery_time(distance_km, ingredient_count):
 
 def get_google_distance_matrix(origin, destination):
     """
-    Mock Google Distance Matrix API call
-    In a real implementation, this would call the actual Google API
+    Distance Matrix API style response for one origin and destination
+    Served by the distance matrix service: the configured provider with caching, or the
+    local haversine distance when no provider is configured (or it is too slow)
     """
-    # Calculate actual distance
-    distance_km = calculate_distance(
-        origin["lat"], origin["lng"],
-        destination["lat"], destination["lng"]
-    )
+    from distance_matrix_service import distance_matrix_service
+    
+    result = distance_matrix_service.matrix([origin], [destination])
+    distance_km = float(result["distance_km"][0, 0])
+    duration_minutes = float(result["duration_minutes"][0, 0])
     
     # Mock response format similar to Google Distance Matrix API
     return {
@@ -209,8 +290,8 @@ def get_google_distance_matrix(origin, destination):
                             "value": int(distance_km * 1000)  # Convert to meters
                         },
                         "duration": {
-                            "text": f"{int(distance_km * 4)} mins",
-                            "value": int(distance_km * 4 * 60)  # Convert to seconds
+                            "text": f"{int(duration_minutes)} mins",
+                            "value": int(duration_minutes * 60)  # Convert to seconds
                         }
                     }
                 ]
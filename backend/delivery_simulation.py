@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Delivery simulation and load benchmark
+
+Generates a synthetic city (shops with random inventories, agents, dishes and customers)
+and replays a Poisson stream of orders through the delivery path: scale_api_ingredients,
+find_and_rank_shops, agent assignment and estimate_delivery_time. In "functions" mode the
+functions are called directly; in "endpoint" mode every order is a POST /delivery/test
+through the Flask test client with the recipe provider, shop catalog and dispatcher
+pointed at the synthetic city, so no external service is called.
+
+Orders arrive in simulated time and each assigned agent stays busy for the order's
+estimated delivery time, so agent utilization and "no agent" failures follow the arrival
+rate. Latency and throughput are measured in wall-clock time. Runs are reproducible for
+a given seed.
+
+Usage: python delivery_simulation.py [--orders 2000] [--shops 500] [--agents 50]
+       [--rate 0.5] [--mode functions|endpoint] [--output report.json]
+       [--baseline report.json --tolerance 0.2]
+"""
+
+import argparse
+import contextlib
+import heapq
+import io
+import json
+import logging
+import math
+import random
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from agent_registry import AgentRegistry
+from delivery_service import assign_delivery_agent, estimate_delivery_time, find_and_rank_shops
+from ingredient_service import scale_api_ingredients
+from mock_data import MOCK_SHOPS
+from shop_catalog import InMemoryShopCatalog
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CITY_CENTER = {"lat": 37.7749, "lng": -122.4194}
+KM_PER_DEGREE_LAT = 111.32
+UNITS = ['g', 'ml', 'cup', 'tbsp', 'piece']
+
+def _random_point(rng: random.Random, center: Dict, radius_km: float) -> Dict:
+    """Uniform point in a disc around center"""
+    distance_km = radius_km * math.sqrt(rng.random())
+    bearing = rng.uniform(0, 2 * math.pi)
+    lat = center["lat"] + distance_km * math.cos(bearing) / KM_PER_DEGREE_LAT
+    lng = center["lng"] + distance_km * math.sin(bearing) / (KM_PER_DEGREE_LAT * math.cos(math.radians(center["lat"])))
+    return {"lat": lat, "lng": lng}
+
+def generate_city(shop_count: int = 500, agent_count: int = 50, dish_count: int = 40,
+                  radius_km: float = 8.0, inventory_size=(20, 60), ingredients_per_dish=(5, 15),
+                  center: Dict = CITY_CENTER, seed: int = 0) -> Dict:
+    """
+    Build a synthetic city
+
+    Inventories are drawn from the built-in shops' items; dishes mostly use those items
+    plus a few that no shop stocks, so match percentages vary like real orders.
+
+    Returns:
+        Dict: {"shops": name -> shop data, "agents": agent dicts, "dishes": dish -> ingredients,
+        "center", "radius_km"}
+    """
+    rng = random.Random(seed)
+    items = sorted({item for shop in MOCK_SHOPS.values() for item in shop["inventory"]})
+    exotic = [f"specialty item {i}" for i in range(50)]
+
+    shops = {}
+    for i in range(shop_count):
+        size = rng.randint(inventory_size[0], min(inventory_size[1], len(items)))
+        shops[f"Shop {i:05d}"] = {"location": _random_point(rng, center, radius_km), "inventory": rng.sample(items, size)}
+
+    agents = [
+        {"id": f"sim_agent_{i:04d}", "name": f"Agent {i}", "status": "available",
+         "current_location": _random_point(rng, center, radius_km)}
+        for i in range(agent_count)
+    ]
+
+    dishes = {}
+    for i in range(dish_count):
+        count = rng.randint(*ingredients_per_dish)
+        names = rng.sample(items, count - count // 5) + rng.sample(exotic, count // 5)
+        dishes[f"dish {i}"] = [
+            {"ingredient": name, "quantity": rng.choice([0.5, 1, 2, 100, 250]), "unit": rng.choice(UNITS)}
+            for name in names
+        ]
+
+    return {"shops": shops, "agents": agents, "dishes": dishes, "center": center, "radius_km": radius_km}
+
+
+def percentile_ms(latencies: List[float], q: float) -> float:
+    return round(float(np.percentile(latencies, q)) * 1000, 3) if latencies else 0.0
+
+class DeliverySimulation:
+    """
+    Replays synthetic orders against one city
+
+    Args:
+        city (Dict): From generate_city
+        orders_per_minute (float): Mean order arrival rate, in simulated time
+        delivery_radius_km (float): Shop search radius
+        min_match_percent (float): Minimum ingredient match
+        mode (str): 'functions' or 'endpoint'
+        seed (int): Seed for arrivals, dishes, servings and customers
+    """
+
+    def __init__(self, city: Dict, orders_per_minute: float = 0.5,
+                 delivery_radius_km: float = Config.MAX_DELIVERY_DISTANCE_KM,
+                 min_match_percent: float = Config.MIN_INGREDIENT_MATCH_PERCENT,
+                 mode: str = 'functions', seed: int = 0):
+        if mode not in ('functions', 'endpoint'):
+            raise ValueError(f"Unknown simulation mode: {mode}")
+        self.city = city
+        self.orders_per_minute = orders_per_minute
+        self.delivery_radius_km = delivery_radius_km
+        self.min_match_percent = min_match_percent
+        self.mode = mode
+        self.rng = random.Random(seed)
+        self.catalog = InMemoryShopCatalog(city["shops"])
+        self.now = 0.0  # Simulated minutes
+        self.registry = AgentRegistry(city["agents"], claim_ttl_seconds=0, clock=lambda: self.now)
+
+    def _order_functions(self, dish: str, servings: int, user_location: Dict) -> Dict:
+        scaled_ingredients = scale_api_ingredients(self.city["dishes"][dish], 2, servings)
+        ranked_shops = find_and_rank_shops(user_location, scaled_ingredients, self.catalog,
+                                           self.delivery_radius_km, self.min_match_percent)
+        if not ranked_shops:
+            return {"outcome": "no_shop"}
+        top_shop = ranked_shops[0]
+        agent = assign_delivery_agent(top_shop["location"], registry=self.registry, claim=True)
+        if agent is None:
+            return {"outcome": "no_agent"}
+        eta_minutes = estimate_delivery_time(top_shop["distance_km"], len(scaled_ingredients), top_shop["location"])
+        return {"outcome": "delivered", "agent_id": agent["id"], "eta_minutes": eta_minutes}
+
+    def _order_endpoint(self, client, dish: str, servings: int, user_location: Dict) -> Dict:
+        response = client.post('/delivery/test', json={
+            'dish_name': dish, 'servings': servings, 'user_location': user_location
+        })
+        data = response.get_json() or {}
+        if response.status_code == 200 and data.get('success'):
+            return {"outcome": "delivered", "agent_id": data['delivery_agent']['id'],
+                    "eta_minutes": data['estimated_delivery_time_minutes']}
+        if response.status_code == 404:
+            return {"outcome": "no_shop"}
+        if response.status_code == 503:
+            return {"outcome": "no_agent"}
+        return {"outcome": "error"}
+
+    @contextlib.contextmanager
+    def _city_app(self):
+        """The Flask app with its recipe provider, shop catalog and dispatcher pointed at the city"""
+        import app as app_module
+        stubs = {
+            'get_recipe_ingredients_from_spoonacular_improved': lambda dish_name: self.city["dishes"].get(dish_name, []),
+            'get_ingredients_by_dish_name': lambda dish_name: [],
+            'shop_catalog': self.catalog,
+            # Simulated customers are anonymous, but every simulated order ties up its agent
+            'dispatch_delivery_agent': lambda shop_location, claim=False: assign_delivery_agent(
+                shop_location, registry=self.registry, claim=True),
+        }
+        originals = {name: getattr(app_module, name) for name in stubs}
+        for name, stub in stubs.items():
+            setattr(app_module, name, stub)
+        try:
+            # The endpoint prints debug lines for every request
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield app_module.app.test_client()
+        finally:
+            for name, original in originals.items():
+                setattr(app_module, name, original)
+
+    def run(self, order_count: int) -> Dict:
+        """
+        Place order_count orders and report on them
+
+        Returns:
+            Dict: Order outcomes, throughput, latency percentiles, ETAs and agent utilization
+        """
+        dishes = sorted(self.city["dishes"])
+        outcomes = {"delivered": 0, "no_shop": 0, "no_agent": 0, "error": 0}
+        latencies, etas = [], []
+        busy_minutes = 0.0
+        deliveries = []  # Heap of (simulated finish minute, agent id, drop-off location)
+
+        with contextlib.ExitStack() as stack:
+            client = stack.enter_context(self._city_app()) if self.mode == 'endpoint' else None
+            started = time.perf_counter()
+            for _ in range(order_count):
+                self.now += self.rng.expovariate(self.orders_per_minute)
+                while deliveries and deliveries[0][0] <= self.now:
+                    _, agent_id, location = heapq.heappop(deliveries)
+                    self.registry.release(agent_id, location)
+
+                dish = self.rng.choice(dishes)
+                servings = self.rng.randint(1, 6)
+                user_location = _random_point(self.rng, self.city["center"], self.city["radius_km"])
+
+                order_started = time.perf_counter()
+                if client is not None:
+                    result = self._order_endpoint(client, dish, servings, user_location)
+                else:
+                    result = self._order_functions(dish, servings, user_location)
+                latencies.append(time.perf_counter() - order_started)
+
+                outcomes[result["outcome"]] += 1
+                if result["outcome"] == "delivered":
+                    etas.append(result["eta_minutes"])
+                    heapq.heappush(deliveries, (self.now + result["eta_minutes"], result["agent_id"], user_location))
+                    busy_minutes += result["eta_minutes"]
+            elapsed = time.perf_counter() - started
+
+        # Deliveries still running at the end only count up to the last arrival
+        busy_minutes -= sum(finish - self.now for finish, _, _ in deliveries)
+        agent_count = len(self.city["agents"])
+        return {
+            "mode": self.mode,
+            "orders": order_count,
+            "shops": len(self.city["shops"]),
+            "agents": agent_count,
+            "outcomes": outcomes,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_orders_per_second": round(order_count / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": percentile_ms(latencies, 50),
+                "p95": percentile_ms(latencies, 95),
+                "p99": percentile_ms(latencies, 99),
+                "max": percentile_ms(latencies, 100)
+            },
+            "mean_eta_minutes": round(sum(etas) / len(etas), 1) if etas else None,
+            "simulated_minutes": round(self.now, 1),
+            "agent_utilization": round(busy_minutes / (agent_count * self.now), 3) if agent_count and self.now else 0.0
+        }
+
+
+def compare_reports(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Performance regressions of report against a baseline report
+
+    Returns:
+        List[str]: One line per metric worse than the baseline by more than tolerance (a fraction)
+    """
+    regressions = []
+    for percentile in ('p50', 'p95', 'p99'):
+        before, after = baseline["latency_ms"][percentile], report["latency_ms"][percentile]
+        if before and after > before * (1 + tolerance):
+            regressions.append(f"{percentile} latency {before} ms -> {after} ms")
+    before, after = baseline["throughput_orders_per_second"], report["throughput_orders_per_second"]
+    if before and after < before * (1 - tolerance):
+        regressions.append(f"throughput {before} -> {after} orders/s")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate delivery orders against a synthetic city')
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--shops', type=int, default=500)
+    parser.add_argument('--agents', type=int, default=50)
+    parser.add_argument('--dishes', type=int, default=40)
+    parser.add_argument('--radius-km', type=float, default=8.0, help='City radius')
+    parser.add_argument('--rate', type=float, default=0.5, help='Orders per simulated minute')
+    parser.add_argument('--mode', choices=['functions', 'endpoint'], default='functions')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the report as JSON')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression against the baseline')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    city = generate_city(args.shops, args.agents, args.dishes, args.radius_km, seed=args.seed)
+    report = DeliverySimulation(city, args.rate, mode=args.mode, seed=args.seed).run(args.orders)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_reports(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,279 @@
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from geo_kernel import GeoPoints, distance_matrix
+from agent_registry import AgentRegistry, agent_registry
+from delivery_service import assign_delivery_agent, estimate_delivery_time
+from eta_service import EtaEngine, eta_engine
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_MODES = ('greedy', 'batch')
+
+def hungarian_assignment(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Minimum-cost assignment of rows to columns (Hungarian method, shortest augmenting paths)
+
+    Every row is matched when rows <= columns, otherwise every column is. Runs in
+    O(rows^2 * columns) with the inner column scans vectorized.
+
+    Args:
+        cost (np.ndarray): (rows, columns) finite costs
+
+    Returns:
+        List[Tuple[int, int]]: (row, column) pairs sorted by row
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return []
+    if cost.shape[0] > cost.shape[1]:
+        return sorted((row, column) for column, row in hungarian_assignment(cost.T))
+
+    rows, columns = cost.shape
+    # 1-indexed potentials and matching; column 0 is the virtual start of each augmenting path
+    row_potential = np.zeros(rows + 1)
+    column_potential = np.zeros(columns + 1)
+    matched_row = np.zeros(columns + 1, dtype=np.intp)
+    previous_column = np.zeros(columns + 1, dtype=np.intp)
+
+    for row in range(1, rows + 1):
+        matched_row[0] = row
+        column = 0
+        min_slack = np.full(columns + 1, np.inf)
+        visited = np.zeros(columns + 1, dtype=bool)
+        while True:
+            visited[column] = True
+            current_row = matched_row[column]
+            slack = cost[current_row - 1] - row_potential[current_row] - column_potential[1:]
+            improved = ~visited[1:] & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            previous_column[1:][improved] = column
+
+            candidate_slack = np.where(visited[1:], np.inf, min_slack[1:])
+            next_column = int(np.argmin(candidate_slack)) + 1
+            delta = candidate_slack[next_column - 1]
+
+            row_potential[matched_row[visited]] += delta
+            column_potential[visited] -= delta
+            min_slack[~visited] -= delta
+            column = next_column
+            if matched_row[column] == 0:
+                break
+
+        # Flip the augmenting path
+        while column:
+            previous = previous_column[column]
+            matched_row[column] = matched_row[previous]
+            column = previous
+
+    return sorted((int(matched_row[column]) - 1, column - 1) for column in range(1, columns + 1) if matched_row[column])
+
+def greedy_assignment(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Cheapest-pair-first assignment, for batches too large for the Hungarian method
+
+    Returns:
+        List[Tuple[int, int]]: (row, column) pairs sorted by row
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return []
+    rows, columns = cost.shape
+    row_taken = np.zeros(rows, dtype=bool)
+    column_taken = np.zeros(columns, dtype=bool)
+    pairs = []
+    for flat in np.argsort(cost, axis=None, kind='stable').tolist():
+        row, column = divmod(flat, columns)
+        if row_taken[row] or column_taken[column]:
+            continue
+        row_taken[row] = column_taken[column] = True
+        pairs.append((row, column))
+        if len(pairs) == min(rows, columns):
+            break
+    return sorted(pairs)
+
+
+def _agent_response(agent: Dict, distance_km: float, shop_location: Dict) -> Dict:
+    """Same shape as assign_delivery_agent's result"""
+    return {
+        "id": agent["id"],
+        "name": agent["name"],
+        "distance_to_shop_km": round(distance_km, 1),
+        "eta_minutes": estimate_delivery_time(distance_km, 0, shop_location),
+        "claim_id": agent["claim_id"]
+    }
+
+class BatchDispatcher:
+    """
+    Collects orders over a short window and assigns agents to the whole batch at once
+
+    Each batch builds an order x agent ETA matrix over the candidate agents (the union of
+    every order's nearest available agents): distances from the vectorized kernel, priced
+    with each pickup zone's prep time and travel pace for the current hour from the ETA
+    tables, so every entry is what estimate_delivery_time would quote for that pair. The
+    matrix is solved globally, minimizing the fleet's total ETA instead of letting each
+    order grab its nearest agent in arrival order. Agents are then claimed
+    through the registry; an order whose agent was claimed elsewhere in the meantime, or
+    that was left without a candidate, falls back to the greedy nearest-agent claim.
+
+    Args:
+        registry (AgentRegistry): Agents to dispatch
+        window_seconds (float): How long a batch collects orders
+        candidate_agents (int): Nearest available agents considered per order
+        hungarian_max_orders (int): Larger batches use greedy_assignment
+        eta (EtaEngine): ETA tables the costs are priced with
+    """
+
+    def __init__(self, registry: AgentRegistry = agent_registry,
+                 window_seconds: float = Config.DISPATCH_WINDOW_SECONDS,
+                 candidate_agents: int = Config.DISPATCH_CANDIDATE_AGENTS,
+                 hungarian_max_orders: int = Config.DISPATCH_HUNGARIAN_MAX_ORDERS,
+                 eta: EtaEngine = eta_engine):
+        self.registry = registry
+        self.eta = eta
+        self.window_seconds = window_seconds
+        self.candidate_agents = candidate_agents
+        self.hungarian_max_orders = hungarian_max_orders
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[Dict, Future]] = []
+        self._timer: Optional[threading.Timer] = None
+
+    def submit(self, shop_location: Dict) -> Future:
+        """
+        Queue an order for the next batch
+
+        Returns:
+            Future: Resolves to the assigned agent (as from assign_delivery_agent) or None;
+                cancelling it before the batch is dispatched drops the order
+        """
+        future = Future()
+        with self._lock:
+            self._pending.append((shop_location, future))
+            if self._timer is None:
+                self._timer = threading.Timer(self.window_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def flush(self):
+        """Dispatch every queued order now"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        batch = [(shop_location, future) for shop_location, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self.dispatch([shop_location for shop_location, _ in batch])
+        except Exception as e:
+            logger.error(f"Batch dispatch failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def dispatch(self, shop_locations: Sequence[Dict]) -> List[Optional[Dict]]:
+        """
+        Assign agents to a batch of orders
+
+        Args:
+            shop_locations (Sequence[Dict]): Pickup location of each order
+
+        Returns:
+            List[Optional[Dict]]: Assigned agent per order (None when no agent is available)
+        """
+        candidates: Dict[str, Dict] = {}
+        for shop_location in shop_locations:
+            for agent, _ in self.registry.nearest_available(shop_location, self.candidate_agents):
+                candidates.setdefault(agent["id"], agent)
+        agents = list(candidates.values())
+
+        results: List[Optional[Dict]] = [None] * len(shop_locations)
+        assigned = [False] * len(shop_locations)
+        if agents:
+            distances = distance_matrix(
+                GeoPoints.from_locations(shop_locations),
+                GeoPoints.from_locations(agent["current_location"] for agent in agents)
+            )
+            now = datetime.utcnow()
+            prep_minutes, minutes_per_km = np.array(
+                [self.eta.rates(shop_location, now) for shop_location in shop_locations]).reshape(-1, 2).T
+            eta_minutes = prep_minutes[:, None] + distances * minutes_per_km[:, None]
+            if len(shop_locations) <= self.hungarian_max_orders:
+                pairs = hungarian_assignment(eta_minutes)
+            else:
+                pairs = greedy_assignment(eta_minutes)
+
+            for order, column in pairs:
+                agent = self.registry.claim(agents[column]["id"])
+                if agent is not None:
+                    results[order] = _agent_response(agent, float(distances[order, column]), shop_locations[order])
+                    assigned[order] = True
+
+        # Orders left over (more orders than candidates, or lost a claim race) go greedy
+        for order, shop_location in enumerate(shop_locations):
+            if not assigned[order]:
+                results[order] = assign_delivery_agent(shop_location, registry=self.registry, claim=True)
+
+        logger.info(f"Dispatched batch of {len(shop_locations)} orders over {len(agents)} candidate agents")
+        return results
+
+    def close(self):
+        """Dispatch whatever is still queued"""
+        self.flush()
+
+
+def _release_abandoned(registry: AgentRegistry, future: Future):
+    """Free the agent a batch claimed for a caller that stopped waiting"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    agent = future.result()
+    if agent is not None:
+        logger.warning(f"Releasing agent {agent['id']} claimed after its order timed out")
+        registry.release(agent["id"], claim_id=agent.get("claim_id"))
+
+
+# Shared dispatcher over the shared agent registry
+batch_dispatcher = BatchDispatcher()
+
+def dispatch_delivery_agent(shop_location: Dict, mode: Optional[str] = None, claim: bool = False) -> Optional[Dict]:
+    """
+    Assign a delivery agent to an order using the configured dispatch mode
+
+    Without claim this previews the nearest available agent and claims nobody. With
+    claim, greedy claims the nearest agent immediately (assign_delivery_agent); batch waits
+    for the current dispatch window and assigns agents across every order in it. Claimed
+    agents stay busy until release_delivery_agent is called. If the batch result does not
+    arrive in time the order is withdrawn from its batch, or, when the batch is already
+    being dispatched, the agent it gets is released again, and TimeoutError is raised.
+
+    Args:
+        shop_location (Dict): Pickup location
+        mode (Optional[str]): 'greedy' or 'batch', defaults to Config.DISPATCH_MODE
+        claim (bool): Claim the agent for an order being placed
+
+    Returns:
+        Optional[Dict]: Assigned agent, or None when no agent is available
+    """
+    if not claim:
+        return assign_delivery_agent(shop_location)
+    mode = mode or Config.DISPATCH_MODE
+    if mode == 'batch':
+        dispatcher = batch_dispatcher
+        future = dispatcher.submit(shop_location)
+        try:
+            return future.result(timeout=dispatcher.window_seconds + Config.DISPATCH_RESULT_TIMEOUT_SECONDS)
+        except TimeoutError:
+            if not future.cancel():
+                future.add_done_callback(lambda done: _release_abandoned(dispatcher.registry, done))
+            raise
+    if mode != 'greedy':
+        logger.warning(f"Unknown dispatch mode '{mode}', using greedy")
+    return assign_delivery_agent(shop_location, claim=True)
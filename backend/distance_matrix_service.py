@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from cache_service import LRUCache
+from geo_kernel import GeoPoints, distance_matrix
+from provider_client import provider_get
+from delivery_service import TRAVEL_MINUTES_PER_KM
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+Cell = Tuple[int, int]
+
+def _format_points(points: Sequence[Tuple[float, float]]) -> str:
+    return "|".join(f"{lat:.6f},{lng:.6f}" for lat, lng in points)
+
+def _chunks(items: List, size: int) -> List[List]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class DistanceMatrixService:
+    """
+    Road distance and travel time between many origins and destinations
+
+    Elements come from a Distance Matrix provider (Google's request/response format) when
+    DISTANCE_MATRIX_PROVIDER_URL is set. Coordinates are snapped to a grid of grid_degrees
+    and elements are cached per (origin cell, destination cell) with TTL and LRU eviction,
+    so nearby requests share provider elements. Misses are requested in blocks of at most
+    max_elements_per_request on a bounded worker pool under one deadline per call.
+
+    Elements the provider does not return in time (or at all) fall back to the local
+    haversine kernel at TRAVEL_MINUTES_PER_KM; fallback elements are not cached, so the
+    provider is asked again next time. Without a provider every element is local.
+
+    Args:
+        provider_url (str): Distance Matrix endpoint, empty for local distances only
+        api_key (str): Sent as the key parameter
+        grid_degrees (float): Cache grid size in degrees
+        cache_max_entries (int): Cached elements kept
+        cache_ttl_seconds (float): Cached element lifetime
+        max_elements_per_request (int): Origins x destinations per provider request
+        max_workers (int): Worker pool size for provider requests
+        deadline_seconds (float): Time budget for all provider requests of one call
+    """
+
+    def __init__(self, provider_url: str = Config.DISTANCE_MATRIX_PROVIDER_URL,
+                 api_key: str = Config.DISTANCE_MATRIX_API_KEY,
+                 grid_degrees: float = Config.DISTANCE_MATRIX_GRID_DEGREES,
+                 cache_max_entries: int = Config.DISTANCE_MATRIX_CACHE_MAX_ENTRIES,
+                 cache_ttl_seconds: float = Config.DISTANCE_MATRIX_CACHE_TTL_SECONDS,
+                 max_elements_per_request: int = Config.DISTANCE_MATRIX_MAX_ELEMENTS_PER_REQUEST,
+                 max_workers: int = Config.DISTANCE_MATRIX_MAX_WORKERS,
+                 deadline_seconds: float = Config.DISTANCE_MATRIX_DEADLINE_SECONDS):
+        self.provider_url = provider_url
+        self.api_key = api_key
+        self.grid_degrees = grid_degrees
+        self.max_elements_per_request = max_elements_per_request
+        self.deadline_seconds = deadline_seconds
+        self._cache = LRUCache(cache_max_entries, cache_ttl_seconds)  # (origin cell, destination cell) -> (km, minutes)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='distance-matrix')
+        self._stats_lock = threading.Lock()
+        self._counts = {'cached_elements': 0, 'provider_elements': 0, 'fallback_elements': 0,
+                        'provider_requests': 0, 'provider_errors': 0}
+
+    def _count(self, counter: str, amount: int = 1):
+        if amount:
+            with self._stats_lock:
+                self._counts[counter] += amount
+
+    def quantize(self, lat: float, lng: float) -> Cell:
+        """Grid cell of a coordinate"""
+        return round(lat / self.grid_degrees), round(lng / self.grid_degrees)
+
+    def _cell_center(self, cell: Cell) -> Tuple[float, float]:
+        return cell[0] * self.grid_degrees, cell[1] * self.grid_degrees
+
+    def matrix(self, origins: Sequence[Dict], destinations: Sequence[Dict]) -> Dict:
+        """
+        Distances and travel times between every origin and every destination
+
+        Args:
+            origins (Sequence[Dict]): {"lat", "lng"} points
+            destinations (Sequence[Dict]): {"lat", "lng"} points
+
+        Returns:
+            Dict: "distance_km" and "duration_minutes" as (origins, destinations) arrays, and
+            "fallback" marking elements computed locally instead of by the provider
+        """
+        shape = (len(origins), len(destinations))
+        distance_km = np.full(shape, np.nan)
+        duration_minutes = np.full(shape, np.nan)
+        if not shape[0] or not shape[1]:
+            return {"distance_km": distance_km, "duration_minutes": duration_minutes,
+                    "fallback": np.zeros(shape, dtype=bool)}
+
+        if self.provider_url:
+            origin_cells = [self.quantize(point["lat"], point["lng"]) for point in origins]
+            destination_cells = [self.quantize(point["lat"], point["lng"]) for point in destinations]
+            unique_origins = list(dict.fromkeys(origin_cells))
+            unique_destinations = list(dict.fromkeys(destination_cells))
+
+            elements: Dict[Tuple[Cell, Cell], Tuple[float, float]] = {}
+            missing = []
+            for origin_cell in unique_origins:
+                for destination_cell in unique_destinations:
+                    element = self._cache.get((origin_cell, destination_cell))
+                    if element is None:
+                        missing.append((origin_cell, destination_cell))
+                    else:
+                        elements[(origin_cell, destination_cell)] = element
+            self._count('cached_elements', len(elements))
+
+            if missing:
+                elements.update(self._fetch(missing))
+
+            for i, origin_cell in enumerate(origin_cells):
+                for j, destination_cell in enumerate(destination_cells):
+                    element = elements.get((origin_cell, destination_cell))
+                    if element is not None:
+                        distance_km[i, j], duration_minutes[i, j] = element
+
+        fallback = np.isnan(distance_km)
+        fallback_count = int(fallback.sum())
+        if fallback_count:
+            local_km = distance_matrix(GeoPoints.from_locations(origins), GeoPoints.from_locations(destinations))
+            distance_km[fallback] = local_km[fallback]
+            duration_minutes[fallback] = local_km[fallback] * TRAVEL_MINUTES_PER_KM
+            self._count('fallback_elements', fallback_count)
+
+        return {"distance_km": distance_km, "duration_minutes": duration_minutes, "fallback": fallback}
+
+    def _fetch(self, missing: List[Tuple[Cell, Cell]]) -> Dict[Tuple[Cell, Cell], Tuple[float, float]]:
+        """Request missing elements from the provider; whatever arrives by the deadline is returned"""
+        # Request blocks of origins x destinations, each origin with the destinations it misses
+        by_origin: Dict[Cell, List[Cell]] = {}
+        for origin_cell, destination_cell in missing:
+            by_origin.setdefault(origin_cell, []).append(destination_cell)
+        blocks: Dict[Tuple[Cell, ...], List[Cell]] = {}
+        for origin_cell, destination_cells in by_origin.items():
+            blocks.setdefault(tuple(destination_cells), []).append(origin_cell)
+
+        requests_to_send = []
+        for destination_cells, origin_cells in blocks.items():
+            for destination_chunk in _chunks(list(destination_cells), min(25, self.max_elements_per_request)):
+                origins_per_request = max(1, min(25, self.max_elements_per_request // len(destination_chunk)))
+                for origin_chunk in _chunks(origin_cells, origins_per_request):
+                    requests_to_send.append((origin_chunk, destination_chunk))
+
+        started = time.monotonic()
+        futures = [self._executor.submit(self._fetch_block, origin_chunk, destination_chunk)
+                   for origin_chunk, destination_chunk in requests_to_send]
+        done, not_done = wait(futures, timeout=self.deadline_seconds)
+        if not_done:
+            # Stragglers keep running and fill the cache for later calls
+            logger.warning(f"Distance matrix deadline hit, {len(not_done)} of {len(futures)} requests fall back to local distances")
+
+        elements = {}
+        for future in done:
+            if future.exception() is None:
+                elements.update(future.result())
+        logger.info(f"Fetched {len(elements)} of {len(missing)} distance matrix elements in {time.monotonic() - started:.2f}s")
+        return elements
+
+    def _fetch_block(self, origin_cells: List[Cell], destination_cells: List[Cell]) -> Dict:
+        """One provider request; stores and returns the elements it got"""
+        params = {
+            'origins': _format_points([self._cell_center(cell) for cell in origin_cells]),
+            'destinations': _format_points([self._cell_center(cell) for cell in destination_cells]),
+            'units': 'metric',
+        }
+        if self.api_key:
+            params['key'] = self.api_key
+
+        self._count('provider_requests')
+        try:
+            response = provider_get('distance_matrix', self.provider_url, params=params)
+            if response.status_code != 200:
+                logger.warning(f"Distance matrix provider returned status {response.status_code}")
+                self._count('provider_errors')
+                return {}
+            data = response.json()
+            if data.get('status') != 'OK':
+                logger.warning(f"Distance matrix provider status: {data.get('status')}")
+                self._count('provider_errors')
+                return {}
+
+            elements = {}
+            for origin_cell, row in zip(origin_cells, data.get('rows', [])):
+                for destination_cell, element in zip(destination_cells, row.get('elements', [])):
+                    if element.get('status') != 'OK':
+                        continue
+                    value = (element['distance']['value'] / 1000, element['duration']['value'] / 60)
+                    elements[(origin_cell, destination_cell)] = value
+                    self._cache.set((origin_cell, destination_cell), value)
+            self._count('provider_elements', len(elements))
+            return elements
+
+        except Exception as e:
+            logger.error(f"Distance matrix request failed: {e}")
+            self._count('provider_errors')
+            return {}
+
+    def clear(self):
+        """Drop cached elements"""
+        self._cache.clear()
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            counts = dict(self._counts)
+        return {**counts, 'provider_enabled': bool(self.provider_url), 'cache': self._cache.stats()}
+
+
+# Shared service configured from the environment
+distance_matrix_service = DistanceMatrixService()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Local stub of a Distance Matrix provider, for tests and local development
+
+Answers GET /maps/api/distancematrix/json?origins=lat,lng|...&destinations=lat,lng|...
+in Google's response format, using haversine distances scaled by a road factor and a
+fixed speed. It can add latency and counts requests and elements.
+
+Usage: python distance_matrix_stub.py [--port 8765] [--delay 0.0]
+Then set DISTANCE_MATRIX_PROVIDER_URL=http://127.0.0.1:8765/maps/api/distancematrix/json
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from spatial_index import haversine_km
+
+STUB_PATH = '/maps/api/distancematrix/json'
+
+def _parse_points(value):
+    points = []
+    for point in value.split('|'):
+        lat, lng = point.split(',')
+        points.append((float(lat), float(lng)))
+    return points
+
+class DistanceMatrixStub:
+    """
+    Threaded stub server; usable as a context manager that starts it on a free port
+
+    Args:
+        port (int): Port to listen on, 0 picks a free one
+        delay_seconds (float): Latency added to every response
+        road_factor (float): Road distance as a multiple of the great-circle distance
+        speed_kmh (float): Travel speed for durations
+    """
+
+    def __init__(self, port: int = 0, delay_seconds: float = 0.0, road_factor: float = 1.3, speed_kmh: float = 20.0):
+        self.delay_seconds = delay_seconds
+        self.road_factor = road_factor
+        self.speed_kmh = speed_kmh
+        self.requests = 0
+        self.elements = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{STUB_PATH}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path != STUB_PATH:
+                    self.send_error(404)
+                    return
+                query = parse_qs(parsed.query)
+                try:
+                    origins = _parse_points(query['origins'][0])
+                    destinations = _parse_points(query['destinations'][0])
+                except (KeyError, ValueError):
+                    self._send({"status": "INVALID_REQUEST", "rows": []})
+                    return
+
+                if stub.delay_seconds:
+                    time.sleep(stub.delay_seconds)
+                with stub._lock:
+                    stub.requests += 1
+                    stub.elements += len(origins) * len(destinations)
+                self._send({"status": "OK", "rows": [
+                    {"elements": [stub.element(origin, destination) for destination in destinations]}
+                    for origin in origins
+                ]})
+
+            def _send(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def element(self, origin, destination) -> dict:
+        """Response element for one origin and destination"""
+        meters = haversine_km(origin[0], origin[1], destination[0], destination[1]) * self.road_factor * 1000
+        seconds = meters / 1000 / self.speed_kmh * 3600
+        return {
+            "status": "OK",
+            "distance": {"text": f"{meters / 1000:.1f} km", "value": int(round(meters))},
+            "duration": {"text": f"{int(seconds // 60)} mins", "value": int(round(seconds))}
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Distance Matrix provider stub')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds of latency per response')
+    args = parser.parse_args()
+
+    stub = DistanceMatrixStub(args.port, args.delay)
+    print(f"Distance matrix stub listening on {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,349 @@
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import numpy as np
+from models import SessionLocal, DeliveryRecord, EtaZoneStat, EtaBuildState, Order
+from spatial_index import geohash_encode
+from order_items import parse_ingredients
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Defaults, also the fallback for zones and hours without enough history
+BASE_PREP_MINUTES = 15
+TRAVEL_MINUTES_PER_KM = 4  # Average city speed
+
+def ingredient_minutes(ingredient_count: int) -> float:
+    """Time to collect the items: 2 minutes per 5 ingredients"""
+    return (ingredient_count / 5) * 2
+
+HOURS_PER_WEEK = 168
+
+def hour_of_week(when: datetime) -> int:
+    """Hour of the week, 0 = Monday 00:00"""
+    return when.weekday() * 24 + when.hour
+
+def zone_of(location: Dict, precision: int = Config.ETA_GEOHASH_PRECISION) -> str:
+    """ETA zone (geohash cell) of a {"lat", "lng"} location"""
+    return geohash_encode(location["lat"], location["lng"], precision)
+
+def _resolve(total, weight, samples, min_samples: int, fallback):
+    """total / weight where there are at least min_samples observations, fallback elsewhere"""
+    usable = (samples >= min_samples) & (weight > 0)
+    return np.where(usable, total / np.where(usable, weight, 1), fallback)
+
+
+class EtaTables:
+    """
+    Per zone and hour-of-week prep time and travel pace, resolved for O(1) lookups
+
+    Cells with fewer than min_samples orders fall back to the zone's all-week figure,
+    then to the fleet-wide figure for that hour, then fleet-wide overall, then the
+    defaults; the fallbacks are applied once when the tables are built.
+
+    Args:
+        stats (list): EtaZoneStat-like rows
+        min_samples (int): Orders a cell needs before its own figures are used
+    """
+
+    def __init__(self, stats, min_samples: int = Config.ETA_MIN_SAMPLES):
+        zones = sorted({stat.zone for stat in stats})
+        self.zone_rows: Dict[str, int] = {zone: row for row, zone in enumerate(zones)}
+        shape = (len(zones), HOURS_PER_WEEK)
+        order_count = np.zeros(shape)
+        prep_sum = np.zeros(shape)
+        travel_count = np.zeros(shape)
+        travel_km = np.zeros(shape)
+        travel_minutes = np.zeros(shape)
+        for stat in stats:
+            cell = (self.zone_rows[stat.zone], stat.hour_of_week)
+            order_count[cell] = stat.order_count or 0
+            prep_sum[cell] = stat.base_prep_minutes_sum or 0
+            travel_count[cell] = stat.travel_count or 0
+            travel_km[cell] = stat.travel_km_sum or 0
+            travel_minutes[cell] = stat.travel_minutes_sum or 0
+        self.order_count = int(order_count.sum())
+
+        # Fleet-wide, overall then per hour
+        overall_prep = _resolve(prep_sum.sum(), order_count.sum(), order_count.sum(), min_samples, BASE_PREP_MINUTES)
+        overall_pace = _resolve(travel_minutes.sum(), travel_km.sum(), travel_count.sum(), min_samples,
+                                TRAVEL_MINUTES_PER_KM)
+        hour_prep = _resolve(prep_sum.sum(axis=0), order_count.sum(axis=0), order_count.sum(axis=0), min_samples,
+                             overall_prep)
+        hour_pace = _resolve(travel_minutes.sum(axis=0), travel_km.sum(axis=0), travel_count.sum(axis=0), min_samples,
+                             overall_pace)
+
+        # Per zone over the whole week, then per cell
+        zone_orders = order_count.sum(axis=1, keepdims=True)
+        zone_prep = _resolve(prep_sum.sum(axis=1, keepdims=True), zone_orders, zone_orders, min_samples,
+                             hour_prep[None, :])
+        zone_pace = _resolve(travel_minutes.sum(axis=1, keepdims=True), travel_km.sum(axis=1, keepdims=True),
+                             travel_count.sum(axis=1, keepdims=True), min_samples, hour_pace[None, :])
+
+        self.prep_minutes = _resolve(prep_sum, order_count, order_count, min_samples, zone_prep).astype(np.float32)
+        self.minutes_per_km = _resolve(travel_minutes, travel_km, travel_count, min_samples, zone_pace).astype(np.float32)
+        # Zones without any history use the fleet-wide figures for the hour
+        self.default_prep_minutes = hour_prep.astype(np.float32)
+        self.default_minutes_per_km = hour_pace.astype(np.float32)
+
+    def lookup(self, zone: str, hour: int) -> Tuple[float, float]:
+        """(base prep minutes, travel minutes per km) for a zone and hour of week"""
+        row = self.zone_rows.get(zone)
+        if row is None:
+            return float(self.default_prep_minutes[hour]), float(self.default_minutes_per_km[hour])
+        return float(self.prep_minutes[row, hour]), float(self.minutes_per_km[row, hour])
+
+
+class EtaEngine:
+    """
+    Delivery ETAs from the precomputed zone tables
+
+    Tables are loaded from eta_zone_stats on first use and reloaded every
+    reload_seconds, so a running app picks up rebuilt tables. Until any history
+    exists, estimates equal the fixed default formula.
+
+    Args:
+        session_factory: Callable returning a SQLAlchemy session
+        precision (int): Geohash precision of the zones
+        min_samples (int): Orders a cell needs before its own figures are used
+        reload_seconds (float): How often to reload the tables
+    """
+
+    def __init__(self, session_factory=SessionLocal, precision: int = Config.ETA_GEOHASH_PRECISION,
+                 min_samples: int = Config.ETA_MIN_SAMPLES,
+                 reload_seconds: float = Config.ETA_TABLE_RELOAD_SECONDS):
+        self.session_factory = session_factory
+        self.precision = precision
+        self.min_samples = min_samples
+        self.reload_seconds = reload_seconds
+        self._tables: Optional[EtaTables] = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def load(self) -> EtaTables:
+        """Read the zone tables from the database and swap them in"""
+        db = self.session_factory()
+        try:
+            tables = EtaTables(db.query(EtaZoneStat).all(), self.min_samples)
+        except Exception as e:
+            logger.error(f"Error loading ETA tables: {e}")
+            tables = self._tables or EtaTables([], self.min_samples)
+        finally:
+            db.close()
+        self._tables = tables
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded ETA tables: {len(tables.zone_rows)} zones from {tables.order_count} orders")
+        return tables
+
+    def _current_tables(self) -> EtaTables:
+        if self._tables is None or time.monotonic() - self._loaded_at >= self.reload_seconds:
+            with self._lock:
+                if self._tables is None or time.monotonic() - self._loaded_at >= self.reload_seconds:
+                    self.load()
+        return self._tables
+
+    def estimate(self, location: Dict, distance_km: float, ingredient_count: int,
+                 when: Optional[datetime] = None) -> int:
+        """
+        Estimate delivery minutes for an order picked up at location
+
+        Args:
+            location (Dict): Pickup {"lat", "lng"}
+            distance_km (float): Travel distance
+            ingredient_count (int): Items to collect
+            when (datetime): Order time (UTC), defaults to now
+
+        Returns:
+            int: Estimated minutes
+        """
+        prep_minutes, minutes_per_km = self.rates(location, when)
+        return round(prep_minutes + distance_km * minutes_per_km + ingredient_minutes(ingredient_count))
+
+    def rates(self, location: Dict, when: Optional[datetime] = None) -> Tuple[float, float]:
+        """(base prep minutes, travel minutes per km) for orders picked up at location"""
+        hour = hour_of_week(when or datetime.utcnow())
+        return self._current_tables().lookup(zone_of(location, self.precision), hour)
+
+
+def record_delivery(db, shop_location: Dict, ordered_at: datetime, distance_km: float, ingredient_count: int,
+                    prep_minutes: float, travel_minutes: float, order_id: Optional[int] = None,
+                    completed_at: Optional[datetime] = None) -> DeliveryRecord:
+    """
+    Add a completed delivery to the history the ETA tables are built from (caller commits)
+    """
+    record = DeliveryRecord(
+        order_id=order_id,
+        zone=zone_of(shop_location),
+        ordered_at=ordered_at,
+        distance_km=distance_km,
+        ingredient_count=ingredient_count,
+        prep_minutes=prep_minutes,
+        travel_minutes=travel_minutes,
+        completed_at=completed_at or datetime.utcnow()
+    )
+    db.add(record)
+    return record
+
+def record_completed_order(db, order: Order, completed_at: Optional[datetime] = None) -> Optional[DeliveryRecord]:
+    """
+    Add a delivered order to the delivery history (caller commits)
+
+    Only orders that know their pickup shop and route (saved by /delivery/test) can be
+    recorded, once each; others return None. Prep and travel time are split at picked_up_at, or
+    without it in the proportion the current tables predict for the order.
+    """
+    if None in (order.shop_lat, order.shop_lng, order.delivery_distance_km, order.order_timestamp):
+        return None
+    if db.query(DeliveryRecord.id).filter(DeliveryRecord.order_id == order.id).first() is not None:
+        return None
+    completed_at = completed_at or datetime.utcnow()
+    location = {"lat": order.shop_lat, "lng": order.shop_lng}
+    ingredient_count = len(parse_ingredients(order.ingredients))
+    elapsed_minutes = max((completed_at - order.order_timestamp).total_seconds() / 60, 0.0)
+
+    if order.picked_up_at is not None and order.order_timestamp <= order.picked_up_at <= completed_at:
+        prep_minutes = (order.picked_up_at - order.order_timestamp).total_seconds() / 60
+    else:
+        base_prep_minutes, minutes_per_km = eta_engine.rates(location, order.order_timestamp)
+        expected_prep = base_prep_minutes + ingredient_minutes(ingredient_count)
+        expected_total = expected_prep + order.delivery_distance_km * minutes_per_km
+        prep_minutes = elapsed_minutes * expected_prep / expected_total if expected_total > 0 else elapsed_minutes
+
+    return record_delivery(db, location, order.order_timestamp, order.delivery_distance_km, ingredient_count,
+                           prep_minutes, elapsed_minutes - prep_minutes, order.id, completed_at)
+
+def rebuild_eta_tables(session_factory=SessionLocal, full: bool = False,
+                       batch_size: int = Config.ETA_REBUILD_BATCH_SIZE) -> Dict:
+    """
+    Fold new delivery records into eta_zone_stats
+
+    Incremental by default: only records past the stored watermark are read, in id order
+    and batches of batch_size, each batch committed with the watermark so an interrupted
+    run resumes where it stopped. full=True starts over from every record. The watermark
+    only advances from the value the batch was read at, so when two builders race (other
+    threads or processes) the loser rolls its batch back and stops instead of counting
+    records twice.
+
+    Returns:
+        Dict: {"processed": records folded in, "cells": zone/hour cells touched, "last_record_id"}
+    """
+    db = session_factory()
+    processed = 0
+    touched = set()
+    try:
+        state = db.get(EtaBuildState, 1)
+        if state is None:
+            state = EtaBuildState(id=1, last_record_id=0)
+            db.add(state)
+        if full:
+            db.query(EtaZoneStat).delete()
+            state.last_record_id = 0
+        db.commit()
+
+        while True:
+            records = (db.query(DeliveryRecord)
+                       .filter(DeliveryRecord.id > state.last_record_id)
+                       .order_by(DeliveryRecord.id)
+                       .limit(batch_size)
+                       .all())
+            if not records:
+                break
+
+            sums: Dict[Tuple[str, int], list] = {}
+            for record in records:
+                cell = sums.setdefault((record.zone, hour_of_week(record.ordered_at)), [0, 0.0, 0, 0.0, 0.0])
+                cell[0] += 1
+                cell[1] += record.prep_minutes - ingredient_minutes(record.ingredient_count or 0)
+                if record.distance_km >= Config.ETA_MIN_TRAVEL_KM:
+                    cell[2] += 1
+                    cell[3] += record.distance_km
+                    cell[4] += record.travel_minutes
+
+            for (zone, hour), (orders, prep, travel_count, travel_km, travel_minutes) in sums.items():
+                stat = db.get(EtaZoneStat, (zone, hour))
+                if stat is None:
+                    stat = EtaZoneStat(zone=zone, hour_of_week=hour, order_count=0, base_prep_minutes_sum=0,
+                                       travel_count=0, travel_km_sum=0, travel_minutes_sum=0)
+                    db.add(stat)
+                stat.order_count += orders
+                stat.base_prep_minutes_sum += prep
+                stat.travel_count += travel_count
+                stat.travel_km_sum += travel_km
+                stat.travel_minutes_sum += travel_minutes
+
+            advanced = db.query(EtaBuildState).filter(
+                EtaBuildState.id == 1, EtaBuildState.last_record_id == state.last_record_id
+            ).update({EtaBuildState.last_record_id: records[-1].id, EtaBuildState.built_at: datetime.utcnow()},
+                     synchronize_session=False)
+            if not advanced:
+                db.rollback()
+                logger.info("ETA tables: another build moved the watermark, leaving the rest to it")
+                break
+            db.commit()
+            db.refresh(state)
+            processed += len(records)
+            touched.update(sums)
+
+        logger.info(f"ETA tables: folded in {processed} delivery records across {len(touched)} cells")
+        return {"processed": processed, "cells": len(touched), "last_record_id": state.last_record_id}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error rebuilding ETA tables: {e}")
+        raise
+    finally:
+        db.close()
+
+
+# Shared engine over the application database
+eta_engine = EtaEngine()
+
+_refresh_lock = threading.Lock()
+_last_refresh = None
+
+def refresh_eta_tables(engine: Optional[EtaEngine] = None, min_interval_seconds: Optional[float] = None) -> bool:
+    """
+    Fold new delivery records into the tables and reload them into the engine
+
+    Skipped while another thread is refreshing or when the last refresh was less than
+    min_interval_seconds (default Config.ETA_REFRESH_MIN_INTERVAL_SECONDS) ago; records
+    left behind are picked up by the next refresh.
+
+    Returns:
+        bool: Whether a refresh ran
+    """
+    global _last_refresh
+    engine = engine or eta_engine
+    if min_interval_seconds is None:
+        min_interval_seconds = Config.ETA_REFRESH_MIN_INTERVAL_SECONDS
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    try:
+        now = time.monotonic()
+        if _last_refresh is not None and now - _last_refresh < min_interval_seconds:
+            return False
+        _last_refresh = now
+        rebuild_eta_tables(engine.session_factory)
+        engine.load()
+        return True
+    except Exception as e:
+        logger.error(f"Error refreshing ETA tables: {e}")
+        return False
+    finally:
+        _refresh_lock.release()
+
+def schedule_eta_refresh() -> threading.Thread:
+    """Run refresh_eta_tables on a background thread"""
+    thread = threading.Thread(target=refresh_eta_tables, name='eta-refresh', daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fold completed deliveries into the ETA zone tables')
+    parser.add_argument('--full', action='store_true', help='Rebuild from every delivery record')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    print(rebuild_eta_tables(full=args.full))
@@ -0,0 +1,78 @@
+from typing import Iterable, Tuple
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+class GeoPoints:
+    """
+    Coordinates packed for vectorized distance math
+
+    Latitudes/longitudes are converted to radians once and kept, together with cos(lat),
+    in contiguous float64 arrays, so each distance query is a handful of NumPy ufuncs.
+
+    Args:
+        lats (Iterable[float]): Latitudes in degrees
+        lngs (Iterable[float]): Longitudes in degrees
+    """
+
+    def __init__(self, lats: Iterable[float], lngs: Iterable[float]):
+        self.lat_rad = np.ascontiguousarray(np.radians(np.asarray(lats, dtype=np.float64)))
+        self.lng_rad = np.ascontiguousarray(np.radians(np.asarray(lngs, dtype=np.float64)))
+        if self.lat_rad.shape != self.lng_rad.shape:
+            raise ValueError("lats and lngs must have the same length")
+        self.cos_lat = np.cos(self.lat_rad)
+
+    @classmethod
+    def from_locations(cls, locations: Iterable[dict]) -> "GeoPoints":
+        """Build from {"lat", "lng"} dicts"""
+        locations = list(locations)
+        return cls([location["lat"] for location in locations], [location["lng"] for location in locations])
+
+    def __len__(self):
+        return len(self.lat_rad)
+
+    def take(self, positions) -> "GeoPoints":
+        """Subset of the points at the given positions"""
+        subset = GeoPoints.__new__(GeoPoints)
+        subset.lat_rad = self.lat_rad[positions]
+        subset.lng_rad = self.lng_rad[positions]
+        subset.cos_lat = self.cos_lat[positions]
+        return subset
+
+
+def _haversine(lat1_rad, cos_lat1, lng1_rad, lat2_rad, cos_lat2, lng2_rad):
+    a = np.sin((lat2_rad - lat1_rad) / 2) ** 2 + cos_lat1 * cos_lat2 * np.sin((lng2_rad - lng1_rad) / 2) ** 2
+    return EARTH_RADIUS_KM * (2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))
+
+def distances_from(lat: float, lng: float, points: GeoPoints) -> np.ndarray:
+    """
+    Haversine distances from one origin to every point
+
+    Args:
+        lat (float): Origin latitude in degrees
+        lng (float): Origin longitude in degrees
+        points (GeoPoints): Destinations
+
+    Returns:
+        np.ndarray: Distances in kilometers, one per point
+    """
+    lat_rad = np.radians(lat)
+    return _haversine(lat_rad, np.cos(lat_rad), np.radians(lng), points.lat_rad, points.cos_lat, points.lng_rad)
+
+def distance_matrix(origins: GeoPoints, destinations: GeoPoints) -> np.ndarray:
+    """
+    Haversine distances between every origin and every destination
+
+    Returns:
+        np.ndarray: (len(origins), len(destinations)) distances in kilometers
+    """
+    return _haversine(
+        origins.lat_rad[:, None], origins.cos_lat[:, None], origins.lng_rad[:, None],
+        destinations.lat_rad[None, :], destinations.cos_lat[None, :], destinations.lng_rad[None, :]
+    )
+
+def nearest(lat: float, lng: float, points: GeoPoints) -> Tuple[int, float]:
+    """Return (position, distance_km) of the point nearest to the origin; the first wins ties"""
+    distances = distances_from(lat, lng, points)
+    position = int(np.argmin(distances))
+    return position, float(distances[position])
@@ -0,0 +1,268 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from models import SessionLocal, IngredientIdMapping, IngredientNutrientProfile
+from cache_service import LRUCache
+from provider_client import provider_get
+from nutrition_index import NUTRIENT_FIELDS
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Spoonacular nutrient names -> profile fields
+SPOONACULAR_NUTRIENTS = {
+    'Calories': 'calories',
+    'Protein': 'protein',
+    'Carbohydrates': 'carbs',
+    'Fat': 'fat',
+    'Total Fat': 'fat',
+    'Fiber': 'fiber',
+    'Sugar': 'sugar'
+}
+
+PROFILE_GRAMS = 100  # Profiles are fetched and stored per 100g
+
+_MISSING = object()
+
+def _search_ingredient_id(ingredient_name: str):
+    """
+    Search Spoonacular for an ingredient id
+
+    Returns:
+        The id, None if Spoonacular has no match, or _MISSING if the request failed
+    """
+    url = "https://api.spoonacular.com/food/ingredients/search"
+    params = {
+        'query': ingredient_name,
+        'apiKey': Config.SPOONACULAR_API_KEY,
+        'number': 1
+    }
+
+    try:
+        response = provider_get('spoonacular_ingredients', url, params=params)
+        if response.status_code != 200:
+            logger.warning(f"❌ Failed to search for {ingredient_name}")
+            return _MISSING
+
+        results = response.json().get('results') or []
+        if not results:
+            logger.warning(f"❌ No ingredient found for {ingredient_name}")
+            return None
+        return results[0]['id']
+
+    except Exception as e:
+        logger.warning(f"❌ Failed to search for {ingredient_name}: {e}")
+        return _MISSING
+
+def _fetch_nutrient_profile(ingredient_id: int) -> Optional[Dict]:
+    """Fetch the per-100g nutrient profile for a Spoonacular ingredient id, None on failure"""
+    url = f"https://api.spoonacular.com/food/ingredients/{ingredient_id}/information"
+    params = {
+        'amount': PROFILE_GRAMS,
+        'unit': 'g',
+        'apiKey': Config.SPOONACULAR_API_KEY
+    }
+
+    try:
+        response = provider_get('spoonacular_ingredients', url, params=params)
+        if response.status_code != 200:
+            logger.warning(f"❌ Failed to get nutrition for ingredient {ingredient_id}")
+            return None
+
+        profile = {field: 0.0 for field in NUTRIENT_FIELDS}
+        for nutrient in response.json().get('nutrition', {}).get('nutrients', []):
+            field = SPOONACULAR_NUTRIENTS.get(nutrient.get('name'))
+            if field:
+                profile[field] = float(nutrient.get('amount') or 0)
+        return profile
+
+    except Exception as e:
+        logger.warning(f"❌ Failed to get nutrition for ingredient {ingredient_id}: {e}")
+        return None
+
+def _fetch_ingredient(ingredient_name: str, ingredient_id=_MISSING):
+    """Worker task: resolve the id if needed, then fetch its profile"""
+    if ingredient_id is _MISSING:
+        ingredient_id = _search_ingredient_id(ingredient_name)
+    if ingredient_id is _MISSING or ingredient_id is None:
+        return ingredient_id, None
+    return ingredient_id, _fetch_nutrient_profile(ingredient_id)
+
+
+class IngredientNutritionLookup:
+    """
+    Cached, concurrent per-ingredient nutrition lookups against Spoonacular
+
+    Ingredient name -> Spoonacular id mappings are stored permanently (unmatched names are
+    retried after NUTRITION_NO_MATCH_TTL_SECONDS) and nutrient profiles are stored per 100g
+    per id, so any amount is computed locally. Both live in an in-process LRU in front of
+    SQLite. Misses are fetched on a bounded worker pool under one deadline per call.
+
+    Args:
+        session_factory: Callable returning a SQLAlchemy session for the persistent tier
+        max_workers (int): Worker pool size for Spoonacular requests
+        deadline_seconds (float): Time budget for all fetches of one lookup call
+        cache_max_entries (int): In-process LRU size for ids and profiles
+    """
+
+    def __init__(self, session_factory=SessionLocal,
+                 max_workers: int = Config.NUTRITION_LOOKUP_MAX_WORKERS,
+                 deadline_seconds: float = Config.NUTRITION_LOOKUP_DEADLINE_SECONDS,
+                 cache_max_entries: int = Config.NUTRITION_PROFILE_CACHE_MAX_ENTRIES):
+        self.session_factory = session_factory
+        self.deadline_seconds = deadline_seconds
+        self._ids = LRUCache(cache_max_entries)  # name -> id or None
+        self._profiles = LRUCache(cache_max_entries)  # id -> per-100g profile
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nutrition-lookup')
+
+    def get_profiles(self, ingredient_names: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Get per-100g nutrient profiles for ingredient names
+
+        Args:
+            ingredient_names (List[str]): Lowercased ingredient names, duplicates are looked up once
+
+        Returns:
+            Dict[str, Optional[Dict]]: Profile per name, None if unmatched, failed or past the deadline
+        """
+        names = list(dict.fromkeys(name for name in ingredient_names if name))
+
+        ids = {}
+        unknown_names = []
+        for name in names:
+            ingredient_id = self._ids.get(name, _MISSING)
+            if ingredient_id is _MISSING:
+                unknown_names.append(name)
+            else:
+                ids[name] = ingredient_id
+        if unknown_names:
+            ids.update(self._load_ids(unknown_names))
+
+        profiles_by_id = {}
+        unknown_ids = []
+        for ingredient_id in {i for i in ids.values() if i is not None}:
+            profile = self._profiles.get(ingredient_id)
+            if profile is None:
+                unknown_ids.append(ingredient_id)
+            else:
+                profiles_by_id[ingredient_id] = profile
+        if unknown_ids:
+            profiles_by_id.update(self._load_profiles(unknown_ids))
+
+        # Fan out whatever is still missing: name searches and profile fetches for known ids
+        tasks = {}
+        for name in names:
+            if name not in ids:
+                tasks[name] = self._executor.submit(_fetch_ingredient, name)
+            elif ids[name] is not None and ids[name] not in profiles_by_id:
+                tasks[name] = self._executor.submit(_fetch_ingredient, name, ids[name])
+
+        if tasks:
+            started = time.monotonic()
+            done, not_done = wait(tasks.values(), timeout=self.deadline_seconds)
+            for future in not_done:
+                future.cancel()
+            if not_done:
+                logger.warning(f"Nutrition lookup deadline hit, {len(not_done)} of {len(tasks)} ingredients skipped")
+
+            new_ids = {}
+            new_profiles = {}
+            for name, future in tasks.items():
+                if future not in done or future.exception() is not None:
+                    continue
+                ingredient_id, profile = future.result()
+                if ingredient_id is _MISSING:
+                    continue
+                if name not in ids:
+                    new_ids[name] = ingredient_id
+                    ids[name] = ingredient_id
+                if profile is not None:
+                    new_profiles[ingredient_id] = profile
+                    profiles_by_id[ingredient_id] = profile
+
+            self._store(new_ids, new_profiles)
+            logger.info(f"Fetched {len(tasks)} ingredient nutrition lookups in {time.monotonic() - started:.2f}s")
+
+        return {
+            name: profiles_by_id.get(ids.get(name)) if ids.get(name) is not None else None
+            for name in names
+        }
+
+    def clear(self):
+        """Drop the in-process tier (persisted mappings and profiles are kept)"""
+        self._ids.clear()
+        self._profiles.clear()
+
+    def _load_ids(self, names: List[str]) -> Dict:
+        db = self.session_factory()
+        try:
+            no_match_cutoff = datetime.utcnow() - timedelta(seconds=Config.NUTRITION_NO_MATCH_TTL_SECONDS)
+            ids = {}
+            for mapping in db.query(IngredientIdMapping).filter(IngredientIdMapping.ingredient_name.in_(names)):
+                if mapping.spoonacular_id is None and mapping.resolved_at < no_match_cutoff:
+                    continue
+                ids[mapping.ingredient_name] = mapping.spoonacular_id
+                self._cache_id(mapping.ingredient_name, mapping.spoonacular_id)
+            return ids
+
+        except Exception as e:
+            logger.error(f"Error loading ingredient id mappings: {e}")
+            return {}
+        finally:
+            db.close()
+
+    def _load_profiles(self, ingredient_ids: List[int]) -> Dict:
+        db = self.session_factory()
+        try:
+            profiles = {}
+            for row in db.query(IngredientNutrientProfile).filter(IngredientNutrientProfile.spoonacular_id.in_(ingredient_ids)):
+                profile = {field: getattr(row, field) or 0.0 for field in NUTRIENT_FIELDS}
+                profiles[row.spoonacular_id] = profile
+                self._profiles.set(row.spoonacular_id, profile)
+            return profiles
+
+        except Exception as e:
+            logger.error(f"Error loading ingredient nutrient profiles: {e}")
+            return {}
+        finally:
+            db.close()
+
+    def _cache_id(self, name: str, ingredient_id: Optional[int]):
+        ttl = Config.NUTRITION_NO_MATCH_TTL_SECONDS if ingredient_id is None else None
+        self._ids.set(name, ingredient_id, ttl_seconds=ttl)
+
+    def _store(self, new_ids: Dict, new_profiles: Dict):
+        for name, ingredient_id in new_ids.items():
+            self._cache_id(name, ingredient_id)
+        for ingredient_id, profile in new_profiles.items():
+            self._profiles.set(ingredient_id, profile)
+
+        if not new_ids and not new_profiles:
+            return
+
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            for name, ingredient_id in new_ids.items():
+                db.merge(IngredientIdMapping(ingredient_name=name, spoonacular_id=ingredient_id, resolved_at=now))
+            for ingredient_id, profile in new_profiles.items():
+                db.merge(IngredientNutrientProfile(spoonacular_id=ingredient_id, fetched_at=now, **profile))
+            db.commit()
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error storing ingredient nutrition lookups: {e}")
+        finally:
+            db.close()
+
+
+def scale_profile(profile: Dict, grams: float) -> Dict:
+    """Scale a per-100g profile to an amount in grams"""
+    factor = grams / PROFILE_GRAMS
+    return {field: profile.get(field, 0) * factor for field in NUTRIENT_FIELDS}
+
+
+# Shared lookup engine used by nutrition_service
+ingredient_nutrition_lookup = IngredientNutritionLookup()
@@ -1,8 +1,11 @@
 import re
-import requests
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from typing import List, Dict, Optional, Tuple
 from config import Config
+from cache_service import recipe_cache
+from provider_client import provider_get
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -377,6 +380,24 @@ def clean_ingredient_name(ingredient_name):
 
 def get_recipe_ingredients_from_spoonacular_improved(dish_name):
     """Get ingredients from Spoonacular API (simplified version)"""
+    cache_key = clean_dish_name(dish_name)
+    if cache_key:
+        cached_ingredients = recipe_cache.get(cache_key, scope='spoonacular')
+        if cached_ingredients is not None:
+            logger.info(f"⚡ Spoonacular cache hit for: {dish_name} ({len(cached_ingredients)} ingredients)")
+            return cached_ingredients
+    
+    ingredients = _fetch_spoonacular_ingredients(dish_name)
+    
+    # Only definitive answers are cached; None means the request itself failed
+    if ingredients is None:
+        return []
+    if cache_key:
+        recipe_cache.set(cache_key, ingredients, source='spoonacular', scope='spoonacular')
+    return ingredients
+
+def _fetch_spoonacular_ingredients(dish_name):
+    """Fetch ingredients from Spoonacular, returning None if the request failed"""
     try:
         logger.info(f"🔍 Searching Spoonacular for: {dish_name}")
         
@@ -389,7 +410,7 @@ def get_recipe_ingredients_from_spoonacular_improved(dish_name):
             'apiKey': Config.SPOONACULAR_API_KEY
         }
         
-        response = requests.get(url, params=search_params, timeout=15)
+        response = provider_get('spoonacular', url, params=search_params)
         
         if response.status_code == 200:
             data = response.json()
@@ -413,22 +434,30 @@ def get_recipe_ingredients_from_spoonacular_improved(dish_name):
                 logger.info(f"✅ Found {len(ingredients)} ingredients from Spoonacular")
                 return ingredients
         
+        if response.status_code != 200:
+            logger.warning(f"❌ Spoonacular returned HTTP {response.status_code} for: {dish_name}")
+            return None
+        
         logger.warning(f"❌ No ingredients found in Spoonacular for: {dish_name}")
         return []
         
     except Exception as e:
         logger.error(f"Error fetching ingredients from Spoonacular: {e}")
-        return []
+        return None
 
 def get_ingredients_from_themealdb(dish_name):
     """Get ingredients from TheMealDB API"""
+    return _fetch_themealdb_ingredients(dish_name) or []
+
+def _fetch_themealdb_ingredients(dish_name):
+    """Fetch ingredients from TheMealDB, returning None if the request failed"""
     try:
         logger.info(f"🔍 Searching TheMealDB for: {dish_name}")
         
         search_url = "https://www.themealdb.com/api/json/v1/1/search.php"
         search_params = {'s': dish_name}
         
-        response = requests.get(search_url, params=search_params, timeout=15)
+        response = provider_get('themealdb', search_url, params=search_params)
         
         if response.status_code == 200:
             data = response.json()
@@ -442,7 +471,7 @@ def get_ingredients_from_themealdb(dish_name):
                 detail_url = f"https://www.themealdb.com/api/json/v1/1/lookup.php"
                 detail_params = {'i': meal_id}
                 
-                detail_response = requests.get(detail_url, params=detail_params, timeout=15)
+                detail_response = provider_get('themealdb', detail_url, params=detail_params)
                 
                 if detail_response.status_code == 200:
                     detail_data = detail_response.json()
@@ -568,12 +597,16 @@ def get_ingredients_from_themealdb(dish_name):
                         logger.info(f"✅ Found {len(ingredients)} ingredients from TheMealDB")
                 return ingredients
         
+        if response.status_code != 200:
+            logger.warning(f"❌ TheMealDB returned HTTP {response.status_code} for: {dish_name}")
+            return None
+        
         logger.warning(f"❌ No ingredients found in TheMealDB for: {dish_name}")
         return []
         
     except Exception as e:
         logger.error(f"Error fetching ingredients from TheMealDB: {e}")
-        return []
+        return None
 
 def get_ingredients_by_dish_name(dish_name):
     """Get ingredients based on dish name"""
@@ -637,32 +670,143 @@ def get_ingredients_by_dish_name(dish_name):
         logger.info(f"✅ PASTA_RECIPES mock data: Found {len(ingredients)} ingredients for {dish_name}")
         return ingredients
     
-    # STEP 5: Try TheMealDB API
-    try:
-        themaldb_ingredients = get_ingredients_from_themealdb(dish_name)
-        if themaldb_ingredients and len(themaldb_ingredients) > 0:
-            # Deduplicate ingredients before returning
-            unique_ingredients = deduplicate_ingredients(themaldb_ingredients)
-            logger.info(f"✅ TheMealDB SUCCESS: Found {len(unique_ingredients)} unique ingredients for {dish_name}")
-            return unique_ingredients
-    except Exception as e:
-        logger.error(f"❌ TheMealDB failed: {e}")
+    # STEP 5: Check the recipe cache before going to the live providers
+    cache_key = clean_dish_name(dish_name)
+    if cache_key:
+        cached_ingredients = recipe_cache.get(cache_key)
+        if cached_ingredients is not None:
+            logger.info(f"⚡ Recipe cache hit for: {dish_name} ({len(cached_ingredients)} ingredients)")
+            return cached_ingredients
+    
+    # STEP 6: Ask the live providers (TheMealDB, Spoonacular)
+    if Config.RECIPE_RESOLVER_MODE == 'concurrent':
+        ingredients, source, complete = _resolve_from_providers_concurrently(dish_name)
+    else:
+        ingredients, source, complete = _resolve_from_providers_sequentially(dish_name)
     
-    # STEP 6: Try Spoonacular API
-    try:
-        spoonacular_ingredients = get_recipe_ingredients_from_spoonacular_improved(dish_name)
-        if spoonacular_ingredients and len(spoonacular_ingredients) > 0:
-            # Deduplicate ingredients before returning
-            unique_ingredients = deduplicate_ingredients(spoonacular_ingredients)
-            logger.info(f"✅ Spoonacular SUCCESS: Found {len(unique_ingredients)} unique ingredients for {dish_name}")
-            return unique_ingredients
-    except Exception as e:
-        logger.error(f"❌ Spoonacular failed: {e}")
+    if ingredients:
+        logger.info(f"✅ {source} SUCCESS: Found {len(ingredients)} unique ingredients for {dish_name}")
+        if cache_key:
+            recipe_cache.set(cache_key, ingredients, source=source)
+        return ingredients
     
-    # STEP 7: Return empty list if no ingredients found
+    # STEP 7: Return empty list if no ingredients found, caching the miss only when
+    # every provider actually answered (a timeout is not a "not found")
+    if cache_key and complete:
+        recipe_cache.set(cache_key, [], source='none')
     logger.warning(f"❌ No ingredients found for: {dish_name}")
     return []
 
+# Live recipe providers, tried in Config.RECIPE_PROVIDER_PRIORITY order
+RECIPE_PROVIDERS = {
+    'themealdb': lambda dish_name: _fetch_themealdb_ingredients(dish_name),
+    'spoonacular': lambda dish_name: _fetch_spoonacular_ingredients(dish_name),
+}
+
+_provider_executor = ThreadPoolExecutor(
+    max_workers=Config.RECIPE_RESOLVER_MAX_WORKERS,
+    thread_name_prefix='recipe-provider'
+)
+
+def _is_good_provider_result(ingredients):
+    """Quality policy: a provider answer is usable once it has enough ingredients"""
+    return bool(ingredients) and len(ingredients) >= Config.RECIPE_MIN_INGREDIENT_COUNT
+
+def _call_recipe_provider(name, dish_name):
+    """Call a provider, returning deduplicated ingredients or None if it failed"""
+    try:
+        ingredients = RECIPE_PROVIDERS[name](dish_name)
+    except Exception as e:
+        logger.error(f"❌ {name} failed: {e}")
+        return None
+    
+    if ingredients is None:
+        return None
+    return deduplicate_ingredients(ingredients)
+
+def _resolve_from_providers_sequentially(dish_name):
+    """
+    Try each provider in priority order until one gives a good answer
+    
+    Returns:
+        Tuple[List[Dict], Optional[str], bool]: ingredients, winning provider, and whether
+        every provider that was asked answered (False if any of them failed)
+    """
+    complete = True
+    
+    for name in Config.RECIPE_PROVIDER_PRIORITY:
+        ingredients = _call_recipe_provider(name, dish_name)
+        if ingredients is None:
+            complete = False
+        elif _is_good_provider_result(ingredients):
+            return ingredients, name, True
+    
+    return [], None, complete
+
+def _choose_provider_result(results, deadline_passed):
+    """
+    Pick the winning provider from the answers received so far
+    
+    With the 'first' policy any good answer wins. With the 'priority' policy a good
+    answer only wins once every higher-priority provider has answered badly, unless
+    the deadline has passed, in which case the best answer received so far wins.
+    """
+    for name in Config.RECIPE_PROVIDER_PRIORITY:
+        if name not in results:
+            if Config.RECIPE_RESOLVER_POLICY == 'priority' and not deadline_passed:
+                return None
+            continue
+        if _is_good_provider_result(results[name]):
+            return name
+    return None
+
+def _resolve_from_providers_concurrently(dish_name):
+    """
+    Fire every provider at once and return the first good answer under a single deadline
+    
+    Providers still running when a winner is chosen (or the deadline passes) are
+    ignored; their threads finish in the background and the results are dropped.
+    
+    Returns:
+        Tuple[List[Dict], Optional[str], bool]: ingredients, winning provider, and whether
+        every provider answered before the deadline without failing
+    """
+    deadline = time.monotonic() + Config.RECIPE_RESOLVER_DEADLINE_SECONDS
+    futures = {
+        _provider_executor.submit(_call_recipe_provider, name, dish_name): name
+        for name in Config.RECIPE_PROVIDER_PRIORITY
+    }
+    pending = set(futures)
+    results = {}
+    
+    winner = None
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[futures[future]] = future.result()
+        
+        winner = _choose_provider_result(results, deadline_passed=False)
+        if winner:
+            break
+    
+    if not winner:
+        winner = _choose_provider_result(results, deadline_passed=True)
+    
+    for future in pending:
+        future.cancel()
+    if pending:
+        logger.info(f"⏱️ Ignoring {len(pending)} slower recipe provider(s) for: {dish_name}")
+    
+    if winner:
+        return results[winner], winner, True
+    
+    complete = not pending and all(result is not None for result in results.values())
+    return [], None, complete
+
 def deduplicate_ingredients(ingredients):
     """Remove duplicate ingredients from a list"""
     seen_ingredients = set()
@@ -0,0 +1,149 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from aho_corasick import AhoCorasick
+
+# Ingredient substitutions for better matching: an ingredient matching a key is also
+# available when any of the key's substitutions is in stock
+INGREDIENT_SUBSTITUTIONS = {
+    'heavy cream': ['heavy cream', 'whipping cream', 'double cream'],
+    'whole milk': ['whole milk', 'milk', 'full fat milk'],
+    'dark chocolate': ['dark chocolate', 'chocolate', 'bittersweet chocolate', 'semisweet chocolate'],
+    'vanilla extract': ['vanilla extract', 'vanilla', 'vanilla essence'],
+    'vanilla bean': ['vanilla bean', 'vanilla pod', 'vanilla extract'],
+    'all-purpose flour': ['all-purpose flour', 'flour', 'plain flour'],
+    'cocoa powder': ['cocoa powder', 'unsweetened cocoa', 'cocoa'],
+    'baking soda': ['baking soda', 'sodium bicarbonate', 'bicarbonate of soda'],
+    'baking powder': ['baking powder'],
+    'extra virgin olive oil': ['extra virgin olive oil', 'olive oil', 'evoo'],
+    'fresh mozzarella': ['fresh mozzarella', 'mozzarella', 'mozzarella cheese'],
+    'tomato sauce': ['tomato sauce', 'pizza sauce', 'marinara sauce'],
+    'fresh basil leaves': ['fresh basil leaves', 'basil', 'basil leaves'],
+    'pepperoni slices': ['pepperoni slices', 'pepperoni', 'pepperoni sausage'],
+    'parmesan cheese': ['parmesan cheese', 'parmesan', 'parmigiano reggiano'],
+    'red pepper flakes': ['red pepper flakes', 'crushed red pepper', 'chili flakes']
+}
+
+@lru_cache(maxsize=8192)
+def expand_substitutions(ingredient_name: str) -> Tuple[str, ...]:
+    """
+    Every term that makes an ingredient available: its own name, then the substitutions
+    of each INGREDIENT_SUBSTITUTIONS key it contains or is contained in
+    """
+    terms = [ingredient_name]
+    for key, substitutions in INGREDIENT_SUBSTITUTIONS.items():
+        if ingredient_name in key or key in ingredient_name:
+            terms.extend(substitutions)
+    return tuple(dict.fromkeys(terms))
+
+
+class InventoryIndex:
+    """
+    Inverted index from ingredient terms to the shops stocking them
+
+    A term is in stock at a shop when it is contained in one of the shop's inventory items
+    or contains one (case-insensitive). Shops are bit positions in Python int bitsets:
+
+    - a map from every substring of every distinct inventory item to the shops whose
+      inventory has an item containing it
+    - an Aho-Corasick automaton over the distinct items for items contained in a term
+
+    Availability of an ingredient across the whole catalog is then a few bitset ORs over
+    its substitution closure, memoized per ingredient name.
+
+    Args:
+        inventories (Iterable[Tuple[str, List[str]]]): (shop name, inventory items) pairs
+    """
+
+    def __init__(self, inventories: Iterable[Tuple[str, List[str]]]):
+        self.shop_names: List[str] = []
+        self.shop_bits: Dict[str, int] = {}
+        self.shop_positions: Dict[str, int] = {}  # Shop name -> bit position
+        item_shops: Dict[str, int] = {}  # lowercased item -> bitset of shops
+        self._always_in_stock = 0  # shops with an empty item, which every term contains
+
+        for shop_name, inventory in inventories:
+            bit = 1 << len(self.shop_names)
+            self.shop_bits[shop_name] = bit
+            self.shop_positions[shop_name] = len(self.shop_names)
+            self.shop_names.append(shop_name)
+            for item in inventory:
+                item = item.lower()
+                if item:
+                    item_shops[item] = item_shops.get(item, 0) | bit
+                else:
+                    self._always_in_stock |= bit
+
+        self._items = tuple(item_shops)
+        self._item_bits = tuple(item_shops[item] for item in self._items)
+        self._automaton = AhoCorasick(self._items) if self._items else None
+
+        containing: Dict[str, int] = {}
+        for item, bits in item_shops.items():
+            for start in range(len(item)):
+                for end in range(start + 1, len(item) + 1):
+                    substring = item[start:end]
+                    containing[substring] = containing.get(substring, 0) | bits
+        # The empty name is contained in every item
+        containing[''] = 0
+        for bits in item_shops.values():
+            containing[''] |= bits
+        self._containing = containing
+
+        self.shops_with_term = lru_cache(maxsize=16384)(self._shops_with_term)
+        self.availability = lru_cache(maxsize=8192)(self._availability)
+
+    def _shops_with_term(self, term: str) -> int:
+        """Bitset of shops stocking an item that contains term or is contained in it"""
+        bits = self._containing.get(term, 0) | self._always_in_stock
+        if self._automaton is not None:
+            for item_index in self._automaton.find_all(term):
+                bits |= self._item_bits[item_index]
+        return bits
+
+    def _availability(self, ingredient_name: str) -> int:
+        """Bitset of shops where an ingredient (or one of its substitutions) is in stock"""
+        bits = 0
+        for term in expand_substitutions(ingredient_name):
+            bits |= self.shops_with_term(term)
+        return bits
+
+    def availability_counts(self, ingredient_names: Iterable[str]) -> np.ndarray:
+        """
+        Number of the given ingredients in stock at every shop
+
+        Args:
+            ingredient_names (Iterable[str]): Normalized (lowercased, stripped) ingredient names
+
+        Returns:
+            np.ndarray: Counts indexed by shop position (see shop_positions)
+        """
+        shop_count = len(self.shop_names)
+        byte_count = (shop_count + 7) // 8
+        counts = np.zeros(byte_count * 8, dtype=np.int64)
+        for ingredient_name in ingredient_names:
+            bits = self.availability(ingredient_name)
+            if bits:
+                counts += np.unpackbits(np.frombuffer(bits.to_bytes(byte_count, 'little'), dtype=np.uint8), bitorder='little')
+        return counts[:shop_count]
+
+    def match(self, ingredients: List[Dict], shop_name: str) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Split ingredients into available and missing at one shop
+
+        Args:
+            ingredients (List[Dict]): Ingredients with an 'ingredient' name
+            shop_name (str): Shop in this index
+
+        Returns:
+            Tuple[List[Dict], List[Dict]]: (available, missing), each in ingredient order
+        """
+        bit = self.shop_bits[shop_name]
+        available_ingredients = []
+        missing_ingredients = []
+        for ingredient in ingredients:
+            if self.availability(ingredient.get('ingredient', '').lower().strip()) & bit:
+                available_ingredients.append(ingredient)
+            else:
+                missing_ingredients.append(ingredient)
+        return available_ingredients, missing_ingredients
@@ -1,21 +1,87 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON
+import logging
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, inspect, text, Index, Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON, Float
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 from config import Config
 
+logger = logging.getLogger(__name__)
+
 # Database setup
-engine = create_engine(
-    Config.DATABASE_URL,
-    pool_size=10,
-    max_overflow=20,
-    pool_timeout=30,
-    pool_recycle=3600,
-    pool_pre_ping=True
-)
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """SQLite production profile, applied to every new connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(Config.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA journal_mode = {Config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {Config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size = {-int(Config.SQLITE_CACHE_SIZE_KB)}")  # Negative means KiB
+        cursor.execute(f"PRAGMA mmap_size = {int(Config.SQLITE_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
+def create_database_engine(url: str = Config.DATABASE_URL, sqlite_profile: bool = Config.SQLITE_PROFILE_ENABLED):
+    """
+    Engine for url; SQLite databases get the WAL/pragma profile unless sqlite_profile is False
+    """
+    database_engine = create_engine(
+        url,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=3600,
+        pool_pre_ping=True
+    )
+    if sqlite_profile and database_engine.dialect.name == 'sqlite':
+        event.listen(database_engine, 'connect', _apply_sqlite_pragmas)
+    return database_engine
+
+engine = create_database_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+class PoolMetrics:
+    """Connection checkout/return counters for an engine's pool, fed by pool events"""
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._lock = threading.Lock()
+        self._counts = {'connects': 0, 'checkouts': 0, 'checkins': 0, 'checked_out': 0, 'peak_checked_out': 0}
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._counts['connects'] += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self._counts['checkouts'] += 1
+            self._counts['checked_out'] += 1
+            self._counts['peak_checked_out'] = max(self._counts['peak_checked_out'], self._counts['checked_out'])
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._counts['checkins'] += 1
+            self._counts['checked_out'] -= 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        pool = self._engine.pool
+        return {
+            **counts,
+            'pool_size': Config.DB_POOL_SIZE,
+            'max_overflow': Config.DB_MAX_OVERFLOW,
+            'idle': pool.checkedin() if hasattr(pool, 'checkedin') else None
+        }
+
+pool_metrics = PoolMetrics(engine)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -37,6 +103,10 @@ class User(Base):
 
 class RecentSearch(Base):
     __tablename__ = "recent_searches"
+    __table_args__ = (
+        Index("ix_recent_searches_user_time", "user_id", "search_timestamp"),  # Latest searches per user
+        Index("ix_recent_searches_user_dish", "user_id", "dish_name"),  # Existing search lookup
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -49,6 +119,9 @@ class RecentSearch(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_user_time", "user_id", "order_timestamp"),  # Order history per user
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -57,13 +130,43 @@ class Order(Base):
     servings = Column(Integer, default=2)
     order_timestamp = Column(DateTime, default=datetime.utcnow)
     status = Column(String, default="pending")  # pending, completed, cancelled
+    agent_id = Column(String)  # Delivery agent claimed for the order, released when it closes
+    agent_claim_id = Column(String)  # That claim, so only this order's claim is released
+    shop_lat = Column(Float)  # Pickup shop, for the ETA history
+    shop_lng = Column(Float)
+    delivery_distance_km = Column(Float)  # Pickup route to the customer
+    picked_up_at = Column(DateTime)  # When the order went on its way
     
     # Relationship
     user = relationship("User", back_populates="orders")
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+    __table_args__ = (
+        Index("ix_order_items_user_ingredient", "user_id", "ingredient_name"),  # Ingredient totals per user
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    position = Column(Integer, nullable=False)  # Index within the order's ingredient list
+    ingredient_name = Column(String, nullable=False, index=True)  # Canonical: lowercased, single spaces
+    ingredient_id = Column(Integer, index=True)  # Spoonacular id when the name has been resolved
+    quantity = Column(Float)
+    unit = Column(String)
+    shop_name = Column(String)  # Shop the order was routed to, when known
+    
+    # Relationship
+    order = relationship("Order", back_populates="items")
 
 
 class SavedAddress(Base):
     __tablename__ = "saved_addresses"
+    __table_args__ = (
+        Index("ix_saved_addresses_user_created", "user_id", "created_at"),  # Addresses per user, newest first
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -98,6 +201,9 @@ class UserPreference(Base):
 
 class UserAllergy(Base):
     __tablename__ = "user_allergies"
+    __table_args__ = (
+        Index("ix_user_allergies_user_name", "user_id", "allergy_name"),  # Allergies per user, duplicate checks
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -108,12 +214,194 @@ class UserAllergy(Base):
     # Relationship
     user = relationship("User", back_populates="allergies")
 
-# Create tables
+
+class AllergyProfileVersion(Base):
+    __tablename__ = "allergy_profile_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)  # Bumped with every change to the user's allergies
+
+
+class RecipeCacheEntry(Base):
+    __tablename__ = "recipe_cache"
+
+    cache_key = Column(String, primary_key=True)  # scope:clean_dish_name
+    ingredients = Column(JSON, nullable=False)  # Empty list caches a "no ingredients found" result
+    source = Column(String)  # themealdb, spoonacular, none
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class IngredientIdMapping(Base):
+    __tablename__ = "ingredient_id_mappings"
+
+    ingredient_name = Column(String, primary_key=True)  # Lowercased ingredient name as searched
+    spoonacular_id = Column(Integer, index=True)  # NULL caches a "no match" result
+    resolved_at = Column(DateTime, default=datetime.utcnow)
+
+
+class IngredientNutrientProfile(Base):
+    __tablename__ = "ingredient_nutrient_profiles"
+
+    spoonacular_id = Column(Integer, primary_key=True)
+    # Nutrients per 100g, scaled locally for any amount
+    calories = Column(Float, default=0)
+    protein = Column(Float, default=0)
+    carbs = Column(Float, default=0)
+    fat = Column(Float, default=0)
+    fiber = Column(Float, default=0)
+    sugar = Column(Float, default=0)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DeliveryRecord(Base):
+    __tablename__ = "delivery_records"
+    __table_args__ = (
+        # One record per saved order
+        Index("ux_delivery_records_order", "order_id", unique=True,
+              sqlite_where=text("order_id IS NOT NULL"), postgresql_where=text("order_id IS NOT NULL")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"))  # NULL for deliveries without a saved order
+    zone = Column(String, nullable=False)  # Geohash of the pickup shop
+    ordered_at = Column(DateTime, nullable=False)
+    distance_km = Column(Float, nullable=False)  # Shop to customer
+    ingredient_count = Column(Integer, default=0)
+    prep_minutes = Column(Float, nullable=False)  # Order placed until picked up
+    travel_minutes = Column(Float, nullable=False)  # Picked up until delivered
+    completed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class EtaZoneStat(Base):
+    __tablename__ = "eta_zone_stats"
+
+    # Running sums per zone and hour of week (0 = Monday 00:00 UTC), folded in by the ETA table job
+    zone = Column(String, primary_key=True)
+    hour_of_week = Column(Integer, primary_key=True)
+    order_count = Column(Integer, default=0)
+    base_prep_minutes_sum = Column(Float, default=0)  # Prep minus the per-ingredient allowance
+    travel_count = Column(Integer, default=0)
+    travel_km_sum = Column(Float, default=0)
+    travel_minutes_sum = Column(Float, default=0)
+
+
+class EtaBuildState(Base):
+    __tablename__ = "eta_build_state"
+
+    id = Column(Integer, primary_key=True)
+    last_record_id = Column(Integer, default=0)  # Highest delivery_records.id folded into eta_zone_stats
+    built_at = Column(DateTime)
+
+class Shop(Base):
+    __tablename__ = "shops"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True, nullable=False)
+    lat = Column(Float, nullable=False)
+    lng = Column(Float, nullable=False)
+    is_active = Column(Boolean, default=True)  # Inactive shops drop out of the catalog
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Bumped on any shop or inventory change
+
+    # Relationship
+    inventory_items = relationship("ShopInventoryItem", back_populates="shop", cascade="all, delete-orphan")
+
+
+class ShopInventoryItem(Base):
+    __tablename__ = "shop_inventory_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    shop_id = Column(Integer, ForeignKey("shops.id"), nullable=False, index=True)
+    item_name = Column(String, nullable=False)
+
+    # Relationship
+    shop = relationship("Shop", back_populates="inventory_items")
+
+
+class Agent(Base):
+    __tablename__ = "agents"
+
+    id = Column(String, primary_key=True)  # e.g. agent_001
+    name = Column(String, nullable=False)
+    status = Column(String, default="available")  # available, busy, offline
+    lat = Column(Float, nullable=False)
+    lng = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+def ensure_columns(bind=engine):
+    """
+    Add nullable columns declared on the models that existing tables lack
+
+    create_all never alters existing tables, so columns added to a model after its table
+    was created are added here. Only nullable columns without a server default are
+    handled; anything else needs a real migration. Safe to run on every start.
+
+    Returns:
+        list: "table.column" names of the columns added
+    """
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable or column.primary_key or column.server_default is not None:
+                logger.error(f"Cannot add column {table.name}.{column.name} automatically")
+                continue
+            column_type = column.type.compile(dialect=bind.dialect)
+            with bind.begin() as connection:
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            added.append(f"{table.name}.{column.name}")
+    if added:
+        logger.info(f"Added missing columns: {', '.join(added)}")
+    return added
+
+def ensure_indexes(bind=engine):
+    """
+    Create indexes declared on the models that the database lacks
+
+    create_all only creates indexes together with new tables, so databases created before
+    an index was declared get it here. Safe to run on every start.
+
+    Returns:
+        list: Names of the indexes created
+    """
+    inspector = inspect(bind)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                index.create(bind=bind)
+                created.append(index.name)
+    if created:
+        logger.info(f"Created missing indexes: {', '.join(created)}")
+    return created
+
+# Create tables, then columns and indexes missing from databases created before they were declared
 Base.metadata.create_all(bind=engine)
+ensure_columns()
+ensure_indexes()
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+@contextmanager
+def session_scope():
+    """Session that is rolled back on error and always closed, for work outside a request"""
+    db = SessionLocal()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
\ No newline at end of file
@@ -0,0 +1,264 @@
+import logging
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Optional
+import numpy as np
+from aho_corasick import AhoCorasick
+
+logger = logging.getLogger(__name__)
+
+# Nutrition database for common ingredients (per 100g or standard serving)
+NUTRITION_DB = {
+    'rice': {'calories': 130, 'protein': 2.7, 'carbs': 28, 'fat': 0.3, 'fiber': 0.4, 'sugar': 0.1},
+    'brown rice': {'calories': 111, 'protein': 2.6, 'carbs': 23, 'fat': 0.9, 'fiber': 1.8, 'sugar': 0.4},
+    'lemon': {'calories': 29, 'protein': 1.1, 'carbs': 9, 'fat': 0.3, 'fiber': 2.8, 'sugar': 1.5},
+    'lemon juice': {'calories': 22, 'protein': 0.4, 'carbs': 7, 'fat': 0.2, 'fiber': 0.3, 'sugar': 1.2},
+    'olive oil': {'calories': 884, 'protein': 0, 'carbs': 0, 'fat': 100, 'fiber': 0, 'sugar': 0},
+    'onion': {'calories': 40, 'protein': 1.1, 'carbs': 9, 'fat': 0.1, 'fiber': 1.7, 'sugar': 4.7},
+    'green onion': {'calories': 32, 'protein': 1.8, 'carbs': 7.3, 'fat': 0.2, 'fiber': 2.6, 'sugar': 2.3},
+    'garlic': {'calories': 149, 'protein': 6.4, 'carbs': 33, 'fat': 0.5, 'fiber': 2.1, 'sugar': 1},
+    'salt': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
+    'pepper': {'calories': 251, 'protein': 10.4, 'carbs': 64, 'fat': 3.3, 'fiber': 25.3, 'sugar': 0.6},
+    'butter': {'calories': 717, 'protein': 0.9, 'carbs': 0.1, 'fat': 81, 'fiber': 0, 'sugar': 0.1},
+    'chicken': {'calories': 165, 'protein': 31, 'carbs': 0, 'fat': 3.6, 'fiber': 0, 'sugar': 0},
+    'chicken breast': {'calories': 165, 'protein': 31, 'carbs': 0, 'fat': 3.6, 'fiber': 0, 'sugar': 0},
+    'almonds': {'calories': 579, 'protein': 21, 'carbs': 22, 'fat': 50, 'fiber': 12.5, 'sugar': 4.4},
+    'celery': {'calories': 16, 'protein': 0.7, 'carbs': 3, 'fat': 0.2, 'fiber': 1.6, 'sugar': 1.3},
+    'mayonnaise': {'calories': 680, 'protein': 1, 'carbs': 0.6, 'fat': 75, 'fiber': 0, 'sugar': 0.6},
+    'paprika': {'calories': 282, 'protein': 14.1, 'carbs': 54, 'fat': 13, 'fiber': 34.9, 'sugar': 10.3},
+    'grapes': {'calories': 62, 'protein': 0.6, 'carbs': 16, 'fat': 0.2, 'fiber': 0.9, 'sugar': 16},
+    'milk': {'calories': 42, 'protein': 3.4, 'carbs': 5, 'fat': 1, 'fiber': 0, 'sugar': 5},
+    'flour': {'calories': 364, 'protein': 10, 'carbs': 76, 'fat': 1, 'fiber': 2.7, 'sugar': 0.3},
+    'sugar': {'calories': 387, 'protein': 0, 'carbs': 100, 'fat': 0, 'fiber': 0, 'sugar': 100},
+    'eggs': {'calories': 155, 'protein': 13, 'carbs': 1.1, 'fat': 11, 'fiber': 0, 'sugar': 1.1},
+    'tomatoes': {'calories': 18, 'protein': 0.9, 'carbs': 3.9, 'fat': 0.2, 'fiber': 1.2, 'sugar': 2.6},
+    'cheese': {'calories': 402, 'protein': 25, 'carbs': 1.3, 'fat': 33, 'fiber': 0, 'sugar': 0.5},
+    'cheddar cheese': {'calories': 402, 'protein': 25, 'carbs': 1.3, 'fat': 33, 'fiber': 0, 'sugar': 0.5},
+    'parmesan cheese': {'calories': 431, 'protein': 38, 'carbs': 4.1, 'fat': 29, 'fiber': 0, 'sugar': 0.1},
+    'ginger': {'calories': 80, 'protein': 1.8, 'carbs': 18, 'fat': 0.8, 'fiber': 2, 'sugar': 1.7},
+    'cumin': {'calories': 375, 'protein': 18, 'carbs': 44, 'fat': 22, 'fiber': 10.5, 'sugar': 2.3},
+    'cardamom': {'calories': 311, 'protein': 11, 'carbs': 68, 'fat': 6.7, 'fiber': 28, 'sugar': 0},
+    'cayenne pepper': {'calories': 318, 'protein': 12, 'carbs': 56, 'fat': 17, 'fiber': 27.2, 'sugar': 10.3},
+    'garam masala': {'calories': 315, 'protein': 13, 'carbs': 58, 'fat': 8, 'fiber': 25.6, 'sugar': 2.8},
+    'bay leaf': {'calories': 313, 'protein': 7.6, 'carbs': 75, 'fat': 8.4, 'fiber': 26.3, 'sugar': 0},
+    'cilantro': {'calories': 23, 'protein': 2.1, 'carbs': 3.7, 'fat': 0.5, 'fiber': 2.8, 'sugar': 0.9},
+    'chives': {'calories': 30, 'protein': 3.3, 'carbs': 4.4, 'fat': 0.7, 'fiber': 2.5, 'sugar': 1.9},
+    'parsley': {'calories': 36, 'protein': 3, 'carbs': 6.3, 'fat': 0.8, 'fiber': 3.3, 'sugar': 0.9},
+    'apricots': {'calories': 48, 'protein': 1.4, 'carbs': 11, 'fat': 0.4, 'fiber': 2, 'sugar': 9.2},
+    'dried apricots': {'calories': 241, 'protein': 3.4, 'carbs': 63, 'fat': 0.5, 'fiber': 7.3, 'sugar': 53.4},
+    'mustard': {'calories': 66, 'protein': 4.4, 'carbs': 5.8, 'fat': 4.4, 'fiber': 4, 'sugar': 0.9},
+    'dijon mustard': {'calories': 66, 'protein': 4.4, 'carbs': 5.8, 'fat': 4.4, 'fiber': 4, 'sugar': 0.9},
+    'sour cream': {'calories': 198, 'protein': 2.4, 'carbs': 4.6, 'fat': 19, 'fiber': 0, 'sugar': 3.2},
+    'greek yogurt': {'calories': 59, 'protein': 10, 'carbs': 3.6, 'fat': 0.4, 'fiber': 0, 'sugar': 3.2},
+    'yogurt': {'calories': 59, 'protein': 10, 'carbs': 3.6, 'fat': 0.4, 'fiber': 0, 'sugar': 3.2},
+    'spinach': {'calories': 23, 'protein': 2.9, 'carbs': 3.6, 'fat': 0.4, 'fiber': 2.2, 'sugar': 0.4},
+    'baby spinach': {'calories': 23, 'protein': 2.9, 'carbs': 3.6, 'fat': 0.4, 'fiber': 2.2, 'sugar': 0.4},
+    'green onions': {'calories': 32, 'protein': 1.8, 'carbs': 7.3, 'fat': 0.2, 'fiber': 2.6, 'sugar': 2.3},
+    'parmesan': {'calories': 431, 'protein': 38, 'carbs': 4.1, 'fat': 29, 'fiber': 0, 'sugar': 0.1},
+    # Add specific mappings for problematic ingredients
+    'servings of': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
+    'squeezes of': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
+    'zest of': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
+    'sticks': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
+    # Add missing ingredients for Lemon Rice
+    'lemon zest': {'calories': 29, 'protein': 1.1, 'carbs': 9, 'fat': 0.3, 'fiber': 2.8, 'sugar': 1.5},
+    'mustard seeds': {'calories': 508, 'protein': 26, 'carbs': 28, 'fat': 36, 'fiber': 12, 'sugar': 6.8},
+    'curry leaves': {'calories': 108, 'protein': 16, 'carbs': 18, 'fat': 1, 'fiber': 43, 'sugar': 0},
+    'green chilies': {'calories': 40, 'protein': 2, 'carbs': 9, 'fat': 0.2, 'fiber': 1.5, 'sugar': 5.1},
+    'turmeric powder': {'calories': 354, 'protein': 8, 'carbs': 65, 'fat': 10, 'fiber': 21, 'sugar': 3.2},
+    'peanuts': {'calories': 567, 'protein': 26, 'carbs': 16, 'fat': 49, 'fiber': 8.5, 'sugar': 4.7},
+    'oil': {'calories': 884, 'protein': 0, 'carbs': 0, 'fat': 100, 'fiber': 0, 'sugar': 0},
+    # Add missing ingredients for Tonkatsu and other dishes
+    'pork': {'calories': 242, 'protein': 27, 'carbs': 0, 'fat': 14, 'fiber': 0, 'sugar': 0},
+    'breadcrumbs': {'calories': 395, 'protein': 13, 'carbs': 72, 'fat': 5, 'fiber': 4, 'sugar': 6},
+    'vegetable oil': {'calories': 884, 'protein': 0, 'carbs': 0, 'fat': 100, 'fiber': 0, 'sugar': 0},
+    'tomato ketchup': {'calories': 102, 'protein': 1, 'carbs': 25, 'fat': 0, 'fiber': 0, 'sugar': 22},
+    'worcestershire sauce': {'calories': 78, 'protein': 0, 'carbs': 19, 'fat': 0, 'fiber': 0, 'sugar': 19},
+    'oyster sauce': {'calories': 51, 'protein': 1, 'carbs': 11, 'fat': 0, 'fiber': 0, 'sugar': 11},
+    'caster sugar': {'calories': 387, 'protein': 0, 'carbs': 100, 'fat': 0, 'fiber': 0, 'sugar': 100},
+    'sugar': {'calories': 387, 'protein': 0, 'carbs': 100, 'fat': 0, 'fiber': 0, 'sugar': 100},
+    'piece': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},  # Generic piece
+    'liter': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},  # Generic liter
+}
+
+# Unit conversion factors (to grams)
+UNIT_CONVERSIONS = {
+    'cup': 240,  # 1 cup = 240g
+    'cups': 240,
+    'tablespoon': 15,  # 1 tbsp = 15g
+    'tablespoons': 15,
+    'tbsp': 15,
+    'tbsp.': 15,
+    'teaspoon': 5,  # 1 tsp = 5g
+    'teaspoons': 5,
+    'tsp': 5,
+    'tsp.': 5,
+    'ounce': 28.35,  # 1 oz = 28.35g
+    'ounces': 28.35,
+    'oz': 28.35,
+    'oz.': 28.35,
+    'pound': 453.59,  # 1 lb = 453.59g
+    'pounds': 453.59,
+    'lb': 453.59,
+    'lb.': 453.59,
+    'gram': 1,
+    'grams': 1,
+    'g': 1,
+    'g.': 1,
+    'milliliter': 1,  # 1ml = 1g for most liquids
+    'milliliters': 1,
+    'ml': 1,
+    'ml.': 1,
+    'liter': 1000,
+    'liters': 1000,
+    'l': 1000,
+    'l.': 1000,
+    'clove': 3,  # 1 garlic clove ≈ 3g
+    'cloves': 3,
+    'piece': 50,  # default fallback; overridden below for specific foods
+    'pieces': 50,
+    'slice': 25,  # default slice weight; overridden below for specific foods
+    'slices': 25,
+    'bun': 70,
+    'buns': 70,
+    'tortilla': 50,
+    'tortillas': 50,
+    'leaf': 5,
+    'leaves': 5,
+    'ring': 10,
+    'rings': 10,
+    'small': 100,  # 1 small onion ≈ 100g
+    'medium': 150,  # 1 medium onion ≈ 150g
+    'large': 200,  # 1 large onion ≈ 200g
+    'bunch': 50,  # 1 bunch herbs ≈ 50g
+    'pinch': 0.5,  # 1 pinch ≈ 0.5g
+    'dash': 1,  # 1 dash ≈ 1g
+    'sprinkle': 0.5,  # 1 sprinkle ≈ 0.5g
+    'serving': 100,  # 1 serving ≈ 100g
+    'servings': 100,
+    'can': 400,  # 1 can ≈ 400g
+    'pint': 473,  # 1 pint ≈ 473g
+    'squeeze': 5,  # 1 squeeze lemon ≈ 5g
+    'squeezes': 5,
+    'zest': 2,  # 1 zest ≈ 2g
+}
+
+# Per-ingredient overrides for typical weights of slices/pieces
+PER_ITEM_WEIGHTS = (
+    # (keyword, unit, grams_per_unit)
+    ('bread', 'slice', 25),
+    ('bacon', 'slice', 15),
+    ('sausage', 'piece', 50),
+    ('mushroom', 'piece', 18),
+    ('tomato', 'piece', 100),
+    ('egg', 'piece', 50),
+    ('pudding', 'slice', 50),  # black pudding slice
+    ('bun', 'bun', 70),
+    ('tortilla', 'tortilla', 50),
+)
+
+NUTRIENT_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar')
+
+# Ingredient names containing any of these are placeholders, not food
+SKIP_INGREDIENT_KEYWORDS = (
+    'servings of', 'squeezes of', 'zest of', 'sticks', 'pieces', 'bunch', 'pinch', 'dash', 'sprinkle'
+)
+
+
+class NutritionIndex:
+    """
+    Immutable lookup index over a nutrition table, built once
+
+    Matching is identical to the original scan: the first table entry (in table order)
+    whose name is contained in the ingredient name, or contains it. Both directions are
+    answered without scanning the table:
+
+    - keys contained in the name: one Aho-Corasick pass over the name
+    - name contained in a key: a precomputed map from every substring of every key to
+      the earliest key containing it (this also covers exact names)
+
+    Results are memoized per ingredient name. ``matrix`` holds the same profiles as a
+    read-only (entries x NUTRIENT_FIELDS) array for batch computation.
+
+    Args:
+        table (Dict[str, Dict]): Ingredient name -> per-100g nutrients, in priority order
+    """
+
+    def __init__(self, table: Dict[str, Dict]):
+        self.keys = tuple(table)
+        self.profiles = tuple(MappingProxyType(dict(table[key])) for key in self.keys)
+        # entries x NUTRIENT_FIELDS, per 100g, for vectorized batch totals
+        self.matrix = np.array([[profile[field] for field in NUTRIENT_FIELDS] for profile in self.profiles], dtype=float)
+        self.matrix.setflags(write=False)
+        self._automaton = AhoCorasick(self.keys)
+
+        substrings = {}
+        for position, key in enumerate(self.keys):
+            for start in range(len(key)):
+                for end in range(start + 1, len(key) + 1):
+                    substrings.setdefault(key[start:end], position)
+        self._earliest_key_containing = MappingProxyType(substrings)
+
+        self.match_position = lru_cache(maxsize=8192)(self._match_position)
+
+    def _match_position(self, ingredient_name: str) -> Optional[int]:
+        candidates = self._automaton.find_all(ingredient_name)
+        container = self._earliest_key_containing.get(ingredient_name)
+        if container is not None:
+            candidates.add(container)
+        return min(candidates) if candidates else None
+
+    def match(self, ingredient_name: str) -> Optional[Dict]:
+        """
+        Find the nutrition profile for an ingredient name
+
+        Args:
+            ingredient_name (str): Lowercased, stripped ingredient name
+
+        Returns:
+            Optional[Dict]: Read-only per-100g nutrients, or None if nothing matches
+        """
+        position = self.match_position(ingredient_name)
+        return self.profiles[position] if position is not None else None
+
+    def match_key(self, ingredient_name: str) -> Optional[str]:
+        """Return the table entry name an ingredient matches, or None"""
+        position = self.match_position(ingredient_name)
+        return self.keys[position] if position is not None else None
+
+
+_PER_ITEM_WEIGHTS_BY_UNIT = {}
+for _keyword, _unit, _grams in PER_ITEM_WEIGHTS:
+    _PER_ITEM_WEIGHTS_BY_UNIT.setdefault(_unit, []).append((_keyword, _grams))
+PER_ITEM_WEIGHTS_BY_UNIT = MappingProxyType({unit: tuple(weights) for unit, weights in _PER_ITEM_WEIGHTS_BY_UNIT.items()})
+
+def grams_for(ingredient_name: str, quantity: float, unit: str) -> float:
+    """
+    Convert an ingredient quantity to grams
+
+    Args:
+        ingredient_name (str): Lowercased ingredient name, used for piece/slice weights
+        quantity (float): Amount in the given unit
+        unit (str): Lowercased unit, '' means grams
+
+    Returns:
+        float: Weight in grams (unknown units are assumed to be grams)
+    """
+    # 1) Per-ingredient overrides for realistic piece/slice weights
+    for keyword, grams_per in PER_ITEM_WEIGHTS_BY_UNIT.get(unit, ()):
+        if keyword in ingredient_name:
+            return quantity * grams_per
+
+    # 2) General unit conversions
+    if unit in UNIT_CONVERSIONS:
+        return quantity * UNIT_CONVERSIONS[unit]
+    if unit != '':
+        logger.debug(f"Unknown unit '{unit}' for ingredient '{ingredient_name}', assuming grams")
+    return quantity
+
+
+UNIT_CONVERSIONS = MappingProxyType(UNIT_CONVERSIONS)
+
+# Shared index used by nutrition_service
+nutrition_index = NutritionIndex(NUTRITION_DB)
+NUTRITION_DB = MappingProxyType(NUTRITION_DB)
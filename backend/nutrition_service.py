@@ -1,7 +1,10 @@
-import requests
 import logging
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
+import numpy as np
 from config import Config
+from provider_client import provider_get
+from ingredient_nutrition_service import ingredient_nutrition_lookup, scale_profile
+from nutrition_index import nutrition_index, grams_for, SKIP_INGREDIENT_KEYWORDS, NUTRIENT_FIELDS
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -126,6 +129,85 @@ def normalize_ingredients_for_realistic_servings(ingredients: List[Dict]) -> Lis
         logger.error(f"Error normalizing ingredients: {e}")
         return ingredients
 
+def _prepare_local_ingredient(ingredient_data: Dict) -> Optional[Tuple[int, float]]:
+    """
+    Resolve one normalized ingredient against the local nutrition index
+    
+    Args:
+        ingredient_data (Dict): Ingredient with 'ingredient', 'quantity', 'unit'
+        
+    Returns:
+        Optional[Tuple[int, float]]: (nutrition index position, grams), or None if skipped or unknown
+    """
+    ingredient_name = ingredient_data.get('ingredient', '').lower().strip()
+    quantity = ingredient_data.get('quantity', 0)
+    unit = ingredient_data.get('unit', '').lower().strip()
+    
+    # Fix unrealistic units for dry ingredients
+    if unit == 'liter' and any(word in ingredient_name for word in ['sugar', 'flour', 'salt', 'spice', 'powder']):
+        logger.info(f"🔧 FIXING: Converting {quantity} liter of {ingredient_name} to tablespoon")
+        unit = 'tablespoon'
+        # Adjust quantity for more realistic amount
+        if quantity > 3:
+            quantity = 2  # Cap at 2 tablespoons for dry ingredients
+    
+    logger.info(f"Processing ingredient: {ingredient_name} ({quantity} {unit})")
+    
+    # Skip invalid ingredients
+    if not ingredient_name or quantity <= 0:
+        logger.info(f"Skipping invalid ingredient: {ingredient_name}")
+        return None
+    
+    # Skip problematic ingredients that don't make sense
+    if any(skip in ingredient_name for skip in SKIP_INGREDIENT_KEYWORDS):
+        logger.info(f"Skipping problematic ingredient: {ingredient_name}")
+        return None
+    
+    # Skip ingredients with very high quantities that seem wrong
+    if unit == 'servings' and quantity > 4:
+        logger.info(f"Skipping ingredient with high servings: {ingredient_name} ({quantity} {unit})")
+        return None
+        
+    # Find matching ingredient in the precompiled nutrition index
+    position = nutrition_index.match_position(ingredient_name)
+    
+    if position is None:
+        logger.debug(f"No nutrition data found for ingredient: {ingredient_name}")
+        return None
+    
+    # Convert quantity to grams (piece/slice overrides, then general unit conversions)
+    return position, grams_for(ingredient_name, quantity, unit)
+
+def _local_nutrition_response(totals) -> Dict:
+    """Build the nutrition response from (calories, protein, carbs, fat, fiber, sugar) totals"""
+    total_calories, total_protein, total_carbs, total_fat, total_fiber, total_sugar = (float(total) for total in totals)
+    
+    # Round to 1 decimal place
+    return {
+        "calories": round(total_calories, 1),
+        "protein": round(total_protein, 1),
+        "carbs": round(total_carbs, 1),
+        "fat": round(total_fat, 1),
+        "fiber": round(total_fiber, 1),
+        "sugar": round(total_sugar, 1),
+        "dietary_tags": _get_dietary_tags_from_nutrition(total_calories, total_protein, total_carbs),
+        "success": True,
+        "error": None
+    }
+
+def _local_nutrition_error_response(error: str) -> Dict:
+    return {
+        "calories": 0,
+        "protein": 0,
+        "carbs": 0,
+        "fat": 0,
+        "fiber": 0,
+        "sugar": 0,
+        "dietary_tags": [],
+        "success": False,
+        "error": error
+    }
+
 def calculate_nutrition_from_ingredients(ingredients: List[Dict]) -> Dict:
     """
     Calculate nutrition information based on actual ingredients
@@ -140,261 +222,69 @@ def calculate_nutrition_from_ingredients(ingredients: List[Dict]) -> Dict:
         # Normalize ingredients to realistic portion sizes
         normalized_ingredients = normalize_ingredients_for_realistic_servings(ingredients)
         
-        total_calories = 0
-        total_protein = 0
-        total_carbs = 0
-        total_fat = 0
-        total_fiber = 0
-        total_sugar = 0
+        totals = [0.0] * len(NUTRIENT_FIELDS)
         
-        # Nutrition database for common ingredients (per 100g or standard serving)
-        nutrition_db = {
-            'rice': {'calories': 130, 'protein': 2.7, 'carbs': 28, 'fat': 0.3, 'fiber': 0.4, 'sugar': 0.1},
-            'brown rice': {'calories': 111, 'protein': 2.6, 'carbs': 23, 'fat': 0.9, 'fiber': 1.8, 'sugar': 0.4},
-            'lemon': {'calories': 29, 'protein': 1.1, 'carbs': 9, 'fat': 0.3, 'fiber': 2.8, 'sugar': 1.5},
-            'lemon juice': {'calories': 22, 'protein': 0.4, 'carbs': 7, 'fat': 0.2, 'fiber': 0.3, 'sugar': 1.2},
-            'olive oil': {'calories': 884, 'protein': 0, 'carbs': 0, 'fat': 100, 'fiber': 0, 'sugar': 0},
-            'onion': {'calories': 40, 'protein': 1.1, 'carbs': 9, 'fat': 0.1, 'fiber': 1.7, 'sugar': 4.7},
-            'green onion': {'calories': 32, 'protein': 1.8, 'carbs': 7.3, 'fat': 0.2, 'fiber': 2.6, 'sugar': 2.3},
-            'garlic': {'calories': 149, 'protein': 6.4, 'carbs': 33, 'fat': 0.5, 'fiber': 2.1, 'sugar': 1},
-            'salt': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
-            'pepper': {'calories': 251, 'protein': 10.4, 'carbs': 64, 'fat': 3.3, 'fiber': 25.3, 'sugar': 0.6},
-            'butter': {'calories': 717, 'protein': 0.9, 'carbs': 0.1, 'fat': 81, 'fiber': 0, 'sugar': 0.1},
-            'chicken': {'calories': 165, 'protein': 31, 'carbs': 0, 'fat': 3.6, 'fiber': 0, 'sugar': 0},
-            'chicken breast': {'calories': 165, 'protein': 31, 'carbs': 0, 'fat': 3.6, 'fiber': 0, 'sugar': 0},
-            'almonds': {'calories': 579, 'protein': 21, 'carbs': 22, 'fat': 50, 'fiber': 12.5, 'sugar': 4.4},
-            'celery': {'calories': 16, 'protein': 0.7, 'carbs': 3, 'fat': 0.2, 'fiber': 1.6, 'sugar': 1.3},
-            'mayonnaise': {'calories': 680, 'protein': 1, 'carbs': 0.6, 'fat': 75, 'fiber': 0, 'sugar': 0.6},
-            'paprika': {'calories': 282, 'protein': 14.1, 'carbs': 54, 'fat': 13, 'fiber': 34.9, 'sugar': 10.3},
-            'grapes': {'calories': 62, 'protein': 0.6, 'carbs': 16, 'fat': 0.2, 'fiber': 0.9, 'sugar': 16},
-            'milk': {'calories': 42, 'protein': 3.4, 'carbs': 5, 'fat': 1, 'fiber': 0, 'sugar': 5},
-            'flour': {'calories': 364, 'protein': 10, 'carbs': 76, 'fat': 1, 'fiber': 2.7, 'sugar': 0.3},
-            'sugar': {'calories': 387, 'protein': 0, 'carbs': 100, 'fat': 0, 'fiber': 0, 'sugar': 100},
-            'eggs': {'calories': 155, 'protein': 13, 'carbs': 1.1, 'fat': 11, 'fiber': 0, 'sugar': 1.1},
-            'tomatoes': {'calories': 18, 'protein': 0.9, 'carbs': 3.9, 'fat': 0.2, 'fiber': 1.2, 'sugar': 2.6},
-            'cheese': {'calories': 402, 'protein': 25, 'carbs': 1.3, 'fat': 33, 'fiber': 0, 'sugar': 0.5},
-            'cheddar cheese': {'calories': 402, 'protein': 25, 'carbs': 1.3, 'fat': 33, 'fiber': 0, 'sugar': 0.5},
-            'parmesan cheese': {'calories': 431, 'protein': 38, 'carbs': 4.1, 'fat': 29, 'fiber': 0, 'sugar': 0.1},
-            'ginger': {'calories': 80, 'protein': 1.8, 'carbs': 18, 'fat': 0.8, 'fiber': 2, 'sugar': 1.7},
-            'cumin': {'calories': 375, 'protein': 18, 'carbs': 44, 'fat': 22, 'fiber': 10.5, 'sugar': 2.3},
-            'cardamom': {'calories': 311, 'protein': 11, 'carbs': 68, 'fat': 6.7, 'fiber': 28, 'sugar': 0},
-            'cayenne pepper': {'calories': 318, 'protein': 12, 'carbs': 56, 'fat': 17, 'fiber': 27.2, 'sugar': 10.3},
-            'garam masala': {'calories': 315, 'protein': 13, 'carbs': 58, 'fat': 8, 'fiber': 25.6, 'sugar': 2.8},
-            'bay leaf': {'calories': 313, 'protein': 7.6, 'carbs': 75, 'fat': 8.4, 'fiber': 26.3, 'sugar': 0},
-            'cilantro': {'calories': 23, 'protein': 2.1, 'carbs': 3.7, 'fat': 0.5, 'fiber': 2.8, 'sugar': 0.9},
-            'chives': {'calories': 30, 'protein': 3.3, 'carbs': 4.4, 'fat': 0.7, 'fiber': 2.5, 'sugar': 1.9},
-            'parsley': {'calories': 36, 'protein': 3, 'carbs': 6.3, 'fat': 0.8, 'fiber': 3.3, 'sugar': 0.9},
-            'apricots': {'calories': 48, 'protein': 1.4, 'carbs': 11, 'fat': 0.4, 'fiber': 2, 'sugar': 9.2},
-            'dried apricots': {'calories': 241, 'protein': 3.4, 'carbs': 63, 'fat': 0.5, 'fiber': 7.3, 'sugar': 53.4},
-            'mustard': {'calories': 66, 'protein': 4.4, 'carbs': 5.8, 'fat': 4.4, 'fiber': 4, 'sugar': 0.9},
-            'dijon mustard': {'calories': 66, 'protein': 4.4, 'carbs': 5.8, 'fat': 4.4, 'fiber': 4, 'sugar': 0.9},
-            'sour cream': {'calories': 198, 'protein': 2.4, 'carbs': 4.6, 'fat': 19, 'fiber': 0, 'sugar': 3.2},
-            'greek yogurt': {'calories': 59, 'protein': 10, 'carbs': 3.6, 'fat': 0.4, 'fiber': 0, 'sugar': 3.2},
-            'yogurt': {'calories': 59, 'protein': 10, 'carbs': 3.6, 'fat': 0.4, 'fiber': 0, 'sugar': 3.2},
-            'spinach': {'calories': 23, 'protein': 2.9, 'carbs': 3.6, 'fat': 0.4, 'fiber': 2.2, 'sugar': 0.4},
-            'baby spinach': {'calories': 23, 'protein': 2.9, 'carbs': 3.6, 'fat': 0.4, 'fiber': 2.2, 'sugar': 0.4},
-            'green onions': {'calories': 32, 'protein': 1.8, 'carbs': 7.3, 'fat': 0.2, 'fiber': 2.6, 'sugar': 2.3},
-            'parmesan': {'calories': 431, 'protein': 38, 'carbs': 4.1, 'fat': 29, 'fiber': 0, 'sugar': 0.1},
-            # Add specific mappings for problematic ingredients
-            'servings of': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
-            'squeezes of': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
-            'zest of': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
-            'sticks': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},
-            # Add missing ingredients for Lemon Rice
-            'lemon zest': {'calories': 29, 'protein': 1.1, 'carbs': 9, 'fat': 0.3, 'fiber': 2.8, 'sugar': 1.5},
-            'mustard seeds': {'calories': 508, 'protein': 26, 'carbs': 28, 'fat': 36, 'fiber': 12, 'sugar': 6.8},
-            'curry leaves': {'calories': 108, 'protein': 16, 'carbs': 18, 'fat': 1, 'fiber': 43, 'sugar': 0},
-            'green chilies': {'calories': 40, 'protein': 2, 'carbs': 9, 'fat': 0.2, 'fiber': 1.5, 'sugar': 5.1},
-            'turmeric powder': {'calories': 354, 'protein': 8, 'carbs': 65, 'fat': 10, 'fiber': 21, 'sugar': 3.2},
-            'peanuts': {'calories': 567, 'protein': 26, 'carbs': 16, 'fat': 49, 'fiber': 8.5, 'sugar': 4.7},
-            'oil': {'calories': 884, 'protein': 0, 'carbs': 0, 'fat': 100, 'fiber': 0, 'sugar': 0},
-            # Add missing ingredients for Tonkatsu and other dishes
-            'pork': {'calories': 242, 'protein': 27, 'carbs': 0, 'fat': 14, 'fiber': 0, 'sugar': 0},
-            'breadcrumbs': {'calories': 395, 'protein': 13, 'carbs': 72, 'fat': 5, 'fiber': 4, 'sugar': 6},
-            'vegetable oil': {'calories': 884, 'protein': 0, 'carbs': 0, 'fat': 100, 'fiber': 0, 'sugar': 0},
-            'tomato ketchup': {'calories': 102, 'protein': 1, 'carbs': 25, 'fat': 0, 'fiber': 0, 'sugar': 22},
-            'worcestershire sauce': {'calories': 78, 'protein': 0, 'carbs': 19, 'fat': 0, 'fiber': 0, 'sugar': 19},
-            'oyster sauce': {'calories': 51, 'protein': 1, 'carbs': 11, 'fat': 0, 'fiber': 0, 'sugar': 11},
-            'caster sugar': {'calories': 387, 'protein': 0, 'carbs': 100, 'fat': 0, 'fiber': 0, 'sugar': 100},
-            'sugar': {'calories': 387, 'protein': 0, 'carbs': 100, 'fat': 0, 'fiber': 0, 'sugar': 100},
-            'piece': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},  # Generic piece
-            'liter': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0},  # Generic liter
-        }
-        
-        # Unit conversion factors (to grams)
-        unit_conversions = {
-            'cup': 240,  # 1 cup = 240g
-            'cups': 240,
-            'tablespoon': 15,  # 1 tbsp = 15g
-            'tablespoons': 15,
-            'tbsp': 15,
-            'tbsp.': 15,
-            'teaspoon': 5,  # 1 tsp = 5g
-            'teaspoons': 5,
-            'tsp': 5,
-            'tsp.': 5,
-            'ounce': 28.35,  # 1 oz = 28.35g
-            'ounces': 28.35,
-            'oz': 28.35,
-            'oz.': 28.35,
-            'pound': 453.59,  # 1 lb = 453.59g
-            'pounds': 453.59,
-            'lb': 453.59,
-            'lb.': 453.59,
-            'gram': 1,
-            'grams': 1,
-            'g': 1,
-            'g.': 1,
-            'milliliter': 1,  # 1ml = 1g for most liquids
-            'milliliters': 1,
-            'ml': 1,
-            'ml.': 1,
-            'liter': 1000,
-            'liters': 1000,
-            'l': 1000,
-            'l.': 1000,
-            'clove': 3,  # 1 garlic clove ≈ 3g
-            'cloves': 3,
-            'piece': 50,  # default fallback; overridden below for specific foods
-            'pieces': 50,
-            'slice': 25,  # default slice weight; overridden below for specific foods
-            'slices': 25,
-            'bun': 70,
-            'buns': 70,
-            'tortilla': 50,
-            'tortillas': 50,
-            'leaf': 5,
-            'leaves': 5,
-            'ring': 10,
-            'rings': 10,
-            'small': 100,  # 1 small onion ≈ 100g
-            'medium': 150,  # 1 medium onion ≈ 150g
-            'large': 200,  # 1 large onion ≈ 200g
-            'bunch': 50,  # 1 bunch herbs ≈ 50g
-            'pinch': 0.5,  # 1 pinch ≈ 0.5g
-            'dash': 1,  # 1 dash ≈ 1g
-            'sprinkle': 0.5,  # 1 sprinkle ≈ 0.5g
-            'serving': 100,  # 1 serving ≈ 100g
-            'servings': 100,
-            'can': 400,  # 1 can ≈ 400g
-            'pint': 473,  # 1 pint ≈ 473g
-            'squeeze': 5,  # 1 squeeze lemon ≈ 5g
-            'squeezes': 5,
-            'zest': 2,  # 1 zest ≈ 2g
-        }
-        
-        # Per-ingredient overrides for typical weights of slices/pieces
-        per_item_weights = [
-            # (keyword, unit, grams_per_unit)
-            ('bread', 'slice', 25),
-            ('bacon', 'slice', 15),
-            ('sausage', 'piece', 50),
-            ('mushroom', 'piece', 18),
-            ('tomato', 'piece', 100),
-            ('egg', 'piece', 50),
-            ('pudding', 'slice', 50),  # black pudding slice
-            ('bun', 'bun', 70),
-            ('tortilla', 'tortilla', 50),
-        ]
-
         for ingredient_data in normalized_ingredients:
-            ingredient_name = ingredient_data.get('ingredient', '').lower().strip()
-            quantity = ingredient_data.get('quantity', 0)
-            unit = ingredient_data.get('unit', '').lower().strip()
-            
-            # Fix unrealistic units for dry ingredients
-            if unit == 'liter' and any(word in ingredient_name for word in ['sugar', 'flour', 'salt', 'spice', 'powder']):
-                logger.info(f"🔧 FIXING: Converting {quantity} liter of {ingredient_name} to tablespoon")
-                unit = 'tablespoon'
-                # Adjust quantity for more realistic amount
-                if quantity > 3:
-                    quantity = 2  # Cap at 2 tablespoons for dry ingredients
-            
-            logger.info(f"Processing ingredient: {ingredient_name} ({quantity} {unit})")
-            
-            # Skip invalid ingredients
-            if not ingredient_name or quantity <= 0:
-                logger.info(f"Skipping invalid ingredient: {ingredient_name}")
+            prepared = _prepare_local_ingredient(ingredient_data)
+            if prepared is None:
                 continue
             
-            # Skip problematic ingredients that don't make sense
-            skip_ingredients = [
-                'servings of', 'squeezes of', 'zest of', 'sticks', 'pieces', 'bunch', 'pinch', 'dash', 'sprinkle'
-            ]
-            if any(skip in ingredient_name for skip in skip_ingredients):
-                logger.info(f"Skipping problematic ingredient: {ingredient_name}")
-                continue
-            
-            # Skip ingredients with very high quantities that seem wrong
-            if unit == 'servings' and quantity > 4:
-                logger.info(f"Skipping ingredient with high servings: {ingredient_name} ({quantity} {unit})")
-                continue
-                
-            # Find matching ingredient in nutrition database
-            matched_ingredient = None
-            for db_ingredient, nutrition in nutrition_db.items():
-                if db_ingredient in ingredient_name or ingredient_name in db_ingredient:
-                    matched_ingredient = nutrition
-                    break
-            
-            if not matched_ingredient:
-                logger.debug(f"No nutrition data found for ingredient: {ingredient_name}")
-                continue
-            
-            # Convert quantity to grams
-            # 1) Try per-ingredient overrides for realistic piece/slice weights
-            grams = None
-            for keyword, match_unit, grams_per in per_item_weights:
-                if keyword in ingredient_name and unit == match_unit:
-                    grams = quantity * grams_per
-                    break
-
-            # 2) Fall back to general unit conversions
-            if grams is None:
-                grams = quantity
-                if unit in unit_conversions:
-                    grams = quantity * unit_conversions[unit]
-                elif unit == '':  # No unit specified, assume grams
-                    grams = quantity
-                else:
-                    logger.debug(f"Unknown unit '{unit}' for ingredient '{ingredient_name}', assuming grams")
+            position, grams = prepared
+            matched_ingredient = nutrition_index.profiles[position]
             
             # Calculate nutrition for this ingredient (per 100g)
             factor = grams / 100
-            
-            total_calories += matched_ingredient['calories'] * factor
-            total_protein += matched_ingredient['protein'] * factor
-            total_carbs += matched_ingredient['carbs'] * factor
-            total_fat += matched_ingredient['fat'] * factor
-            total_fiber += matched_ingredient['fiber'] * factor
-            total_sugar += matched_ingredient['sugar'] * factor
-        
-        # Round to 1 decimal place
-        return {
-            "calories": round(total_calories, 1),
-            "protein": round(total_protein, 1),
-            "carbs": round(total_carbs, 1),
-            "fat": round(total_fat, 1),
-            "fiber": round(total_fiber, 1),
-            "sugar": round(total_sugar, 1),
-            "dietary_tags": _get_dietary_tags_from_nutrition(total_calories, total_protein, total_carbs),
-            "success": True,
-            "error": None
-        }
+            for i, field in enumerate(NUTRIENT_FIELDS):
+                totals[i] += matched_ingredient[field] * factor
+        
+        return _local_nutrition_response(totals)
         
     except Exception as e:
         logger.error(f"Error calculating nutrition from ingredients: {e}")
-        return {
-            "calories": 0,
-            "protein": 0,
-            "carbs": 0,
-            "fat": 0,
-            "fiber": 0,
-            "sugar": 0,
-            "dietary_tags": [],
-            "success": False,
-            "error": str(e)
-        }
+        return _local_nutrition_error_response(str(e))
+
+def calculate_nutrition_batch(ingredient_lists: List[List[Dict]]) -> List[Dict]:
+    """
+    Calculate local nutrition for many dishes at once
+    
+    Every ingredient is resolved against the nutrition index, converted to grams and
+    scattered into a (dishes x index entries) weight matrix; the totals for all dishes are
+    then one matrix product with the per-100g nutrient matrix.
+    
+    Args:
+        ingredient_lists (List[List[Dict]]): One ingredient list per dish, each with 'ingredient', 'quantity', 'unit'
+        
+    Returns:
+        List[Dict]: Nutrition per dish, same shape as calculate_nutrition_from_ingredients
+    """
+    results = [None] * len(ingredient_lists)
+    dish_rows = []
+    entry_columns = []
+    weights = []
+    
+    for dish_index, ingredients in enumerate(ingredient_lists):
+        try:
+            for ingredient_data in normalize_ingredients_for_realistic_servings(ingredients or []):
+                prepared = _prepare_local_ingredient(ingredient_data)
+                if prepared is None:
+                    continue
+                position, grams = prepared
+                dish_rows.append(dish_index)
+                entry_columns.append(position)
+                weights.append(grams / 100)
+        except Exception as e:
+            logger.error(f"Error preparing ingredients for batch dish {dish_index}: {e}")
+            results[dish_index] = _local_nutrition_error_response(str(e))
+    
+    weight_matrix = np.zeros((len(ingredient_lists), len(nutrition_index.keys)))
+    np.add.at(weight_matrix, (np.array(dish_rows, dtype=int), np.array(entry_columns, dtype=int)), weights)
+    totals = weight_matrix @ nutrition_index.matrix
+    
+    for dish_index in range(len(ingredient_lists)):
+        if results[dish_index] is None:
+            results[dish_index] = _local_nutrition_response(totals[dish_index])
+    
+    return results
 
 def _get_dietary_tags_from_nutrition(calories, protein, carbs):
     """Get dietary tags based on nutrition values"""
@@ -497,7 +387,7 @@ def _get_recipe_info_from_spoonacular(dish_name: str) -> Optional[Dict]:
             search_params['cuisine'] = 'Middle Eastern'
         
         logger.info(f"Searching for recipe info: {dish_name}")
-        response = requests.get(url, params=search_params, timeout=3)
+        response = provider_get('spoonacular_nutrition', url, params=search_params)
         
         if response.status_code == 200:
             data = response.json()
@@ -539,7 +429,7 @@ def _get_recipe_nutrition_from_spoonacular(recipe_id: int) -> Optional[Dict]:
         }
         
         logger.info(f"Fetching nutrition for recipe ID: {recipe_id}")
-        response = requests.get(url, params=params, timeout=3)
+        response = provider_get('spoonacular_nutrition', url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -570,7 +460,7 @@ def _get_guess_nutrition_from_spoonacular(recipe_id: int) -> Optional[Dict]:
             'apiKey': Config.SPOONACULAR_API_KEY
         }
         
-        response = requests.get(url, params=params, timeout=3)
+        response = provider_get('spoonacular_nutrition', url, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -824,66 +714,35 @@ def get_nutrition_from_spoonacular_ingredients(ingredients: List[Dict]) -> Dict:
         
         logger.info(f"Getting nutrition from Spoonacular for {len(normalized_ingredients)} normalized ingredients")
         
+        # Resolve per-100g profiles for every ingredient at once (cached, misses fetched concurrently)
+        profiles = ingredient_nutrition_lookup.get_profiles([
+            ingredient_data.get('ingredient', '').lower() for ingredient_data in normalized_ingredients
+            if _convert_to_grams(ingredient_data.get('quantity', 0), ingredient_data.get('unit', 'g')) > 0
+        ])
+        
         for ingredient_data in normalized_ingredients:
             ingredient_name = ingredient_data.get('ingredient', '').lower()
             quantity = ingredient_data.get('quantity', 0)
             unit = ingredient_data.get('unit', 'g')
             
-            # Convert to grams for Spoonacular API
+            # Convert to grams to scale the per-100g profile
             grams = _convert_to_grams(quantity, unit)
             
             if grams > 0:
-                # Use Spoonacular's ingredient nutrition endpoint
-                url = "https://api.spoonacular.com/food/ingredients/search"
-                params = {
-                    'query': ingredient_name,
-                    'apiKey': Config.SPOONACULAR_API_KEY,
-                    'number': 1
-                }
+                profile = profiles.get(ingredient_name)
+                if not profile:
+                    logger.warning(f"❌ Failed to get nutrition for {ingredient_name}")
+                    continue
                 
-                response = requests.get(url, params=params, timeout=2)
+                nutrition = scale_profile(profile, grams)
+                total_calories += nutrition['calories']
+                total_protein += nutrition['protein']
+                total_carbs += nutrition['carbs']
+                total_fat += nutrition['fat']
+                total_fiber += nutrition['fiber']
+                total_sugar += nutrition['sugar']
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('results') and len(data['results']) > 0:
-                        ingredient_id = data['results'][0]['id']
-                        
-                        # Get nutrition for this ingredient
-                        nutrition_url = f"https://api.spoonacular.com/food/ingredients/{ingredient_id}/information"
-                        nutrition_params = {
-                            'amount': grams,
-                            'unit': 'g',
-                            'apiKey': Config.SPOONACULAR_API_KEY
-                        }
-                        
-                        nutrition_response = requests.get(nutrition_url, params=nutrition_params, timeout=2)
-                        
-                        if nutrition_response.status_code == 200:
-                            nutrition_data = nutrition_response.json()
-                            nutrients = nutrition_data.get('nutrition', {}).get('nutrients', [])
-                            
-                            # Extract nutrition values
-                            calories = next((n['amount'] for n in nutrients if n['name'] == 'Calories'), 0)
-                            protein = next((n['amount'] for n in nutrients if n['name'] == 'Protein'), 0)
-                            carbs = next((n['amount'] for n in nutrients if n['name'] == 'Carbohydrates'), 0)
-                            fat = next((n['amount'] for n in nutrients if n['name'] == 'Total Fat'), 0)
-                            fiber = next((n['amount'] for n in nutrients if n['name'] == 'Fiber'), 0)
-                            sugar = next((n['amount'] for n in nutrients if n['name'] == 'Sugar'), 0)
-                            
-                            total_calories += calories
-                            total_protein += protein
-                            total_carbs += carbs
-                            total_fat += fat
-                            total_fiber += fiber
-                            total_sugar += sugar
-                            
-                            logger.info(f"✅ Got nutrition for {ingredient_name}: {calories} cal, {protein}g protein")
-                        else:
-                            logger.warning(f"❌ Failed to get nutrition for {ingredient_name}")
-                    else:
-                        logger.warning(f"❌ No ingredient found for {ingredient_name}")
-                else:
-                    logger.warning(f"❌ Failed to search for {ingredient_name}")
+                logger.info(f"✅ Got nutrition for {ingredient_name}: {nutrition['calories']:.1f} cal, {nutrition['protein']:.1f}g protein")
         
         # Generate dietary tags
         dietary_tags = _get_dietary_tags_from_nutrition(total_calories, total_protein, total_carbs)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Normalized order line items
+
+Orders keep their ingredient list as a JSON blob (older /delivery/test orders even hold
+a json.dumps string of it). Each ingredient is also written to order_items as one row
+with a canonical ingredient name, so ingredient totals and per-user history are plain
+SQL aggregates instead of deserializing every order.
+
+New orders get their rows when they are saved; backfill_order_items fills in orders
+saved before the table existed.
+
+Usage: python order_items.py [--batch-size 500]
+"""
+
+import argparse
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func, insert, or_, select
+from models import SessionLocal, Order, OrderItem, IngredientIdMapping
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def canonical_ingredient_name(name) -> str:
+    """Lowercased ingredient name with runs of whitespace collapsed to one space"""
+    return ' '.join(str(name or '').lower().split())
+
+def _quantity(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_ingredients(ingredients) -> List:
+    """
+    An order's ingredient list as stored, decoding legacy JSON string blobs
+
+    Returns:
+        List: The ingredient entries, or an empty list when the blob is unreadable
+    """
+    if isinstance(ingredients, str):
+        try:
+            ingredients = json.loads(ingredients)
+        except ValueError:
+            logger.warning("Unreadable ingredients blob, skipping it")
+            return []
+    return ingredients if isinstance(ingredients, list) else []
+
+def ingredient_shops(top_shop: Optional[Dict] = None, basket_plan: Optional[Dict] = None) -> Dict[str, str]:
+    """
+    Which shop each ingredient of a delivery order is collected from
+
+    Args:
+        top_shop (Dict): Single shop the order was routed to (see delivery_service.rank_shops)
+        basket_plan (Dict): Split order (see basket_planner.plan_basket); wins over top_shop
+
+    Returns:
+        Dict[str, str]: Canonical ingredient name -> shop name, for available ingredients
+    """
+    shops = {}
+    if basket_plan:
+        for stop in basket_plan["stops"]:
+            for item in stop["items"]:
+                shops[canonical_ingredient_name(item.get('ingredient'))] = stop["name"]
+    elif top_shop:
+        for item in top_shop.get("available_ingredients", []):
+            shops[canonical_ingredient_name(item.get('ingredient'))] = top_shop["name"]
+    return shops
+
+def order_item_rows(order_id: int, user_id: int, ingredients, shops: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """
+    order_items rows for one order's ingredients
+
+    Entries may be {"ingredient", "quantity", "unit"} dicts or bare names; entries without
+    a name are skipped.
+
+    Args:
+        ingredients: The order's ingredient list, or a legacy JSON string of it
+        shops (Dict[str, str]): Canonical ingredient name -> shop name
+
+    Returns:
+        List[Dict]: Rows ready for an executemany insert
+    """
+    shops = shops or {}
+    rows = []
+    for position, entry in enumerate(parse_ingredients(ingredients)):
+        if isinstance(entry, dict):
+            name = canonical_ingredient_name(entry.get('ingredient') or entry.get('name'))
+            quantity, unit = _quantity(entry.get('quantity')), entry.get('unit')
+        else:
+            name, quantity, unit = canonical_ingredient_name(entry), None, None
+        if not name:
+            continue
+        rows.append({
+            "order_id": order_id, "user_id": user_id, "position": position,
+            "ingredient_name": name, "ingredient_id": None,
+            "quantity": quantity, "unit": unit or None, "shop_name": shops.get(name)
+        })
+    return rows
+
+def _ingredient_ids(db, names: Iterable[str]) -> Dict[str, int]:
+    names = list(set(names))
+    if not names:
+        return {}
+    return dict(db.execute(
+        select(IngredientIdMapping.ingredient_name, IngredientIdMapping.spoonacular_id)
+        .where(IngredientIdMapping.ingredient_name.in_(names), IngredientIdMapping.spoonacular_id.isnot(None))
+    ).all())
+
+def _insert_rows(db, rows: List[Dict]) -> int:
+    # Canonical ids come from names already resolved against Spoonacular
+    if not rows:
+        return 0
+    ids = _ingredient_ids(db, (row["ingredient_name"] for row in rows))
+    for row in rows:
+        row["ingredient_id"] = ids.get(row["ingredient_name"])
+    db.execute(insert(OrderItem), rows)
+    return len(rows)
+
+def add_order_items(db, order_id: int, user_id: int, ingredients, shops: Optional[Dict[str, str]] = None) -> int:
+    """
+    Write an order's line items in the caller's transaction
+
+    Call after the order is flushed so its id is known; the caller commits.
+
+    Returns:
+        int: Rows written
+    """
+    return _insert_rows(db, order_item_rows(order_id, user_id, ingredients, shops))
+
+def backfill_order_items(session_factory=SessionLocal,
+                         batch_size: int = Config.ORDER_ITEMS_BACKFILL_BATCH_SIZE) -> Dict:
+    """
+    Write line items for orders that have none, one commit per batch of orders
+
+    Walks orders by id, so it can be stopped and rerun at any time. Legacy orders whose
+    ingredients are a JSON string get the decoded list written back to the blob.
+
+    Args:
+        session_factory: Callable returning a SQLAlchemy session
+        batch_size (int): Orders per batch
+
+    Returns:
+        Dict: {"orders", "items", "rewritten"} counts
+    """
+    counts = {"orders": 0, "items": 0, "rewritten": 0}
+    has_items = select(OrderItem.id).where(OrderItem.order_id == Order.id).exists()
+    last_id = 0
+    db = session_factory()
+    try:
+        while True:
+            batch = db.execute(
+                select(Order.id, Order.user_id, Order.ingredients)
+                .where(Order.id > last_id, ~has_items)
+                .order_by(Order.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+
+            rows = []
+            for order_id, user_id, ingredients in batch:
+                if isinstance(ingredients, str):
+                    db.query(Order).filter(Order.id == order_id).update(
+                        {Order.ingredients: parse_ingredients(ingredients)}, synchronize_session=False)
+                    counts["rewritten"] += 1
+                rows.extend(order_item_rows(order_id, user_id, ingredients))
+            counts["items"] += _insert_rows(db, rows)
+            db.commit()
+
+            counts["orders"] += len(batch)
+            last_id = batch[-1][0]
+
+        logger.info(f"Backfilled order items: {counts['items']} items for {counts['orders']} orders "
+                    f"({counts['rewritten']} legacy blobs rewritten)")
+        return counts
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error backfilling order items: {e}")
+        raise
+    finally:
+        db.close()
+
+def order_status_filter(statuses: List[str]):
+    """
+    SQL condition for orders in any of statuses; orders saved without a status count as pending
+    """
+    condition = Order.status.in_(statuses)
+    if 'pending' in statuses:
+        condition = or_(condition, Order.status.is_(None))
+    return condition
+
+def top_ingredients(db, limit: int = 10, user_id: Optional[int] = None,
+                    statuses: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Most ordered ingredients, counted in SQL over order_items
+
+    Args:
+        limit (int): Most ingredients returned
+        user_id (int): Only this user's orders when given
+        statuses (List[str]): Only orders in these statuses when given
+
+    Returns:
+        List[Dict]: {"ingredient", "orders"} by order count, descending
+    """
+    order_count = func.count(func.distinct(OrderItem.order_id))
+    query = select(OrderItem.ingredient_name, order_count)
+    if user_id is not None:
+        query = query.where(OrderItem.user_id == user_id)
+    if statuses:
+        query = query.join(Order, Order.id == OrderItem.order_id).where(order_status_filter(statuses))
+    query = query.group_by(OrderItem.ingredient_name).order_by(order_count.desc(), OrderItem.ingredient_name).limit(limit)
+    return [{"ingredient": name, "orders": orders} for name, orders in db.execute(query).all()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write order_items rows for orders saved before the table existed')
+    parser.add_argument('--batch-size', type=int, default=Config.ORDER_ITEMS_BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    print(backfill_order_items(batch_size=args.batch_size))
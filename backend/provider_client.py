@@ -0,0 +1,148 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class JitteredRetry(Retry):
+    """urllib3 Retry using exponential backoff with full jitter"""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return 0
+        return random.uniform(0, backoff)
+
+
+_sessions = {}  # host -> requests.Session
+_sessions_lock = threading.Lock()
+
+_metrics_lock = threading.Lock()
+_provider_metrics = {}  # provider -> counters
+
+def _create_session() -> requests.Session:
+    """Create a keep-alive session with a tuned pool and retry policy"""
+    retry = JitteredRetry(
+        total=Config.PROVIDER_MAX_RETRIES,
+        connect=Config.PROVIDER_MAX_RETRIES,
+        read=0,  # A read timeout means the provider is hung; retrying would hold the request thread for another full timeout
+        status=Config.PROVIDER_MAX_RETRIES,
+        backoff_factor=Config.PROVIDER_RETRY_BACKOFF_SECONDS,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET'],
+        respect_retry_after_header=True,
+        raise_on_status=False  # Hand the final response back so callers can check status_code
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,  # One session per host, so a single pool is enough
+        pool_maxsize=Config.PROVIDER_POOL_MAXSIZE,
+        pool_block=False,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_session(url: str) -> requests.Session:
+    """Return the shared pooled session for the host of url"""
+    host = urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _create_session()
+                _sessions[host] = session
+    return session
+
+def _record(provider: str, elapsed: float, retries: int = 0, error: bool = False):
+    with _metrics_lock:
+        metrics = _provider_metrics.setdefault(provider, {
+            'requests': 0,
+            'errors': 0,
+            'retries': 0,
+            'total_latency_ms': 0.0
+        })
+        metrics['requests'] += 1
+        metrics['retries'] += retries
+        metrics['total_latency_ms'] += elapsed * 1000
+        if error:
+            metrics['errors'] += 1
+
+def provider_get(provider: str, url: str, params: Optional[Dict] = None, timeout: Optional[float] = None) -> requests.Response:
+    """
+    GET a provider URL through the pooled session for its host
+
+    Args:
+        provider (str): Provider name, used for the timeout lookup and metrics
+        url (str): Request URL
+        params (Dict): Query parameters
+        timeout (float): Overrides the provider timeout from Config.PROVIDER_TIMEOUTS
+
+    Returns:
+        requests.Response: The final response after retries; transport errors are raised
+    """
+    if timeout is None:
+        timeout = Config.PROVIDER_TIMEOUTS.get(provider, Config.PROVIDER_DEFAULT_TIMEOUT)
+
+    started = time.monotonic()
+    try:
+        response = get_session(url).get(url, params=params, timeout=timeout)
+    except Exception:
+        _record(provider, time.monotonic() - started, error=True)
+        raise
+
+    retry_state = getattr(response.raw, 'retries', None)
+    retries = len(retry_state.history) if retry_state is not None else 0
+    _record(provider, time.monotonic() - started, retries=retries, error=response.status_code >= 400)
+    return response
+
+def _host_connection_stats(session: requests.Session) -> Dict:
+    """Connections opened vs requests served by the session's urllib3 pools"""
+    adapter = session.get_adapter('https://')
+    pools = adapter.poolmanager.pools
+    opened = 0
+    served = 0
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is not None:
+            opened += pool.num_connections
+            served += pool.num_requests
+    return {
+        'connections_opened': opened,
+        'requests_served': served,
+        'connections_reused': max(served - opened, 0),
+        'reuse_ratio': round((served - opened) / served, 3) if served else 0.0
+    }
+
+def get_client_metrics() -> Dict:
+    """Return per-provider request counters and per-host connection reuse stats"""
+    with _metrics_lock:
+        providers = {}
+        for provider, metrics in _provider_metrics.items():
+            providers[provider] = dict(metrics)
+            providers[provider]['avg_latency_ms'] = round(metrics['total_latency_ms'] / metrics['requests'], 1)
+            providers[provider]['total_latency_ms'] = round(metrics['total_latency_ms'], 1)
+
+    with _sessions_lock:
+        hosts = {host: _host_connection_stats(session) for host, session in _sessions.items()}
+
+    return {
+        'providers': providers,
+        'hosts': hosts
+    }
+
+def close_sessions():
+    """Close every pooled session (used at shutdown and in tests)"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
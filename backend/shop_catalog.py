@@ -0,0 +1,254 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import selectinload
+from spatial_index import GeoGridIndex
+from inventory_index import InventoryIndex
+from models import SessionLocal, Shop
+from catalog_loader import load_shops
+from mock_data import MOCK_SHOPS
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class ShopCatalog:
+    """
+    Interface for a source of shops that can answer radius queries
+
+    Shops are dicts with at least "location" ({"lat", "lng"}) and "inventory" (List[str]),
+    the same shape as mock_data.MOCK_SHOPS values. Implementations decide how shops are
+    stored and indexed.
+    """
+
+    def shops_within(self, location: Dict, radius_km: float) -> List[Tuple[str, Dict, float]]:
+        """
+        Find shops within radius_km of a location
+
+        Args:
+            location (Dict): {"lat": float, "lng": float}
+            radius_km (float): Inclusive radius in kilometers
+
+        Returns:
+            List[Tuple[str, Dict, float]]: (shop name, shop data, distance_km) in catalog order
+        """
+        raise NotImplementedError
+
+    def shops_in_box(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Tuple[str, Dict]]:
+        """
+        Find shops inside a lat/lng box (edges included, min_lng <= max_lng)
+
+        Returns:
+            List[Tuple[str, Dict]]: (shop name, shop data) in catalog order
+        """
+        return [(shop_name, shop_data) for shop_name, shop_data in self.items()
+                if min_lat <= shop_data["location"]["lat"] <= max_lat
+                and min_lng <= shop_data["location"]["lng"] <= max_lng]
+
+    def get(self, shop_name: str) -> Optional[Dict]:
+        """Return a shop by name, or None"""
+        raise NotImplementedError
+
+    @property
+    def inventory_index(self) -> Optional[InventoryIndex]:
+        """Inverted inventory index over the catalog, or None to match inventories one by one"""
+        return None
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        """Iterate over (shop name, shop data) in catalog order"""
+        raise NotImplementedError
+
+    def snapshot(self) -> 'ShopCatalog':
+        """A catalog that stays consistent across several queries (itself unless the catalog changes underneath)"""
+        return self
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class InMemoryShopCatalog(ShopCatalog):
+    """
+    Shop catalog over an in-memory dict, indexed with a lat/lng grid
+
+    Args:
+        shops (Dict[str, Dict]): Shop name -> shop data
+        cell_km (float): Grid cell size, see GeoGridIndex
+    """
+
+    def __init__(self, shops: Dict[str, Dict], cell_km: float = Config.SHOP_INDEX_CELL_KM):
+        self._shops = dict(shops)
+        self._index = GeoGridIndex(cell_km)
+        for shop_name, shop_data in self._shops.items():
+            self._index.insert(shop_name, shop_data["location"]["lat"], shop_data["location"]["lng"])
+        self._inventory_index = InventoryIndex(
+            (shop_name, shop_data["inventory"]) for shop_name, shop_data in self._shops.items()
+        )
+
+    def shops_within(self, location: Dict, radius_km: float) -> List[Tuple[str, Dict, float]]:
+        return [
+            (shop_name, self._shops[shop_name], distance_km)
+            for shop_name, distance_km in self._index.query_radius(location["lat"], location["lng"], radius_km)
+        ]
+
+    def shops_in_box(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Tuple[str, Dict]]:
+        return [(shop_name, self._shops[shop_name])
+                for shop_name in self._index.query_box(min_lat, min_lng, max_lat, max_lng)]
+
+    def get(self, shop_name: str) -> Optional[Dict]:
+        return self._shops.get(shop_name)
+
+    @property
+    def inventory_index(self) -> Optional[InventoryIndex]:
+        return self._inventory_index
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        return iter(self._shops.items())
+
+    def __len__(self):
+        return len(self._shops)
+
+
+class DatabaseShopCatalog(ShopCatalog):
+    """
+    Shop catalog over the shops table, served from a read-optimized in-memory snapshot
+
+    The snapshot is an InMemoryShopCatalog (spatial grid and inventory index) over the
+    active shops in shop id order. Every refresh_seconds only shops whose updated_at moved
+    past the last one seen are read back, with their inventories; when any of them
+    changed, a new snapshot is built from the kept shop dicts and swapped in, so readers
+    never see a half-updated catalog. Queries go to the current snapshot; callers that
+    issue several queries for one request should take snapshot() once.
+
+    Only the first load blocks a request. After that a stale snapshot() starts one
+    background refresh and keeps serving the current snapshot until the new one is in.
+
+    Args:
+        session_factory: Callable returning a SQLAlchemy session
+        refresh_seconds (float): How often to look for changed shops
+        cell_km (float): Grid cell size, see GeoGridIndex
+        seed_shops (Optional[Dict[str, Dict]]): Loaded into the table when it has no shops
+    """
+
+    def __init__(self, session_factory=SessionLocal,
+                 refresh_seconds: float = Config.SHOP_CATALOG_REFRESH_SECONDS,
+                 cell_km: float = Config.SHOP_INDEX_CELL_KM, seed_shops: Optional[Dict[str, Dict]] = None):
+        self.session_factory = session_factory
+        self.refresh_seconds = refresh_seconds
+        self.cell_km = cell_km
+        self.seed_shops = seed_shops
+        self._shops: Dict[int, Tuple[str, Dict]] = {}  # Shop id -> (name, shop data), active shops only
+        self._snapshot = InMemoryShopCatalog({}, cell_km)
+        self._loaded = False
+        self._watermark = None  # Latest updated_at applied
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> int:
+        """
+        Apply shops changed since the last refresh
+
+        Returns:
+            int: Shops added, changed or removed in the snapshot
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        # Caller holds self._lock
+        db = self.session_factory()
+        try:
+            if not self._loaded and self.seed_shops and db.query(Shop.id).first() is None:
+                logger.info(f"Seeding empty shops table with {len(self.seed_shops)} built-in shops")
+                load_shops(({"name": name, **shop} for name, shop in self.seed_shops.items()),
+                           self.session_factory)
+
+            query = db.query(Shop).options(selectinload(Shop.inventory_items))
+            if self._watermark is not None:
+                # >= re-reads rows stamped in the same instant as the last refresh; unchanged ones are skipped
+                query = query.filter(Shop.updated_at >= self._watermark)
+            rows = query.all()
+
+            changed = 0
+            for row in rows:
+                if self._watermark is None or row.updated_at > self._watermark:
+                    self._watermark = row.updated_at
+                current = self._shops.get(row.id)
+                if not row.is_active:
+                    if current is not None:
+                        del self._shops[row.id]
+                        changed += 1
+                    continue
+                shop_data = {
+                    "location": {"lat": row.lat, "lng": row.lng},
+                    "inventory": [item.item_name for item in sorted(row.inventory_items, key=lambda item: item.id)]
+                }
+                if current != (row.name, shop_data):
+                    self._shops[row.id] = (row.name, shop_data)
+                    changed += 1
+
+            if changed or not self._loaded:
+                self._snapshot = InMemoryShopCatalog(
+                    {name: shop_data for _, (name, shop_data) in sorted(self._shops.items())}, self.cell_km
+                )
+                logger.info(f"Shop catalog refreshed: {changed} shops changed, {len(self._shops)} active")
+            self._loaded = True
+            return changed
+
+        except Exception as e:
+            logger.error(f"Error refreshing shop catalog: {e}")
+            if not self._loaded and self.seed_shops:
+                # Serve the built-in shops rather than nothing until the database is reachable
+                self._snapshot = InMemoryShopCatalog(self.seed_shops, self.cell_km)
+            return 0
+        finally:
+            self._refreshed_at = time.monotonic()
+            db.close()
+
+    def _stale(self) -> bool:
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_seconds
+
+    def _refresh_in_background(self):
+        # Runs with the lock taken by snapshot(); skips the work if a refresh just happened
+        try:
+            if self._stale():
+                self._refresh()
+        finally:
+            self._lock.release()
+
+    def snapshot(self) -> InMemoryShopCatalog:
+        if self._stale():
+            if not self._loaded:
+                # Nothing to serve yet, so the first load happens on this thread
+                with self._lock:
+                    if not self._loaded:
+                        self._refresh()
+            elif self._lock.acquire(blocking=False):
+                try:
+                    threading.Thread(target=self._refresh_in_background, name='shop-catalog-refresh', daemon=True).start()
+                except Exception:
+                    self._lock.release()
+                    raise
+        return self._snapshot
+
+    def shops_within(self, location: Dict, radius_km: float) -> List[Tuple[str, Dict, float]]:
+        return self.snapshot().shops_within(location, radius_km)
+
+    def shops_in_box(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Tuple[str, Dict]]:
+        return self.snapshot().shops_in_box(min_lat, min_lng, max_lat, max_lng)
+
+    def get(self, shop_name: str) -> Optional[Dict]:
+        return self.snapshot().get(shop_name)
+
+    @property
+    def inventory_index(self) -> Optional[InventoryIndex]:
+        return self.snapshot().inventory_index
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        return self.snapshot().items()
+
+    def __len__(self):
+        return len(self.snapshot())
+
+
+# Shared catalog over the shops table, seeded with the built-in shops when empty
+shop_catalog = DatabaseShopCatalog(seed_shops=MOCK_SHOPS if Config.SHOP_CATALOG_SEED_MOCK_SHOPS else None)
@@ -0,0 +1,293 @@
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import numpy as np
+from geo_kernel import EARTH_RADIUS_KM, GeoPoints, distances_from
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+HALF_EARTH_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM  # No two points are farther apart
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometers"""
+    lat1_rad = math.radians(lat1)
+    lng1_rad = math.radians(lng1)
+    lat2_rad = math.radians(lat2)
+    lng2_rad = math.radians(lng2)
+
+    dlat = lat2_rad - lat1_rad
+    dlng = lng2_rad - lng1_rad
+
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
+def grid_cell(lat: float, lng: float, cell_deg: float, lng_cells: int) -> Tuple[int, int]:
+    """(row, col) of the grid cell containing a point"""
+    row = math.floor((lat + 90) / cell_deg)
+    col = math.floor((lng + 180) / cell_deg) % lng_cells
+    return row, col
+
+def covering_cells(lat: float, lng: float, radius_km: float, cell_deg: float,
+                   lng_cells: int) -> Tuple[int, int, Iterable[int]]:
+    """
+    Grid cells overlapping the bounding box of a radius around (lat, lng)
+
+    Returns:
+        Tuple[int, int, Iterable[int]]: (min_row, max_row, cols)
+    """
+    # Small margin so floating-point error at the box edge never drops a point
+    lat_span = radius_km / KM_PER_DEGREE_LAT + 1e-9
+    min_row = math.floor((max(lat - lat_span, -90) + 90) / cell_deg)
+    max_row = math.floor((min(lat + lat_span, 90) + 90) / cell_deg)
+
+    widest_lat = min(abs(lat) + lat_span, 90)
+    cos_lat = math.cos(math.radians(widest_lat))
+    if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE_LAT * cos_lat) >= 180:
+        return min_row, max_row, range(lng_cells)
+    lng_span = radius_km / (KM_PER_DEGREE_LAT * cos_lat) + 1e-9
+    min_col = math.floor((lng - lng_span + 180) / cell_deg)
+    max_col = math.floor((lng + lng_span + 180) / cell_deg)
+    return min_row, max_row, {col % lng_cells for col in range(min_col, max_col + 1)}
+
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+def geohash_encode(lat: float, lng: float, precision: int = 5) -> str:
+    """
+    Geohash of a point (precision 5 cells are about 4.9 x 4.9 km, 6 about 1.2 x 0.6 km)
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    value = 0
+    bits = 0
+    even = True  # Bits alternate longitude, latitude, starting with longitude
+    while len(chars) < precision:
+        coordinate, bounds = (lng, lng_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_BASE32[value])
+            value = 0
+            bits = 0
+    return ''.join(chars)
+
+
+class GeoGridIndex:
+    """
+    Fixed-size lat/lng grid for radius queries
+
+    Points are bucketed into cells of roughly cell_km on a side (at the equator). A radius
+    query only visits the cells overlapping the query's bounding box and then applies the
+    exact haversine distance, so it costs O(points near the query) instead of O(all points).
+    Longitude wraps at the antimeridian and queries near the poles widen to every longitude.
+
+    Args:
+        cell_km (float): Cell edge length in kilometers, best set near the typical query radius
+    """
+
+    def __init__(self, cell_km: float = 2.0):
+        self.cell_deg = cell_km / KM_PER_DEGREE_LAT
+        self.lng_cells = max(1, math.ceil(360 / self.cell_deg))
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self._keys: List[Hashable] = []
+        self._lats: List[float] = []
+        self._lngs: List[float] = []
+        self._points: Optional[GeoPoints] = None  # Packed coordinates, rebuilt after inserts
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return grid_cell(lat, lng, self.cell_deg, self.lng_cells)
+
+    def insert(self, key: Hashable, lat: float, lng: float):
+        """Add a point; keys are returned by queries in insertion order"""
+        self._cells.setdefault(self._cell(lat, lng), []).append(len(self._keys))
+        self._keys.append(key)
+        self._lats.append(lat)
+        self._lngs.append(lng)
+        self._points = None
+
+    def query_radius(self, lat: float, lng: float, radius_km: float) -> List[Tuple[Hashable, float]]:
+        """
+        Find every point within radius_km of (lat, lng)
+
+        Args:
+            lat (float): Query latitude
+            lng (float): Query longitude
+            radius_km (float): Inclusive search radius in kilometers
+
+        Returns:
+            List[Tuple[Hashable, float]]: (key, distance_km) pairs in insertion order
+        """
+        min_row, max_row, cols = covering_cells(lat, lng, radius_km, self.cell_deg, self.lng_cells)
+
+        candidates = []
+        cells = self._cells
+        for row in range(min_row, max_row + 1):
+            for col in cols:
+                candidates.extend(cells.get((row, col), ()))
+        if not candidates:
+            return []
+
+        if self._points is None:
+            self._points = GeoPoints(self._lats, self._lngs)
+        candidates = np.sort(np.fromiter(candidates, dtype=np.intp, count=len(candidates)))
+        distances = distances_from(lat, lng, self._points.take(candidates))
+        within = distances <= radius_km
+
+        keys = self._keys
+        return [(keys[position], distance_km)
+                for position, distance_km in zip(candidates[within].tolist(), distances[within].tolist())]
+
+    def query_box(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Hashable]:
+        """
+        Find every point inside a lat/lng box (edges included)
+
+        Walks the cells the box covers; a box covering more cells than hold points (very
+        wide boxes, or boxes reaching the poles) scans the points instead.
+
+        Args:
+            min_lat, min_lng, max_lat, max_lng (float): The box, with min_lng <= max_lng
+
+        Returns:
+            List[Hashable]: Keys in insertion order
+        """
+        min_row = math.floor((max(min_lat, -90) + 90) / self.cell_deg)
+        max_row = math.floor((min(max_lat, 90) + 90) / self.cell_deg)
+        min_col = math.floor((min_lng + 180) / self.cell_deg)
+        max_col = math.floor((max_lng + 180) / self.cell_deg)
+        if min_row > max_row or min_col > max_col:
+            return []
+
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+            candidates = range(len(self._keys))
+        else:
+            cols = {col % self.lng_cells for col in range(min_col, max_col + 1)}
+            candidates = sorted(position for row in range(min_row, max_row + 1) for col in cols
+                                for position in self._cells.get((row, col), ()))
+
+        lats, lngs, keys = self._lats, self._lngs, self._keys
+        return [keys[position] for position in candidates
+                if min_lat <= lats[position] <= max_lat and min_lng <= lngs[position] <= max_lng]
+
+
+class DynamicGeoGridIndex:
+    """
+    Lat/lng grid over points that move, appear and disappear
+
+    Same cell layout as GeoGridIndex, but each cell holds a key -> (lat, lng) dict so
+    upserts and removals are O(1). Besides radius queries it answers k-nearest queries
+    by searching a growing radius until k points are inside it, which visits only the
+    cells near the query point. Queries visit whichever is smaller: the cells covering
+    the search box or the occupied cells, so sparse grids stay cheap at large radii.
+
+    Args:
+        cell_km (float): Cell edge length in kilometers
+    """
+
+    def __init__(self, cell_km: float = 2.0):
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / KM_PER_DEGREE_LAT
+        self.lng_cells = max(1, math.ceil(360 / self.cell_deg))
+        self._cells: Dict[Tuple[int, int], Dict[Hashable, Tuple[float, float]]] = {}
+        self._key_cells: Dict[Hashable, Tuple[int, int]] = {}
+        self._rank: Dict[Hashable, int] = {}  # First-insertion order, breaks distance ties
+
+    def __len__(self):
+        return len(self._key_cells)
+
+    def __contains__(self, key: Hashable):
+        return key in self._key_cells
+
+    def upsert(self, key: Hashable, lat: float, lng: float):
+        """Add a point or move an existing one"""
+        cell = grid_cell(lat, lng, self.cell_deg, self.lng_cells)
+        previous = self._key_cells.get(key)
+        if previous is not None and previous != cell:
+            self._discard(key, previous)
+        self._cells.setdefault(cell, {})[key] = (lat, lng)
+        self._key_cells[key] = cell
+        self._rank.setdefault(key, len(self._rank))
+
+    def remove(self, key: Hashable) -> bool:
+        """Remove a point; returns False when it was not indexed"""
+        cell = self._key_cells.pop(key, None)
+        if cell is None:
+            return False
+        self._discard(key, cell)
+        return True
+
+    def _discard(self, key: Hashable, cell: Tuple[int, int]):
+        points = self._cells[cell]
+        del points[key]
+        if not points:
+            del self._cells[cell]
+
+    def _candidates(self, lat: float, lng: float, radius_km: float) -> List[Tuple[Hashable, Tuple[float, float]]]:
+        min_row, max_row, cols = covering_cells(lat, lng, radius_km, self.cell_deg, self.lng_cells)
+        candidates = []
+        if (max_row - min_row + 1) * len(cols) <= len(self._cells):
+            cells = self._cells
+            for row in range(min_row, max_row + 1):
+                for col in cols:
+                    points = cells.get((row, col))
+                    if points:
+                        candidates.extend(points.items())
+        else:
+            if not isinstance(cols, range):
+                cols = set(cols)
+            for (row, col), points in self._cells.items():
+                if min_row <= row <= max_row and col in cols:
+                    candidates.extend(points.items())
+        return candidates
+
+    def query_radius(self, lat: float, lng: float, radius_km: float) -> List[Tuple[Hashable, float]]:
+        """
+        Find every point within radius_km of (lat, lng)
+
+        Returns:
+            List[Tuple[Hashable, float]]: (key, distance_km) pairs, nearest first
+        """
+        candidates = self._candidates(lat, lng, radius_km)
+        if not candidates:
+            return []
+        points = GeoPoints([point[0] for _, point in candidates], [point[1] for _, point in candidates])
+        distances = distances_from(lat, lng, points).tolist()
+        rank = self._rank
+        found = [(key, distance_km) for (key, _), distance_km in zip(candidates, distances) if distance_km <= radius_km]
+        found.sort(key=lambda item: (item[1], rank[item[0]]))
+        return found
+
+    def nearest(self, lat: float, lng: float, k: int = 1,
+                max_distance_km: Optional[float] = None) -> List[Tuple[Hashable, float]]:
+        """
+        Find the k points nearest to (lat, lng)
+
+        Args:
+            lat (float): Query latitude
+            lng (float): Query longitude
+            k (int): Number of points to return
+            max_distance_km (Optional[float]): Ignore points farther than this
+
+        Returns:
+            List[Tuple[Hashable, float]]: Up to k (key, distance_km) pairs, nearest first;
+            equal distances keep first-insertion order
+        """
+        if k <= 0 or not self._key_cells:
+            return []
+        limit = HALF_EARTH_CIRCUMFERENCE_KM if max_distance_km is None else min(max_distance_km, HALF_EARTH_CIRCUMFERENCE_KM)
+        radius_km = min(self.cell_km, limit)
+        while True:
+            # Every point within radius_km is found, so once k of them are, they are the k nearest
+            found = self.query_radius(lat, lng, radius_km)
+            if len(found) >= k or radius_km >= limit:
+                return found[:k]
+            radius_km = min(radius_km * 2, limit)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for the delivery agent registry
+"""
+
+import random
+import threading
+
+import pytest
+
+from agent_registry import AgentRegistry
+from delivery_service import assign_delivery_agent, calculate_distance, release_delivery_agent
+from mock_data import DELIVERY_AGENTS
+from spatial_index import DynamicGeoGridIndex
+
+SHOP = {"lat": 37.7849, "lng": -122.4094}
+
+def make_agents(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {"id": f"agent_{i}", "name": f"Agent {i}", "status": "available",
+         "current_location": {"lat": 37.77 + rng.uniform(-0.2, 0.2), "lng": -122.42 + rng.uniform(-0.2, 0.2)}}
+        for i in range(count)
+    ]
+
+def brute_force_nearest(agents, location, k):
+    available = [a for a in agents if a["status"] == "available"]
+    return [a["id"] for a in sorted(available, key=lambda a: calculate_distance(
+        location["lat"], location["lng"], a["current_location"]["lat"], a["current_location"]["lng"]))[:k]]
+
+def test_nearest_available_matches_brute_force():
+    agents = make_agents(500)
+    registry = AgentRegistry(agents)
+    rng = random.Random(1)
+    for agent in agents[::3]:
+        registry.set_status(agent["id"], "busy")
+    for agent in agents[1::7]:
+        lat, lng = 37.77 + rng.uniform(-0.2, 0.2), -122.42 + rng.uniform(-0.2, 0.2)
+        registry.update_location(agent["id"], lat, lng)
+    snapshot = registry.agents()
+    for _ in range(50):
+        location = {"lat": 37.77 + rng.uniform(-0.3, 0.3), "lng": -122.42 + rng.uniform(-0.3, 0.3)}
+        k = rng.randint(1, 10)
+        found = [agent["id"] for agent, _ in registry.nearest_available(location, k)]
+        assert found == brute_force_nearest(snapshot, location, k)
+
+def test_nearest_respects_max_distance():
+    registry = AgentRegistry(DELIVERY_AGENTS)
+    nearby = registry.nearest_available(SHOP, k=5, max_distance_km=1.0)
+    assert nearby and all(distance_km <= 1.0 for _, distance_km in nearby)
+    assert registry.nearest_available({"lat": 0.0, "lng": 0.0}, max_distance_km=100) == []
+
+def test_claim_and_release_cycle():
+    registry = AgentRegistry(DELIVERY_AGENTS)
+    agent, distance_km = registry.claim_nearest(SHOP)
+    assert agent["id"] == "agent_002" and distance_km == 0
+    assert registry.get("agent_002")["status"] == "busy"
+    assert registry.claim("agent_002") is None
+    assert registry.claim_nearest(SHOP)[0]["id"] != "agent_002"
+
+    assert registry.release("agent_002", {"lat": 37.70, "lng": -122.50})
+    assert not registry.release("agent_002")
+    released = registry.get("agent_002")
+    assert released["status"] == "available"
+    assert released["current_location"] == {"lat": 37.70, "lng": -122.50}
+
+def test_status_transitions():
+    registry = AgentRegistry(DELIVERY_AGENTS)
+    assert registry.set_status("agent_001", "offline")
+    assert not registry.set_status("agent_001", "busy")
+    assert registry.claim("agent_001") is None
+    assert registry.set_status("agent_001", "available")
+    assert not registry.set_status("missing", "available")
+    with pytest.raises(ValueError):
+        registry.set_status("agent_001", "on_break")
+    assert registry.available_count() == len(DELIVERY_AGENTS)
+
+def test_claims_expire_after_lease():
+    now = [0.0]
+    registry = AgentRegistry(DELIVERY_AGENTS, claim_ttl_seconds=60, clock=lambda: now[0])
+    registry.claim("agent_001")
+    now[0] = 59
+    assert registry.get("agent_001")["status"] == "busy"
+    now[0] = 60
+    assert registry.get("agent_001")["status"] == "available"
+
+    # A release followed by a new claim starts a fresh lease
+    registry.claim("agent_001")
+    registry.release("agent_001")
+    registry.claim("agent_001")
+    now[0] = 119
+    assert registry.get("agent_001")["status"] == "busy"
+
+def test_stale_claims_cannot_release_a_reclaimed_agent():
+    now = [0.0]
+    registry = AgentRegistry(DELIVERY_AGENTS, claim_ttl_seconds=60, clock=lambda: now[0])
+    first = registry.claim("agent_001")["claim_id"]
+    now[0] = 60
+    second = registry.claim("agent_001")["claim_id"]
+    assert not registry.release("agent_001", claim_id=first)
+    assert registry.get("agent_001")["status"] == "busy"
+    assert registry.release("agent_001", claim_id=second)
+
+def test_snapshots_are_detached():
+    registry = AgentRegistry(DELIVERY_AGENTS)
+    registry.get("agent_001")["current_location"]["lat"] = 0
+    assert registry.get("agent_001")["current_location"]["lat"] == 37.7749
+    assert DELIVERY_AGENTS[0]["status"] == "available"
+
+def test_concurrent_claims_never_share_an_agent():
+    registry = AgentRegistry(make_agents(50), claim_ttl_seconds=0)
+    claimed = []
+    barrier = threading.Barrier(16)
+
+    def worker():
+        barrier.wait()
+        for _ in range(5):
+            result = registry.claim_nearest(SHOP)
+            if result:
+                claimed.append(result[0]["id"])
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(claimed) == 50
+    assert len(set(claimed)) == 50
+    assert registry.available_count() == 0
+
+def test_assign_and_release_delivery_agent():
+    registry = AgentRegistry(DELIVERY_AGENTS)
+    preview = assign_delivery_agent(SHOP, registry=registry, claim=False)
+    assigned = assign_delivery_agent(SHOP, registry=registry, claim=True)
+    assert {**preview, "claim_id": assigned["claim_id"]} == assigned
+    assert assigned["name"] == "Agent B"
+    assert assign_delivery_agent(SHOP, registry=registry, claim=True)["name"] != "Agent B"
+    assert not release_delivery_agent(assigned["id"], registry=registry, claim_id="someone else")
+    assert release_delivery_agent(assigned["id"], registry=registry, claim_id=assigned["claim_id"])
+    assert registry.get(assigned["id"])["status"] == "available"
+
+def test_dynamic_grid_moves_and_removals():
+    index = DynamicGeoGridIndex(1.0)
+    index.upsert("a", 0.0, 0.0)
+    index.upsert("b", 0.0, 0.05)
+    index.upsert("a", 10.0, 10.0)
+    assert [key for key, _ in index.nearest(0.0, 0.0, 2)] == ["b", "a"]
+    assert index.remove("b") and not index.remove("b")
+    assert [key for key, _ in index.nearest(0.0, 0.0, 5)] == ["a"]
+    assert len(index) == 1
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled allergen matcher
+"""
+
+import random
+
+from allergy_service import COMMON_ALLERGENS, check_ingredients_for_allergies, get_allergen_matcher
+
+def legacy_details(ingredients, user_allergies):
+    """The original nested loops from check_ingredients_for_allergies"""
+    details = []
+    user_allergies_lower = [allergy.lower() for allergy in user_allergies]
+    for ingredient in ingredients:
+        ingredient_name = ingredient.get('ingredient', '').lower()
+        for allergen_name, allergen_data in COMMON_ALLERGENS.items():
+            if allergen_name in user_allergies_lower:
+                for keyword in allergen_data['keywords']:
+                    if keyword in ingredient_name:
+                        details.append({"allergen": allergen_name, "ingredient": ingredient.get('ingredient', ''), "type": "keyword_match"})
+                        break
+                for related in allergen_data['related']:
+                    if related in ingredient_name:
+                        details.append({"allergen": allergen_name, "ingredient": ingredient.get('ingredient', ''), "type": "related_match"})
+                        break
+        for custom_allergy in user_allergies_lower:
+            if custom_allergy not in COMMON_ALLERGENS:
+                if custom_allergy in ingredient_name or ingredient_name in custom_allergy:
+                    details.append({"allergen": custom_allergy, "ingredient": ingredient.get('ingredient', ''), "type": "custom_match"})
+    return details
+
+INGREDIENTS = [
+    'Peanut Butter', 'Almond Milk', 'Fish Sauce', 'Shrimp Paste', 'Whole Milk', 'Sour Cream',
+    'Egg White', 'Soy Sauce', 'Wheat Flour', 'Sesame Oil', 'Cod Fillet', 'Basmati Rice',
+    'Kiwi', 'Strawberries', 'Cashew Milk', 'Tofu', 'Pasta', 'Buttermilk', '', 'Mustard Seeds'
+]
+
+def test_matches_original_loops_for_random_profiles():
+    rng = random.Random(11)
+    allergy_pool = list(COMMON_ALLERGENS) + ['kiwi', 'Strawberry', 'mustard', 'rice', 'milk', 'basmati rice extra', 'Kiwi']
+    for _ in range(300):
+        allergies = rng.sample(allergy_pool, rng.randint(0, 6))
+        ingredients = [{'ingredient': name} for name in rng.sample(INGREDIENTS, 8)]
+        result = check_ingredients_for_allergies(ingredients, allergies)
+        expected = legacy_details(ingredients, allergies)
+        assert result['allergen_details'] == expected
+        assert result['found_allergens'] == list(dict.fromkeys(detail['allergen'] for detail in expected))
+
+def test_keyword_and_related_both_reported():
+    result = check_ingredients_for_allergies([{'ingredient': 'Fish Sauce'}], ['fish', 'shellfish'])
+    assert [(d['allergen'], d['type']) for d in result['allergen_details']] == [
+        ('shellfish', 'related_match'), ('fish', 'keyword_match'), ('fish', 'related_match')
+    ]
+    assert result['has_allergens'] is True
+    assert result['warning_message'].startswith('⚠️')
+
+def test_custom_allergy_contains_ingredient_name():
+    result = check_ingredients_for_allergies([{'ingredient': 'Rice'}], ['basmati rice'])
+    assert result['allergen_details'] == [{'allergen': 'basmati rice', 'ingredient': 'Rice', 'type': 'custom_match'}]
+
+def test_matcher_is_cached_per_allergy_list():
+    assert get_allergen_matcher(('dairy', 'kiwi')) is get_allergen_matcher(('dairy', 'kiwi'))
+    assert get_allergen_matcher(('dairy',)) is not get_allergen_matcher(('dairy', 'kiwi'))
+
+def test_user_profile_is_cached_and_invalidated(monkeypatch):
+    import allergy_service
+    from models import SessionLocal, User, UserAllergy
+
+    db = SessionLocal()
+    user = User(name='Allergy Test', email=f'allergy-{random.random()}@example.com', password_hash='x')
+    db.add(user)
+    db.commit()
+    user_id = user.id
+
+    loads = []
+    real_get_allergen_matcher = allergy_service.get_allergen_matcher
+    def counting_get_allergen_matcher(allergies):
+        loads.append(allergies)
+        return real_get_allergen_matcher(allergies)
+    monkeypatch.setattr(allergy_service, 'get_allergen_matcher', counting_get_allergen_matcher)
+
+    sessions = []
+    def counting_session_factory():
+        sessions.append(1)
+        return SessionLocal()
+
+    allergy_service.add_user_allergy(db, user_id, 'Dairy', 'common')
+    for _ in range(3):
+        assert allergy_service.get_user_allergy_matcher(user_id, counting_session_factory).user_allergies == ('dairy',)
+    assert len(loads) == 1
+    assert len(sessions) == 1  # Cache hits never touch the database
+
+    result = allergy_service.add_user_allergy(db, user_id, 'kiwi')
+    assert allergy_service.get_user_allergy_matcher(user_id).user_allergies == ('dairy', 'kiwi')
+    assert len(loads) == 2
+
+    allergy_service.remove_user_allergy(db, user_id, result['allergy']['id'])
+    assert allergy_service.get_user_allergy_matcher(user_id).user_allergies == ('dairy',)
+    assert len(loads) == 3
+
+    # Another worker process changes the allergies: no local invalidation reaches this one
+    db.add(UserAllergy(user_id=user_id, allergy_name='sesame', allergy_type='common'))
+    allergy_service.bump_allergy_profile_version(db, user_id)
+    db.commit()
+    assert allergy_service.get_user_allergy_matcher(user_id).user_allergies == ('dairy',)
+    monkeypatch.setattr(allergy_service.Config, 'ALLERGY_PROFILE_VERSION_CHECK_SECONDS', 0)
+    assert allergy_service.get_user_allergy_matcher(user_id).user_allergies == ('dairy', 'sesame')
+    assert len(loads) == 4
+    db.close()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for multi-shop basket planning
+"""
+
+import itertools
+import random
+
+from basket_planner import basket_as_top_shop, min_cost_cover, plan_basket
+from delivery_service import find_and_rank_shops
+from shop_catalog import InMemoryShopCatalog
+
+USER = {"lat": 37.7749, "lng": -122.4194}
+
+def ingredient(name):
+    return {"ingredient": name, "quantity": 1, "unit": "piece"}
+
+def shop(lat_offset, inventory):
+    return {"location": {"lat": USER["lat"] + lat_offset, "lng": USER["lng"]}, "inventory": inventory}
+
+def brute_force_cover(masks, costs, target, max_sets):
+    best = None
+    for size in range(1, max_sets + 1):
+        for combo in itertools.combinations(range(len(masks)), size):
+            covered = 0
+            for index in combo:
+                covered |= masks[index]
+            if covered & target == target:
+                cost = sum(costs[index] for index in combo)
+                if best is None or cost < best:
+                    best = cost
+    return best
+
+def test_min_cost_cover_is_optimal():
+    rng = random.Random(0)
+    for _ in range(200):
+        elements = rng.randint(1, 10)
+        masks = [rng.getrandbits(elements) for _ in range(rng.randint(1, 12))]
+        costs = [rng.uniform(0.5, 6) for _ in masks]
+        target = 0
+        for mask in masks:
+            target |= mask
+        max_sets = rng.randint(1, 4)
+        chosen = min_cost_cover(masks, costs, target, max_sets)
+        expected = brute_force_cover(masks, costs, target, max_sets) if target else 0
+        if expected is None:
+            assert chosen is None
+            continue
+        assert len(chosen) <= max_sets
+        covered = 0
+        for index in chosen:
+            covered |= masks[index]
+        assert covered & target == target
+        assert abs(sum(costs[index] for index in chosen) - expected) < 1e-9
+
+def test_two_shops_cover_what_neither_covers_alone():
+    shops = {
+        "Bakery": shop(0.005, ["flour", "yeast", "sugar"]),
+        "Dairy": shop(-0.005, ["milk", "butter", "mozzarella"]),
+        "Far Market": shop(0.2, ["flour", "yeast", "sugar", "milk", "butter", "mozzarella"]),
+    }
+    ingredients = [ingredient(name) for name in ["flour", "milk", "yeast", "butter", "mozzarella cheese"]]
+    assert find_and_rank_shops(USER, ingredients, shops, max_distance_km=5, min_match_percent=80) == []
+
+    plan = plan_basket(USER, ingredients, shops, max_distance_km=5, min_match_percent=80)
+    assert {stop["name"] for stop in plan["stops"]} == {"Bakery", "Dairy"}
+    items = {stop["name"]: [item["ingredient"] for item in stop["items"]] for stop in plan["stops"]}
+    assert items["Bakery"] == ["flour", "yeast"]
+    assert items["Dairy"] == ["milk", "butter", "mozzarella cheese"]
+    assert plan["match_percent"] == 100.0
+    assert plan["unavailable_ingredients"] == []
+
+    summary = basket_as_top_shop(plan)
+    assert summary["location"] == plan["stops"][0]["location"]
+    assert len(summary["available_ingredients"]) == 5
+
+def test_stop_cost_trades_distance_for_fewer_stops():
+    shops = {
+        "Near A": shop(0.005, ["flour"]),
+        "Near B": shop(-0.005, ["milk"]),
+        "One Stop": shop(0.02, ["flour", "milk"]),
+    }
+    ingredients = [ingredient("flour"), ingredient("milk")]
+    cheap_stops = plan_basket(USER, ingredients, shops, stop_cost_km=0.1)
+    costly_stops = plan_basket(USER, ingredients, shops, stop_cost_km=5)
+    assert cheap_stops["shop_count"] == 2
+    assert [stop["name"] for stop in costly_stops["stops"]] == ["One Stop"]
+
+def test_unavailable_ingredients_and_thresholds():
+    shops = {"Bakery": shop(0.005, ["flour"]), "Dairy": shop(-0.005, ["milk"])}
+    ingredients = [ingredient("flour"), ingredient("milk"), ingredient("saffron")]
+    plan = plan_basket(USER, ingredients, shops, min_match_percent=60)
+    assert [item["ingredient"] for item in plan["unavailable_ingredients"]] == ["saffron"]
+    assert plan["available_count"] == 2
+    assert plan_basket(USER, ingredients, shops, min_match_percent=80) is None
+    assert plan_basket(USER, ingredients, shops, max_shops=1) is None
+
+    # Covering everything would take two stops; one stop still reaches 50%
+    one_stop = plan_basket(USER, ingredients[:2], shops, min_match_percent=50, max_shops=1)
+    assert one_stop["shop_count"] == 1 and one_stop["match_percent"] == 50.0
+    assert len(one_stop["unavailable_ingredients"]) == 1
+    assert plan_basket(USER, [], shops) is None
+
+def test_pickup_route_ends_nearest_the_user():
+    shops = {
+        "Near": shop(0.002, ["flour"]),
+        "Mid": shop(0.01, ["milk"]),
+        "Far": shop(0.03, ["eggs"]),
+    }
+    catalog = InMemoryShopCatalog(shops)
+    plan = plan_basket(USER, [ingredient("flour"), ingredient("milk"), ingredient("eggs")], catalog)
+    assert [stop["name"] for stop in plan["stops"]] == ["Far", "Mid", "Near"]
+    # Far -> Mid -> Near -> user along one meridian is just Far's distance
+    assert abs(plan["route_km"] - plan["stops"][0]["distance_km"]) <= 0.1
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the bulk catalog loader and the database-backed shop catalog
+"""
+
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from catalog_loader import deactivate_shops, load_agents, load_shops, read_agents, read_shop_file
+from mock_data import MOCK_SHOPS, DELIVERY_AGENTS
+from models import SessionLocal, Shop, ShopInventoryItem, Agent
+from shop_catalog import DatabaseShopCatalog, InMemoryShopCatalog
+
+SHOPS = [{"name": name, **shop} for name, shop in MOCK_SHOPS.items()]
+
+@pytest.fixture(autouse=True)
+def empty_tables():
+    db = SessionLocal()
+    for model in (ShopInventoryItem, Shop, Agent):
+        db.query(model).delete()
+    db.commit()
+    db.close()
+
+def test_csv_and_json_dumps_round_trip(tmp_path):
+    csv_path = tmp_path / "shops.csv"
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "lat", "lng", "inventory"])
+        for shop in SHOPS:
+            writer.writerow([shop["name"], shop["location"]["lat"], shop["location"]["lng"], "|".join(shop["inventory"])])
+    json_path = tmp_path / "shops.json"
+    json_path.write_text(json.dumps(MOCK_SHOPS))
+
+    assert list(read_shop_file(str(csv_path))) == SHOPS
+    assert list(read_shop_file(str(json_path))) == SHOPS
+
+def test_catalog_matches_in_memory_catalog():
+    counts = load_shops(SHOPS, batch_size=2)
+    assert counts == {"inserted": len(SHOPS), "updated": 0,
+                      "items": sum(len(shop["inventory"]) for shop in SHOPS)}
+
+    catalog = DatabaseShopCatalog(refresh_seconds=3600)
+    expected = InMemoryShopCatalog(MOCK_SHOPS)
+    assert list(catalog.items()) == list(expected.items())
+    location = {"lat": 37.77, "lng": -122.42}
+    assert catalog.shops_within(location, 3) == expected.shops_within(location, 3)
+    assert catalog.inventory_index.shop_names == list(MOCK_SHOPS)
+
+def test_refresh_applies_only_changed_shops():
+    load_shops(SHOPS)
+    catalog = DatabaseShopCatalog(refresh_seconds=3600)
+    before = catalog.snapshot()
+    assert catalog.refresh() == 0
+
+    load_shops([{"name": "Fresh Mart", "location": {"lat": 37.78, "lng": -122.41}, "inventory": ["truffle"]},
+                {"name": "Night Owl", "location": {"lat": 37.77, "lng": -122.42}, "inventory": ["milk"]}])
+    assert catalog.refresh() == 2
+    assert catalog.get("Fresh Mart") == {"location": {"lat": 37.78, "lng": -122.41}, "inventory": ["truffle"]}
+    assert [name for name, _ in catalog.items()][-1] == "Night Owl"
+    assert catalog.inventory_index.availability("truffle") == catalog.inventory_index.shop_bits["Fresh Mart"]
+    # Snapshots already handed out are left alone
+    assert before.get("Fresh Mart") == MOCK_SHOPS["Fresh Mart"]
+    assert before.get("Night Owl") is None
+
+    assert deactivate_shops(["Night Owl"]) == 1
+    assert catalog.refresh() == 1
+    assert catalog.get("Night Owl") is None
+    assert len(catalog) == len(MOCK_SHOPS)
+
+def test_stale_snapshots_refresh_in_the_background():
+    load_shops(SHOPS)
+    catalog = DatabaseShopCatalog(refresh_seconds=3600)
+    before = catalog.snapshot()
+
+    refreshes = []
+    started, release = threading.Event(), threading.Event()
+    real_refresh = catalog._refresh
+    def slow_refresh():
+        refreshes.append(threading.current_thread().name)
+        started.set()
+        release.wait(10)
+        return real_refresh()
+    catalog._refresh = slow_refresh
+
+    load_shops([{"name": "Night Owl", "location": {"lat": 37.77, "lng": -122.42}, "inventory": ["milk"]}])
+    catalog.refresh_seconds = 0
+    # Readers keep getting the current snapshot while one refresh runs off their thread
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(snapshot is before for snapshot in executor.map(lambda _: catalog.snapshot(), range(50)))
+    assert started.wait(10)
+    catalog.refresh_seconds = 3600
+    release.set()
+
+    deadline = time.monotonic() + 10
+    while catalog.snapshot() is before and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert catalog.get("Night Owl") == {"location": {"lat": 37.77, "lng": -122.42}, "inventory": ["milk"]}
+    assert refreshes == ['shop-catalog-refresh']
+
+def test_empty_table_is_seeded():
+    catalog = DatabaseShopCatalog(refresh_seconds=3600, seed_shops=MOCK_SHOPS)
+    assert list(catalog.items()) == list(MOCK_SHOPS.items())
+    assert SessionLocal().query(Shop).count() == len(MOCK_SHOPS)
+
+def test_agents_round_trip():
+    assert load_agents(DELIVERY_AGENTS, batch_size=2) == len(DELIVERY_AGENTS)
+    assert read_agents() == DELIVERY_AGENTS
+
+    moved = dict(DELIVERY_AGENTS[0], current_location={"lat": 37.70, "lng": -122.50})
+    load_agents([moved])
+    agents = read_agents()
+    assert len(agents) == len(DELIVERY_AGENTS)
+    assert agents[0]["current_location"] == {"lat": 37.70, "lng": -122.50}
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for request-scoped database sessions and pool metrics
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from models import pool_metrics
+
+import app as app_module
+
+def register(client):
+    response = client.post('/auth/register', json={
+        'name': 'Pool Tester', 'email': f'pool-{uuid.uuid4().hex}@example.com', 'password': 'secret123'
+    })
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+def test_session_is_released_when_the_request_ends():
+    before = pool_metrics.stats()['checked_out']
+    with app_module.app.test_request_context():
+        db = app_module.get_request_db()
+        assert app_module.get_request_db() is db
+        db.execute(app_module.User.__table__.select().limit(1))
+        assert pool_metrics.stats()['checked_out'] == before + 1
+    assert pool_metrics.stats()['checked_out'] == before
+
+def test_concurrent_requests_do_not_exhaust_the_pool():
+    client = app_module.app.test_client()
+    headers = register(client)
+    client.post('/user/recent-searches', json={'dish_name': 'pasta'}, headers=headers)
+    start = pool_metrics.stats()
+
+    def hammer(i):
+        thread_client = app_module.app.test_client()
+        path = ('/auth/me', '/user/recent-searches', '/user/orders', '/user/preferences')[i % 4]
+        return thread_client.get(path, headers=headers).status_code
+
+    request_count = (Config.DB_POOL_SIZE + Config.DB_MAX_OVERFLOW) * 20
+    with ThreadPoolExecutor(max_workers=48) as executor:
+        statuses = list(executor.map(hammer, range(request_count)))
+
+    assert statuses == [200] * request_count
+    end = pool_metrics.stats()
+    assert end['checked_out'] == 0
+    assert end['checkouts'] - start['checkouts'] >= request_count
+    assert end['checkins'] - start['checkins'] == end['checkouts'] - start['checkouts']
+    assert end['peak_checked_out'] <= Config.DB_POOL_SIZE + Config.DB_MAX_OVERFLOW
+
+    metrics = client.get('/health/metrics').get_json()['db_pool']
+    assert metrics['checked_out'] == 0
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Tests for the delivery simulation harness
+"""
+
+from delivery_simulation import DeliverySimulation, compare_reports, generate_city
+
+def run(mode, seed=3, orders=120):
+    city = generate_city(shop_count=150, agent_count=8, dish_count=10, seed=seed)
+    return DeliverySimulation(city, orders_per_minute=0.5, mode=mode, seed=seed).run(orders)
+
+def test_runs_are_reproducible():
+    first, second = run('functions'), run('functions')
+    for key in ('outcomes', 'mean_eta_minutes', 'simulated_minutes', 'agent_utilization'):
+        assert first[key] == second[key]
+    assert sum(first['outcomes'].values()) == 120
+    assert first['outcomes']['delivered'] and first['outcomes']['no_agent']
+    assert 0 < first['agent_utilization'] <= 1
+    latency = first['latency_ms']
+    assert latency['p50'] <= latency['p95'] <= latency['p99'] <= latency['max']
+
+def test_endpoint_mode_matches_direct_calls():
+    direct, endpoint = run('functions'), run('endpoint')
+    for key in ('outcomes', 'mean_eta_minutes', 'agent_utilization'):
+        assert endpoint[key] == direct[key]
+
+def test_compare_reports_flags_regressions():
+    baseline = {"latency_ms": {"p50": 1.0, "p95": 2.0, "p99": 3.0}, "throughput_orders_per_second": 1000}
+    same = {"latency_ms": {"p50": 1.1, "p95": 2.2, "p99": 3.3}, "throughput_orders_per_second": 900}
+    slower = {"latency_ms": {"p50": 1.0, "p95": 3.0, "p99": 3.0}, "throughput_orders_per_second": 500}
+    assert compare_reports(same, baseline, 0.2) == []
+    assert compare_reports(slower, baseline, 0.2) == ["p95 latency 2.0 ms -> 3.0 ms", "throughput 1000 -> 500 orders/s"]
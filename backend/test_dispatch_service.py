@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for batched order-to-agent dispatch
+"""
+
+import itertools
+import random
+import time
+
+import numpy as np
+import pytest
+
+from agent_registry import AgentRegistry
+from delivery_service import assign_delivery_agent
+from dispatch_service import BatchDispatcher, dispatch_delivery_agent, greedy_assignment, hungarian_assignment
+from geo_kernel import GeoPoints, distance_matrix
+
+def brute_force_cost(cost):
+    rows, columns = cost.shape
+    if rows <= columns:
+        return min(sum(cost[r, c] for r, c in enumerate(perm)) for perm in itertools.permutations(range(columns), rows))
+    return brute_force_cost(cost.T)
+
+def assignment_cost(cost, pairs):
+    return sum(cost[r, c] for r, c in pairs)
+
+def make_agent(agent_id, lat, lng):
+    return {"id": agent_id, "name": agent_id, "status": "available", "current_location": {"lat": lat, "lng": lng}}
+
+def test_hungarian_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for rows, columns in [(1, 1), (3, 3), (4, 6), (6, 4), (6, 6), (5, 7)]:
+        for _ in range(10):
+            cost = rng.uniform(0, 100, size=(rows, columns)).round(1)
+            pairs = hungarian_assignment(cost)
+            assert len(pairs) == min(rows, columns)
+            assert len({r for r, _ in pairs}) == len({c for _, c in pairs}) == len(pairs)
+            assert abs(assignment_cost(cost, pairs) - brute_force_cost(cost)) < 1e-9
+
+def test_greedy_is_a_valid_matching():
+    cost = np.random.default_rng(1).uniform(size=(30, 20))
+    pairs = greedy_assignment(cost)
+    assert len(pairs) == 20
+    assert len({r for r, _ in pairs}) == len({c for _, c in pairs}) == 20
+    assert hungarian_assignment(np.zeros((0, 3))) == greedy_assignment(np.zeros((0, 3))) == []
+
+def test_batch_beats_sequential_greedy():
+    # Agent "near" sits between both shops; greedy hands it to the first order and sends
+    # "left" all the way over to the second shop
+    agents = [make_agent("near", 0.0, 0.004), make_agent("left", 0.0, -0.006), make_agent("right", 0.0, 0.050)]
+    shops = [{"lat": 0.0, "lng": 0.0}, {"lat": 0.0, "lng": 0.012}]
+
+    greedy_registry = AgentRegistry(agents)
+    greedy = [assign_delivery_agent(shop, registry=greedy_registry, claim=True) for shop in shops]
+    batch = BatchDispatcher(AgentRegistry(agents), window_seconds=60).dispatch(shops)
+
+    assert [a["id"] for a in greedy] == ["near", "left"]
+    assert [a["id"] for a in batch] == ["left", "near"]
+    assert sum(a["distance_to_shop_km"] for a in batch) < sum(a["distance_to_shop_km"] for a in greedy)
+
+def test_batch_never_worse_than_greedy_on_random_fleets():
+    rng = random.Random(3)
+    for _ in range(10):
+        agents = [make_agent(f"a{i}", rng.uniform(-0.1, 0.1), rng.uniform(-0.1, 0.1)) for i in range(30)]
+        shops = [{"lat": rng.uniform(-0.1, 0.1), "lng": rng.uniform(-0.1, 0.1)} for _ in range(20)]
+        greedy_registry = AgentRegistry(agents)
+        greedy = [assign_delivery_agent(shop, registry=greedy_registry, claim=True) for shop in shops]
+        batch = BatchDispatcher(AgentRegistry(agents), candidate_agents=30).dispatch(shops)
+        assert len({a["id"] for a in batch}) == 20
+        assert sum(a["eta_minutes"] for a in batch) <= sum(a["eta_minutes"] for a in greedy) + len(shops)
+
+def test_orders_beyond_the_fleet_get_none():
+    registry = AgentRegistry([make_agent("only", 0.0, 0.0)])
+    results = BatchDispatcher(registry).dispatch([{"lat": 0.0, "lng": 0.01}, {"lat": 0.0, "lng": 0.02}])
+    assert results[0]["id"] == "only"
+    assert results[1] is None
+
+def test_lost_claim_falls_back_to_greedy():
+    registry = AgentRegistry([make_agent("a", 0.0, 0.0), make_agent("b", 0.0, 0.05)])
+    dispatcher = BatchDispatcher(registry)
+    original_claim = registry.claim
+
+    def claim_racing_with_another_order(agent_id):
+        if agent_id == "a" and registry.get("a")["status"] == "available":
+            original_claim("a")  # Another request takes "a" first
+            return None
+        return original_claim(agent_id)
+
+    registry.claim = claim_racing_with_another_order
+    assert dispatcher.dispatch([{"lat": 0.0, "lng": 0.0}])[0]["id"] == "b"
+
+def test_window_collects_orders_into_one_batch():
+    registry = AgentRegistry([make_agent("a", 0.0, 0.0), make_agent("b", 0.0, 0.05)])
+    dispatcher = BatchDispatcher(registry, window_seconds=0.05)
+    batches = []
+    original_dispatch = dispatcher.dispatch
+    dispatcher.dispatch = lambda shops: batches.append(len(shops)) or original_dispatch(shops)
+
+    futures = [dispatcher.submit({"lat": 0.0, "lng": 0.0}), dispatcher.submit({"lat": 0.0, "lng": 0.05})]
+    results = [future.result(timeout=5) for future in futures]
+    assert batches == [2]
+    assert [r["id"] for r in results] == ["a", "b"]
+
+def test_dispatch_modes(monkeypatch):
+    import dispatch_service
+    registry = AgentRegistry([make_agent("a", 0.0, 0.0)])
+    monkeypatch.setattr(dispatch_service, "batch_dispatcher", BatchDispatcher(registry, window_seconds=0.01))
+    assert dispatch_delivery_agent({"lat": 0.0, "lng": 0.0}, mode="batch", claim=True)["id"] == "a"
+    assert dispatch_delivery_agent({"lat": 0.0, "lng": 0.0}, mode="batch", claim=True) is None
+
+def test_timed_out_batch_orders_hold_no_agent(monkeypatch):
+    import dispatch_service
+    from concurrent.futures import TimeoutError
+    registry = AgentRegistry([make_agent("a", 0.0, 0.0)])
+    dispatcher = BatchDispatcher(registry, window_seconds=0.05)
+    monkeypatch.setattr(dispatch_service, "batch_dispatcher", dispatcher)
+
+    # Gives up while the order still waits for its batch: it is withdrawn
+    monkeypatch.setattr(dispatch_service.Config, "DISPATCH_RESULT_TIMEOUT_SECONDS", -0.04)
+    with pytest.raises(TimeoutError):
+        dispatch_delivery_agent({"lat": 0.0, "lng": 0.0}, mode="batch", claim=True)
+    time.sleep(0.1)
+    assert registry.available_count() == 1
+
+    # Gives up while the batch is being dispatched: the agent it got is released
+    original_dispatch = dispatcher.dispatch
+    dispatcher.dispatch = lambda shops: time.sleep(0.1) or original_dispatch(shops)
+    monkeypatch.setattr(dispatch_service.Config, "DISPATCH_RESULT_TIMEOUT_SECONDS", 0.02)
+    with pytest.raises(TimeoutError):
+        dispatch_delivery_agent({"lat": 0.0, "lng": 0.0}, mode="batch", claim=True)
+    time.sleep(0.2)
+    assert registry.available_count() == 1
+
+def test_batch_costs_come_from_the_eta_tables():
+    class SlowFirstZone:
+        # 10 min/km around the first shop, 1 min/km elsewhere
+        def rates(self, location, when=None):
+            return (5.0, 10.0 if location["lng"] == 0.0 else 1.0)
+
+    shops = [{"lat": 0.0, "lng": 0.0}, {"lat": 0.0, "lng": 0.02}]
+    agents = [make_agent("middle", 0.0, 0.01), make_agent("west", 0.0, -0.0135)]
+
+    # By distance alone "west" takes the first shop; priced by ETA, the slow zone gets the closer agent
+    by_distance = hungarian_assignment(distance_matrix(GeoPoints.from_locations(shops),
+                                                       GeoPoints.from_locations(a["current_location"] for a in agents)))
+    assert by_distance == [(0, 1), (1, 0)]
+    batch = BatchDispatcher(AgentRegistry(agents), eta=SlowFirstZone()).dispatch(shops)
+    assert [a["id"] for a in batch] == ["middle", "west"]
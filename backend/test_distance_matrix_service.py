@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the distance/ETA matrix service, against the local provider stub
+"""
+
+import random
+import time
+
+import numpy as np
+
+from delivery_service import calculate_distance, get_google_distance_matrix
+from distance_matrix_service import DistanceMatrixService
+from distance_matrix_stub import DistanceMatrixStub
+
+def random_points(rng, count):
+    return [{"lat": 37.77 + rng.uniform(-0.05, 0.05), "lng": -122.42 + rng.uniform(-0.05, 0.05)} for _ in range(count)]
+
+def test_local_only_matches_haversine():
+    rng = random.Random(0)
+    origins, destinations = random_points(rng, 4), random_points(rng, 6)
+    result = DistanceMatrixService(provider_url='').matrix(origins, destinations)
+    assert result["fallback"].all()
+    for i, origin in enumerate(origins):
+        for j, destination in enumerate(destinations):
+            expected = calculate_distance(origin["lat"], origin["lng"], destination["lat"], destination["lng"])
+            assert abs(result["distance_km"][i, j] - expected) < 1e-9
+            assert abs(result["duration_minutes"][i, j] - expected * 4) < 1e-9
+
+def test_google_style_response_shape():
+    response = get_google_distance_matrix({"lat": 37.7749, "lng": -122.4194}, {"lat": 37.7849, "lng": -122.4094})
+    element = response["rows"][0]["elements"][0]
+    expected_km = calculate_distance(37.7749, -122.4194, 37.7849, -122.4094)
+    assert response["status"] == "OK"
+    assert element["distance"]["value"] == int(expected_km * 1000)
+    assert element["duration"]["value"] == int(expected_km * 4 * 60)
+
+def test_provider_elements_are_cached_per_grid_cell():
+    rng = random.Random(1)
+    origins, destinations = random_points(rng, 3), random_points(rng, 5)
+    with DistanceMatrixStub() as stub:
+        service = DistanceMatrixService(provider_url=stub.url, grid_degrees=0.001)
+        first = service.matrix(origins, destinations)
+        assert not first["fallback"].any()
+        assert stub.requests == 1 and stub.elements == 15
+
+        # Snapped to the cell centers the provider was asked about
+        cell = service.quantize(origins[0]["lat"], origins[0]["lng"])
+        target = service.quantize(destinations[0]["lat"], destinations[0]["lng"])
+        expected = stub.element(service._cell_center(cell), service._cell_center(target))
+        assert first["distance_km"][0, 0] == expected["distance"]["value"] / 1000
+        assert first["duration_minutes"][0, 0] == expected["duration"]["value"] / 60
+
+        # Points moved within their cells hit the cache
+        nudged = [{"lat": service._cell_center(service.quantize(p["lat"], p["lng"]))[0] + 0.0001,
+                   "lng": service._cell_center(service.quantize(p["lat"], p["lng"]))[1]} for p in origins]
+        second = service.matrix(nudged, destinations)
+        np.testing.assert_array_equal(second["distance_km"], first["distance_km"])
+        assert stub.requests == 1
+        assert service.stats()["cached_elements"] == 15
+
+def test_large_matrices_are_split_into_provider_sized_requests():
+    rng = random.Random(2)
+    origins, destinations = random_points(rng, 30), random_points(rng, 40)
+    with DistanceMatrixStub() as stub:
+        service = DistanceMatrixService(provider_url=stub.url, grid_degrees=0.0001, max_elements_per_request=100)
+        result = service.matrix(origins, destinations)
+        assert not result["fallback"].any()
+        assert stub.elements == 30 * 40
+        assert stub.requests >= 12
+        # Only the new destination is requested once the rest are cached
+        service.matrix(origins, destinations + random_points(rng, 1))
+        assert stub.elements == 30 * 41
+
+def test_slow_provider_falls_back_then_fills_cache():
+    rng = random.Random(3)
+    origins, destinations = random_points(rng, 2), random_points(rng, 2)
+    with DistanceMatrixStub(delay_seconds=0.5) as stub:
+        service = DistanceMatrixService(provider_url=stub.url, deadline_seconds=0.05)
+        started = time.monotonic()
+        result = service.matrix(origins, destinations)
+        assert time.monotonic() - started < 0.4
+        assert result["fallback"].all()
+        expected = calculate_distance(origins[0]["lat"], origins[0]["lng"], destinations[0]["lat"], destinations[0]["lng"])
+        assert abs(result["distance_km"][0, 0] - expected) < 1e-9
+
+        time.sleep(0.8)
+        assert not service.matrix(origins, destinations)["fallback"].any()
+        assert stub.requests == 1
+
+def test_provider_errors_fall_back():
+    with DistanceMatrixStub() as stub:
+        service = DistanceMatrixService(provider_url=stub.url.replace('/json', '/missing'))
+        result = service.matrix([{"lat": 37.77, "lng": -122.42}], [{"lat": 37.78, "lng": -122.41}])
+        assert result["fallback"].all()
+        assert service.stats()["provider_errors"] == 1
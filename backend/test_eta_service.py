@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests for the zone/hour-of-week ETA tables
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from delivery_service import estimate_delivery_time
+from eta_service import EtaEngine, EtaTables, eta_engine, hour_of_week, rebuild_eta_tables, record_delivery, zone_of
+from models import SessionLocal, DeliveryRecord, EtaZoneStat, EtaBuildState
+
+DOWNTOWN = {"lat": 37.7749, "lng": -122.4194}
+SUBURB = {"lat": 37.55, "lng": -122.30}
+MONDAY_NOON = datetime(2024, 1, 1, 12, 0)  # A Monday
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    for model in (DeliveryRecord, EtaZoneStat, EtaBuildState):
+        session.query(model).delete()
+    session.commit()
+    yield session
+    for model in (DeliveryRecord, EtaZoneStat, EtaBuildState):
+        session.query(model).delete()
+    session.commit()
+    session.close()
+    eta_engine.load()
+
+def add_deliveries(db, location, when, count, prep_minutes, minutes_per_km, rng, distance_km=2.0):
+    for _ in range(count):
+        distance = distance_km * rng.uniform(0.5, 1.5)
+        record_delivery(db, location, when, distance, 5, prep_minutes + 2, distance * minutes_per_km)
+    db.commit()
+
+def legacy_estimate(distance_km, ingredient_count):
+    return round(15 + distance_km * 4 + (ingredient_count / 5) * 2)
+
+def test_defaults_match_the_legacy_formula(db):
+    engine = EtaEngine(reload_seconds=0)
+    rng = random.Random(0)
+    for _ in range(200):
+        distance_km, count = rng.uniform(0, 10), rng.randint(0, 30)
+        assert engine.estimate(DOWNTOWN, distance_km, count) == legacy_estimate(distance_km, count)
+        assert estimate_delivery_time(distance_km, count) == legacy_estimate(distance_km, count)
+
+def test_zone_hour_figures_are_used(db):
+    rng = random.Random(1)
+    add_deliveries(db, DOWNTOWN, MONDAY_NOON, 30, prep_minutes=25, minutes_per_km=6, rng=rng)
+    add_deliveries(db, DOWNTOWN, MONDAY_NOON + timedelta(hours=3), 30, prep_minutes=10, minutes_per_km=3, rng=rng)
+    assert rebuild_eta_tables()["processed"] == 60
+
+    engine = EtaEngine(min_samples=20, reload_seconds=0)
+    assert engine.estimate(DOWNTOWN, 2.0, 5, MONDAY_NOON) == round(25 + 2 * 6 + 2)
+    assert engine.estimate(DOWNTOWN, 2.0, 5, MONDAY_NOON + timedelta(hours=3)) == round(10 + 2 * 3 + 2)
+
+    # Other hours fall back to the zone's whole-week figures (both hours pooled)
+    tables = engine.load()
+    prep, pace = tables.lookup(zone_of(DOWNTOWN), hour_of_week(MONDAY_NOON + timedelta(days=2)))
+    assert prep == pytest.approx(17.5)
+    assert pace == pytest.approx(4.5, rel=0.1)
+
+    # Zones without history use the fleet-wide figures for the hour
+    prep, pace = tables.lookup(zone_of(SUBURB), hour_of_week(MONDAY_NOON))
+    assert prep == pytest.approx(25)
+    assert pace == pytest.approx(6)
+
+def test_sparse_cells_fall_back(db):
+    rng = random.Random(2)
+    add_deliveries(db, DOWNTOWN, MONDAY_NOON, 5, prep_minutes=40, minutes_per_km=10, rng=rng)
+    rebuild_eta_tables()
+    engine = EtaEngine(min_samples=20, reload_seconds=0)
+    assert engine.estimate(DOWNTOWN, 3.0, 10, MONDAY_NOON) == legacy_estimate(3.0, 10)
+
+def test_incremental_rebuild_matches_full_rebuild(db):
+    rng = random.Random(3)
+    add_deliveries(db, DOWNTOWN, MONDAY_NOON, 25, prep_minutes=20, minutes_per_km=5, rng=rng)
+    first = rebuild_eta_tables(batch_size=7)
+    add_deliveries(db, SUBURB, MONDAY_NOON, 25, prep_minutes=12, minutes_per_km=2, rng=rng)
+    add_deliveries(db, DOWNTOWN, MONDAY_NOON, 10, prep_minutes=30, minutes_per_km=5, rng=rng)
+    second = rebuild_eta_tables(batch_size=7)
+    assert (first["processed"], second["processed"]) == (25, 35)
+    assert rebuild_eta_tables()["processed"] == 0
+
+    def snapshot():
+        return sorted((s.zone, s.hour_of_week, s.order_count, round(s.base_prep_minutes_sum, 6),
+                       s.travel_count, round(s.travel_km_sum, 6), round(s.travel_minutes_sum, 6))
+                      for s in SessionLocal().query(EtaZoneStat).all())
+
+    incremental = snapshot()
+    assert rebuild_eta_tables(full=True)["processed"] == 60
+    assert snapshot() == incremental
+
+def test_tables_are_compact_arrays():
+    class Stat:
+        def __init__(self, zone, hour):
+            self.zone, self.hour_of_week = zone, hour
+            self.order_count, self.base_prep_minutes_sum = 30, 30 * 20.0
+            self.travel_count, self.travel_km_sum, self.travel_minutes_sum = 30, 60.0, 300.0
+
+    tables = EtaTables([Stat("9q8yy", 12), Stat("9q8yz", 12)], min_samples=20)
+    assert tables.prep_minutes.shape == (2, 168)
+    assert tables.prep_minutes.dtype.name == 'float32'
+    assert tables.lookup("9q8yy", 12) == (20.0, 5.0)
+
+def test_delivered_orders_update_their_zone_estimate(db, monkeypatch):
+    import eta_service
+    import app as app_module
+    from agent_registry import agent_registry
+    from models import Order
+
+    ingredients = [{'ingredient': name, 'quantity': 1, 'unit': 'piece'} for name in ('chicken', 'rice', 'onion', 'tomato', 'egg')]
+    monkeypatch.setattr(app_module, 'get_recipe_ingredients_from_spoonacular_improved', lambda dish_name: list(ingredients))
+    monkeypatch.setattr(eta_service.eta_engine, 'min_samples', 1)
+    monkeypatch.setattr(eta_service.Config, 'ETA_REFRESH_MIN_INTERVAL_SECONDS', 0)
+    refreshes = []
+    monkeypatch.setattr(app_module, 'schedule_eta_refresh', lambda: refreshes.append(eta_service.schedule_eta_refresh()))
+
+    client = app_module.app.test_client()
+    registered = client.post('/auth/register', json={
+        'name': 'Eta Test', 'email': f'eta-{random.getrandbits(64):x}@example.com', 'password': 'secret123'
+    }).get_json()
+    headers = {'Authorization': f"Bearer {registered['access_token']}"}
+    placed = client.post('/delivery/test', headers=headers, json={'dish_name': 'Chicken rice'}).get_json()
+    shop = next(s for s in placed['all_qualified_shops'] if s['name'] == placed['top_shop']['name'])
+    order_id = client.get('/user/orders?fields=id', headers=headers).get_json()['orders'][0]['id']
+
+    # A slow order: 30 minutes of prep, then 40 minutes on the road
+    ordered_at = datetime.utcnow() - timedelta(minutes=70)
+    db.query(Order).filter(Order.id == order_id).update({Order.order_timestamp: ordered_at})
+    db.commit()
+    before = eta_service.eta_engine.estimate(shop['location'], shop['distance_km'], 5, ordered_at)
+    client.put(f'/user/orders/{order_id}/status', headers=headers, json={'status': 'on_the_way'})
+    db.query(Order).filter(Order.id == order_id).update({Order.picked_up_at: ordered_at + timedelta(minutes=30)})
+    db.commit()
+    assert client.put(f'/user/orders/{order_id}/status', headers=headers, json={'status': 'delivered'}).status_code == 200
+
+    app_module.write_queue.execute(lambda session: None)
+    for thread in refreshes:
+        thread.join()
+    assert len(refreshes) == 1
+    record = db.query(DeliveryRecord).filter(DeliveryRecord.order_id == order_id).one()
+    assert record.prep_minutes == pytest.approx(30, abs=0.5)
+    assert record.travel_minutes == pytest.approx(40, abs=0.5)
+    assert record.zone == zone_of(shop['location'])
+
+    after = eta_service.eta_engine.estimate(shop['location'], shop['distance_km'], 5, ordered_at)
+    prep, pace = eta_service.eta_engine.rates(shop['location'], ordered_at)
+    assert prep == pytest.approx(30 - 2)  # Less the time to collect 5 ingredients
+    assert after == round(30 + shop['distance_km'] * pace) != before
+    assert agent_registry.available_count() == len(agent_registry.agents())
+
+
+    # Each order is recorded once, however it is closed again
+    assert eta_service.record_completed_order(db, db.get(Order, order_id)) is None
+    record_delivery(db, shop['location'], ordered_at, 1.0, 5, 10, 5, order_id=order_id)
+    with pytest.raises(IntegrityError):
+        db.flush()
+    db.rollback()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorized haversine kernel
+"""
+
+import random
+
+import numpy as np
+
+from agent_registry import AgentRegistry
+from delivery_service import assign_delivery_agent, calculate_distance
+from geo_kernel import GeoPoints, distance_matrix, distances_from, nearest
+from mock_data import DELIVERY_AGENTS
+
+def random_points(rng, count):
+    return [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(count)]
+
+def test_distances_match_scalar_haversine():
+    rng = random.Random(4)
+    points = random_points(rng, 500)
+    packed = GeoPoints([lat for lat, _ in points], [lng for _, lng in points])
+    for lat, lng in random_points(rng, 20):
+        expected = [calculate_distance(lat, lng, p_lat, p_lng) for p_lat, p_lng in points]
+        np.testing.assert_allclose(distances_from(lat, lng, packed), expected, rtol=1e-12, atol=1e-9)
+
+def test_distance_matrix_rows_match_single_origin():
+    rng = random.Random(5)
+    origins = GeoPoints(*zip(*random_points(rng, 7)))
+    destinations = GeoPoints(*zip(*random_points(rng, 11)))
+    matrix = distance_matrix(origins, destinations)
+    assert matrix.shape == (7, 11)
+    for row, (lat, lng) in enumerate(zip(np.degrees(origins.lat_rad), np.degrees(origins.lng_rad))):
+        np.testing.assert_allclose(matrix[row], distances_from(lat, lng, destinations), rtol=1e-12)
+
+def test_nearest_prefers_first_on_ties():
+    points = GeoPoints([1.0, 0.0, 0.0], [0.0, 1.0, 1.0])
+    position, distance_km = nearest(0.0, 1.0, points)
+    assert position == 1
+    assert distance_km == 0
+
+def test_assign_delivery_agent_picks_nearest():
+    shop = {"lat": 37.7849, "lng": -122.4094}
+    agent = assign_delivery_agent(shop, registry=AgentRegistry(DELIVERY_AGENTS))
+    expected = min(DELIVERY_AGENTS, key=lambda a: calculate_distance(
+        shop["lat"], shop["lng"], a["current_location"]["lat"], a["current_location"]["lng"]))
+    assert agent["name"] == expected["name"]
+    assert agent["distance_to_shop_km"] == 0
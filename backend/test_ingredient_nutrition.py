@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for cached, concurrent per-ingredient nutrition lookups
+"""
+
+import threading
+import time
+
+import pytest
+
+import ingredient_nutrition_service
+import nutrition_service
+from ingredient_nutrition_service import IngredientNutritionLookup
+from models import SessionLocal, IngredientIdMapping, IngredientNutrientProfile
+
+IDS = {'rice': 1, 'chicken': 2}
+PROFILES = {
+    1: {'calories': 130.0, 'protein': 2.7, 'carbs': 28.0, 'fat': 0.3, 'fiber': 0.4, 'sugar': 0.1},
+    2: {'calories': 239.0, 'protein': 27.0, 'carbs': 0.0, 'fat': 14.0, 'fiber': 0.0, 'sugar': 0.0},
+}
+
+class FakeSpoonacular:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.searches = []
+        self.profiles = []
+        self.lock = threading.Lock()
+
+    def search(self, name):
+        time.sleep(self.delay)
+        with self.lock:
+            self.searches.append(name)
+        return IDS.get(name)
+
+    def profile(self, ingredient_id):
+        time.sleep(self.delay)
+        with self.lock:
+            self.profiles.append(ingredient_id)
+        return dict(PROFILES[ingredient_id])
+
+@pytest.fixture
+def spoonacular(monkeypatch):
+    db = SessionLocal()
+    db.query(IngredientIdMapping).delete()
+    db.query(IngredientNutrientProfile).delete()
+    db.commit()
+    db.close()
+
+    fake = FakeSpoonacular()
+    monkeypatch.setattr(ingredient_nutrition_service, '_search_ingredient_id', fake.search)
+    monkeypatch.setattr(ingredient_nutrition_service, '_fetch_nutrient_profile', fake.profile)
+    return fake
+
+def test_lookups_are_cached_in_memory_and_sqlite(spoonacular):
+    lookup = IngredientNutritionLookup(deadline_seconds=5)
+    first = lookup.get_profiles(['rice', 'chicken', 'rice'])
+    assert first == {'rice': PROFILES[1], 'chicken': PROFILES[2]}
+    assert sorted(spoonacular.searches) == ['chicken', 'rice']
+
+    # Memory tier
+    lookup.get_profiles(['rice', 'chicken'])
+    assert len(spoonacular.searches) == 2
+
+    # Persistent tier survives a fresh engine
+    fresh = IngredientNutritionLookup(deadline_seconds=5)
+    assert fresh.get_profiles(['chicken']) == {'chicken': PROFILES[2]}
+    assert len(spoonacular.searches) == 2
+    assert len(spoonacular.profiles) == 2
+
+def test_unmatched_names_are_cached_as_no_match(spoonacular):
+    lookup = IngredientNutritionLookup(deadline_seconds=5)
+    assert lookup.get_profiles(['unicorn dust']) == {'unicorn dust': None}
+    assert lookup.get_profiles(['unicorn dust']) == {'unicorn dust': None}
+    assert spoonacular.searches == ['unicorn dust']
+
+def test_misses_are_fetched_concurrently(spoonacular):
+    spoonacular.delay = 0.2
+    lookup = IngredientNutritionLookup(max_workers=8, deadline_seconds=5)
+
+    started = time.monotonic()
+    lookup.get_profiles(['rice', 'chicken'])
+    # Two sequential round trips per ingredient, ingredients in parallel
+    assert time.monotonic() - started < 0.7
+
+def test_deadline_skips_slow_lookups_without_caching_them(spoonacular):
+    spoonacular.delay = 0.5
+    lookup = IngredientNutritionLookup(deadline_seconds=0.1)
+    assert lookup.get_profiles(['rice']) == {'rice': None}
+
+    spoonacular.delay = 0
+    lookup.deadline_seconds = 5
+    assert lookup.get_profiles(['rice']) == {'rice': PROFILES[1]}
+
+def test_amounts_are_scaled_locally(spoonacular, monkeypatch):
+    lookup = IngredientNutritionLookup(deadline_seconds=5)
+    monkeypatch.setattr(nutrition_service, 'ingredient_nutrition_lookup', lookup)
+    monkeypatch.setattr(nutrition_service, 'normalize_ingredients_for_realistic_servings', lambda ingredients: ingredients)
+
+    result = nutrition_service.get_nutrition_from_spoonacular_ingredients([
+        {'ingredient': 'Rice', 'quantity': 200, 'unit': 'g'},
+        {'ingredient': 'Chicken', 'quantity': 50, 'unit': 'g'},
+    ])
+
+    assert result['success'] is True
+    assert result['calories'] == round(130.0 * 2 + 239.0 * 0.5, 1)
+    assert result['protein'] == round(2.7 * 2 + 27.0 * 0.5, 1)
+    assert spoonacular.profiles.count(1) == 1
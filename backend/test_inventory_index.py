@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the inverted inventory index
+"""
+
+import random
+
+from delivery_service import match_ingredients_with_shop
+from inventory_index import INGREDIENT_SUBSTITUTIONS, InventoryIndex
+from mock_data import MOCK_SHOPS
+
+def legacy_match(ingredients, shop_inventory):
+    """The original scan from match_ingredients_with_shop"""
+    available_ingredients = []
+    missing_ingredients = []
+    for ingredient in ingredients:
+        ingredient_name = ingredient.get('ingredient', '').lower().strip()
+        found = False
+        for shop_item in shop_inventory:
+            if ingredient_name in shop_item.lower() or shop_item.lower() in ingredient_name:
+                found = True
+                break
+        if not found:
+            for key, substitutions in INGREDIENT_SUBSTITUTIONS.items():
+                if ingredient_name in key or key in ingredient_name:
+                    for substitution in substitutions:
+                        for shop_item in shop_inventory:
+                            if substitution in shop_item.lower() or shop_item.lower() in substitution:
+                                found = True
+                                break
+                        if found:
+                            break
+                if found:
+                    break
+        (available_ingredients if found else missing_ingredients).append(ingredient)
+    return available_ingredients, missing_ingredients
+
+NAMES = [
+    'Chicken Breast', 'basmati rice', 'Whole Milk', 'heavy cream', 'double cream', 'Extra Virgin Olive Oil',
+    'fresh mozzarella', 'Pizza Sauce', 'tomato sauce', 'Dark Chocolate', 'vanilla bean', 'bittersweet chocolate',
+    'nori', 'saffron threads', 'red pepper flakes', 'all-purpose flour', 'cream', 'oil', 'a', '', '  Rice  ',
+    'unicorn dust', 'parmigiano reggiano', 'evoo', 'cocoa'
+]
+
+def test_matches_legacy_scan_for_mock_shops():
+    index = InventoryIndex((name, shop["inventory"]) for name, shop in MOCK_SHOPS.items())
+    ingredients = [{'ingredient': name} for name in NAMES]
+    for shop_name, shop in MOCK_SHOPS.items():
+        assert index.match(ingredients, shop_name) == legacy_match(ingredients, shop["inventory"])
+        assert match_ingredients_with_shop(ingredients, shop["inventory"]) == legacy_match(ingredients, shop["inventory"])
+
+def test_matches_legacy_scan_for_random_inventories():
+    rng = random.Random(5)
+    item_pool = sorted({item for shop in MOCK_SHOPS.values() for item in shop["inventory"]}) + \
+        ['Milk', 'Plain Flour', 'Marinara Sauce', 'chili flakes', 'Vanilla Pod', 'pepperoni', '']
+    inventories = {f"shop_{i}": rng.sample(item_pool, rng.randint(0, 15)) for i in range(40)}
+    index = InventoryIndex(inventories.items())
+    for _ in range(20):
+        ingredients = [{'ingredient': name} for name in rng.sample(NAMES, 8)]
+        for shop_name, inventory in inventories.items():
+            assert index.match(ingredients, shop_name) == legacy_match(ingredients, inventory)
+
+def test_availability_is_a_shop_bitset():
+    index = InventoryIndex([('a', ['Milk']), ('b', ['whipping cream']), ('c', [])])
+    assert index.availability('whole milk') == index.shop_bits['a']
+    assert index.availability('heavy cream') == index.shop_bits['b']
+    assert index.availability('') == index.shop_bits['a'] | index.shop_bits['b']
+
+def test_availability_counts_per_shop():
+    rng = random.Random(6)
+    item_pool = sorted({item for shop in MOCK_SHOPS.values() for item in shop["inventory"]})
+    inventories = {f"shop_{i}": rng.sample(item_pool, rng.randint(0, 20)) for i in range(70)}
+    index = InventoryIndex(inventories.items())
+    names = [name.lower().strip() for name in NAMES]
+    counts = index.availability_counts(names)
+    assert len(counts) == 70
+    for shop_name, inventory in inventories.items():
+        available, _ = legacy_match([{'ingredient': name} for name in names], inventory)
+        assert counts[index.shop_positions[shop_name]] == len(available)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the precompiled nutrition index
+"""
+
+import random
+
+from aho_corasick import AhoCorasick
+from nutrition_index import NUTRITION_DB, NutritionIndex, nutrition_index, grams_for
+from nutrition_service import calculate_nutrition_from_ingredients, calculate_nutrition_batch
+
+def legacy_match(ingredient_name):
+    """The original scan from calculate_nutrition_from_ingredients"""
+    for db_ingredient, nutrition in NUTRITION_DB.items():
+        if db_ingredient in ingredient_name or ingredient_name in db_ingredient:
+            return db_ingredient
+    return None
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+    assert automaton.find_all('ushers') == {0, 1, 3}
+    assert automaton.find_all('xyz') == set()
+    assert automaton.contains_any('this')
+
+def test_aho_corasick_matches_brute_force():
+    rng = random.Random(3)
+    for _ in range(200):
+        patterns = list({''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))) for _ in range(6)})
+        text = ''.join(rng.choice('abcd') for _ in range(20))
+        expected = {i for i, pattern in enumerate(patterns) if pattern in text}
+        assert AhoCorasick(patterns).find_all(text) == expected
+
+def test_index_matches_legacy_scan_on_real_names():
+    names = list(NUTRITION_DB) + [
+        'brown rice', 'basmati rice', 'extra virgin olive oil', 'black pepper', 'red onion',
+        'chicken thighs', 'garlic cloves', 'egg', 'eggs', 'grated parmesan cheese', 'oil',
+        'sea salt', 'fresh cilantro leaves', 'whole milk', 'all-purpose flour', 'ice',
+        'lemon', 'le', 'a', 'sugar snap peas', 'unknown thing', 'pork belly', 'ketchup'
+    ]
+    for name in names:
+        assert nutrition_index.match_key(name) == legacy_match(name), name
+
+def test_index_matches_legacy_scan_on_random_names():
+    rng = random.Random(7)
+    keys = list(NUTRITION_DB)
+    for _ in range(2000):
+        key = rng.choice(keys)
+        start = rng.randrange(len(key))
+        name = key[start:start + rng.randint(1, 8)]
+        if rng.random() < 0.5:
+            name = rng.choice(['fresh ', 'chopped ', '', 'x']) + name + rng.choice([' leaves', 's', '', ' paste'])
+        assert nutrition_index.match_key(name) == legacy_match(name), name
+
+def test_index_respects_table_order():
+    rice = {'calories': 1, 'protein': 0, 'carbs': 0, 'fat': 0, 'fiber': 0, 'sugar': 0}
+    index = NutritionIndex({'rice': rice, 'brown rice': dict(rice, calories=2)})
+    assert index.match('brown rice') == rice
+    assert index.match('wild brown rice') == rice
+
+def test_grams_conversion():
+    assert grams_for('egg', 2, 'piece') == 100
+    assert grams_for('bacon', 2, 'slice') == 30
+    assert grams_for('cheese', 2, 'slice') == 50
+    assert grams_for('milk', 1, 'cup') == 240
+    assert grams_for('flour', 30, '') == 30
+    assert grams_for('flour', 30, 'handful') == 30
+
+def test_calculate_nutrition_uses_index():
+    result = calculate_nutrition_from_ingredients([
+        {'ingredient': 'Basmati Rice', 'quantity': 200, 'unit': 'g'},
+        {'ingredient': 'Olive Oil', 'quantity': 1, 'unit': 'tbsp'},
+    ])
+    assert result['success'] is True
+    assert result['calories'] > 0
+
+def test_batch_matches_single_dish_calculation():
+    dishes = [
+        [{'ingredient': 'Basmati Rice', 'quantity': 200, 'unit': 'g'},
+         {'ingredient': 'Olive Oil', 'quantity': 1, 'unit': 'tbsp'}],
+        [{'ingredient': 'Eggs', 'quantity': 2, 'unit': 'piece'},
+         {'ingredient': 'Butter', 'quantity': 10, 'unit': 'g'},
+         {'ingredient': 'Eggs', 'quantity': 1, 'unit': 'piece'}],
+        [],
+        [{'ingredient': 'Unicorn dust', 'quantity': 5, 'unit': 'g'}],
+    ]
+    batch = calculate_nutrition_batch(dishes)
+    assert len(batch) == len(dishes)
+    for ingredients, result in zip(dishes, batch):
+        single = calculate_nutrition_from_ingredients(ingredients)
+        for field in ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar'):
+            assert abs(result[field] - single[field]) <= 0.1
+        assert result['dietary_tags'] == single['dietary_tags']
+        assert result['success'] is True
+    assert batch[2]['calories'] == 0
+
+def test_batch_endpoint():
+    from app import app
+
+    client = app.test_client()
+    response = client.post('/nutrition/batch', json={'dishes': [
+        {'dish_name': 'Rice bowl', 'ingredients': [{'ingredient': 'rice', 'quantity': 100, 'unit': 'g'}]},
+        {'dish_name': 'Buttered rice', 'ingredients': [{'ingredient': 'rice', 'quantity': 100, 'unit': 'g'},
+                                                        {'ingredient': 'butter', 'quantity': 10, 'unit': 'g'}]},
+    ]})
+    data = response.get_json()
+    assert response.status_code == 200
+    assert [result['dish_name'] for result in data['results']] == ['Rice bowl', 'Buttered rice']
+    rice_bowl = calculate_nutrition_from_ingredients([{'ingredient': 'rice', 'quantity': 100, 'unit': 'g'}])
+    assert data['results'][0]['nutrition']['calories'] == rice_bowl['calories']
+    assert data['totals']['calories'] == round(sum(r['nutrition']['calories'] for r in data['results']), 1)
+
+    assert client.post('/nutrition/batch', json={'dishes': []}).status_code == 400
+    assert client.post('/nutrition/batch', json={'dishes': [{'dish_name': 'x'}]}).status_code == 400
+    assert client.post('/nutrition/batch', json=[{'dish_name': 'x', 'ingredients': []}]).status_code == 400
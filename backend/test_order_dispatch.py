@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for delivery agents claimed by placed orders and released when the orders close
+"""
+
+import uuid
+
+import pytest
+
+from agent_registry import agent_registry
+
+import app as app_module
+
+INGREDIENTS = [{'ingredient': name, 'quantity': 1, 'unit': 'piece'} for name in ('chicken', 'rice', 'onion', 'tomato')]
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, 'get_recipe_ingredients_from_spoonacular_improved', lambda dish_name: list(INGREDIENTS))
+    monkeypatch.setattr(app_module, 'get_ingredients_by_dish_name', lambda dish_name: list(INGREDIENTS))
+    yield app_module.app.test_client()
+    for agent in agent_registry.agents():
+        agent_registry.release(agent['id'])
+
+def register(client):
+    registered = client.post('/auth/register', json={
+        'name': 'Dispatch Test', 'email': f'dispatch-{uuid.uuid4().hex}@example.com', 'password': 'secret123'
+    }).get_json()
+    return {'Authorization': f"Bearer {registered['access_token']}"}
+
+def place_order(client, headers=None):
+    return client.post('/delivery/test', headers=headers or {}, json={'dish_name': 'Chicken rice', 'servings': 2})
+
+def saved_order_ids(client, headers):
+    return [order['id'] for order in client.get('/user/orders?fields=id', headers=headers).get_json()['orders']]
+
+def test_previews_never_claim_agents(client):
+    headers = register(client)
+    fleet = len(agent_registry.agents())
+    for _ in range(fleet + 3):
+        assert place_order(client).status_code == 200
+        assert client.post('/delivery', headers=headers, json={'dish_name': 'Chicken rice', 'servings': 2}).status_code == 200
+    assert agent_registry.available_count() == fleet
+
+def test_closing_orders_frees_their_agents(client):
+    headers = register(client)
+    fleet = len(agent_registry.agents())
+
+    agents = [place_order(client, headers).get_json()['delivery_agent']['id'] for _ in range(fleet)]
+    assert len(set(agents)) == fleet
+    assert place_order(client, headers).status_code == 503
+
+    order_ids = saved_order_ids(client, headers)
+    client.put(f'/user/orders/{order_ids[0]}/status', headers=headers, json={'status': 'delivered'})
+    client.put(f'/user/orders/{order_ids[1]}/status', headers=headers, json={'status': 'cancelled'})
+    assert agent_registry.available_count() == 2
+
+    # More orders than agents, as long as earlier ones finish
+    for _ in range(2 * fleet):
+        response = place_order(client, headers)
+        assert response.status_code == 200
+        order_id = saved_order_ids(client, headers)[0]
+        client.put(f'/user/orders/{order_id}/status', headers=headers, json={'status': 'completed'})
+    assert agent_registry.available_count() == 2
+
+    client.delete('/user/orders/clear', headers=headers)
+    assert agent_registry.available_count() == fleet
+
+def test_closed_orders_cannot_reopen(client):
+    owner, other = register(client), register(client)
+    fleet = len(agent_registry.agents())
+    place_order(client, owner)
+    order_id = saved_order_ids(client, owner)[0]
+    assert client.put(f'/user/orders/{order_id}/status', headers=owner, json={'status': 'cancelled'}).status_code == 200
+
+    # Someone else now holds the whole fleet, including the agent the order had
+    for _ in range(fleet):
+        assert place_order(client, other).status_code == 200
+    assert client.put(f'/user/orders/{order_id}/status', headers=owner, json={'status': 'pending'}).status_code == 409
+    assert client.put(f'/user/orders/{order_id}/status', headers=owner, json={'status': 'cancelled'}).status_code == 200
+    assert client.put(f'/user/orders/{order_id}/status', headers=owner, json={'status': 'lost'}).status_code == 400
+    assert agent_registry.available_count() == 0
+
+def test_agent_updates_need_an_operator(client, monkeypatch):
+    headers = register(client)
+    agent_id = agent_registry.agents()[0]['id']
+    body = {'status': 'offline'}
+    assert client.put(f'/delivery/agents/{agent_id}/status', json=body).status_code == 401
+    assert client.put(f'/delivery/agents/{agent_id}/status', headers=headers, json=body).status_code == 403
+    assert client.put(f'/delivery/agents/{agent_id}/location', headers=headers, json={'lat': 0, 'lng': 0}).status_code == 403
+    assert agent_registry.get(agent_id)['status'] == 'available'
+
+    operator = register(client)
+    email = app_module.verify_token(operator['Authorization'].split(' ')[1])['sub']
+    monkeypatch.setattr(app_module.Config, 'DELIVERY_OPERATOR_EMAILS', {email})
+    assert client.put(f'/delivery/agents/{agent_id}/status', headers=operator, json=body).status_code == 200
+    assert client.put(f'/delivery/agents/{agent_id}/status', headers=operator, json={'status': 'available'}).status_code == 200
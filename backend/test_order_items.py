@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the normalized order_items table
+"""
+
+import json
+import uuid
+
+import pytest
+
+from models import SessionLocal, Order, OrderItem, IngredientIdMapping
+from order_items import order_item_rows, ingredient_shops, backfill_order_items, top_ingredients
+
+import app as app_module
+
+@pytest.fixture
+def user():
+    client = app_module.app.test_client()
+    registered = client.post('/auth/register', json={
+        'name': 'Line Items', 'email': f'items-{uuid.uuid4().hex}@example.com', 'password': 'secret123'
+    }).get_json()
+    return client, {'Authorization': f"Bearer {registered['access_token']}"}, registered['user']['id']
+
+def _items(order_id):
+    db = SessionLocal()
+    try:
+        return [(item.position, item.ingredient_name, item.quantity, item.unit, item.ingredient_id, item.shop_name)
+                for item in db.query(OrderItem).filter(OrderItem.order_id == order_id).order_by(OrderItem.position)]
+    finally:
+        db.close()
+
+def test_rows_canonicalize_names_and_read_legacy_blobs():
+    ingredients = [{'ingredient': '  Olive   OIL ', 'quantity': '2', 'unit': 'tbsp'}, 'Salt', {'quantity': 1}]
+    rows = order_item_rows(7, 3, json.dumps(ingredients), shops={'olive oil': 'Corner Shop'})
+    assert [(row['position'], row['ingredient_name'], row['quantity'], row['unit'], row['shop_name']) for row in rows] == [
+        (0, 'olive oil', 2.0, 'tbsp', 'Corner Shop'),
+        (1, 'salt', None, None, None),
+    ]
+    assert order_item_rows(7, 3, 'not json') == []
+
+def test_ingredient_shops_prefers_basket_stops():
+    top_shop = {'name': 'A', 'available_ingredients': [{'ingredient': 'Rice'}]}
+    basket = {'stops': [{'name': 'B', 'items': [{'ingredient': 'Rice'}]}, {'name': 'C', 'items': [{'ingredient': 'Egg'}]}]}
+    assert ingredient_shops(top_shop) == {'rice': 'A'}
+    assert ingredient_shops(top_shop, basket) == {'rice': 'B', 'egg': 'C'}
+
+def test_new_orders_get_line_items(user):
+    client, headers, _ = user
+    db = SessionLocal()
+    db.merge(IngredientIdMapping(ingredient_name='basmati rice', spoonacular_id=10020444))
+    db.commit()
+    db.close()
+
+    order_id = client.post('/user/orders', headers=headers, json={
+        'dish_name': 'Pilaf',
+        'ingredients': [{'ingredient': 'Basmati Rice', 'quantity': 1.5, 'unit': 'cup'}, {'ingredient': 'Onion', 'quantity': 1}]
+    }).get_json()['order_id']
+
+    assert _items(order_id) == [
+        (0, 'basmati rice', 1.5, 'cup', 10020444, None),
+        (1, 'onion', 1.0, None, None, None),
+    ]
+
+def test_backfill_splits_existing_orders_and_rewrites_string_blobs(user):
+    _, _, user_id = user
+    db = SessionLocal()
+    legacy = Order(user_id=user_id, dish_name='Old curry', ingredients=json.dumps([{'ingredient': 'Garam masala', 'quantity': 2}]))
+    listed = Order(user_id=user_id, dish_name='Old salad', ingredients=[{'ingredient': 'Lettuce'}, {'ingredient': 'Tomato'}])
+    db.add_all([legacy, listed])
+    db.commit()
+    legacy_id, listed_id = legacy.id, listed.id
+    db.close()
+
+    counts = backfill_order_items(batch_size=1)
+    assert counts['orders'] >= 2 and counts['rewritten'] >= 1
+    assert _items(legacy_id) == [(0, 'garam masala', 2.0, None, None, None)]
+    assert [name for _, name, *_ in _items(listed_id)] == ['lettuce', 'tomato']
+
+    db = SessionLocal()
+    assert db.get(Order, legacy_id).ingredients == [{'ingredient': 'Garam masala', 'quantity': 2}]
+    db.close()
+
+    # A rerun finds nothing left to do for these orders
+    backfill_order_items()
+    assert len(_items(listed_id)) == 2
+
+def test_top_ingredients_and_clear(user):
+    client, headers, user_id = user
+    for dish, names in (('A', ['Rice', 'Egg']), ('B', ['rice', 'Peas']), ('C', ['RICE', 'egg'])):
+        client.post('/user/orders', headers=headers, json={'dish_name': dish, 'ingredients': [{'ingredient': n} for n in names]})
+
+    db = SessionLocal()
+    assert top_ingredients(db, limit=2, user_id=user_id) == [{'ingredient': 'rice', 'orders': 3}, {'ingredient': 'egg', 'orders': 2}]
+    db.close()
+    summary = client.get('/user/orders?summary=true', headers=headers).get_json()['summary']
+    assert summary['top_ingredients'][0] == {'ingredient': 'rice', 'orders': 3}
+
+    client.delete('/user/orders/clear', headers=headers)
+    db = SessionLocal()
+    assert db.query(OrderItem).filter(OrderItem.user_id == user_id).count() == 0
+    db.close()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for keyset-paginated GET /user/orders
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import SessionLocal, Order
+
+import app as app_module
+
+@pytest.fixture
+def user():
+    client = app_module.app.test_client()
+    registered = client.post('/auth/register', json={
+        'name': 'Order Pager', 'email': f'pager-{uuid.uuid4().hex}@example.com', 'password': 'secret123'
+    }).get_json()
+    user_id = registered['user']['id']
+
+    # Batches of orders share a timestamp so pages have to break ties by id
+    db = SessionLocal()
+    start = datetime(2024, 1, 1)
+    for i in range(130):
+        db.add(Order(user_id=user_id, dish_name=f'dish {i}', ingredients=[{'ingredient': 'rice', 'quantity': i}],
+                     servings=2, status=('pending', 'completed', 'cancelled')[i % 3],
+                     order_timestamp=start + timedelta(minutes=i // 7)))
+    db.commit()
+    expected = [order.id for order in db.query(Order).filter(Order.user_id == user_id)
+                .order_by(Order.order_timestamp.desc(), Order.id.desc())]
+    db.close()
+    return client, {'Authorization': f"Bearer {registered['access_token']}"}, expected
+
+def test_pages_walk_every_order_once(user):
+    client, headers, expected = user
+    ids, cursor = [], None
+    while True:
+        url = '/user/orders?limit=25' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url, headers=headers).get_json()
+        assert len(page['orders']) <= 25
+        ids.extend(order['id'] for order in page['orders'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert ids == expected
+
+def test_projection_and_status_filter(user):
+    client, headers, expected = user
+    page = client.get('/user/orders?limit=5&fields=id,status,timestamp&status=completed', headers=headers).get_json()
+    assert all(set(order) == {'id', 'status', 'timestamp'} for order in page['orders'])
+    assert all(order['status'] == 'completed' for order in page['orders'])
+    assert page['limit'] == 5
+
+    default = client.get('/user/orders', headers=headers).get_json()
+    assert len(default['orders']) == 50
+    assert default['orders'][0]['ingredients'] == [{'ingredient': 'rice', 'quantity': 129}]
+
+def test_summary(user):
+    client, headers, _ = user
+    summary = client.get('/user/orders?summary=true', headers=headers).get_json()['summary']
+    assert summary['total'] == 130
+    assert summary['by_status'] == {'pending': 44, 'completed': 43, 'cancelled': 43}
+
+def test_bad_parameters(user):
+    client, headers, _ = user
+    for query in ('limit=0', 'limit=x', 'cursor=nonsense', 'fields=id,password'):
+        assert client.get(f'/user/orders?{query}', headers=headers).status_code == 400
+
+def test_orders_without_status_count_as_pending(user):
+    client, headers, expected = user
+    db = SessionLocal()
+    db.query(Order).filter(Order.id.in_(expected[:2])).update({Order.status: None}, synchronize_session=False)
+    db.commit()
+    db.close()
+
+    ids, cursor = [], None
+    while True:
+        page = client.get('/user/orders?limit=100&fields=id&status=pending,in_transit' + (f'&cursor={cursor}' if cursor else ''),
+                          headers=headers).get_json()
+        ids.extend(order['id'] for order in page['orders'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    # The two newest orders were a pending and a cancelled one
+    assert ids[:2] == expected[:2]
+    assert len(ids) == 45
+
+    summary = client.get('/user/orders?summary=true&status=pending', headers=headers).get_json()['summary']
+    assert summary['by_status'] == {'pending': 45}
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled, retrying provider HTTP client
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import provider_client
+from config import Config
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    flaky_failures = 0
+    slow_requests = 0
+
+    def do_GET(self):
+        if self.path.startswith('/slow'):
+            _Handler.slow_requests += 1
+            time.sleep(0.5)
+            self._reply(200, b'{"ok": true}')
+        elif self.path.startswith('/flaky') and _Handler.flaky_failures > 0:
+            _Handler.flaky_failures -= 1
+            self._reply(503, b'busy')
+        else:
+            self._reply(200, b'{"ok": true}')
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(Config, 'PROVIDER_RETRY_BACKOFF_SECONDS', 0)
+    provider_client.close_sessions()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+    provider_client.close_sessions()
+
+def test_connections_are_reused_per_host(server):
+    for _ in range(5):
+        response = provider_client.provider_get('test_reuse', f'{server}/ok', params={'q': 'pizza'})
+        assert response.status_code == 200
+        assert response.json() == {'ok': True}
+
+    host_stats = provider_client.get_client_metrics()['hosts'][server.split('//')[1]]
+    assert host_stats['requests_served'] == 5
+    assert host_stats['connections_opened'] == 1
+    assert host_stats['connections_reused'] == 4
+
+def test_retries_transient_status_codes(server):
+    _Handler.flaky_failures = 2
+    response = provider_client.provider_get('test_retry', f'{server}/flaky')
+
+    assert response.status_code == 200
+    metrics = provider_client.get_client_metrics()['providers']['test_retry']
+    assert metrics['retries'] == 2
+    assert metrics['errors'] == 0
+
+def test_returns_last_response_when_retries_exhausted(server):
+    _Handler.flaky_failures = Config.PROVIDER_MAX_RETRIES + 5
+    response = provider_client.provider_get('test_exhausted', f'{server}/flaky')
+
+    assert response.status_code == 503
+    assert provider_client.get_client_metrics()['providers']['test_exhausted']['errors'] == 1
+    _Handler.flaky_failures = 0
+
+def test_read_timeouts_are_not_retried(server):
+    _Handler.slow_requests = 0
+    with pytest.raises(Exception):
+        provider_client.provider_get('test_slow', f'{server}/slow', timeout=0.1)
+    assert _Handler.slow_requests == 1
+
+def test_transport_errors_are_raised_and_counted(monkeypatch):
+    monkeypatch.setattr(Config, 'PROVIDER_MAX_RETRIES', 0)
+    provider_client.close_sessions()
+    with pytest.raises(Exception):
+        provider_client.provider_get('test_down', 'http://127.0.0.1:9/unreachable', timeout=0.5)
+    assert provider_client.get_client_metrics()['providers']['test_down']['errors'] == 1
+    provider_client.close_sessions()
+
+def test_jittered_backoff_stays_within_exponential_bound():
+    retry = provider_client.JitteredRetry(total=5, backoff_factor=1)
+    for _ in range(3):
+        retry = retry.increment(method='GET', url='/')
+    bound = provider_client.Retry(total=5, backoff_factor=1, backoff_max=retry.backoff_max)
+    for _ in range(3):
+        bound = bound.increment(method='GET', url='/')
+    for _ in range(20):
+        assert 0 <= retry.get_backoff_time() <= bound.get_backoff_time()
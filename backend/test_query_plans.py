@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Query plan tests: the per-user hot queries must be served by an index
+"""
+
+import os
+import tempfile
+
+import pytest
+from datetime import datetime
+
+from sqlalchemy import and_, or_, text
+
+from models import (Base, SessionLocal, create_database_engine, engine, ensure_columns, ensure_indexes,
+                    Order, RecentSearch, SavedAddress, UserAllergy)
+
+HOT_QUERY_NAMES = ("recent searches", "existing search", "order history", "order history page", "clear orders",
+                   "addresses", "default address", "allergies", "allergy duplicate check")
+
+def hot_queries(db):
+    user_id = 1
+    return {
+        "recent searches": db.query(RecentSearch).filter(RecentSearch.user_id == user_id)
+                             .order_by(RecentSearch.search_timestamp.desc()).limit(4),
+        "existing search": db.query(RecentSearch).filter(RecentSearch.user_id == user_id,
+                                                         RecentSearch.dish_name == 'pasta'),
+        "order history": db.query(Order).filter(Order.user_id == user_id).order_by(Order.order_timestamp.desc()),
+        "order history page": db.query(Order.id, Order.order_timestamp, Order.status)
+                                .filter(Order.user_id == user_id, or_(
+                                    Order.order_timestamp < datetime(2024, 1, 1),
+                                    and_(Order.order_timestamp == datetime(2024, 1, 1), Order.id < 500)))
+                                .order_by(Order.order_timestamp.desc(), Order.id.desc()).limit(51),
+        "clear orders": db.query(Order).filter(Order.user_id == user_id),
+        "addresses": db.query(SavedAddress).filter(SavedAddress.user_id == user_id)
+                       .order_by(SavedAddress.created_at.desc()),
+        "default address": db.query(SavedAddress).filter(SavedAddress.user_id == user_id,
+                                                         SavedAddress.is_default == True),
+        "allergies": db.query(UserAllergy).filter(UserAllergy.user_id == user_id),
+        "allergy duplicate check": db.query(UserAllergy).filter(UserAllergy.user_id == user_id,
+                                                                UserAllergy.allergy_name.ilike('peanuts')),
+    }
+
+def query_plan(query):
+    sql = str(query.statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+def test_every_hot_query_is_checked():
+    db = SessionLocal()
+    try:
+        assert tuple(hot_queries(db)) == HOT_QUERY_NAMES
+    finally:
+        db.close()
+
+@pytest.mark.parametrize("name", HOT_QUERY_NAMES)
+def test_hot_query_uses_an_index(name):
+    db = SessionLocal()
+    try:
+        plan = query_plan(hot_queries(db)[name])
+    finally:
+        db.close()
+    assert any("USING INDEX" in step or "USING COVERING INDEX" in step for step in plan), plan
+    assert not any(step.startswith("SCAN") and "INDEX" not in step for step in plan), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+def test_missing_indexes_are_added_to_existing_databases():
+    path = os.path.join(tempfile.mkdtemp(prefix='weknow-migrate-'), 'old.db')
+    old_engine = create_database_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(bind=old_engine)
+    with old_engine.begin() as connection:
+        for name in ("ix_orders_user_time", "ix_recent_searches_user_time"):
+            connection.execute(text(f"DROP INDEX {name}"))
+
+    assert ensure_indexes(old_engine) == ["ix_orders_user_time", "ix_recent_searches_user_time"]
+    assert ensure_indexes(old_engine) == []
+
+def test_missing_columns_are_added_to_existing_databases():
+    path = os.path.join(tempfile.mkdtemp(prefix='weknow-migrate-'), 'old.db')
+    old_engine = create_database_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(bind=old_engine)
+    with old_engine.begin() as connection:
+        connection.execute(text("ALTER TABLE orders DROP COLUMN agent_id"))
+
+    assert ensure_columns(old_engine) == ["orders.agent_id"]
+    assert ensure_columns(old_engine) == []
+    with old_engine.connect() as connection:
+        assert "agent_id" in [row[1] for row in connection.execute(text("PRAGMA table_info(orders)"))]
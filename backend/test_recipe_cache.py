@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for the two-tier recipe cache in front of get_ingredients_by_dish_name
+"""
+
+import time
+
+import ingredient_service
+from cache_service import LRUCache, RecipeCache
+
+SAMPLE_INGREDIENTS = [
+    {'ingredient': 'Rice', 'quantity': 1, 'unit': 'cup'},
+    {'ingredient': 'Lemon', 'quantity': 1, 'unit': 'piece'}
+]
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+def test_lru_cache_expires_entries():
+    cache = LRUCache(max_entries=10, ttl_seconds=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+
+def test_recipe_cache_survives_restart():
+    cache = RecipeCache()
+    cache.clear()
+    cache.set('lemon rice', SAMPLE_INGREDIENTS, source='themealdb')
+
+    # A fresh instance has an empty memory tier and must read from SQLite
+    restarted = RecipeCache()
+    assert restarted.get('lemon rice') == SAMPLE_INGREDIENTS
+    assert restarted.stats()['persistent_hits'] == 1
+
+    assert restarted.get('lemon rice') == SAMPLE_INGREDIENTS
+    assert restarted.stats()['memory_hits'] == 1
+
+def test_recipe_cache_returns_copies():
+    cache = RecipeCache()
+    cache.clear()
+    cache.set('lemon rice', SAMPLE_INGREDIENTS)
+
+    first = cache.get('lemon rice')
+    first[0]['quantity'] = 99
+    assert cache.get('lemon rice')[0]['quantity'] == 1
+
+def test_recipe_cache_negative_entries_and_ttl():
+    cache = RecipeCache(negative_ttl_seconds=0)
+    cache.clear()
+    cache.set('unknown dish', [])
+    assert cache.get('unknown dish') is None
+
+    cache = RecipeCache(negative_ttl_seconds=60)
+    cache.set('unknown dish', [])
+    assert cache.get('unknown dish') == []
+    assert cache.stats()['negative_hits'] == 1
+
+def test_recipe_cache_bounds_persisted_rows():
+    cache = RecipeCache(max_persisted_entries=2, prune_every_writes=1)
+    cache.clear()
+    for dish in ['a', 'b', 'c']:
+        cache.set(dish, SAMPLE_INGREDIENTS)
+        time.sleep(0.01)
+
+    restarted = RecipeCache()
+    assert restarted.get('a') is None
+    assert restarted.get('c') == SAMPLE_INGREDIENTS
+
+def test_recipe_cache_prunes_every_n_writes():
+    cache = RecipeCache(max_persisted_entries=1, prune_every_writes=3)
+    cache.clear()
+    cache.set('a', SAMPLE_INGREDIENTS)
+    time.sleep(0.01)
+    cache.set('b', SAMPLE_INGREDIENTS)
+    assert RecipeCache().get('a') == SAMPLE_INGREDIENTS
+
+    time.sleep(0.01)
+    cache.set('c', SAMPLE_INGREDIENTS)
+    restarted = RecipeCache()
+    assert restarted.get('a') is None and restarted.get('b') is None
+    assert restarted.get('c') == SAMPLE_INGREDIENTS
+
+def test_get_ingredients_by_dish_name_uses_cache(monkeypatch):
+    ingredient_service.recipe_cache.clear()
+    calls = []
+
+    def fake_themealdb(dish_name):
+        calls.append(dish_name)
+        return list(SAMPLE_INGREDIENTS)
+
+    monkeypatch.setattr(ingredient_service, '_fetch_themealdb_ingredients', fake_themealdb)
+
+    assert ingredient_service.get_ingredients_by_dish_name('Lemon Rice') == SAMPLE_INGREDIENTS
+    # Same clean_dish_name output, so this is served from the cache
+    assert ingredient_service.get_ingredients_by_dish_name('homemade lemon rice recipe') == SAMPLE_INGREDIENTS
+    assert calls == ['Lemon Rice']
+
+def test_get_ingredients_by_dish_name_negative_caching(monkeypatch):
+    ingredient_service.recipe_cache.clear()
+    calls = []
+
+    def not_found(dish_name):
+        calls.append(dish_name)
+        return []
+
+    monkeypatch.setattr(ingredient_service, '_fetch_themealdb_ingredients', not_found)
+    monkeypatch.setattr(ingredient_service, '_fetch_spoonacular_ingredients', not_found)
+
+    assert ingredient_service.get_ingredients_by_dish_name('Imaginary Stew') == []
+    assert ingredient_service.get_ingredients_by_dish_name('Imaginary Stew') == []
+    assert len(calls) == 2
+
+def test_provider_failures_are_not_negatively_cached(monkeypatch):
+    ingredient_service.recipe_cache.clear()
+    calls = []
+
+    def failed(dish_name):
+        calls.append(dish_name)
+        return None
+
+    monkeypatch.setattr(ingredient_service, '_fetch_themealdb_ingredients', failed)
+    monkeypatch.setattr(ingredient_service, '_fetch_spoonacular_ingredients', failed)
+
+    assert ingredient_service.get_ingredients_by_dish_name('Imaginary Stew') == []
+    assert ingredient_service.get_ingredients_by_dish_name('Imaginary Stew') == []
+    assert len(calls) == 4
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for sequential and concurrent recipe provider resolution
+"""
+
+import time
+
+import ingredient_service
+from config import Config
+
+MEALDB_INGREDIENTS = [{'ingredient': 'Rice', 'quantity': 1, 'unit': 'cup'}]
+SPOONACULAR_INGREDIENTS = [{'ingredient': 'Basmati Rice', 'quantity': 2, 'unit': 'cup'}]
+
+def slow_provider(result, delay):
+    def provider(dish_name):
+        time.sleep(delay)
+        return result
+    return provider
+
+def use_providers(monkeypatch, themealdb, spoonacular, mode='concurrent', policy='priority'):
+    ingredient_service.recipe_cache.clear()
+    monkeypatch.setitem(ingredient_service.RECIPE_PROVIDERS, 'themealdb', themealdb)
+    monkeypatch.setitem(ingredient_service.RECIPE_PROVIDERS, 'spoonacular', spoonacular)
+    monkeypatch.setattr(Config, 'RECIPE_RESOLVER_MODE', mode)
+    monkeypatch.setattr(Config, 'RECIPE_RESOLVER_POLICY', policy)
+
+def test_concurrent_latency_is_max_not_sum(monkeypatch):
+    use_providers(monkeypatch, slow_provider([], 0.3), slow_provider(SPOONACULAR_INGREDIENTS, 0.3))
+
+    started = time.monotonic()
+    ingredients = ingredient_service.get_ingredients_by_dish_name('Mystery Pilaf')
+    elapsed = time.monotonic() - started
+
+    assert ingredients == SPOONACULAR_INGREDIENTS
+    assert elapsed < 0.5
+
+def test_priority_policy_waits_for_preferred_provider(monkeypatch):
+    use_providers(monkeypatch, slow_provider(MEALDB_INGREDIENTS, 0.2), slow_provider(SPOONACULAR_INGREDIENTS, 0))
+
+    assert ingredient_service.get_ingredients_by_dish_name('Mystery Pilaf') == MEALDB_INGREDIENTS
+
+def test_first_policy_takes_fastest_good_answer(monkeypatch):
+    use_providers(monkeypatch, slow_provider(MEALDB_INGREDIENTS, 0.5), slow_provider(SPOONACULAR_INGREDIENTS, 0),
+                  policy='first')
+
+    started = time.monotonic()
+    assert ingredient_service.get_ingredients_by_dish_name('Mystery Pilaf') == SPOONACULAR_INGREDIENTS
+    assert time.monotonic() - started < 0.4
+
+def test_deadline_returns_best_answer_so_far(monkeypatch):
+    use_providers(monkeypatch, slow_provider(MEALDB_INGREDIENTS, 1.0), slow_provider(SPOONACULAR_INGREDIENTS, 0))
+    monkeypatch.setattr(Config, 'RECIPE_RESOLVER_DEADLINE_SECONDS', 0.2)
+
+    started = time.monotonic()
+    assert ingredient_service.get_ingredients_by_dish_name('Mystery Pilaf') == SPOONACULAR_INGREDIENTS
+    assert time.monotonic() - started < 0.5
+
+def test_deadline_without_answer_is_not_negatively_cached(monkeypatch):
+    use_providers(monkeypatch, slow_provider(MEALDB_INGREDIENTS, 0.5), slow_provider(None, 0))
+    monkeypatch.setattr(Config, 'RECIPE_RESOLVER_DEADLINE_SECONDS', 0.1)
+
+    assert ingredient_service.get_ingredients_by_dish_name('Mystery Pilaf') == []
+    assert ingredient_service.recipe_cache.get(ingredient_service.clean_dish_name('Mystery Pilaf')) is None
+
+def test_sequential_mode_follows_priority(monkeypatch):
+    calls = []
+
+    def themealdb(dish_name):
+        calls.append('themealdb')
+        return []
+
+    def spoonacular(dish_name):
+        calls.append('spoonacular')
+        return SPOONACULAR_INGREDIENTS
+
+    use_providers(monkeypatch, themealdb, spoonacular, mode='sequential')
+
+    assert ingredient_service.get_ingredients_by_dish_name('Mystery Pilaf') == SPOONACULAR_INGREDIENTS
+    assert calls == ['themealdb', 'spoonacular']
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for paginated, filtered shop listings (list_shops and GET /delivery/shops)
+"""
+
+import random
+
+import pytest
+
+from delivery_service import calculate_distance, decode_shop_cursor, encode_shop_cursor, list_shops
+from mock_data import MOCK_SHOPS
+from shop_catalog import InMemoryShopCatalog
+
+def random_catalog(count, seed=0):
+    rng = random.Random(seed)
+    items = sorted({item for shop in MOCK_SHOPS.values() for item in shop["inventory"]})
+    return InMemoryShopCatalog({
+        f"Shop {i}": {
+            "location": {"lat": 37.7 + rng.uniform(-0.2, 0.2), "lng": -122.4 + rng.uniform(-0.2, 0.2)},
+            "inventory": rng.sample(items, rng.randint(0, 20))
+        }
+        for i in range(count)
+    })
+
+def walk(catalog, limit, **filters):
+    names, after, position = [], None, None
+    while True:
+        page = list_shops(catalog, ('name',), limit, after, after_position=position, **filters)
+        names.extend(shop["name"] for shop in page["shops"])
+        if page["next_after"] is None:
+            return names, page["total"]
+        after, position = page["next_after"], page["next_position"]
+
+def test_pages_cover_the_catalog_in_order():
+    catalog = random_catalog(230)
+    names, total = walk(catalog, 17)
+    assert names == [name for name, _ in catalog.items()]
+    assert total == 230
+
+def test_area_filters_match_brute_force():
+    catalog = random_catalog(400, seed=1)
+    center = {"lat": 37.71, "lng": -122.38}
+    names, total = walk(catalog, 25, center=center, radius_km=6)
+    assert names == [name for name, shop in catalog.items()
+                     if calculate_distance(37.71, -122.38, shop["location"]["lat"], shop["location"]["lng"]) <= 6]
+    assert total == len(names)
+
+    bbox = (37.6, -122.5, 37.75, -122.35)
+    names, _ = walk(catalog, 25, bbox=bbox)
+    assert names == [name for name, shop in catalog.items()
+                     if 37.6 <= shop["location"]["lat"] <= 37.75 and -122.5 <= shop["location"]["lng"] <= -122.35]
+    assert names
+
+def test_wide_and_polar_boxes_keep_every_shop_inside():
+    rng = random.Random(2)
+    catalog = InMemoryShopCatalog({
+        f"Shop {i}": {"location": {"lat": rng.uniform(-90, 90), "lng": rng.uniform(-180, 180)}, "inventory": []}
+        for i in range(500)
+    }, cell_km=500)
+    boxes = [
+        (-60, -180, 60, 180),  # Every longitude: shops near the antimeridian are farther out than its corners
+        (-10, -170, 10, 170),
+        (60, -180, 90, 180),  # Reaches the north pole
+        (-90, -20, -45, 45),
+        (20, 0, 50, 40),  # Few enough cells to walk them
+    ]
+    for bbox in boxes:
+        min_lat, min_lng, max_lat, max_lng = bbox
+        names, total = walk(catalog, 40, bbox=bbox)
+        assert names == [name for name, shop in catalog.items()
+                         if min_lat <= shop["location"]["lat"] <= max_lat and min_lng <= shop["location"]["lng"] <= max_lng]
+        assert total == len(names) > 0
+
+def test_projection_and_cursor():
+    catalog = InMemoryShopCatalog(MOCK_SHOPS)
+    page = list_shops(catalog, ('name', 'inventory_count', 'inventory_sample'), limit=2)
+    assert page["shops"][0] == {"name": "Fresh Mart", "inventory_count": len(MOCK_SHOPS["Fresh Mart"]["inventory"]),
+                                "inventory_sample": MOCK_SHOPS["Fresh Mart"]["inventory"][:6]}
+    assert page["next_position"] == 1
+    assert decode_shop_cursor(encode_shop_cursor(page["next_after"], 1)) == (page["next_after"], 1)
+    with pytest.raises(ValueError):
+        list_shops(catalog, after="Closed Shop")
+
+def test_cursor_survives_catalog_changes():
+    shops = {f"Shop {i}": {"location": {"lat": 37.7, "lng": -122.4}, "inventory": []} for i in range(10)}
+    first = list_shops(InMemoryShopCatalog(shops), ('name',), limit=4)
+    assert first["next_after"] == "Shop 3"
+
+    # The cursor's shop closed: carry on with the shop that followed it
+    del shops["Shop 3"]
+    second = list_shops(InMemoryShopCatalog(shops), ('name',), 4, first["next_after"], after_position=first["next_position"])
+    assert [shop["name"] for shop in second["shops"]] == ["Shop 4", "Shop 5", "Shop 6", "Shop 7"]
+
+    # A shop opened earlier in the listing: the name still wins over the position
+    shops = {"Shop new": shops["Shop 0"], **shops}
+    third = list_shops(InMemoryShopCatalog(shops), ('name',), 4, second["next_after"], after_position=second["next_position"])
+    assert [shop["name"] for shop in third["shops"]] == ["Shop 8", "Shop 9"]
+
+def test_shops_endpoint(monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "shop_catalog", InMemoryShopCatalog(MOCK_SHOPS))
+    client = app_module.app.test_client()
+
+    monkeypatch.setattr(app_module, "shop_catalog", random_catalog(120))
+    everything = client.get('/delivery/shops?fields=name').get_json()
+    assert len(everything["shops"]) == everything["total"] == 120
+    assert everything["next_cursor"] is None and everything["limit"] is None
+    monkeypatch.setattr(app_module, "shop_catalog", InMemoryShopCatalog(MOCK_SHOPS))
+
+    full = client.get('/delivery/shops')
+    assert full.status_code == 200
+    assert [shop["name"] for shop in full.get_json()["shops"]] == list(MOCK_SHOPS)
+    assert full.get_json()["shops"][0]["inventory"] == MOCK_SHOPS["Fresh Mart"]["inventory"]
+    assert full.get_json()["next_cursor"] is None
+
+    cached = client.get('/delivery/shops', headers={'If-None-Match': full.headers['ETag']})
+    assert cached.status_code == 304
+    assert not cached.data
+
+    first = client.get('/delivery/shops?limit=2&fields=name,inventory_count').get_json()
+    assert set(first["shops"][0]) == {"name", "inventory_count"}
+    second = client.get(f"/delivery/shops?limit=2&fields=name&cursor={first['next_cursor']}").get_json()
+    assert [shop["name"] for shop in first["shops"] + second["shops"]] == list(MOCK_SHOPS)[:4]
+    assert second["total"] == len(MOCK_SHOPS)
+
+    nearby = client.get('/delivery/shops?lat=37.7749&lng=-122.4194&radius_km=0.5&fields=name').get_json()
+    assert [shop["name"] for shop in nearby["shops"]] == ["Fresh Mart"]
+
+    for query in ('fields=name,secret', 'limit=0', 'lat=37.7', 'bbox=1,2,3', 'cursor=%25%25'):
+        assert client.get(f'/delivery/shops?{query}').status_code == 400
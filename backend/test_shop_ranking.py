@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for top-k shop ranking
+"""
+
+import random
+
+from delivery_service import calculate_distance, find_and_rank_shops, match_ingredients_with_shop, rank_shops
+from shop_catalog import InMemoryShopCatalog
+
+USER = {"lat": 37.7749, "lng": -122.4194}
+ITEMS = ["flour", "milk", "eggs", "butter", "sugar", "olive oil", "basil", "mozzarella", "tomato sauce", "yeast"]
+
+def legacy_find_and_rank_shops(user_location, ingredients, shops, max_distance_km, min_match_percent):
+    qualified_shops = []
+    for shop_name, shop_data in shops.items():
+        distance_km = calculate_distance(user_location["lat"], user_location["lng"],
+                                         shop_data["location"]["lat"], shop_data["location"]["lng"])
+        if distance_km > max_distance_km:
+            continue
+        available, missing = match_ingredients_with_shop(ingredients, shop_data["inventory"])
+        match_percent = (len(available) / len(ingredients)) * 100 if ingredients else 0
+        if match_percent < min_match_percent:
+            continue
+        qualified_shops.append({
+            "name": shop_name, "distance_km": round(distance_km, 1), "match_percent": round(match_percent, 1),
+            "location": shop_data["location"], "inventory": shop_data["inventory"],
+            "available_ingredients": available, "missing_ingredients": missing,
+            "total_ingredients": len(ingredients), "available_count": len(available)
+        })
+    qualified_shops.sort(key=lambda x: (-x["match_percent"], x["distance_km"]))
+    return qualified_shops
+
+def make_shops(count, seed):
+    rng = random.Random(seed)
+    return {
+        f"Shop {i}": {
+            "location": {"lat": USER["lat"] + rng.uniform(-0.05, 0.05), "lng": USER["lng"] + rng.uniform(-0.05, 0.05)},
+            "inventory": rng.sample(ITEMS, rng.randint(2, len(ITEMS)))
+        }
+        for i in range(count)
+    }
+
+def make_ingredients(rng):
+    return [{"ingredient": name, "quantity": 1, "unit": "piece"} for name in rng.sample(ITEMS, rng.randint(3, 8))]
+
+def test_full_ranking_matches_legacy():
+    rng = random.Random(1)
+    for seed in range(5):
+        shops = make_shops(300, seed)
+        for _ in range(5):
+            ingredients = make_ingredients(rng)
+            expected = legacy_find_and_rank_shops(USER, ingredients, shops, 5, 50)
+            assert find_and_rank_shops(USER, ingredients, InMemoryShopCatalog(shops), 5, 50) == expected
+
+def test_pages_are_slices_of_the_full_ranking():
+    rng = random.Random(2)
+    catalog = InMemoryShopCatalog(make_shops(500, 9))
+    ingredients = make_ingredients(rng)
+    full = find_and_rank_shops(USER, ingredients, catalog, 5, 40)
+    for limit, offset in [(1, 0), (10, 0), (10, 25), (7, len(full) - 3), (5, len(full) + 10)]:
+        page = rank_shops(USER, ingredients, catalog, 5, 40, limit=limit, offset=offset)
+        assert page["total"] == len(full)
+        assert page["shops"] == full[offset:offset + limit]
+        assert page["top"] == full[0]
+
+def test_no_qualified_shops():
+    page = rank_shops(USER, [{"ingredient": "saffron"}], make_shops(20, 3), 5, 60, limit=5)
+    assert page == {"total": 0, "shops": [], "top": None}
+
+def test_ranked_shops_endpoint_paginates(monkeypatch):
+    import app as app_module
+    ingredients = [{"ingredient": name, "quantity": 1, "unit": "piece"} for name in ["flour", "sugar", "milk"]]
+    monkeypatch.setattr(app_module, "get_recipe_ingredients_from_spoonacular_improved", lambda dish_name: ingredients)
+    monkeypatch.setattr(app_module, "shop_catalog", InMemoryShopCatalog(make_shops(60, 9)))
+
+    client = app_module.app.test_client()
+    full = client.post('/delivery/ranked-shops', json={'dish_name': 'cake', 'min_match_percent': 0,
+                                                       'user_location': USER}).get_json()
+    page = client.post('/delivery/ranked-shops?limit=2&offset=1', json={'dish_name': 'cake', 'min_match_percent': 0,
+                                                                       'user_location': USER}).get_json()
+    assert page['total_qualified_shops'] == full['total_qualified_shops'] == len(full['all_qualified_shops'])
+    assert len(full['all_qualified_shops']) > 20
+    assert full['limit'] is None
+    assert page['all_qualified_shops'] == full['all_qualified_shops'][1:3]
+    assert page['top_shop'] == full['top_shop']
+    assert (page['limit'], page['offset']) == (2, 1)
+
+    assert not any('inventory' in shop for shop in full['all_qualified_shops'])
+    with_inventory = client.post('/delivery/ranked-shops?limit=2&include_inventory=true',
+                                 json={'dish_name': 'cake', 'min_match_percent': 0}).get_json()
+    assert all(shop['inventory'] for shop in with_inventory['all_qualified_shops'])
+
+    bad = client.post('/delivery/ranked-shops', json={'dish_name': 'cake', 'limit': 'many'})
+    assert bad.status_code == 400
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for the spatial shop index and shop catalog
+"""
+
+import random
+
+from delivery_service import calculate_distance, find_and_rank_shops
+from mock_data import MOCK_SHOPS
+from shop_catalog import InMemoryShopCatalog, shop_catalog
+from spatial_index import GeoGridIndex
+
+def brute_force(points, lat, lng, radius_km):
+    return [(key, calculate_distance(lat, lng, p_lat, p_lng))
+            for key, (p_lat, p_lng) in points.items()
+            if calculate_distance(lat, lng, p_lat, p_lng) <= radius_km]
+
+def check_region(rng, lat_range, lng_range, cell_km, radii):
+    points = {i: (rng.uniform(*lat_range), rng.uniform(*lng_range)) for i in range(2000)}
+    index = GeoGridIndex(cell_km)
+    for key, (lat, lng) in points.items():
+        index.insert(key, lat, lng)
+    for _ in range(50):
+        lat, lng = rng.uniform(*lat_range), rng.uniform(*lng_range)
+        radius = rng.choice(radii)
+        result = index.query_radius(lat, lng, radius)
+        expected = brute_force(points, lat, lng, radius)
+        assert [key for key, _ in result] == [key for key, _ in expected]
+        assert all(abs(got - want) < 1e-9 for (_, got), (_, want) in zip(result, expected))
+
+def test_grid_matches_brute_force_in_a_city():
+    check_region(random.Random(1), (37.6, 37.9), (-122.6, -122.2), 2.0, [0.5, 1, 5, 12])
+
+def test_grid_handles_antimeridian_and_poles():
+    rng = random.Random(2)
+    check_region(rng, (-10, 10), (179.5, 180), 5.0, [10, 50, 200])
+    check_region(rng, (-10, 10), (-180, -179.5), 5.0, [10, 50, 200])
+    check_region(rng, (88, 90), (-180, 180), 10.0, [20, 100, 400])
+
+def test_find_and_rank_shops_same_for_dict_and_catalog():
+    user_location = {"lat": 37.7749, "lng": -122.4194}
+    ingredients = [{'ingredient': name} for name in ['chicken', 'rice', 'saffron', 'heavy cream', 'nori']]
+    for radius in [0.5, 1.5, 2, 5, 50]:
+        from_dict = find_and_rank_shops(user_location, ingredients, MOCK_SHOPS, radius, 0)
+        from_catalog = find_and_rank_shops(user_location, ingredients, shop_catalog, radius, 0)
+        assert from_dict == from_catalog
+        expected = {name for name, shop in MOCK_SHOPS.items()
+                    if calculate_distance(user_location["lat"], user_location["lng"],
+                                          shop["location"]["lat"], shop["location"]["lng"]) <= radius}
+        assert {shop["name"] for shop in from_catalog} == expected
+
+def test_catalog_accessors():
+    catalog = InMemoryShopCatalog(MOCK_SHOPS)
+    assert len(catalog) == len(MOCK_SHOPS)
+    assert catalog.get("Fresh Mart") is MOCK_SHOPS["Fresh Mart"]
+    assert [name for name, _ in catalog.items()] == list(MOCK_SHOPS)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite connection profile and the single-writer queue
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import pytest
+from sqlalchemy import text
+
+from models import SessionLocal, engine, RecentSearch, User
+from write_queue import WriteQueue
+
+@pytest.fixture
+def user_id():
+    db = SessionLocal()
+    user = User(name='Writer', email=f'writer-{uuid.uuid4().hex}@example.com', password_hash='x')
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+def searches(user_id):
+    db = SessionLocal()
+    try:
+        return sorted(search.dish_name for search in db.query(RecentSearch).filter(RecentSearch.user_id == user_id))
+    finally:
+        db.close()
+
+def test_sqlite_connections_use_the_profile():
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert connection.execute(text("PRAGMA cache_size")).scalar() == -65536
+
+def test_concurrent_writes_are_batched(user_id):
+    writer = WriteQueue(max_batch=50, max_delay_seconds=0.05)
+
+    def add(i):
+        def job(db):
+            search = RecentSearch(user_id=user_id, dish_name=f'dish {i:02d}')
+            db.add(search)
+            db.flush()
+            return search.id
+        return writer.execute(job, timeout=10)
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        ids = list(executor.map(add, range(40)))
+    writer.close()
+
+    assert len(set(ids)) == 40
+    assert searches(user_id) == [f'dish {i:02d}' for i in range(40)]
+    stats = writer.stats()
+    assert stats['jobs'] == 40
+    assert stats['batches'] < 40
+
+def test_failing_write_does_not_sink_its_batch(user_id):
+    writer = WriteQueue(max_batch=10, max_delay_seconds=0.2)
+
+    def failing(db):
+        db.add(RecentSearch(user_id=user_id, dish_name='doomed'))
+        raise ValueError('bad write')
+
+    futures = [
+        writer.submit(lambda db: db.add(RecentSearch(user_id=user_id, dish_name='first'))),
+        writer.submit(failing),
+        writer.submit(lambda db: db.add(RecentSearch(user_id=user_id, dish_name='second'))),
+    ]
+    futures[0].result(timeout=10)
+    futures[2].result(timeout=10)
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=10)
+    writer.close()
+
+    assert searches(user_id) == ['first', 'second']
+    assert writer.stats()['retried_batches'] == 1
+    assert writer.stats()['failed_jobs'] == 1
+
+def test_disabled_queue_writes_inline(user_id):
+    writer = WriteQueue(enabled=False)
+    writer.execute(lambda db: db.add(RecentSearch(user_id=user_id, dish_name='inline')))
+    assert searches(user_id) == ['inline']
+    assert writer.stats()['pending'] == 0
+
+def test_order_endpoint_writes_through_the_queue():
+    import app as app_module
+    client = app_module.app.test_client()
+    registered = client.post('/auth/register', json={
+        'name': 'Queue Tester', 'email': f'queue-{uuid.uuid4().hex}@example.com', 'password': 'secret123'
+    }).get_json()
+    headers = {'Authorization': f"Bearer {registered['access_token']}"}
+
+    response = client.post('/user/orders', json={
+        'dish_name': 'pasta', 'ingredients': [{'ingredient': 'pasta'}], 'servings': 2
+    }, headers=headers)
+    assert response.status_code == 200
+    orders = client.get('/user/orders', headers=headers).get_json()['orders']
+    assert [order['id'] for order in orders] == [response.get_json()['order_id']]
+
+    assert client.post('/user/recent-searches', json={'dish_name': 'pasta'}, headers=headers).status_code == 200
+    assert client.post('/user/recent-searches', json={'dish_name': 'pasta'}, headers=headers).status_code == 200
+    assert searches(registered['user']['id']) == ['pasta']
+
+def test_timed_out_writes_are_cancelled(user_id):
+    writer = WriteQueue(max_batch=1, max_delay_seconds=0)
+    started, release = threading.Event(), threading.Event()
+
+    def slow(db):
+        started.set()
+        release.wait(10)
+        db.add(RecentSearch(user_id=user_id, dish_name='slow'))
+
+    slow_write = writer.submit(slow)
+    assert started.wait(10)
+    with pytest.raises(TimeoutError):
+        writer.execute(lambda db: db.add(RecentSearch(user_id=user_id, dish_name='abandoned')), timeout=0.05)
+    release.set()
+    slow_write.result(timeout=10)
+    writer.close()
+
+    assert searches(user_id) == ['slow']
+    assert writer.stats()['cancelled_jobs'] == 1
+
+def test_started_writes_are_waited_for(user_id):
+    writer = WriteQueue(max_batch=1, max_delay_seconds=0)
+
+    def slow(db):
+        time.sleep(0.3)
+        db.add(RecentSearch(user_id=user_id, dish_name='late'))
+        return 'done'
+
+    assert writer.execute(slow, timeout=0.1) == 'done'
+    writer.close()
+    assert searches(user_id) == ['late']
+    assert writer.stats()['cancelled_jobs'] == 0
+
+def test_timed_out_orders_are_never_saved(monkeypatch):
+    import app as app_module
+    client = app_module.app.test_client()
+    registered = client.post('/auth/register', json={
+        'name': 'Queue Tester', 'email': f'queue-{uuid.uuid4().hex}@example.com', 'password': 'secret123'
+    }).get_json()
+    headers = {'Authorization': f"Bearer {registered['access_token']}"}
+
+    started, release = threading.Event(), threading.Event()
+    app_module.write_queue.submit(lambda db: (started.set(), release.wait(10)))
+    assert started.wait(10)
+    monkeypatch.setattr(app_module.Config, 'DB_POOL_TIMEOUT', 0.05)
+    response = client.post('/user/orders', json={'dish_name': 'pasta', 'ingredients': [{'ingredient': 'pasta'}]}, headers=headers)
+    release.set()
+    assert response.status_code == 503
+
+    app_module.write_queue.execute(lambda db: None)
+    assert client.get('/user/orders', headers=headers).get_json()['orders'] == []
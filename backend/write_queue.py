@@ -0,0 +1,172 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Callable, List, Optional, Tuple
+from models import SessionLocal
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+WriteJob = Callable[[Any], Any]
+
+class WriteQueue:
+    """
+    Single writer thread that batches small writes into one transaction
+
+    SQLite allows one writer at a time, so request threads writing on their own contend
+    for the database lock. Jobs submitted here run one after another on the writer
+    thread: it waits up to max_delay_seconds for up to max_batch jobs, runs them all in
+    one session and commits once. If any job in a batch raises, the batch is rolled back
+    and its jobs rerun one transaction each, so only the failing job sees the error.
+
+    A job is a callable taking the session; its return value resolves the job's Future
+    after the commit. Return plain values (ids, counts), not ORM objects, which expire
+    when the writer's session closes. Cancelling the Future before the writer reaches
+    the job drops it.
+
+    Args:
+        session_factory: Callable returning a SQLAlchemy session
+        max_batch (int): Most jobs committed together
+        max_delay_seconds (float): How long a batch collects jobs
+        enabled (bool): When False, execute() runs jobs inline in their own transaction
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_batch: int = Config.WRITE_QUEUE_MAX_BATCH,
+                 max_delay_seconds: float = Config.WRITE_QUEUE_MAX_DELAY_SECONDS,
+                 enabled: bool = Config.WRITE_QUEUE_ENABLED):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay_seconds = max_delay_seconds
+        self.enabled = enabled
+        self._jobs: "queue.Queue[Optional[Tuple[WriteJob, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._counts = {'jobs': 0, 'batches': 0, 'failed_jobs': 0, 'retried_batches': 0, 'cancelled_jobs': 0}
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._stats_lock:
+            self._counts[counter] += amount
+
+    def submit(self, job: WriteJob) -> Future:
+        """
+        Queue a write
+
+        Returns:
+            Future: Resolves to the job's return value once committed, or its exception
+        """
+        future = Future()
+        if not self.enabled:
+            future.set_running_or_notify_cancel()
+            self._run_alone(job, future)
+            return future
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+                    self._thread.start()
+        self._jobs.put((job, future))
+        return future
+
+    def execute(self, job: WriteJob, timeout: Optional[float] = None) -> Any:
+        """
+        Queue a write and wait for it to commit; raises whatever the job raised
+
+        On timeout the job is cancelled and TimeoutError raised, so a caller that gives
+        up (and perhaps retries) never has the write land later. A job the writer has
+        already started cannot be cancelled and is waited for instead.
+        """
+        future = self.submit(job)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            return future.result()
+
+    def _run(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay_seconds
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._jobs.get(timeout=remaining) if remaining > 0 else self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch: List[Tuple[WriteJob, Future]]):
+        running = [(job, future) for job, future in batch if future.set_running_or_notify_cancel()]
+        self._count('cancelled_jobs', len(batch) - len(running))
+        batch = running
+        if not batch:
+            return
+        db = self.session_factory()
+        try:
+            results = [job(db) for job, _ in batch]
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if len(batch) == 1:
+                logger.error(f"Queued write failed: {e}")
+                self._count('failed_jobs')
+                batch[0][1].set_exception(e)
+                return
+            logger.warning(f"Write batch of {len(batch)} failed ({e}), retrying its writes one by one")
+            self._count('retried_batches')
+            for job, future in batch:
+                self._run_alone(job, future)
+            return
+        finally:
+            db.close()
+
+        self._count('jobs', len(batch))
+        self._count('batches')
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _run_alone(self, job: WriteJob, future: Future):
+        db = self.session_factory()
+        try:
+            result = job(db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Queued write failed: {e}")
+            self._count('failed_jobs')
+            future.set_exception(e)
+            return
+        finally:
+            db.close()
+        self._count('jobs')
+        self._count('batches')
+        future.set_result(result)
+
+    def close(self, timeout: Optional[float] = None):
+        """Finish queued writes and stop the writer thread"""
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        with self._stats_lock:
+            counts = dict(self._counts)
+        return {**counts, 'enabled': self.enabled, 'pending': self._jobs.qsize()}
+
+
+# Shared writer over the application database
+write_queue = WriteQueue()
@@ -16,6 +16,9 @@ import SavedAddresses from './pages/SavedAddresses';
 import Settings from './pages/Settings';
 import TrackOrders from './pages/TrackOrders';
 
+// Newest orders kept in app state; the full history is paged in OrderHistory
+const RECENT_ORDERS_LIMIT = 20;
+
 function App() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [showLoginForm, setShowLoginForm] = useState(false);
@@ -79,7 +82,7 @@ function App() {
     const loadOrders = async () => {
       if (isAuthenticated) {
         try {
-          const userOrders = await userDataService.getOrders();
+          const userOrders = await userDataService.getOrders({ limit: RECENT_ORDERS_LIMIT });
           setOrders(userOrders);
           // No longer saving to localStorage - components will fetch from database
         } catch (error) {
@@ -98,7 +101,7 @@ function App() {
   const refreshOrders = async () => {
     if (isAuthenticated) {
       try {
-        const userOrders = await userDataService.getOrders();
+        const userOrders = await userDataService.getOrders({ limit: RECENT_ORDERS_LIMIT });
         setOrders(userOrders);
       } catch (error) {
         console.error('Error refreshing orders:', error);
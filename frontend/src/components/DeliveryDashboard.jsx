@@ -50,9 +50,17 @@ const DeliveryDashboard = ({ onClose, selectedDish, selectedServings, addOrder }
     try {
       setLoading(true);
       
-      // Fetch shops
-      const shopsResponse = await axios.get('http://localhost:8000/delivery/shops');
-      setShops(shopsResponse.data.shops);
+      // Fetch shops, following the cursor when the server pages the listing
+      const allShops = [];
+      let cursor = null;
+      do {
+        const shopsResponse = await axios.get('http://localhost:8000/delivery/shops', {
+          params: { fields: 'name,location,inventory_count,inventory_sample', ...(cursor && { cursor }) }
+        });
+        allShops.push(...shopsResponse.data.shops);
+        cursor = shopsResponse.data.next_cursor;
+      } while (cursor);
+      setShops(allShops);
       
       // Fetch agents
       const agentsResponse = await axios.get('http://localhost:8000/delivery/agents');
@@ -294,11 +302,11 @@ const DeliveryDashboard = ({ onClose, selectedDish, selectedServings, addOrder }
                 <div className="shop-inventory">
                   <p>Sample items:</p>
                   <div className="inventory-tags">
-                    {shop.inventory.slice(0, 6).map((item, idx) => (
+                    {shop.inventory_sample.map((item, idx) => (
                       <span key={idx} className="inventory-tag">{item}</span>
                     ))}
-                    {shop.inventory.length > 6 && (
-                      <span className="inventory-tag">+{shop.inventory.length - 6} more</span>
+                    {shop.inventory_count > shop.inventory_sample.length && (
+                      <span className="inventory-tag">+{shop.inventory_count - shop.inventory_sample.length} more</span>
                     )}
                   </div>
                 </div>
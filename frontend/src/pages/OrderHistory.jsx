@@ -7,10 +7,16 @@ const OrderHistory = () => {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (cursor = null) => {
     try {
-      setLoading(true);
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
       setError(null);
       
       const token = localStorage.getItem('weKnowToken');
@@ -24,11 +30,17 @@ const OrderHistory = () => {
       const response = await axios.get('http://localhost:8000/user/orders', {
         headers: {
           'Authorization': `Bearer ${token}`
+        },
+        params: {
+          limit: 20,
+          ...(cursor ? { cursor } : {})
         }
       });
       
       if (response.data.success) {
-        setOrders(response.data.orders || []);
+        const page = response.data.orders || [];
+        setOrders(previous => (cursor ? [...previous, ...page] : page));
+        setNextCursor(response.data.next_cursor || null);
       } else {
         setError(response.data.error || 'Failed to load orders');
       }
@@ -40,6 +52,7 @@ const OrderHistory = () => {
       }
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -82,7 +95,7 @@ const OrderHistory = () => {
           </div>
         ) : orders.length > 0 ? (
           <div className="orders-list">
-            <h3>✅ Found {orders.length} orders:</h3>
+            <h3>✅ Showing {orders.length} orders:</h3>
             {orders.map((order) => (
               <div key={order.id} className="order-card">
                 <div className="order-header">
@@ -120,6 +133,11 @@ const OrderHistory = () => {
                 </div>
               </div>
             ))}
+            {nextCursor && (
+              <button onClick={() => fetchOrders(nextCursor)} className="refresh-button" disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more orders'}
+              </button>
+            )}
           </div>
         ) : (
           <div className="empty-state">
@@ -26,6 +26,12 @@ const TrackOrders = () => {
       const response = await axios.get('http://localhost:8000/user/orders', {
         headers: {
           'Authorization': `Bearer ${token}`
+        },
+        // Only the 3 most recent active orders, without their ingredient lists
+        params: {
+          status: 'pending,in_transit',
+          limit: 3,
+          fields: 'id,dish_name,servings,status,timestamp'
         }
       });
 
@@ -33,12 +39,7 @@ const TrackOrders = () => {
       
       if (response.data.success) {
         console.log('Orders fetched successfully:', response.data.orders);
-        // Filter for active orders (pending or in_transit)
-        const activeOrders = response.data.orders
-          .filter(order => (order.status || 'pending') === 'pending' || (order.status || 'pending') === 'in_transit')
-          .slice(0, 3); // Show only the 3 most recent orders as "active"
-        
-        setOrders(activeOrders || []);
+        setOrders(response.data.orders || []);
       } else {
         console.error('Failed to load orders:', response.data.error);
         setError(response.data.error || 'Failed to load orders');
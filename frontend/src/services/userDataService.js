@@ -48,10 +48,12 @@ class UserDataService {
   }
 
   // Orders
-  async getOrders() {
+  // params: { limit, cursor, fields, status } - see GET /user/orders
+  async getOrders(params = {}) {
     try {
       const response = await axios.get(`${API_BASE_URL}/user/orders`, {
-        headers: getAuthHeaders()
+        headers: getAuthHeaders(),
+        params
       });
       return response.data.orders || [];
     } catch (error) {